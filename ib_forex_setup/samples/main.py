@@ -53,8 +53,12 @@ smtp_username = 'your_email@gmail.com'
 to_email = 'any_email@email_extension.com'
 # The app password that was obtained in Google. You need to allow app password in Google: https://support.google.com/mail/answer/185833?hl=en
 password = 'qwer yuio asdf hjkl'
+# Keep the app connected to the IB server for all the periods of the week instead of reconnecting every period
+persistent_connection = True
+# Subscribe to the minute bars and keep the bars in memory instead of downloading them every period (only with the persistent connection)
+live_bars = True
 ###############################################################################
 
 # Run the main file to run the app loop
 main(account, timezone, port, account_currency, symbol, data_frequency, local_restart_hour, historical_data_address, base_df_address, train_span, test_span_days, 
-     max_window, host, client_id, purged_window_size, embargo_period, seed, random_seeds, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, smtp_username, to_email, password)
+     max_window, host, client_id, purged_window_size, embargo_period, seed, random_seeds, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, smtp_username, to_email, password, persistent_connection=persistent_connection, live_bars=live_bars)
@@ -1,4 +1,5 @@
 # For data manipulation
+import os
 import pickle 
 import numpy as np
 import pandas as pd
@@ -6,10 +7,8 @@ from hmmlearn import hmm
 from datetime import datetime
 from sklearn.utils import check_random_state
 import trading_functions as tf
-import featuretools as ft
-from featuretools.primitives import Month, Weekday, Hour
-from ta import add_all_ta_features
-from statsmodels.tsa.stattools import adfuller
+import store_functions as stf
+import ta_functions as taf
 from sklearn.ensemble import BaggingClassifier
 from sklearn.ensemble import RandomForestClassifier as RFC
 from sklearn.calibration import CalibratedClassifierCV as calibration
@@ -55,12 +54,9 @@ def set_take_profit_price(signal, last_value, risk_management_target, take_profi
         
     return order_price
 
-def prepare_base_df(df, max_window, test_span, train_span=None, scalable_features=None):
-    """ Function to prepare the data to be used for model fitting """
-        
-    ###############################################################################
-    # Section 1: Creating the first model prediction feature
-    ###############################################################################
+def create_prediction_feature(df):
+    """ Function to create the prediction feature and drop its scarce labels """
+    
     # Compute the close-to-close log returns
     df['cc_returns'] = np.log(df.Close/df.Close.shift(1))
     # Compute the prediction feature for the first model
@@ -69,81 +65,90 @@ def prepare_base_df(df, max_window, test_span, train_span=None, scalable_feature
     # Drop the rows which have the prediction feature a label with very few observations
     df = tf.dropLabels(df)
     
-    # Use the last number of observations
-    if train_span is not None:
-        df = df.iloc[-train_span:]
+    return df
 
-    ###############################################################################
-    # Section 2: Creating the datetime input features
-    ###############################################################################
-    # Set the name for the dates dataframe index
-    for_features_index = 'index1'
-    # Create a column based on the index datetime
-    df[for_features_index] = df.index
-    
-    # Create an entityset to form the dates-based features
-    es = ft.EntitySet('My EntitySet')
-    es.add_dataframe(
-        dataframe_name = 'main_data_table',
-        index = 'index',
-        dataframe = df[['Close', for_features_index]])#,
-        # time_index = 'index1')#, 
-        # make_index=True)
-        
-    # Set the frequency to be used to get the dates time series
-    time_features = [Month, Weekday, Hour]
-    #time_features = [Minute, Hour, Weekday, Month]
-    
-    # Create the time series based on the time frequencies' features from above
-    fm, features = ft.dfs(
-        entityset = es,
-        target_dataframe_name = 'main_data_table',
-        trans_primitives = time_features)
-    
-    # Set the fm index as the df.index is
-    fm.set_index(df.index, inplace=True, drop=True)
-    
-    # A function to obtain the fm columns names
-    def get_var_name(variable):
-         for name, value in globals().items():
-            if value is variable:
-                return name
-            
-    # Set the time features names in a list
-    time_features_columns = [get_var_name(el).upper()+ '('+for_features_index+')' for el in time_features]
-    
-    # Obtain the dummies from the months' time series
-    months_dummies = pd.get_dummies(fm[time_features_columns[0]])
-    # Rename the month's columns
-    months_dummies.columns = ['month_'+ str(month) for month in months_dummies.columns.to_list()]
-    # Obtain the dummies from the days' time series
-    days_dummies = pd.get_dummies(fm[time_features_columns[1]])
-    # Rename the days columns
-    days_dummies.columns = ['day_'+ str(day) for day in days_dummies.columns.to_list()]
-    # Drop the Saturday's column
-    days_dummies.drop('day_5', axis=1, inplace=True)
-    # Obtain the dummies from the hours' time series
-    hours_dummies = pd.get_dummies(fm[time_features_columns[2]])
-    # Rename the hour's columns
-    hours_dummies.columns = ['hour_'+ str(hour) for hour in hours_dummies.columns.to_list()]
+def get_stationarity_transforms(technical_features_df, test_span, batched=True):
+    """ Function to decide, per technical indicator, whether to use its level or its percentage returns
+        - If batched is True, the adfuller tests of all the technical indicators are solved at once in matrix form"""
+    
+    # Create a dictionary to save the transform of each technical indicator
+    transforms = {}
+    
+    # Get the p-values of the adfuller applied to the technical indicators
+    pvalues = tf.adfuller_pvalues(technical_features_df.iloc[:-test_span], batched)
+    
+    # Create a loop to check the stationarity of the technical indicators
+    for indicator, pvalue in pvalues.items():
+        # If the p-value is higher than 0.05
+        if pvalue > 0.05:
+            # Use the percentage returns of the technical indicator as the input feature
+            transforms[indicator] = 'pct_change'
+        # If a p-value was obtained from the adfuller, use the level of the technical indicator
+        elif not np.isnan(pvalue):
+            transforms[indicator] = 'level'
+                
+    return transforms
+
+def apply_stationarity_transforms(technical_features_df, transforms):
+    """ Function to make the technical indicators stationary as per their transforms """
+    
+    # Drop the technical indicators without a transform
+    technical_features_df = technical_features_df[[indicator for indicator in technical_features_df.columns if indicator in transforms]].copy()
     
+    # Get the technical indicators which are not stationary
+    pct_change_indicators = [indicator for indicator in technical_features_df.columns if transforms[indicator] == 'pct_change']
+    # Use the percentage returns of these technical indicators as the input features, all at once
+    technical_features_df[pct_change_indicators] = technical_features_df[pct_change_indicators].pct_change()
+            
+    return technical_features_df
+
+def create_datetime_features(index):
+    """ Function to create the month, weekday and hour dummies with a fixed column layout """
+    
+    # Set the dummies' prefixes, the datetime values and their categories. Saturday is left out of the weekdays
+    calendar_features = [('month', index.month.values, list(range(1,13))),
+                         ('day', index.weekday.values, [0,1,2,3,4,6]),
+                         ('hour', index.hour.values, list(range(24)))]
+    
+    # Create a list to save the dummies' blocks
+    dummies_blocks = list()
+    for prefix, values, categories in calendar_features:
+        # Create the uint8 dummies block comparing each datetime value against each category
+        dummies = (values[:,None] == np.array(categories)[None,:]).astype(np.uint8)
+        dummies_blocks.append(pd.DataFrame(dummies, index=index, columns=[f'{prefix}_{category}' for category in categories]))
+        
     # Save the datetime features in a single dataframe
-    datetime_features = pd.concat([months_dummies, days_dummies, hours_dummies],axis=1)
+    datetime_features = pd.concat(dummies_blocks, axis=1)
     
-    ###############################################################################
-    # Section 3: Creating the technical indicators features
-    ###############################################################################
-    # Create a Volume column with zeros
-    df['Volume'] = 0.0
+    return datetime_features
+
+def get_window_sizes(max_window):
+    """ Function to get the window sizes of the technical indicators """
     
     # Set the list of window sizes        
     if max_window<=15:
         windows = list(range(3,max_window))
     elif max_window>=16:
         windows = list(range(3,11))+list(range(15,(max_window+1),10))
+        
+    return windows
+
+def create_features(df, max_window, test_span, transforms=None, cumulative_return_base=None, states=None):
+    """ Function to create the input features before making them rolling-zscore-based
+        - The cumulative return indicator starts from cumulative_return_base, or from the first close price used if it's None
+        - If the technical indicators' states are given, their recursions continue from the saved states and the states are updated"""
     
-    # Create the technical indicators dataframe
-    technical_features_df = pd.DataFrame(index=df.index)
+    ###############################################################################
+    # Section 2: Creating the datetime input features
+    ###############################################################################
+    # Create the month, weekday and hour dummies
+    datetime_features = create_datetime_features(df.index)
+    
+    ###############################################################################
+    # Section 3: Creating the technical indicators features
+    ###############################################################################
+    # Set the list of window sizes        
+    windows = get_window_sizes(max_window)
     
     # Obtain the long-memory stationary OHLC data based on the optimal "d" previously estimated
     df[['Open_dif','High_dif','Low_dif','Close_dif']] = df[['Open','High','Low','Close']].pct_change()
@@ -156,79 +161,39 @@ def prepare_base_df(df, max_window, test_span, train_span=None, scalable_feature
     # Drop Nan values
     df.dropna(inplace=True)
     
-    # Get all the possible technical indicators for each window size
-    for window in windows:
-        # Obtain the technical indicators
-        technical_features = (
-            add_all_ta_features(
-                df[['Open','High','Low','Close','Volume']].copy(), \
-                    open="Open", high="High", low="Low", close="Close", volume="Volume"
-            )
-            .ffill()
-        )
-        
-        # Drop the OHLCV columns
-        technical_features.drop(['Open','High','Low','Close','Volume'], axis=1, inplace=True)
-        # Save the names of the volume-based features as a list
-        volume_indicators = technical_features.filter(like='volume', axis=1).columns.tolist()
-        # Drop the volume-based features
-        technical_features.drop(volume_indicators, axis=1, inplace=True)
-        
-        # Save the names of the volume-based features as a list
-        volume_pvo_indicators = technical_features.filter(like='pvo', axis=1).columns.tolist()
-        # Drop the volume-based features
-        technical_features.drop(volume_pvo_indicators, axis=1, inplace=True)
-        
-        # Modify the dataframe columns to distinguish them from other features with different window sizes
-        technical_features.columns = [f'{column}_{window}' for column in technical_features.columns.tolist()]
-        # Concatenate these window-size-based technical indicators to the bigger dataframe
-        technical_features_df.loc[technical_features.index, technical_features.columns.tolist()] = technical_features
-        
-    # Create a loop to make the technical indicators stationary
-    for indicator in technical_features_df.columns:
-        # If all observations are NaN values
-        if technical_features_df[indicator].isna().all():
-            # Drop the feature from the dataframe
-            technical_features_df.drop(indicator, axis=1, inplace=True)  
-            continue
-        # If all observations are Infinite
-        elif np.isinf(technical_features_df[indicator].values).all():
-            # Drop the feature from the dataframe
-            technical_features_df.drop(indicator, axis=1, inplace=True)  
-            continue
-        else:
-            try:
-                # Get the p-value of the adfuller applied to the technical indicator
-                pvalue = adfuller(technical_features_df[indicator].iloc[:-test_span].dropna(), regression='c', autolag='AIC')[1]
-                # If the p-value is higher than 0.05
-                if pvalue > 0.05:
-                    # Use the percentage returns of the technical indicator as the input feature
-                    technical_features_df[indicator] = technical_features_df[indicator].pct_change()
-                # If no p-value was obtained from the adfuller
-                elif np.isnan(pvalue):
-                    # Drop the feature from the dataframe
-                    technical_features_df.drop(indicator, axis=1, inplace=True)
-            except:
-                # Drop the feature from the dataframe
-                technical_features_df.drop(indicator, axis=1, inplace=True)
+    # Set the close price the cumulative return starts from
+    if cumulative_return_base is None:
+        cumulative_return_base = df['Close'].iloc[0]
+    
+    # Compute each technical indicator once per window size
+    technical_features_df = taf.get_technical_indicators(df, windows, cumulative_return_base=cumulative_return_base, states=states)
+        
+    # If the stationarity transforms were not provided
+    if transforms is None:
+        # Decide the transform of each technical indicator with the adfuller test
+        transforms = get_stationarity_transforms(technical_features_df, test_span)
+        
+    # Make the technical indicators stationary
+    technical_features_df = apply_stationarity_transforms(technical_features_df, transforms)
     
     # Creating more features
     ma_signal_names = [f'ma_signal_{i}' for i in windows]
     std_names = [f'std_{i}' for i in windows]
     std_mean_names = [f'std_mean_{i}' for i in windows]
     std_signal_names = [f'std_signal_{i1}_{i2}' for i1 in windows for i2 in windows]    
-    df[ma_signal_names] = np.array([np.where(df['Close']>df['Close'].rolling(i).mean().values,1.0,-1.0) for i in windows]).T
-    df[std_names] = np.array([df['Close'].rolling(i).std().values for i in windows]).T
-    df[std_mean_names] = np.array([df[f'std_{i}'].rolling(i).mean() for i in windows]).T    
+    # The rolling windows are computed over each window's own values, so the features of a row don't depend on the rows before its windows
+    close = df['Close'].to_numpy(dtype=float)
+    df[ma_signal_names] = np.array([np.where(close>taf.rolling_mean(close, i),1.0,-1.0) for i in windows]).T
+    df[std_names] = np.array([taf.rolling_std(close, i, ddof=1) for i in windows]).T
+    df[std_mean_names] = np.array([taf.rolling_mean(df[f'std_{i}'].to_numpy(), i) for i in windows]).T    
     df[std_signal_names] = np.array([np.where(df[f'std_{i1}']<df[f'std_mean_{i2}'],1.0,-1) for i1 in windows for i2 in windows]).T
     
     ###############################################################################
     # Section 4: Concatenating the necessary dataframes into a single dataframe
     ###############################################################################
-    # Set the scalable features list
-    if scalable_features is None:
-        scalable_features = technical_features_df.columns.tolist() + \
-            df[ohlc_lags_list].columns.tolist()
+    # Set the features that can be scaled
+    scalable_features = technical_features_df.columns.tolist() + \
+        df[ohlc_lags_list].columns.tolist()
         
     # Create the base dataframe to be used for the ML model
     base_df = pd.concat([technical_features_df, df[ohlc_lags_list], datetime_features],axis=1)
@@ -261,6 +226,32 @@ def prepare_base_df(df, max_window, test_span, train_span=None, scalable_feature
     # Drop the NaN values
     base_df.dropna(inplace=True) 
     
+    return base_df, final_input_features, scalable_features, transforms, cumulative_return_base
+
+def create_base_df(df, max_window, test_span, train_span=None, scalable_features=None, transforms=None, states=None):
+    """ Function to prepare the data to be used for model fitting together with the technical indicators' transforms
+        - If the technical indicators' states are given, they're saved to continue the recursions with the next bars """
+        
+    ###############################################################################
+    # Section 1: Creating the first model prediction feature
+    ###############################################################################
+    # Create the prediction feature
+    df = create_prediction_feature(df)
+    
+    # Use the last number of observations
+    if train_span is not None:
+        df = df.iloc[-train_span:]
+
+    ###############################################################################
+    # Sections 2 to 4: Creating the input features
+    ###############################################################################
+    # Create the datetime and technical indicators features
+    base_df, final_input_features, all_scalable_features, transforms, cumulative_return_base = create_features(df, max_window, test_span, transforms, states=states)
+    
+    # Set the scalable features list
+    if scalable_features is None:
+        scalable_features = all_scalable_features
+        
     ###############################################################################
     # Section 5: Make the input features rolling-zscore-based
     ###############################################################################
@@ -272,22 +263,207 @@ def prepare_base_df(df, max_window, test_span, train_span=None, scalable_feature
     base_df.replace([np.inf, -np.inf], np.nan, inplace=True)
     base_df.ffill(inplace=True) 
     
+    return base_df, final_input_features, scalable_features, transforms, cumulative_return_base
+
+def prepare_base_df(df, max_window, test_span, train_span=None, scalable_features=None, transforms=None):
+    """ Function to prepare the data to be used for model fitting """
+        
+    # Create the base_df dataframe
+    base_df, final_input_features, scalable_features, _, _ = create_base_df(df, max_window, test_span, train_span, scalable_features, transforms)
+    
     return base_df, final_input_features, scalable_features
 
-def get_signal(logging, market_open_time, base_df, final_input_features, purged_window_size, embargo_period): 
-    ''' Function to get the signal'''
+def get_features_lookback(max_window, zscore_window=30):
+    """ Function to get the number of previous bars used to compute the features of new bars
+        - The OHLC percentage returns and their 9 lags use 10 bars, the technical indicators their rolling windows' lookback and the z-scores the previous "zscore_window" rows,
+          whose technical indicators' percentage returns use 1 more bar """
+    return 10 + taf.get_indicators_lookback(get_window_sizes(max_window)) + zscore_window + 1
+
+class feature_engine():
+    ''' Class to update the base_df dataframe incrementally, period by period
+        - The technical indicators' recursions continue from the states saved when the base_df dataframe was created
+        - The rolling windows are computed with the last bars only, the ones their lookbacks need '''
+    
+    def __init__(self, df, base_df, max_window, scalable_features, transforms, warmup_span=500, zscore_window=30, dc_state=None, cumulative_return_base=None, states=None):
+        
+        # Set the maximum window to compute the technical indicators
+        self.max_window = max_window
+        # Set the features to be made rolling-zscore-based
+        self.scalable_features = scalable_features
+        # Set the technical indicators' stationarity transforms
+        self.transforms = transforms
+        # Set the number of bars kept to warm up the technical indicators
+        self.warmup_span = warmup_span
+        # Set the rolling zscore window
+        self.zscore_window = zscore_window
+        # Set the DC state to update the R indicator
+        self.dc_state = dc_state
+        # Set the close price the cumulative return starts from, the first close of the base_df data
+        self.cumulative_return_base = cumulative_return_base
+        # Set the technical indicators' states, if they're None the features are computed with the whole bars buffer
+        self.states = states
+        # Set the number of bars before the new bars used to compute their features: the OHLC lags, the technical indicators' and the features' lookbacks and the z-score rows
+        self.lookback_span = get_features_lookback(max_window, zscore_window)
+        # Set the base_df columns to be returned by each update
+        self.columns = base_df.columns.tolist()
+        
+        # Create the prediction feature to know which labels are kept
+        labeled_df = create_prediction_feature(df[['Open','High','Low','Close','high_first']].copy())
+        # Save the prediction feature labels that are kept
+        self.labels = labeled_df['y'].unique().tolist()
+        # Save the last bars as a buffer for the lags, rolling windows and technical indicators
+        self.bars = labeled_df.iloc[-warmup_span:]
+        # Save the last bar, whose prediction feature is known only when the next bar arrives
+        self.last_bar = df[['Open','High','Low','Close','high_first']].iloc[-1:].copy()
+        # Save the last bar close-to-close log return
+        self.last_bar['cc_returns'] = np.log(df['Close'].iloc[-1]/df['Close'].iloc[-2])
+        # Save the last base_df row to forward-fill the new rows
+        self.last_row = base_df.iloc[-1].copy()
+        
+    def update(self, df):
+        ''' Function to create the base_df rows of the bars that arrived after the last update '''
+        
+        # Get the bars after the last bar
+        new_bars = df.loc[df.index>self.last_bar.index[-1], ['Open','High','Low','Close','high_first']]
+        
+        # If there are no new bars, return an empty dataframe
+        if new_bars.empty:
+            return pd.DataFrame(columns=self.columns)
+        
+        # Join the last bar with the new bars
+        bars = pd.concat([self.last_bar, new_bars])
+        # Compute the close-to-close log returns, the last bar's one is already known
+        cc_returns = np.log(bars['Close']/bars['Close'].shift(1))
+        cc_returns.iloc[0] = self.last_bar['cc_returns'].iloc[-1]
+        bars['cc_returns'] = cc_returns
+        # Compute the prediction feature, the last bar's one is known now
+        bars['y'] = np.where(bars['cc_returns'].shift(-1)>0,1,0)
+        bars['y'] = np.where(bars['cc_returns'].shift(-1)<0,-1,bars['y'])
+        
+        # Update the bars buffer, replacing the previous last bar since its label has changed
+        self.bars = pd.concat([self.bars[self.bars.index<bars.index[0]], bars[bars['y'].isin(self.labels)]])
+        # Save the new last bar
+        self.last_bar = bars.iloc[-1:].drop('y', axis=1)
+        # Keep the bars whose labels are kept
+        bars = bars[bars['y'].isin(self.labels)]
+        
+        # If no new bar was kept
+        if bars.empty:
+            return pd.DataFrame(columns=self.columns)
+        
+        # Create the input features with the last bars of the buffer, the technical indicators' recursions continue from their states
+        if self.states is not None:
+            unscaled_df, _, _, _, _ = create_features(self.bars.iloc[-(self.lookback_span+len(bars)):].copy(), self.max_window, 1, self.transforms, self.cumulative_return_base, self.states)
+        # Create the input features with the bars buffer if there are no states, or if the last bars don't continue the ones computed before, so the recursions start again
+        if (self.states is None) or not self.states.resumed:
+            unscaled_df, _, _, _, _ = create_features(self.bars.copy(), self.max_window, 1, self.transforms, self.cumulative_return_base, self.states)
+        # Keep the new rows together with the previous rows needed to z-score them
+        unscaled_df = unscaled_df.iloc[-((unscaled_df.index>=bars.index[0]).sum()+self.zscore_window):]
+        
+        # Z-score the input features
+        scaled_df = tf.roll_zscore(unscaled_df[self.scalable_features], window=self.zscore_window)
+        # Replace the infinite values with NaN values
+        scaled_df.replace([np.inf, -np.inf], np.nan, inplace=True)
+        # Concatenate the rest of the columns and keep the new rows
+        new_rows = pd.concat([scaled_df, unscaled_df[unscaled_df.columns.difference(self.scalable_features)]], axis=1)
+        new_rows = new_rows[new_rows.index>=bars.index[0]]
+        # Drop the NaN values and order the columns as the base_df columns
+        new_rows = new_rows.dropna().reindex(columns=self.columns, fill_value=0.0)
+        
+        # Forward fill the Inf values, starting from the last base_df row
+        new_rows.replace([np.inf, -np.inf], np.nan, inplace=True)
+        new_rows = new_rows.ffill()
+        # Fill the rest of the NaN values column by column only if there are any left
+        if new_rows.isna().values.any():
+            new_rows = new_rows.fillna(self.last_row)
+        
+        # Update the DC state with the new rows' close prices, the previous last row keeps its R value
+        if (self.dc_state is not None) and not new_rows.empty:
+            is_new = new_rows.index > self.last_row.name
+            r_values = np.full(len(new_rows), self.last_row['R'])
+            r_values[is_new] = self.dc_state.update_many(new_rows.loc[is_new,'Close'])
+            new_rows['R'] = r_values
+        
+        # Save the last row to forward-fill the next rows
+        if not new_rows.empty:
+            self.last_row = new_rows.iloc[-1].copy()
+        
+        # Keep only the last bars in the buffer
+        self.bars = self.bars.iloc[-self.warmup_span:]
+        
+        return new_rows
+
+def create_feature_engine(df, max_window, test_span, train_span=None, scalable_features=None, transforms=None, warmup_span=500):
+    """ Function to prepare the base_df dataframe together with its incremental feature engine """
+    
+    # Create the technical indicators' states to continue their recursions in the next periods
+    states = taf.indicator_states(keep=get_features_lookback(max_window))
+    
+    # Create the base_df dataframe
+    base_df, final_input_features, scalable_features, transforms, cumulative_return_base = create_base_df(df.copy(), max_window, test_span, train_span, scalable_features, transforms, states)
+    
+    # Create the DC state together with the R indicator to be used as the HMM input
+    dc_state = tf.directional_change_state(theta=0.00002)
+    base_df['R'] = dc_state.update_many(base_df['Close'])
+    
+    # Create the feature engine to update the base_df dataframe in the next periods
+    engine = feature_engine(df, base_df, max_window, scalable_features, transforms, warmup_span, dc_state=dc_state, cumulative_return_base=cumulative_return_base, states=states)
+    
+    return base_df, final_input_features, scalable_features, engine
+
+def prepare_signal(market_open_time, model_cache=None):
+    ''' Function to load the model objects used by the signal
+        - It doesn't use the last bar, so the trading setup can run it shortly before the period starts
+        - The model objects are taken from the trading app's model cache, or loaded from their files if it's None
+        - It returns a dictionary to be passed to get_signal'''
+    
+    """ Change code from here """
+    # Set a new model cache to load the model objects from their files
+    if model_cache is None:
+        model_cache = stf.model_cache()
+    
+    # Set the month and day strings to call the models
+    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
+    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+    
+    # Set the HMM model address
+    hmm_model_address = f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle'
+    
+    # Load the HMM forward filter saved in the previous period
+    hmm_filter = None
+    if os.path.exists('data/models/hmm_filter.pickle'):
+        with open('data/models/hmm_filter.pickle', 'rb') as handle:
+            hmm_filter = pickle.load(handle)
+    
+    # Call the HMM model only if the filter doesn't belong to it
+    hmm_model = None
+    if (hmm_filter is None) or (hmm_filter.model_address != hmm_model_address):
+        hmm_model = model_cache.load(hmm_model_address)
+    
+    # Call the random-forest first model object as its array-based predictor, which predicts the single-row signal without the parallel jobs
+    model_object = model_cache.load(f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle', tf.get_fast_predictor)
+    """ Change code up to here """
+    
+    return {'hmm_model_address':hmm_model_address, 'hmm_filter':hmm_filter, 'hmm_model':hmm_model, 'model_object':model_object}
+
+def get_signal(logging, market_open_time, base_df, final_input_features, purged_window_size, embargo_period, signal_inputs=None): 
+    ''' Function to get the signal
+        - signal_inputs is the prepare_signal output, the model objects are loaded if it's None
+        - It returns the signal together with a dictionary of the updated objects to be pickled, by file address, which the trading setup saves once the orders are sent'''
     
     print('Getting the current signal...')
     logging.info('Getting the current signal...')
         
     """ Change code from here """
     ###############################################################################
-    # Section 1: Create the month and day strings to be used for calling the model objects
+    # Section 1: Load the model objects if they weren't loaded before the period started
     ###############################################################################
 
-    # Set the month and day strings to call the models
-    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
-    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+    # Load the model objects
+    if signal_inputs is None:
+        signal_inputs = prepare_signal(market_open_time)
+    # Set the HMM model address
+    hmm_model_address = signal_inputs['hmm_model_address']
 
     ###############################################################################
     # Section 2: Split the data into train and test dataframes for the X and y features
@@ -303,24 +479,40 @@ def get_signal(logging, market_open_time, base_df, final_input_features, purged_
     # Section 3: Create the HMM-based input feature
     ###############################################################################
 
-    # Create the R indicator
-    r_values = tf.directional_change_events(base_df.loc[X_train.index,['Close']], theta=0.00002, columns='R').dropna().values.reshape(-1,1)
+    # Get the R indicator updated by the feature engine's DC state, otherwise create it
+    if 'R' in base_df.columns:
+        r_values = base_df.loc[X_train.index,'R'].dropna()
+    else:
+        r_values = tf.directional_change_events(base_df.loc[X_train.index,['Close']], theta=0.00002, columns='R').dropna()
     
-    # Call the HMM model
-    hmm_model = pickle.load(open(f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle', 'rb'))
-        
-    X_train['states'].iloc[-len(r_values):] = hmm_model.predict(r_values)
+    # Get the HMM forward filter saved in the previous period
+    hmm_filter = signal_inputs['hmm_filter']
+    
+    # If the filter belongs to the current HMM model and its last R value is still in the data, update it only with the new R values
+    if (hmm_filter is not None) and (hmm_filter.model_address == hmm_model_address) and (hmm_filter.last_index in r_values.index):
+        r_values = r_values[r_values.index > hmm_filter.last_index]
+    # Otherwise, create the filter with the HMM model and all the R values
+    else:
+        # Call the HMM model
+        hmm_model = signal_inputs['hmm_model'] if signal_inputs['hmm_model'] is not None else pickle.load(open(hmm_model_address, 'rb'))
+        hmm_filter = tf.hmm_forward_filter(hmm_model, hmm_model_address)
     
-    # Forecast the next period state
-    transmat_cdf = np.cumsum(hmm_model.transmat_, axis=1)
-    random_state = check_random_state(hmm_model.random_state)
-    X_test['states'].iloc[0] = (transmat_cdf[int(X_train['states'].iloc[-1])] > random_state.rand()).argmax()
+    # Update the forward probabilities and get the current state
+    X_train['states'].iloc[-1] = hmm_filter.update_many(r_values.values.reshape(-1,1), r_values.index)
+    
+    # Set the HMM forward filter to be saved for the next period
+    models_to_save = {'data/models/hmm_filter.pickle':hmm_filter}
+    
+    # Forecast the next period state with the next state distribution
+    next_state_cdf = np.cumsum(hmm_filter.get_next_state_probabilities())
+    random_state = check_random_state(hmm_filter.random_state)
+    X_test['states'].iloc[0] = (next_state_cdf > random_state.rand()).argmax()
     
     ###############################################################################
     # Section 4: Create the signal
     ###############################################################################
-    # Call the random-forest first model object
-    model_object = pickle.load(open(f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle', 'rb'))
+    # Get the random-forest first model object
+    model_object = signal_inputs['model_object']
     
     # Save the model test signal predictions
     signal = base_df.loc[X_test.index,'signal'] = float(model_object.predict(X_test[model_object.feature_names_in_.tolist()].astype("float32"))[0])
@@ -330,7 +522,7 @@ def get_signal(logging, market_open_time, base_df, final_input_features, purged_
     print('The current signal was successfully created...')
     logging.info('The current signal was successfully created...')
     
-    return signal
+    return signal, models_to_save
 
 def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_frequency, max_window, file_address, base_df_address, purged_window_size, embargo_period, train_span, test_span=None):
 
@@ -353,10 +545,8 @@ def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_f
     if test_span is None:
         test_span = 5*periods_per_day
     
-    # Import the data
-    df = pd.read_csv(file_address, index_col = 0)
-    # Parse the index as datetime
-    df.index = pd.to_datetime(df.index)
+    # Import the minute data needed for the last "train_span" observations from the historical minute data store
+    df = stf.read_minute_data(file_address, train_span, data_frequency)
     # Get the midpoint of the OHLC data
     df = tf.get_mid_series(df)
     # Resample the data as the frequency string
@@ -368,8 +558,8 @@ def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_f
     # Resample the data
     df2 = tf.resample_df(df,frequency=data_frequency,start=f'{hour_string}h{minute_string}min')
     
-    # Prepare the dataframe to be used for fitting the model
-    base_df, final_input_features, scalable_features = prepare_base_df(df2, max_window, test_span, train_span)
+    # Prepare the dataframe to be used for fitting the model together with its feature engine
+    base_df, final_input_features, scalable_features, engine = create_feature_engine(df2, max_window, test_span, train_span)
     
     start_time = datetime.now()
     print('='*100)
@@ -483,8 +673,12 @@ def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_f
     # Get the optimal model seed to trade the next month 
     optimal_seed = max(models_sharpe, key=models_sharpe.get)
             
-    # Saving the base_df dataframe
-    base_df.to_csv('data/'+base_df_address)
+    # Sort the base_df based on its index
+    base_df.index = pd.to_datetime(base_df.index)
+    # Drop duplicates
+    base_df = base_df[~base_df.index.duplicated(keep='last')]
+    # Save the base_df dataframe in the store the trading setup updates, replacing the one of the previous feature engine
+    stf.columnar_store('data/'+os.path.splitext(base_df_address)[0]).write(base_df)
     
     ###############################################################################
     # Section 7: Save all the model objects used while optimizating the strategy
@@ -496,6 +690,10 @@ def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_f
     # Save the model object
     with open(f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
         pickle.dump(model_objects[optimal_seed], handle, protocol=pickle.HIGHEST_PROTOCOL)
+        
+    # Save the feature engine to update the base_df dataframe while trading
+    with open('data/models/feature_engine.pickle', 'wb') as handle:
+        pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
     """ Change code up to here """
     
@@ -503,6 +701,9 @@ def strategy_parameter_optimization(market_open_time, seed, random_seeds, data_f
     features_df = pd.DataFrame(data=final_input_features, columns=['final_features'], index=range(len(final_input_features)))
     features_df['scalable_features'] = np.nan
     features_df.loc[:(len(scalable_features)-1),'scalable_features'] = pd.Series(scalable_features)
+    # Save the technical indicators' stationarity transforms next to the features
+    features_df['indicators'] = pd.Series(list(engine.transforms.keys()))
+    features_df['transforms'] = pd.Series(list(engine.transforms.values()))
     features_df.to_excel('data/optimal_features_df.xlsx')
         
 
@@ -1,6 +1,6 @@
 # Import the necessary libraries
 import pandas as pd
-import trading_functions as tf
+import store_functions as stf
 
 def create_trading_info_workbook(smtp_username, to_email, password):
 
@@ -54,8 +54,8 @@ def create_trading_info_workbook(smtp_username, to_email, password):
                  'app_time_spent':app_time_spent,\
                  'periods_traded':periods_traded}
          
-    # Save the dataframes into a single Excel workbook
-    tf.save_xlsx(dict_df = dictfiles, path = 'data/database.xlsx')
+    # Save the dataframes into the trading app database
+    stf.trading_journal('data/database.db').write(dictfiles)
     
     # Create the email information dataframe
     email_password = pd.DataFrame(columns=['smtp_username', 'to_email', 'password'], index=[0])
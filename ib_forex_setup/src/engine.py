@@ -1,12 +1,11 @@
 # Import the necessary libraries
 import os
-import time
 import logging
 import datetime as dt
-from threading import Thread
 import create_database as cd
 import strategy as stra
 import trading_functions as tf
+import store_functions as stf
 import setup_functions as sf
 import setup_for_download_data as sdd
 from setup import trading_app
@@ -44,10 +43,34 @@ logging.basicConfig(filename=f'data/log/log_file_{now_.year}_{month}_{day}_{hour
                     level=logging.DEBUG,
                     format='%(asctime)s.%(msecs)03d %(levelname)s %(module)s - %(funcName)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
+# Function to prepare the next period's strategy inputs
+def precompute_next_period(app, session, clock, next_period, precompute_seconds):
+    ''' Function to prepare the next period's strategy inputs precompute_seconds before it starts
+        - Only the session app keeps the inputs for the next period
+        - The trading day end period closes the position, so it doesn't need them '''
+    
+    # Return if the app isn't kept for the next period or the next period doesn't run the strategy
+    if (session is None) or (precompute_seconds is None) or (next_period >= app.trading_day_end_datetime):
+        return
+    
+    # Wait until shortly before the next period
+    clock.sleep_until(next_period - dt.timedelta(seconds=precompute_seconds), 'precompute')
+    
+    # Prepare the strategy inputs that don't need the next period's last bar
+    sf.precompute_strategy_inputs(app, next_period)
+    
 # Function to run the app each period
 def run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, 
             historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window):
+            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session=None, clock=None, live_bars=False, precompute_seconds=30):
+    ''' Function to run the app for the current period
+        - If session is a dictionary, its "app" object is kept connected and used for all the periods it's passed to
+        - If live_bars is True, the session app subscribes to the minute bars and keeps the bars in memory instead of downloading them every period
+        - The clock is used to read the now datetime and sleep until the next period, a new one is created if it's None
+        - The session app prepares the next period's strategy inputs precompute_seconds before the period starts, None disables it '''
+    
+    # Set the clock to read the now datetime and sleep until the next period
+    clock = tf.setup_clock() if clock is None else clock
     
     print('='*100)
     print('='*100)
@@ -59,28 +82,36 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
     logging.info('Running the app...wish you the best!')
 
     # Get the previous, current and next trading periods
-    previous_period, current_period, next_period = tf.get_the_closest_periods(dt.datetime.now(), data_frequency, trading_day_end_datetime, previous_day_start_datetime, day_start_datetime, market_close_time)
+    previous_period, current_period, next_period = tf.get_the_closest_periods(clock.now(), data_frequency, trading_day_end_datetime, previous_day_start_datetime, day_start_datetime, market_close_time)
     
     # A while loop to run the app, we will break the loop whenever we finish running the app for the current period
     while True:
-        # Create an object of the app class
-        app = trading_app(logging, account, account_currency, symbol, timezone, data_frequency, historical_data_address, base_df_address, leverage, 
-                          risk_management_target, stop_loss_multiplier, take_profit_multiplier, purged_window_size, embargo_period, market_open_time, market_close_time, 
-                          previous_day_start_datetime, trading_day_end_datetime, day_end_datetime, current_period, previous_period, next_period, train_span, test_span, max_window)
+        # Start time to get the number of seconds used to set up the app for the period
+        setup_start_time = clock.now()
+        
+        # If the session already has an app, reset it for the current period
+        if (session is not None) and (session.get('app') is not None):
+            app = session['app']
+            app.reset_period(current_period, previous_period, next_period, market_open_time, market_close_time, 
+                             previous_day_start_datetime, trading_day_end_datetime, day_end_datetime)
+        else:
+            # Create an object of the app class
+            app = trading_app(logging, account, account_currency, symbol, timezone, data_frequency, historical_data_address, base_df_address, leverage, 
+                              risk_management_target, stop_loss_multiplier, take_profit_multiplier, purged_window_size, embargo_period, market_open_time, market_close_time, 
+                              previous_day_start_datetime, trading_day_end_datetime, day_end_datetime, current_period, previous_period, next_period, train_span, test_span, max_window)
+            # Keep the app in the session for the next periods
+            if session is not None:
+                app.persistent_connection = True
+                app.live_bars = live_bars
+                session['app'] = app
                 
-        # Connect the app to the IB server
-        print('Connecting the app to the IB server...')
-        logging.info('Connecting the app to the IB server...')
-        app.connect(host=host, port=port, clientId=client_id)
+        # Connect the app to the IB server if it's not connected
+        reconnected = sf.connect_app(app, host, port, client_id)
         
-        # Set the app thread as the main one
-        thread1 = Thread(target=app.run, daemon=True)
-    
-        # Start the app
-        thread1.start()
-            
-        # Wait until the app is successfully connected
-        time.sleep(5)
+        # Log the number of seconds used to set up the app
+        setup_seconds = (clock.now() - setup_start_time).total_seconds()
+        print(f"The app was set up in {setup_seconds:.2f} seconds ({'new connection' if reconnected else 'connection kept'})")
+        logging.info(f"The app was set up in {setup_seconds:.2f} seconds ({'new connection' if reconnected else 'connection kept'})")
         
         print('='*100)
         print(f'Current period is {current_period}')
@@ -90,10 +121,10 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
         print('='*100)
         
         # If now is before the market close datetime
-        if dt.datetime.now() < market_close_time:
+        if clock.now() < market_close_time:
     
             # If now is before the trading day end datetime
-            if dt.datetime.now() < trading_day_end_datetime:
+            if clock.now() < trading_day_end_datetime:
                 
                 # If the current period hasn't been traded
                 if app.periods_traded.loc[app.periods_traded['trade_time']==current_period]['trade_done'].values[0] == 0:
@@ -103,13 +134,15 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                         if app.previous_time_spent >= (next_period - current_period).total_seconds():
                             app.previous_time_spent = 60
                         # If the previous time spent is less than the seconds left until the next trading period
-                        if app.previous_time_spent < (next_period - dt.datetime.now()).total_seconds():
+                        if app.previous_time_spent < (next_period - clock.now()).total_seconds():
                             # Run the strategy, create the signal, and send orders if necessary
                             sf.run_strategy_for_the_period(app)
                             # If the strategy was successfully done
                             if app.strategy_end:
+                                # Prepare the next period's strategy inputs shortly before it starts
+                                precompute_next_period(app, session, clock, next_period, precompute_seconds)
                                 # Wait until we arrive at the next trading period
-                                time.sleep(0 if (next_period-dt.datetime.now()).total_seconds()<0 else (next_period-dt.datetime.now()).total_seconds())
+                                clock.sleep_until(next_period, 'next period')
                                 break
                             else:
                                 # Couldn't connect to IB server, we'll try once again
@@ -119,8 +152,7 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                             print("Time up to the next period is not sufficient to run the strategy for the current period...")
                             logging.info("Time up to the next period is not sufficient to run the strategy for the current period...")
                             # Wait until we arrive at the next trading period
-                            sf.wait_for_next_period(app)
-                            time.sleep(0 if (next_period-dt.datetime.now()).total_seconds()<0 else (next_period-dt.datetime.now()).total_seconds())
+                            sf.wait_for_next_period(app, clock)
                             break
                       
                     # If the strategy time spent is not fille, i.e., it's the first time we trade
@@ -129,8 +161,10 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                         sf.run_strategy_for_the_period(app)
                         # If the strategy was successfully done
                         if app.strategy_end:
+                            # Prepare the next period's strategy inputs shortly before it starts
+                            precompute_next_period(app, session, clock, next_period, precompute_seconds)
                             # Wait until we arrive at the next trading period
-                            time.sleep(0 if (next_period-dt.datetime.now()).total_seconds()<0 else (next_period-dt.datetime.now()).total_seconds())
+                            clock.sleep_until(next_period, 'next period')
                             break
                         else:
                             # Couldn't connect to IB server, we'll try once again
@@ -142,7 +176,7 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                     print("The current period has already been traded. Let's wait for the next period...")
                     logging.info("The current period has already been traded. Let's wait for the next period...")
                     # Wait until we arrive at the next trading period
-                    sf.wait_for_next_period(app)
+                    sf.wait_for_next_period(app, clock)
                     break
             # If now is after the trading day end datetime
             else:
@@ -151,7 +185,7 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                 # If the current period hasn't been traded
                 if app.periods_traded.loc[app.periods_traded['trade_time']==trading_day_end_datetime]['trade_done'].values[0] == 0:
                     # Update the trading information and close the position if needed before the market closes
-                    sf.update_and_close_positions(app)
+                    sf.update_and_close_positions(app, clock)
                 else:
                     print("The last position was already closed and the trading info was already updated...")
                     logging.info("The last position was already closed and the trading info was already updated...")
@@ -159,7 +193,7 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                 # Wait until we arrive at the next trading period
                 print("Let's wait until the new trading day begins...")
                 logging.info("Let's wait until the new trading day begins...")
-                time.sleep(0 if (day_start_datetime-dt.datetime.now()).total_seconds()<0 else (day_start_datetime-dt.datetime.now()).total_seconds())
+                clock.sleep_until(day_start_datetime, 'day start')
                 break
         # If now is after the market close datetime
         else:   
@@ -169,7 +203,15 @@ def run_app(host, port, account, client_id, timezone, now_, account_currency, sy
                 
 # Run the trading all inside a loop for the whole week                        
 def run_trading_setup_loop(host, port, account, client_id, data_frequency, london_start_hour, local_restart_hour, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, 
-                         historical_data_address, base_df_address, purged_window_size, embargo_period, train_span, test_span, max_window):  
+                         historical_data_address, base_df_address, purged_window_size, embargo_period, train_span, test_span, max_window, persistent_connection=False, clock=None, live_bars=False, precompute_seconds=30):  
+    ''' Function to run the trading setup for the whole week
+        - The clock is used to read the now datetime and sleep until the next event, a new one is created if it's None
+        - Set persistent_connection to True to keep one app connected for all the periods of the week, a new app is connected every period by default
+        - Set live_bars to True to subscribe to the minute bars instead of downloading them every period, it's only used with the persistent connection
+        - The strategy inputs prepared before each period (precompute_seconds) are also only used with the persistent connection '''
+    
+    # Set the clock to sleep until the next event instead of busy-waiting
+    clock = tf.setup_clock() if clock is None else clock
                   
     print('='*100)
     print('='*100)
@@ -181,12 +223,12 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
     # Get the local timezone hours that match the Easter timezone hours
     restart_hour, restart_minute, day_end_hour, day_end_minute, trading_start_hour = tf.get_end_hours(timezone, london_start_hour, local_restart_hour)
     # Get the market open and close datetimes of the current week
-    market_open_time, market_close_time = tf.define_trading_week(timezone, trading_start_hour, day_end_minute)
+    market_open_time, market_close_time = tf.define_trading_week(timezone, trading_start_hour, day_end_minute, clock.now())
     
     # Get the corresponding auto-restart and day-end datetimes to be used while trading
     auto_restart_start_datetime, auto_restart_datetime_before_end, auto_restart_end_datetime, \
         day_start_datetime, day_datetime_before_end, trading_day_end_datetime, day_end_datetime, previous_day_start_datetime = \
-            tf.get_restart_and_day_close_datetimes(data_frequency, dt.datetime.now(), day_end_hour, day_end_minute, restart_hour, restart_minute, trading_start_hour)
+            tf.get_restart_and_day_close_datetimes(data_frequency, clock.now(), day_end_hour, day_end_minute, restart_hour, restart_minute, trading_start_hour)
 
     print(f'market open time is {market_open_time}')
     logging.info(f'market open time is {market_open_time}')
@@ -199,7 +241,7 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
     logging.info(f'\t - auto_restart_datetime_before_end is {auto_restart_datetime_before_end}')
     print(f'\t - auto_restart_end_datetime is {auto_restart_end_datetime}')
     logging.info(f'\t - auto_restart_end_datetime is {auto_restart_end_datetime}')
-    if dt.datetime.now()>=market_open_time:
+    if clock.now()>=market_open_time:
        print(f'\t - previous_day_start_datetime is {previous_day_start_datetime}')
        logging.info(f'\t - previous_day_start_datetime is {previous_day_start_datetime}')
     print(f'\t - day_datetime_before_end is {day_datetime_before_end}')
@@ -212,28 +254,31 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
     logging.info(f'\t - day_start_datetime is {day_start_datetime}')
 
     # Check if now is sooner than the market opening datetime
-    if dt.datetime.now() < market_open_time:
+    if clock.now() < market_open_time:
         print("Let's wait until the market opens...")
         logging.info("Let's wait until the market opens...")
-        # If we are outside the week's market hours, we wait until we're in
-        while dt.datetime.now() <= market_open_time: continue
+        # If we are outside the week's market hours, we sleep until we're in
+        clock.sleep_until(market_open_time, 'market open')
     
     # Check if now is sooner than the day start datetime
-    if dt.datetime.now() < previous_day_start_datetime:
+    if clock.now() < previous_day_start_datetime:
         print("Let's wait until the trading day starts...")
         logging.info("Let's wait until the trading day starts...")
-        # Start trading at the trading start datetime
-        while dt.datetime.now() <= previous_day_start_datetime: continue
+        # Sleep until the trading start datetime
+        clock.sleep_until(previous_day_start_datetime, 'trading day start')
         
+    # Set the session to use the same connected app for all the week's periods, or None to create and connect a new app per period
+    session = {'app':None} if persistent_connection else None
+    
     # If we're inside the week's market hours
-    while dt.datetime.now() >= market_open_time and dt.datetime.now() <= market_close_time:
+    while clock.now() >= market_open_time and clock.now() <= market_close_time:
         # Get the local timezone hours that match the Easter timezone hours
         restart_hour, restart_minute, day_end_hour, day_end_minute, trading_start_hour = tf.get_end_hours(timezone, london_start_hour, local_restart_hour)
         
         # Get the corresponding autorestart and day-end datetimes to be used while trading
         auto_restart_start_datetime, auto_restart_datetime_before_end, auto_restart_end_datetime, \
             day_start_datetime, day_datetime_before_end, trading_day_end_datetime, day_end_datetime, previous_day_start_datetime = \
-                tf.get_restart_and_day_close_datetimes(data_frequency, dt.datetime.now(), day_end_hour, day_end_minute, restart_hour, restart_minute, trading_start_hour)
+                tf.get_restart_and_day_close_datetimes(data_frequency, clock.now(), day_end_hour, day_end_minute, restart_hour, restart_minute, trading_start_hour)
                 
         # Set the highest hour
         highest_hour = restart_hour if restart_hour > day_end_hour else day_end_hour
@@ -242,33 +287,34 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
         highest_minute = auto_restart_datetime_before_end.minute if highest_hour == restart_hour else day_end_datetime.minute
     
         # If now is sooner than the last day and the auto-restart hour
-        if ((dt.datetime.now().weekday() <= (market_close_time.weekday()-1)) and (dt.datetime.now().hour < highest_hour) \
-            and (dt.datetime.now().minute < highest_minute)): 
+        if ((clock.now().weekday() <= (market_close_time.weekday()-1)) and (clock.now().hour < highest_hour) \
+            and (clock.now().minute < highest_minute)): 
             
             # If the auto-restart datetime is sooner than the day start datetime
             if auto_restart_datetime_before_end < day_start_datetime:
                 # A while loop to run the app
                 while True:
                     # If now is less than the autorestart datetime
-                    if (dt.datetime.now() < auto_restart_datetime_before_end):
+                    if (clock.now() < auto_restart_datetime_before_end):
                         # Run the app
                         run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                     # If now is higher than the auto-restart datetime
                     else:
                         # Break the while loop
                         break
-                # Wait until now is higher than auto-restart start datetime
-                while (dt.datetime.now() >= auto_restart_datetime_before_end) and (dt.datetime.now() < auto_restart_start_datetime): continue
+                # Sleep until the auto-restart start datetime if the auto-restart has begun
+                if clock.now() >= auto_restart_datetime_before_end:
+                    clock.sleep_until(auto_restart_start_datetime, 'auto-restart end')
             # If the autorestart datetime is later than the day start datetime
             else:
                 # A while loop to run the app
                 while True:                
                     # If now is sooner than the day datetime before the day closes
-                    if (dt.datetime.now() < day_datetime_before_end):
+                    if (clock.now() < day_datetime_before_end):
                         # Run the app
                         run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                     # If now is later than the day datetime before the day closes
                     else:
                         # Break the while loop
@@ -277,10 +323,10 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
                 # A while loop to run the app
                 while True:                
                     # If now is later than the day datetime before the day closes and sooner than the trading day end datetime
-                    if (dt.datetime.now() >= day_datetime_before_end) and (dt.datetime.now() < trading_day_end_datetime):
+                    if (clock.now() >= day_datetime_before_end) and (clock.now() < trading_day_end_datetime):
                         # Run the app
                         run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                     # If now is later than the trading day end datetime
                     else:
                         # Break the while loop
@@ -288,10 +334,10 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
                 # A while loop to run the app
                 while True:                
                     # If now is later than the trading day end datetime and sooner than the day end datetime
-                    if (dt.datetime.now() >= trading_day_end_datetime) and (dt.datetime.now() < day_end_datetime):
+                    if (clock.now() >= trading_day_end_datetime) and (clock.now() < day_end_datetime):
                         # Run the app
                         run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                                    trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                     # If now is later than the day-end datetime
                     else:
                         # Break the while loop
@@ -299,7 +345,9 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
                                         
                 print("Let's wait until we start the trading day once again")
                 logging.info("Let's wait until we start the trading day once again")
-                while (dt.datetime.now() >= day_end_datetime) and (dt.datetime.now() < day_start_datetime): continue
+                # Sleep until the day start datetime if the day has ended
+                if clock.now() >= day_end_datetime:
+                    clock.sleep_until(day_start_datetime, 'day start')
             
         # If now is last day and later than the auto-restart hour                                                                                
         else:
@@ -307,10 +355,10 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
             # A while loop to run the app
             while True:                
                 # If now is sooner than the day datetime before the day closes
-                if (dt.datetime.now() <= day_datetime_before_end):
+                if (clock.now() <= day_datetime_before_end):
                     # Run the app
                     run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                 # If now is later than the day datetime before the day closes
                 else:
                     # Break the while loop
@@ -318,10 +366,10 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
             # A while loop to run the app
             while True:                
                 # If now is later than the day datetime before the day closes and sooner than the trading day end datetime
-                if (dt.datetime.now() >= day_datetime_before_end) and (dt.datetime.now() < trading_day_end_datetime): 
+                if (clock.now() >= day_datetime_before_end) and (clock.now() < trading_day_end_datetime): 
                     # Run the app
                     run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                 # If now is later than the trading day end datetime
                 else:
                     # Break the while loop
@@ -329,10 +377,10 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
             # A while loop to run the app
             while True:                
                 # If now is later than the trading day end datetime and sooner than the day end datetime
-                if (dt.datetime.now() >= trading_day_end_datetime) and (dt.datetime.now() < day_end_datetime):
+                if (clock.now() >= trading_day_end_datetime) and (clock.now() < day_end_datetime):
                     # Run the app
                     run_app(host, port, account, client_id, timezone, now_, account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, historical_data_address, base_df_address, data_frequency, purged_window_size, embargo_period, 
-                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window)
+                            trading_day_end_datetime, day_end_datetime, previous_day_start_datetime, day_start_datetime, market_open_time, market_close_time, train_span, test_span, max_window, session, clock, live_bars, precompute_seconds)
                 # If now is later than the day-end datetime
                 else:
                     # Break the while loop
@@ -340,11 +388,18 @@ def run_trading_setup_loop(host, port, account, client_id, data_frequency, londo
                                         
             print("Let's wait until the trading week close datetime arrives")
             logging.info("Let's wait until the trading week close datetime arrives")
-            while (dt.datetime.now() >= day_end_datetime) and (dt.datetime.now() < day_start_datetime): continue
+            # Sleep until the day start datetime if the day has ended
+            if clock.now() >= day_end_datetime:
+                clock.sleep_until(day_start_datetime, 'day start')
+            
+    # Disconnect the session app once the week is over
+    if (session is not None) and (session['app'] is not None):
+        print('Disconnecting...')
+        session['app'].disconnect()
     
 # A main function to run everything
 def main(account, timezone, port, account_currency, symbol, data_frequency, local_restart_hour, historical_data_address, base_df_address, train_span, test_span_days, 
-         max_window, host, client_id, purged_window_size, embargo_period, seed, random_seeds, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, smtp_username, to_email, password):   
+         max_window, host, client_id, purged_window_size, embargo_period, seed, random_seeds, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, smtp_username, to_email, password, persistent_connection=False, live_bars=False):   
      
     # Set the London-timezone hour as the trading start hour
     london_start_hour = 23
@@ -368,7 +423,7 @@ def main(account, timezone, port, account_currency, symbol, data_frequency, loca
     day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
 
     # If you don't have historical minute-frequency data
-    if os.path.exists(historical_minute_data_address)==False:
+    if (os.path.exists(historical_minute_data_address)==False) and (stf.get_minute_data_store(historical_minute_data_address).exists()==False):
         print('='*100)
         print('='*100)
         print('='*100)
@@ -394,12 +449,21 @@ def main(account, timezone, port, account_currency, symbol, data_frequency, loca
             # Optimize the strategy parameters
             stra.strategy_parameter_optimization(market_open_time, seed, random_seeds, data_frequency, max_window, historical_minute_data_address, base_df_address, purged_window_size, embargo_period, train_span, test_span)
         
-    if os.path.exists("data/database.xlsx")==False:
+    # If the trading information database doesn't exist but the Excel workbook of previous versions does
+    if (os.path.exists("data/database.db")==False) and os.path.exists("data/database.xlsx"):
+        print('='*100)
+        print('='*100)
+        print('='*100)
+        print('Importing the trading information workbook into the database...')
+        # Import the Excel workbook sheets into the database
+        stf.trading_journal('data/database.db').import_xlsx('data/database.xlsx')
+        
+    if os.path.exists("data/database.db")==False:
         print('='*100)
         print('='*100)
         print('='*100)
         print('Creating the trading information database...')
-        # Create the Excel workbook to save the trading information
+        # Create the database to save the trading information
         cd.create_trading_info_workbook(smtp_username, to_email , password)
         
     print('='*100)
@@ -408,7 +472,7 @@ def main(account, timezone, port, account_currency, symbol, data_frequency, loca
     print('Running the trading app for the week...')
     # Run the app loop
     run_trading_setup_loop(host, port, account, client_id, data_frequency, london_start_hour, local_restart_hour, timezone, dt.datetime.now(), account_currency, symbol, leverage, risk_management_target, stop_loss_multiplier, take_profit_multiplier, 
-                         historical_data_address, base_df_address, purged_window_size, embargo_period, train_span, 1, max_window)
+                         historical_data_address, base_df_address, purged_window_size, embargo_period, train_span, 1, max_window, persistent_connection, None, live_bars)
         
     print('='*100)
     print('='*100)
@@ -1,4 +1,8 @@
 # Import the necessary libraries
+import numpy as np
+import pandas as pd
+import trading_functions as tf
+from threading import Event, Lock
 from ibapi.order import Order
 from ibapi.client import Contract
 from ibapi.execution import ExecutionFilter
@@ -82,3 +86,328 @@ def executionFilter(time_):
     # Set the time to be used to request the executions data based on the filter
     execFilter.time = time_
     return execFilter
+
+class bar_buffer():
+    ''' Class to save the historical data bars of each request ID in preallocated arrays
+        - The arrays double their size when they're full, so each bar is appended in constant amortized time
+        - The bars of a request are converted into a dataframe only once, when the request finishes '''
+    
+    def __init__(self, capacity=1024):
+        
+        # Set the initial number of bars of each request's arrays
+        self.capacity = capacity
+        # Set the dictionaries to save the dates, the prices and the number of bars of each request
+        self.dates = {}
+        self.prices = {}
+        self.lengths = {}
+        # Set the price columns, in the order they were saved by the historicalData callbacks
+        self.columns = ['close','open','high','low']
+        
+    def append(self, reqId, bar):
+        ''' Function to save a bar of a request '''
+        
+        # Create the request's arrays with its first bar
+        if reqId not in self.lengths:
+            self.dates[reqId] = np.empty(self.capacity, dtype=object)
+            self.prices[reqId] = np.empty((self.capacity, 4), dtype=float)
+            self.lengths[reqId] = 0
+        
+        # Get the number of bars saved
+        length = self.lengths[reqId]
+        
+        # Double the arrays' size if they're full
+        if length == len(self.dates[reqId]):
+            self.dates[reqId] = np.concatenate([self.dates[reqId], np.empty(length, dtype=object)])
+            self.prices[reqId] = np.concatenate([self.prices[reqId], np.empty((length, 4), dtype=float)])
+        
+        # Save the bar
+        self.dates[reqId][length] = bar.date
+        self.prices[reqId][length] = (bar.close, bar.open, bar.high, bar.low)
+        self.lengths[reqId] = length + 1
+        
+    def to_dataframe(self, reqId):
+        ''' Function to convert the bars of a request into a dataframe and release its arrays '''
+        
+        # Get the number of bars saved
+        length = self.lengths.pop(reqId, 0)
+        # Get the request's arrays
+        dates = self.dates.pop(reqId, np.empty(0, dtype=object))[:length]
+        prices = self.prices.pop(reqId, np.empty((0, 4), dtype=float))[:length]
+        
+        # Create the dataframe
+        df = pd.DataFrame(prices, index=pd.Index(dates, dtype=object), columns=self.columns)
+        # Keep the last bar of each date, as the previous .loc assignments did
+        return df[~df.index.duplicated(keep='last')]
+
+def parse_bar_dates(dates):
+    ''' Function to convert the IB bars' date strings into a timezone-naive datetime index '''
+    # Set the index to datetime type
+    index = pd.to_datetime(pd.Index(dates), format='%Y%m%d %H:%M:%S %Z')
+    # Get rid of the timezone tag
+    return index.tz_localize(None)
+
+class live_bar_feed():
+    ''' Class to create the data-frequency mid bars from the BID and ASK minute bars of a keepUpToDate historical data request
+        - The mid prices of each minute are passed to a bar aggregator, which replaces the minute's previous update
+        - The finished bars are saved in a ring buffer with the last "capacity" bars that stays in memory from period to period
+        - The updates received before the feed is started are saved and passed to the aggregator once it starts '''
+    
+    def __init__(self, data_frequency, market_open_time, capacity, bid_id=0, ask_id=1):
+        
+        # Set the data frequency and the market open time to create the bar aggregator
+        self.data_frequency = data_frequency
+        self.market_open_time = market_open_time
+        # Create the ring buffer of the finished bars
+        self.ring = tf.bar_ring_buffer(capacity)
+        # Set the request IDs of the BID and ASK bars
+        self.bid_id = bid_id
+        self.ask_id = ask_id
+        # Set the threading event that is set every time a bar is finished
+        self.bar_event = Event()
+        # Set the lock to update the feed from the IB message thread and the strategy thread
+        self.lock = Lock()
+        # Set the feed as not subscribed
+        self.active = False
+        # Set the last date string and datetime of each request, so each minute's date is parsed only once
+        self.dates = {}
+        self.reset()
+        
+    def reset(self):
+        ''' Function to stop passing the updates to the aggregator until the feed is started again, e.g. before subscribing again '''
+        with self.lock:
+            # Create the bar aggregator, the minute bars are revised until the next minute begins
+            self.aggregator = tf.bar_aggregator(self.data_frequency, self.market_open_time, '1min', complete_observations=False)
+            # Create the dictionaries to save the last BID and ASK minute bars by datetime
+            self.quotes = {self.bid_id:{}, self.ask_id:{}}
+            # Set the feed as not started
+            self.started = False
+        
+    def save_bars(self, bars):
+        ''' Function to save the finished bars in the ring buffer '''
+        for bar in bars:
+            self.ring.append(bar)
+        # The ring buffer keeps the bars, so the aggregator doesn't need to
+        self.aggregator.bars.clear()
+        # Tell the strategy thread a bar was finished
+        if len(bars) > 0:
+            self.bar_event.set()
+        
+    def add_mid_prices(self, time):
+        ''' Function to pass the mid prices of a minute to the aggregator if its BID and ASK bars have arrived '''
+        # Get the BID and ASK prices of the minute
+        bid, ask = self.quotes[self.bid_id].get(time), self.quotes[self.ask_id].get(time)
+        # Wait for the other bar if it hasn't arrived
+        if (bid is None) or (ask is None):
+            return
+        # Pass the minute's open, high, low and close mid prices
+        self.save_bars(self.aggregator.update(time, *[(bid_price+ask_price)/2 for bid_price, ask_price in zip(bid, ask)]))
+        
+    def update(self, reqId, bar):
+        ''' Function to save a BID or ASK minute bar update, called by the historicalDataUpdate callback '''
+        with self.lock:
+            # Get the minute datetime
+            date, time = self.dates.get(reqId, (None, None))
+            if bar.date != date:
+                time = parse_bar_dates([bar.date])[0]
+                self.dates[reqId] = (bar.date, time)
+            # Save the minute prices
+            quotes = self.quotes[reqId]
+            quotes[time] = (bar.open, bar.high, bar.low, bar.close)
+            # Keep only the last minutes
+            if len(quotes) > 10:
+                del quotes[min(quotes)]
+            # Pass the mid prices to the aggregator if the feed has started
+            if self.started:
+                self.add_mid_prices(time)
+                
+    def start(self, bars, minutes):
+        ''' Function to start the feed with the downloaded bars and minute mid prices
+            - The bars have the resample_df columns and are saved in the ring buffer if they're newer than the saved ones
+            - The minute mid prices have the get_mid_series columns, they're the ones of the bars that aren't finished yet '''
+        with self.lock:
+            # Save the finished bars
+            self.ring.extend(bars)
+            # Set the last saved bar as the aggregator's last finished bar, so the late updates of its minutes are skipped
+            if (len(self.ring) > 0) and (self.aggregator.last_bar_number is None):
+                last_bar = self.ring.to_dataframe(1)
+                self.aggregator.last_bar_number = self.aggregator.get_bar_number(last_bar.index[-1] - self.aggregator.bar_length)
+                self.aggregator.last_close_time = pd.Timestamp(last_bar['Close_time'].iloc[-1])
+            # Pass the minute mid prices to the aggregator
+            for observation in minutes[['Open','High','Low','Close']].itertuples():
+                self.save_bars(self.aggregator.update(*observation))
+            # Pass the updates received during the download
+            for time in sorted(set(self.quotes[self.bid_id]) & set(self.quotes[self.ask_id])):
+                self.add_mid_prices(time)
+            # Set the feed as started and subscribed
+            self.started = self.active = True
+            
+    def flush(self, now):
+        ''' Function to finish the partial bar if its closing time has passed '''
+        with self.lock:
+            self.save_bars(self.aggregator.flush(now))
+            
+    def get_last_index(self):
+        ''' Function to get the index of the last finished bar '''
+        with self.lock:
+            return self.ring.get_last_index()
+        
+    def to_dataframe(self, last_rows=None):
+        ''' Function to create a dataframe with the last finished bars '''
+        with self.lock:
+            return self.ring.to_dataframe(last_rows)
+
+class callback_record():
+    ''' Base class of the records saved by the IB API callbacks
+        - Each record only has the slots of its columns, so it's much cheaper to create than a one-row dataframe
+        - The records of a request are converted into a dataframe only once, when the request finishes '''
+    
+    # Set the record attributes and their dataframe column names
+    __slots__ = ()
+    columns = ()
+    
+    def __init__(self, **values):
+        # Save each value in its slot
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+            
+    def values(self):
+        ''' Function to get the record values in the columns order '''
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+class open_order_record(callback_record):
+    ''' Record of the openOrder callback '''
+    __slots__ = ('perm_id','client_id','order_id','account','symbol','sec_type','exchange','action','order_type', \
+                 'total_qty','cash_qty','lmt_price','aux_price','status','datetime')
+    columns = ('PermId','ClientId','OrderId','Account','Symbol','SecType','Exchange','Action','OrderType', \
+               'TotalQty','CashQty','LmtPrice','AuxPrice','Status','datetime')
+
+class order_status_record(callback_record):
+    ''' Record of the orderStatus callback '''
+    __slots__ = ('order_id','status','filled','perm_id','client_id','remaining','avg_fill_price','last_fill_price','datetime')
+    columns = ('OrderId','Status','Filled','PermId','ClientId','Remaining','AvgFillPrice','LastFillPrice','datetime')
+
+class execution_record(callback_record):
+    ''' Record of the execDetails callback '''
+    __slots__ = ('order_id','perm_id','execution_id','symbol','side','price','av_price','cum_qty','currency', \
+                 'sec_type','position','execution_time','last_liquidity','order_ref','datetime')
+    columns = ('OrderId','PermId','ExecutionId','Symbol','Side','Price','AvPrice','cumQty','Currency', \
+               'SecType','Position','Execution Time','Last Liquidity','OrderRef','datetime')
+
+class commission_record(callback_record):
+    ''' Record of the commissionReport callback '''
+    __slots__ = ('execution_id','commission','currency','realized_pnl','datetime')
+    columns = ('ExecutionId','Commission','Currency','Realized PnL','datetime')
+
+class position_record(callback_record):
+    ''' Record of the position callback '''
+    __slots__ = ('account','symbol','sec_type','currency','position','avg_cost','datetime')
+    columns = ('Account','Symbol','SecType','Currency','Position','Avg cost','datetime')
+
+class account_value_record(callback_record):
+    ''' Record of the updateAccountValue callback '''
+    __slots__ = ('key','account','value','currency','datetime')
+    columns = ('key','Account','Value','Currency','datetime')
+
+def records_to_dataframe(records):
+    ''' Function to convert a list of callback records into a dataframe '''
+    # Return an empty dataframe if there are no records
+    if len(records)==0:
+        return pd.DataFrame()
+    # Create the dataframe with the columns of the records' class
+    return pd.DataFrame([record.values() for record in records], columns=list(records[0].columns))
+
+class order_state_index():
+    ''' Class to save the latest state of each order, keyed by its order ID, together with the latest order ID of each symbol and order type
+        - It's updated with the callback records, so the risk management orders lookups don't scan the trading dataframes
+        - The trading dataframes loaded at the app start are added once with add_dataframes '''
+    
+    def __init__(self):
+        
+        # Set the dictionary to save the latest order ID of each symbol and order type
+        self.latest_order_ids = {}
+        # Set the dictionary to save the latest state of each order ID
+        self.orders = {}
+        # Set the dictionary to save the latest position of each symbol and currency
+        self.positions = {}
+        
+    def add(self, record):
+        ''' Function to update the index with a callback record '''
+        
+        # If it's an open order record
+        if isinstance(record, open_order_record):
+            # Update the latest order ID of its symbol and order type
+            key = (record.symbol, record.order_type)
+            self.latest_order_ids[key] = max(self.latest_order_ids.get(key, record.order_id), record.order_id)
+            # Save the open order status and prices
+            self.orders.setdefault(record.order_id, {}).update(open_status=record.status, aux_price=record.aux_price, lmt_price=record.lmt_price)
+        # If it's an order status record
+        elif isinstance(record, order_status_record):
+            # Save the order status, the remaining quantity and the datetime
+            order = self.orders.setdefault(record.order_id, {})
+            order.update(status=record.status, remaining=record.remaining, status_datetime=record.datetime)
+            # Save the average fill price of the filled order
+            if record.status == 'Filled':
+                order['filled_price'] = record.avg_fill_price
+        # If it's an execution record
+        elif isinstance(record, execution_record):
+            # Save the execution average price
+            self.orders.setdefault(record.order_id, {})['av_price'] = record.av_price
+        # If it's a position record
+        elif isinstance(record, position_record):
+            # Save the position of the symbol and currency
+            self.positions[(record.symbol, record.currency)] = record.position
+            
+    def add_dataframes(self, open_orders, orders_status, exec_df, pos_df):
+        ''' Function to update the index with the trading dataframes loaded at the app start
+            - Only the last row of each order ID (or symbol and currency for the positions) is used, as the dataframes are sorted by datetime '''
+        
+        # If the open orders dataframe is not empty
+        if not open_orders.empty:
+            # Update the latest order ID of each symbol and order type
+            for key, order_id in open_orders.groupby(['Symbol','OrderType'])['OrderId'].max().items():
+                self.latest_order_ids[key] = max(self.latest_order_ids.get(key, order_id), order_id)
+            # Save the open order status and prices of each order ID
+            last = open_orders.drop_duplicates('OrderId', keep='last')
+            for order_id, status, aux_price, lmt_price in zip(last['OrderId'].tolist(), last['Status'].tolist(), last['AuxPrice'].tolist(), last['LmtPrice'].tolist()):
+                self.orders.setdefault(order_id, {}).update(open_status=status, aux_price=aux_price, lmt_price=lmt_price)
+                
+        # If the orders status dataframe is not empty
+        if not orders_status.empty:
+            # Save the order status, the remaining quantity and the datetime of each order ID
+            last = orders_status[~orders_status['OrderId'].duplicated(keep='last')]
+            for order_id, status, remaining, status_datetime in zip(last['OrderId'].tolist(), last['Status'].tolist(), last['Remaining'].tolist(), last.index):
+                self.orders.setdefault(order_id, {}).update(status=status, remaining=remaining, status_datetime=status_datetime)
+            # Save the average fill price of the filled orders
+            filled = orders_status[orders_status['Status']=='Filled'].drop_duplicates('OrderId', keep='last')
+            for order_id, avg_fill_price in zip(filled['OrderId'].tolist(), filled['AvgFillPrice'].tolist()):
+                self.orders.setdefault(order_id, {})['filled_price'] = avg_fill_price
+                
+        # If the executions dataframe is not empty
+        if not exec_df.empty:
+            # Save the execution average price of each order ID
+            last = exec_df.drop_duplicates('OrderId', keep='last')
+            for order_id, av_price in zip(last['OrderId'].tolist(), last['AvPrice'].tolist()):
+                self.orders.setdefault(order_id, {})['av_price'] = av_price
+                
+        # If the positions dataframe is not empty
+        if not pos_df.empty:
+            # Save the position of each symbol and currency
+            last = pos_df.drop_duplicates(['Symbol','Currency'], keep='last')
+            for symbol, currency, position in zip(last['Symbol'].tolist(), last['Currency'].tolist(), last['Position'].tolist()):
+                self.positions[(symbol, currency)] = position
+            
+    def get_latest_order_id(self, symbol, order_type):
+        ''' Function to get the latest order ID of a symbol and order type, a KeyError is raised if there is none '''
+        return int(self.latest_order_ids[(symbol, order_type)])
+    
+    def get(self, order_id, name):
+        ''' Function to get a value of the latest state of an order, a KeyError is raised if it's unknown '''
+        return self.orders[order_id][name]
+    
+    def get_position(self, symbol, currency):
+        ''' Function to get the latest position of a symbol and currency, a KeyError is raised if there is none '''
+        return self.positions[(symbol, currency)]
+    
+    def set_position(self, symbol, currency, position):
+        ''' Function to save the position of a symbol and currency '''
+        self.positions[(symbol, currency)] = position
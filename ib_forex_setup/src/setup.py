@@ -1,11 +1,11 @@
 # Import the necessary libraries
-import time
 import numpy as np
 import pandas as pd
 import datetime as dt
 import ib_functions as ibf
 from threading import Event
 import trading_functions as tf
+import store_functions as stf
 from ibapi.client import EClient
 from ibapi.wrapper import EWrapper
 
@@ -72,20 +72,22 @@ class trading_app(EClient, EWrapper):
         # Get the data frequency number and time string from the data_frequency string
         self.frequency_number, self.frequency_string = tf.get_data_frequency_values(data_frequency)
         
+        # Set the trading app database, it keeps the last rows saved to only insert the new ones every period
+        self.journal = stf.trading_journal('data/database.db')
         # Call the trading app database
-        database = pd.ExcelFile('data/database.xlsx')
+        database = self.journal.read()
         # Load the open orders dataframe
-        self.open_orders = pd.read_excel(database, "open_orders", index_col = 0)
+        self.open_orders = database["open_orders"]
         # Load the orders status dataframe
-        self.orders_status = pd.read_excel(database, "orders_status", index_col = 0)
+        self.orders_status = database["orders_status"]
         # Load the executions dataframe
-        self.exec_df = pd.read_excel(database, "executions", index_col = 0)
+        self.exec_df = database["executions"]
         # Load the commissions dataframe
-        self.comm_df = pd.read_excel(database, "commissions", index_col = 0)
+        self.comm_df = database["commissions"]
         # Load the positions dataframe
-        self.pos_df = pd.read_excel(database, "positions", index_col = 0)
+        self.pos_df = database["positions"]
         # Load the cash balance dataframe
-        self.cash_balance = database.parse("cash_balance", index_col = 0)
+        self.cash_balance = database["cash_balance"]
 
         # Convert to datetime the string index of each of the previous dataframes
         self.open_orders.index = pd.to_datetime(self.open_orders.index)
@@ -96,12 +98,16 @@ class trading_app(EClient, EWrapper):
         self.cash_balance.index = pd.to_datetime(self.cash_balance.index)
 
         # Kiad the app time spent dataframe
-        self.app_time_spent = database.parse("app_time_spent", index_col=0)
+        self.app_time_spent = database["app_time_spent"]
         # Convert to float previous_time_spent seconds column
         self.previous_time_spent = float(self.app_time_spent['seconds'].iloc[0])        
 
         # Load the periods traded dataframe
-        self.periods_traded = database.parse("periods_traded", index_col = 0)
+        self.periods_traded = database["periods_traded"]
+        
+        # Create the order state index with the loaded dataframes
+        self.order_state = ibf.order_state_index()
+        self.order_state.add_dataframes(self.open_orders, self.orders_status, self.exec_df, self.pos_df)
         
         # Convert to datetime type the trade_time column of the previous_traded dataframe
         self.periods_traded['trade_time'] = pd.to_datetime(self.periods_traded['trade_time'])
@@ -113,6 +119,8 @@ class trading_app(EClient, EWrapper):
         self.new_df = {}
         self.new_df['0'] = pd.DataFrame()
         self.new_df['1'] = pd.DataFrame()
+        # Create the bar buffer to save the downloaded bars until each request finishes
+        self.bar_buffer = ibf.bar_buffer()
        
         # Set the ticker
         self.ticker = symbol
@@ -146,6 +154,11 @@ class trading_app(EClient, EWrapper):
         self.scalable_features = features_df['scalable_features'].dropna().tolist()
         # Set all the features to prepare the data
         self.final_input_features = features_df['final_features'].dropna().tolist()
+        # Set the technical indicators' stationarity transforms estimated in the strategy optimization
+        if 'transforms' in features_df.columns:
+            self.transforms = dict(zip(features_df['indicators'].dropna(), features_df['transforms'].dropna()))
+        else:
+            self.transforms = None
         # Set the stop loss order id to NaN             
         self.sl_order_id = np.nan
         # Set the take profit order id to NaN             
@@ -155,6 +168,16 @@ class trading_app(EClient, EWrapper):
         self.count = 0
         self.last_value_count = 0
         
+        # Set the last midpoint price of the asset and the datetime it was received
+        self.last_value = 0
+        self.last_value_time = None
+        # Set the request ID of the midpoint subscription, the historical data requests use 0 and 1
+        self.midpoint_id = 2
+        # Set the midpoint subscription as not started
+        self.midpoint_subscribed = False
+        # Set the threading event that is set every time a midpoint tick arrives
+        self.midpoint_event = Event()
+        
         # Create the account update information dataframe
         self.acc_update = pd.DataFrame()        
         # Create a dictionary to save the historical data events to download it properly        
@@ -170,6 +193,28 @@ class trading_app(EClient, EWrapper):
         self.account_update_event = Event()
         # Set the threading event for the executions request
         self.executions_request_event = Event()
+        # Set the threading event for the connection, it's set once the next valid order ID is received
+        self.connection_event = Event()
+        # Set the threading event for the next valid order ID request
+        self.order_id_event = Event()
+        # Create a dictionary to save the threading events of the orders waiting for IB's acknowledgement
+        self.order_events = {}
+        # Set the message loop thread
+        self.run_thread = None
+        # Set the persistent connection to False, the app is disconnected once the period is traded
+        self.persistent_connection = False
+        # Set the live bars to False, the historical data is downloaded every period
+        self.live_bars = False
+        # Set the live bar feed, it's created with the first live bars' request
+        self.live_bar_feed = None
+        # Create the dictionary of the strategy inputs prepared before the period starts
+        self.precomputed = {}
+        # Create the cache of the signal's model objects, they're kept in memory while their files don't change
+        self.model_cache = stf.model_cache()
+        # Set the base_df rows and the feature engine to be saved once the orders are sent
+        self.base_df_update = None
+        # Create the dictionary of the signal's updated objects to be saved once the orders are sent
+        self.models_update = {}
 
         # Create temporary dataframes to be used while requesting previous trading information
         self.acc_update = pd.DataFrame()
@@ -178,6 +223,9 @@ class trading_app(EClient, EWrapper):
         self.temp_exec_df = pd.DataFrame()
         self.temp_comm_df = pd.DataFrame()  
         self.temp_pos_df = pd.DataFrame() 
+        # Create the lists to save the callback records of each temporary dataframe until the requests finish
+        self.records = {'temp_open_orders':[], 'temp_orders_status':[], 'temp_exec_df':[], \
+                        'temp_comm_df':[], 'temp_pos_df':[], 'acc_update':[]}
         
         # Set the strategy end to False
         self.strategy_end = False
@@ -185,11 +233,134 @@ class trading_app(EClient, EWrapper):
         # Set the logging as part of the setup
         self.logging = logging
         
+    def reset_period(self, current_period, previous_period, next_period, market_open_time, market_close_time, 
+                     previous_day_start_datetime, trading_day_end_datetime, day_end_datetime):
+        ''' Function to reset the period-scoped state to use the same app for a new period
+            - The trading dataframes, the historical data and the order state index are kept in memory since they're saved every period '''
+        
+        # Start time to get later the number of seconds used to run the whole strategy per period
+        self.app_start_time = dt.datetime.now()
+        
+        # Set the market open and close datetimes of the current week
+        self.market_open_time = market_open_time
+        self.market_close_time = market_close_time
+        # Set the previous day start, trading day end and day-end datetimes
+        self.previous_day_start_datetime = previous_day_start_datetime
+        self.trading_day_end_datetime = trading_day_end_datetime
+        self.day_end_datetime = day_end_datetime
+        # Set the current, previous and next periods
+        self.current_period = current_period
+        self.previous_period = previous_period
+        self.next_period = next_period
+        
+        # Set the previous time spent with the last period saved
+        self.previous_time_spent = float(self.app_time_spent['seconds'].iloc[0])
+        # Add a new row to the periods_traded column with the current period, only once if the period is retried
+        if not (self.periods_traded['trade_time'] == current_period).any():
+            self.periods_traded.loc[len(self.periods_traded.index),:] = [current_period, 0, market_open_time, market_close_time]
+        
+        # Use the last train_span observations for the historical data, as it's saved every period
+        self.historical_data = self.historical_data.tail(self.train_span)
+        
+        # Create the new_df dataframe to save the downloaded historical BID and ASK data
+        self.new_df = {'0':pd.DataFrame(), '1':pd.DataFrame()}
+        # Create the bar buffer to save the downloaded bars until each request finishes
+        self.bar_buffer = ibf.bar_buffer()
+        
+        # Create a dictionary to save the app output errors
+        self.errors_dict = {}
+        # Set the stop loss and take profit order ids to NaN             
+        self.sl_order_id = np.nan
+        self.tp_order_id = np.nan
+        # Set the count values to zero
+        self.count = 0
+        self.last_value_count = 0
+        
+        # Clear the requests' threading events
+        for event in [self.hist_data_events['0'], self.hist_data_events['1'], self.orders_request_event, \
+                      self.positions_request_event, self.account_update_event, self.executions_request_event, self.order_id_event]:
+            event.clear()
+        # Create the dictionary of the orders' acknowledgement events
+        self.order_events = {}
+            
+        # Create the temporary dataframes and their records lists
+        self.acc_update = pd.DataFrame()
+        self.temp_open_orders = pd.DataFrame()
+        self.temp_orders_status = pd.DataFrame()
+        self.temp_exec_df = pd.DataFrame()
+        self.temp_comm_df = pd.DataFrame()  
+        self.temp_pos_df = pd.DataFrame() 
+        self.records = {'temp_open_orders':[], 'temp_orders_status':[], 'temp_exec_df':[], \
+                        'temp_comm_df':[], 'temp_pos_df':[], 'acc_update':[]}
+        
+        # Drop the base_df rows of the previous period if they weren't saved, the feature engine is loaded again from its file
+        self.base_df_update = None
+        # Drop the signal's updated objects of the previous period if they weren't saved, the next signal starts from the saved ones
+        self.models_update = {}
+        
+        # Set the strategy end to False
+        self.strategy_end = False
+        
     def error(self, reqId, code, msg, advancedOrderRejectJson=''):
         ''' Called if an error occurs '''
         self.errors_dict[code] = msg
         print('Error: {} - {} - {}'.format(reqId, code, msg))
         self.logging.info('Error: {} - {} - {}'.format(reqId, code, msg))
+        # An error of a pending order also acknowledges its request, the market data errors of the data requests with the same ID don't
+        if (reqId in self.order_events) and not ((reqId in [0, 1, self.midpoint_id]) and (code in [162, 165, 354, 366, 10089, 10090, 10167, 10168, 10182, 10197])):
+            self.acknowledge_order(reqId)
+        # If the live bars' subscription is lost, the historical data will be requested again
+        if (self.live_bar_feed is not None) and (((reqId in [0, 1]) and (code in [162, 366, 10182])) or (code in [1100, 1101])):
+            self.live_bar_feed.active = False
+        # If the midpoint subscription is lost, it will be requested again
+        if (reqId == self.midpoint_id) or (code in [1100, 1101]):
+            self.midpoint_subscribed = False
+        
+    def expect_order(self, order_id, statuses=None):
+        ''' Function to create the event that is set once IB acknowledges an order request
+            - Call it before placing or canceling the order so the acknowledgement can't be missed
+            - The order is acknowledged with any of its order statuses (only the given statuses, if any) or any of its errors '''
+        self.order_events[order_id] = (Event(), statuses)
+        
+    def acknowledge_order(self, order_id, status=None):
+        ''' Function to set the event of an order request if it's waiting for this order status or error
+            - Errors are passed without a status '''
+        event, statuses = self.order_events.get(order_id, (None, None))
+        # If the order is waiting for its acknowledgement
+        if event is not None:
+            # Set the event if it's an error or an expected status
+            if (status is None) or (statuses is None) or (status in statuses):
+                event.set()
+                
+    def wait_for_order(self, order_id, timeout):
+        ''' Function to wait until IB acknowledges an order request or the timeout passes
+            - It returns True if the order was acknowledged '''
+        event, _ = self.order_events.get(order_id, (None, None))
+        # Return if the order isn't waiting for its acknowledgement
+        if event is None:
+            return False
+        # Wait until the acknowledgement arrives
+        acknowledged = event.wait(timeout)
+        # Drop the order event
+        self.order_events.pop(order_id, None)
+        if not acknowledged:
+            print(f"Order {order_id} wasn't acknowledged in {timeout} seconds...")
+            self.logging.info(f"Order {order_id} wasn't acknowledged in {timeout} seconds...")
+        return acknowledged
+        
+    def save_records(self, *names):
+        ''' Function to convert the callback records into their temporary dataframes
+            - Records that arrive after the request end are saved the next time this function is called '''
+        for name in names:
+            # Take the records list and leave a new one for the next callbacks
+            records, self.records[name] = self.records[name], []
+            # Continue if there are no new records
+            if len(records)==0:
+                continue
+            # Convert the records into a dataframe only once
+            new_df = ibf.records_to_dataframe(records)
+            # Concatenate it with the temporary dataframe
+            setattr(self, name, new_df if getattr(self, name).empty else pd.concat([getattr(self, name), new_df], ignore_index=True))
                 
     def nextValidId(self, orderId):
         ''' Set the next order id '''
@@ -199,31 +370,38 @@ class trading_app(EClient, EWrapper):
             self.nextValidOrderId = orderId
             print("NextValidId:", orderId)
             self.logging.info("NextValidId: {}".format(orderId))
-            time.sleep(1)
+            # Set the event to tell the next valid order ID arrived
+            self.order_id_event.set()
+            # Set the event to tell the app is connected
+            self.connection_event.set()
         else:
             return
     
     def openOrder(self, orderId, contract, order, orderState):
         ''' Function to call the open orders '''
         super().openOrder(orderId, contract, order, orderState)
-        # Create a dictionary to save the data
-        dictionary = {"PermId":order.permId, \
-                      "ClientId": order.clientId, \
-                      "OrderId": orderId, 
-                      "Account": order.account, \
-                      "Symbol": contract.symbol, \
-                      "SecType": contract.secType,
-                      "Exchange": contract.exchange, \
-                      "Action": order.action, \
-                      "OrderType": order.orderType,
-                      "TotalQty": float(order.totalQuantity), \
-                      "CashQty": order.cashQty, 
-                      "LmtPrice": order.lmtPrice, \
-                      "AuxPrice": order.auxPrice,\
-                      "Status": orderState.status,\
-                      "datetime":dt.datetime.now().replace(microsecond=0)}
-        # Save the data into the temporary dataframe
-        self.temp_open_orders = pd.concat([self.temp_open_orders, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Create the record
+        record = ibf.open_order_record(perm_id=order.permId, \
+                      client_id=order.clientId, \
+                      order_id=orderId, 
+                      account=order.account, \
+                      symbol=contract.symbol, \
+                      sec_type=contract.secType,
+                      exchange=contract.exchange, \
+                      action=order.action, \
+                      order_type=order.orderType,
+                      total_qty=float(order.totalQuantity), \
+                      cash_qty=order.cashQty, 
+                      lmt_price=order.lmtPrice, \
+                      aux_price=order.auxPrice,\
+                      status=orderState.status,\
+                      datetime=dt.datetime.now().replace(microsecond=0))
+        # Save the record into the temporary records list
+        self.records['temp_open_orders'].append(record)
+        # Update the order state index
+        self.order_state.add(record)
+        # Acknowledge the order request if it's waiting for this status
+        self.acknowledge_order(orderId, orderState.status)
 
         
     def orderStatus(self, orderId, status, filled, remaining, avgFillPrice, \
@@ -234,21 +412,27 @@ class trading_app(EClient, EWrapper):
                             avgFillPrice, permId, parentId, lastFillPrice, \
                             clientId, whyHeld, mktCapPrice)
         
-        # Create a dictionary to save the data
-        dictionary = {"OrderId": orderId, \
-                      "Status":status, \
-                      "Filled":filled, \
-                      "PermId":permId, \
-                      "ClientId": clientId, \
-                      "Remaining": float(remaining), \
-                      "AvgFillPrice": avgFillPrice, \
-                      "LastFillPrice": lastFillPrice, \
-                      "datetime":dt.datetime.now().replace(microsecond=0)}
-        # Save the data into the temporary dataframe
-        self.temp_orders_status = pd.concat([self.temp_orders_status, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Create the record
+        record = ibf.order_status_record(order_id=orderId, \
+                      status=status, \
+                      filled=filled, \
+                      perm_id=permId, \
+                      client_id=clientId, \
+                      remaining=float(remaining), \
+                      avg_fill_price=avgFillPrice, \
+                      last_fill_price=lastFillPrice, \
+                      datetime=dt.datetime.now().replace(microsecond=0))
+        # Save the record into the temporary records list
+        self.records['temp_orders_status'].append(record)
+        # Update the order state index
+        self.order_state.add(record)
+        # Acknowledge the order request if it's waiting for this status
+        self.acknowledge_order(orderId, status)
                 
     def openOrderEnd(self):
         print("Open orders request was successfully completed")
+        # Convert the open orders and orders status records into the temporary dataframes
+        self.save_records('temp_open_orders', 'temp_orders_status')
         self.orders_request_event.set()
 
     # Receive details when orders are executed        
@@ -258,25 +442,26 @@ class trading_app(EClient, EWrapper):
         self.logging.info('Requesting the trading executions...')
         
         super().execDetails(reqId, contract, execution)
-        # Create a dictionary to save the data
-        dictionary = {"OrderId": execution.orderId,  
-                      "PermId":execution.permId, \
-                      "ExecutionId":execution.execId, \
-                      "Symbol": contract.symbol, \
-                      "Side":execution.side, \
-                      "Price":execution.price, \
-                      "AvPrice":execution.avgPrice, \
-                      "cumQty":execution.cumQty, \
-                      "Currency":contract.currency, \
-                      "SecType": contract.secType, \
-                      "Position": float(execution.shares), \
-                      "Execution Time": execution.time, \
-                      "Last Liquidity": execution.lastLiquidity, \
-                      "OrderRef":execution.orderRef, \
-                      "datetime":dt.datetime.now().replace(microsecond=0)}
-            
-        # Save the data into the temporary dataframe
-        self.temp_exec_df = pd.concat([self.temp_exec_df, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Create the record
+        record = ibf.execution_record(order_id=execution.orderId,  
+                      perm_id=execution.permId, \
+                      execution_id=execution.execId, \
+                      symbol=contract.symbol, \
+                      side=execution.side, \
+                      price=execution.price, \
+                      av_price=execution.avgPrice, \
+                      cum_qty=execution.cumQty, \
+                      currency=contract.currency, \
+                      sec_type=contract.secType, \
+                      position=float(execution.shares), \
+                      execution_time=execution.time, \
+                      last_liquidity=execution.lastLiquidity, \
+                      order_ref=execution.orderRef, \
+                      datetime=dt.datetime.now().replace(microsecond=0))
+        # Save the record into the temporary records list
+        self.records['temp_exec_df'].append(record)
+        # Update the order state index
+        self.order_state.add(record)
         
     def commissionReport(self, commissionReport):
         ''' Function to call the trading commissions'''
@@ -284,19 +469,18 @@ class trading_app(EClient, EWrapper):
         self.logging.info('Requesting the trading commissions...')
         
         super().commissionReport(commissionReport)
-        # Create a dictionary to save the data
-        dictionary = {"ExecutionId":commissionReport.execId, \
-                      "Commission": commissionReport.commission, \
-                      "Currency":commissionReport.currency, \
-                      "Realized PnL": float(commissionReport.realizedPNL), \
-                      "datetime":dt.datetime.now().replace(microsecond=0)}
-            
-        # Save the data into the temporary dataframe
-        self.temp_comm_df = pd.concat([self.temp_comm_df, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Save the data into the temporary records list
+        self.records['temp_comm_df'].append(ibf.commission_record(execution_id=commissionReport.execId, \
+                      commission=commissionReport.commission, \
+                      currency=commissionReport.currency, \
+                      realized_pnl=float(commissionReport.realizedPNL), \
+                      datetime=dt.datetime.now().replace(microsecond=0)))
 
     def execDetailsEnd(self, reqId: int):
         super().execDetailsEnd(reqId)
         print("Trading executions request was successfully finished. ReqId:", reqId)
+        # Convert the executions and commissions records into the temporary dataframes
+        self.save_records('temp_exec_df', 'temp_comm_df')
         self.executions_request_event.set()
                 
     # Receive the positions from the TWS
@@ -305,51 +489,60 @@ class trading_app(EClient, EWrapper):
         print('Requesting the trading positions...')
         self.logging.info('Requesting the trading positions...')
         super().position(account, contract, position, avgCost)
-        # Create a dictionary to save the data
-        dictionary = {"Account":account, "Symbol": contract.symbol, \
-                      "SecType": contract.secType,
-                      "Currency": contract.currency, "Position": float(position), \
-                      "Avg cost": avgCost, "datetime":dt.datetime.now().replace(microsecond=0)}
-            
-        # Save the data into the temporary dataframe
-        self.temp_pos_df = pd.concat([self.temp_pos_df, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Create the record
+        record = ibf.position_record(account=account, symbol=contract.symbol, \
+                      sec_type=contract.secType,
+                      currency=contract.currency, position=float(position), \
+                      avg_cost=avgCost, datetime=dt.datetime.now().replace(microsecond=0))
+        # Save the record into the temporary records list
+        self.records['temp_pos_df'].append(record)
+        # Update the order state index
+        self.order_state.add(record)
         
     # Display message once the positions are retrieved
     def positionEnd(self):
         print('Positions Retrieved.')
+        # Convert the positions records into the temporary dataframe
+        self.save_records('temp_pos_df')
         self.positions_request_event.set()
                 
     # Receive historical bars from TWS
     def historicalData(self, reqId, bar):
         ''' Function to call the historical data'''
-        # Save the data into the new_df dataframe
-        self.new_df[f'{reqId}'].loc[bar.date,'close'] = bar.close
-        self.new_df[f'{reqId}'].loc[bar.date,'open'] = bar.open
-        self.new_df[f'{reqId}'].loc[bar.date,'high'] = bar.high
-        self.new_df[f'{reqId}'].loc[bar.date,'low'] = bar.low
+        # Save the bar into the bar buffer
+        self.bar_buffer.append(reqId, bar)
                         
     # Display a message once historical data is retrieved
     def historicalDataEnd(self,reqId,start,end):
         super().historicalDataEnd(reqId,start,end)
+        # Save the downloaded bars into the new_df dataframe
+        self.new_df[f'{reqId}'] = self.bar_buffer.to_dataframe(reqId)
         print("Historical Data Download finished...")
         self.logging.info("Historical Data Download finished...")
         # Set the event and end the historical data download
         self.hist_data_events[f'{reqId}'].set()
 
+    def historicalDataUpdate(self, reqId, bar):
+        ''' Function to call the keepUpToDate historical data updates'''
+        # Save the minute bar update into the live bar feed
+        if self.live_bar_feed is not None:
+            self.live_bar_feed.update(reqId, bar)
+            
     def tickByTickMidPoint(self, reqId, tick_time, midpoint):
         ''' Function to call in response to reqTickByTickData '''
         # Save midpoint price to last_value 
         self.last_value = midpoint
+        # Save the datetime the midpoint was received to check if it's stale
+        self.last_value_time = dt.datetime.now()
+        # Tell the strategy thread a midpoint arrived
+        self.midpoint_event.set()
                         
     def updateAccountValue(self, key, value, currency, accountName):
         ''' Function to call the account values'''
         super().updateAccountValue(key, value, currency, accountName)
-        # Save the data into a dictionary
-        dictionary = {"key":key, "Account": accountName, "Value": value, \
-                      "Currency": currency, "datetime":dt.datetime.now().replace(microsecond=0)}
-                        
-        # Save the data into a temporary dataframe
-        self.acc_update = pd.concat([self.acc_update, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+        # Save the data into the temporary records list
+        self.records['acc_update'].append(ibf.account_value_record(key=key, account=accountName, value=value, \
+                      currency=currency, datetime=dt.datetime.now().replace(microsecond=0)))
             
     def updateAccountTime(self, timeStamp: str):
         print("Account update time is:", timeStamp)
@@ -357,4 +550,6 @@ class trading_app(EClient, EWrapper):
     def accountDownloadEnd(self, accountName: str):
         print("Account download was done for account:", accountName)
         self.logging.info(f"Account download was done for account: {accountName}")
+        # Convert the account values records into the account update dataframe
+        self.save_records('acc_update')
         self.account_update_event.set()
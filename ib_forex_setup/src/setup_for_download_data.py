@@ -1,4 +1,5 @@
 # Import the necessary libraries
+import os
 import time
 import numpy as np
 import pandas as pd
@@ -7,6 +8,7 @@ from threading import Thread
 from datetime import datetime
 from concurrent import futures
 import trading_functions as tf
+import store_functions as stf
 from ibapi.client import EClient
 import ib_functions as ibf
 from ibapi.wrapper import EWrapper
@@ -39,55 +41,46 @@ class app_for_download_data(EWrapper, EClient):
         # List of lists of params to be used while downloading the historical data
         self.params_list = list()
         
-        # DataFrame to save the completed dataframe to be saved
-        self.end_df = pd.DataFrame()
+        # Dictionary to save the Saturday datetime of each BID params list, which names its partition
+        self.partition_names = {}
         
         # Dictionary to save the threading events to be used while downloading the historical data
         self.events = {}
+        
+        # Bar buffer to save the downloaded bars until each request finishes
+        self.bar_buffer = ibf.bar_buffer()
                 
         # File name to be used to save the historical data
         self.file_name = file_name
         
-        # If it's the first time you download data or you haven't completed to download from previous years
-        if update == 'false':
-            # Check if you already have a historical data file
-            try: 
-                # Import the historical data
-                self.end_df = pd.read_csv(self.file_name, index_col=0)
-                # Set the now datetime to the first index value of the dataframe
-                self.now = self.end_df.index[0]
-                # Set the index to datetime type
-                self.end_df.index = pd.to_datetime(self.end_df.index)
-                # Get the Saturdays list from January 2005 to the now datetime
-                self.saturdays = [date0 for date0 in saturdays if date0<=self.now]
-            except:
-                # Set the now datetime
-                self.now = now
-                # Create the dataframe to be used to save the historical data
-                self.end_df = pd.DataFrame()
-                # Save the Saturdays list inside the class app
-                self.saturdays = saturdays
+        # Set the now datetime
+        self.now = now
+        
+        # Set the historical minute data store, the folder is the file name without its extension
+        self.store = stf.get_minute_data_store(self.file_name)
+        # Import the historical data file of previous versions into the store
+        if (self.store.exists()==False) and os.path.exists(self.file_name):
+            # Import the historical data
+            previous_df = pd.read_csv(self.file_name, index_col=0)
+            # Set the index to datetime type
+            previous_df.index = pd.to_datetime(previous_df.index)
+            # Save the historical data into the weekly partitions
+            self.store.import_dataframe(previous_df, saturdays, now)
+        
+        # If it's the first time you download data or you haven't completed to download from previous years, or in case you want to just fill
+        if (update == 'false') or (update == 'fill'):
+            # Subset the Saturdays list to the ones not completely downloaded yet
+            complete_names = self.store.get_complete_names()
+            self.saturdays = [date0 for date0 in saturdays if date0 not in complete_names]
         # If we already have a historical complete historical data and we just need to update it to the most recent datetime
         elif update == 'true':
-            # Set the now datetime
-            self.now = now
-            # Import the historical dataframe
-            self.end_df = pd.read_csv(self.file_name, index_col=0)
-            # Set the index to datetime type
-            self.end_df.index = pd.to_datetime(self.end_df.index)
-            # From this first date to now we're going to download data
-            first_date = self.end_df.index[-1].strftime('%Y%m%d-%H:%M:%S')  
+            # From the last datetime of the store to now we're going to download data
+            first_date = self.store.get_last_index().strftime('%Y%m%d-%H:%M:%S')  
             # Subset the Saturdays list from the first date onwards
             self.saturdays = [date0 for date0 in saturdays if date0>=first_date]
             
-            if (len(self.saturdays)==1) and (self.saturdays[0] >= first_date):
+            if (len(self.saturdays)==1) and (self.saturdays[0] >= first_date) and (self.saturdays[0] in self.store.get_complete_names()):
                 return
-        # In case you want to just fill
-        elif update == 'fill':
-            self.end_df = pd.read_csv(self.file_name, index_col=0)
-            self.end_df.index = pd.to_datetime(self.end_df.index)
-            self.now = now
-            self.saturdays = saturdays
         
         # Create the params list with the BID and ASK quotes
         j = 0
@@ -95,6 +88,8 @@ class app_for_download_data(EWrapper, EClient):
         for date0 in self.saturdays:
             # Append a list with the BID quote
             self.params_list.append([j, self.contract, date0, 'BID'])
+            # Save the partition name of the BID and ASK quotes
+            self.partition_names[j] = date0
             # Append a list with the ASK quote
             self.params_list.append([j+1, self.contract, date0, 'ASK'])
             # Create an empty dataframe corresponding to the BID params list
@@ -217,14 +212,14 @@ class app_for_download_data(EWrapper, EClient):
     def historicalData(self, reqId, bar):
         ''' Called in response to reqHistoricalData '''
         
-        self.dfs[f'{reqId}'].loc[bar.date,'close'] = bar.close
-        self.dfs[f'{reqId}'].loc[bar.date,'open'] = bar.open
-        self.dfs[f'{reqId}'].loc[bar.date,'high'] = bar.high
-        self.dfs[f'{reqId}'].loc[bar.date,'low'] = bar.low
+        # Save the bar into the bar buffer
+        self.bar_buffer.append(reqId, bar)
 
     def historicalDataEnd(self, reqId, start, end):
         ''' Called when the historical data for reqId is finished '''
         super().historicalDataEnd(reqId, start, end)
+        # Save the downloaded bars into the request dataframe
+        self.dfs[f'{reqId}'] = self.bar_buffer.to_dataframe(reqId)
         print(f"Historical Data for ID {reqId} Download End")
         self.events[f'{reqId}'].set()
             
@@ -288,14 +283,11 @@ class app_for_download_data(EWrapper, EClient):
             
             # Concatenate the BID and ASK dataframes into a single one
             temp_df = pd.concat([self.dfs[f'{j}'],self.dfs[f'{j+1}']], axis=1)
-            # Update the whole historical dataframe
-            self.end_df = pd.concat([self.end_df,temp_df])
-            # Sort the dataframe by index
-            self.end_df = self.end_df.sort_index()
-            # Drop duplicates
-            self.end_df = self.end_df[~self.end_df.index.duplicated(keep='first')]
-            # Save the historical dataframe into a CSV file
-            self.end_df.to_csv(self.file_name, encoding='utf-8', index=True)
+            # Save the week partition once, the partition is complete if its Saturday datetime has already passed
+            partition_name = self.partition_names[j]
+            self.store.write_partition(partition_name, temp_df, complete=datetime.strptime(partition_name, '%Y%m%d-%H:%M:%S')<=self.now)
+            # Release the downloaded dataframes
+            self.dfs[f'{j}'], self.dfs[f'{j+1}'] = pd.DataFrame(), pd.DataFrame()
             # Update the params list number
             j+=2
 
@@ -365,9 +357,6 @@ class app_for_download_data(EWrapper, EClient):
             # Update the historical dataframe
             self.update_df(params_sublist_left) 
             
-        # Save the historical dataframe into a CSV file
-        self.end_df.to_csv(self.file_name, encoding='utf-8', index=True)
-        
         print('Download of historical minute data is completed')
                                          
 # -------------------------x-----------------------x--------------------------#
@@ -386,10 +375,8 @@ def update_historical_resampled_data(historical_minute_data, historical_data_add
         historical_data = tf.resample_df(tf.get_mid_series(historical_minute_data), data_frequency, start=f'{hour_string}h{minute_string}min')
     # If it's a string address
     else:
-        # Import the historical minute-frequency data
-        historical_minute_data = pd.read_csv(historical_minute_data, index_col=0)
-        # Convert the index to datetime type
-        historical_minute_data.index = pd.to_datetime(historical_minute_data.index)
+        # Import the historical minute-frequency data needed for the last "train_span" observations
+        historical_minute_data = stf.read_minute_data(historical_minute_data, train_span, data_frequency)
         # Resample the data as per the trading frequency
         historical_data = tf.resample_df(tf.get_mid_series(historical_minute_data), data_frequency, start=f'{hour_string}h{minute_string}min')
   
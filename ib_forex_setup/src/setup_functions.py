@@ -1,6 +1,7 @@
 # Import the necessary libraries
 import os
 import time
+import pickle
 import smtplib
 import numpy as np
 import pandas as pd
@@ -8,7 +9,9 @@ import datetime as dt
 import yfinance as yf
 import strategy as stra
 import trading_functions as tf
+import store_functions as stf
 import ib_functions as ibf
+from threading import Thread
 from concurrent.futures import ThreadPoolExecutor
 
 def connection_monitor(app):
@@ -147,7 +150,7 @@ def download_hist_data(app, params):
                                whatToShow=whatToShow,
                                useRTH=False,
                                formatDate=1,
-                               keepUpToDate=False,
+                               keepUpToDate=app.live_bars,
                                # EClient function to request contract details
                                chartOptions=[])	
         
@@ -165,16 +168,74 @@ def prepare_downloaded_data(app, params):
     app.new_df[f'{params[0]}'].rename(columns={'open':f'{params[-1].lower()}_open','high':f'{params[-1].lower()}_high',\
                                               'low':f'{params[-1].lower()}_low','close':f'{params[-1].lower()}_close'},inplace=True)
     
-    # Set the index to datetime type            
-    app.new_df[f'{params[0]}'].index = pd.to_datetime(app.new_df[f'{params[0]}'].index, format='%Y%m%d %H:%M:%S %Z')
-    # Get rid of the timezone tag
-    app.new_df[f'{params[0]}'].index = app.new_df[f'{params[0]}'].index.tz_localize(None)
+    # Set the index to timezone-naive datetime type            
+    app.new_df[f'{params[0]}'].index = ibf.parse_bar_dates(app.new_df[f'{params[0]}'].index)
     
     print(f'{params[-1]} data is prepared...')
     app.logging.info(f'{params[-1]} data is prepared...')
        
+def wait_for_live_bars(app, timeout=10):
+    ''' Function to wait until the live bar feed finishes the current period's bar
+        - A bar is finished once the first update of the next bar arrives, the partial bar is finished after "timeout" seconds
+        - It returns True if the live bars reach the current period '''
+    
+    # Set the live bar feed
+    feed = app.live_bar_feed
+    # Set the wait's deadline
+    deadline = time.monotonic() + timeout
+    
+    while True:
+        # Clear the threading event before checking the last bar, so a new bar can't be missed
+        feed.bar_event.clear()
+        # Stop waiting if the current period's bar is finished
+        last_index = feed.get_last_index()
+        if (last_index is not None) and (last_index >= app.current_period):
+            return True
+        # Stop waiting if the deadline has passed or the subscription was lost
+        if (time.monotonic() >= deadline) or (not feed.active) or (not app.isConnected()):
+            break
+        # Wait until a new bar is finished
+        feed.bar_event.wait(max(deadline - time.monotonic(), 0))
+    
+    # Finish the partial bar with the updates received up to now
+    feed.flush(app.current_period)
+    last_index = feed.get_last_index()
+    
+    return (last_index is not None) and (last_index >= app.current_period)
+
 def update_hist_data(app):
-    ''' Request the historical data '''
+    ''' Request the historical data
+        - With live bars, the historical data is only requested to subscribe to the minute bars or to fill a gap once the subscription is lost
+        - Otherwise, the bars are read from the live bar feed '''
+    
+    # If the live bars' subscription is working
+    if app.live_bars and (app.live_bar_feed is not None) and app.live_bar_feed.active and app.isConnected():
+        print("Reading the live bars...")
+        app.logging.info("Reading the live bars...")
+        # If the live bars reach the current period
+        if wait_for_live_bars(app):
+            # Read the last bars
+            app.historical_data = app.live_bar_feed.to_dataframe(app.train_span)
+            print("Historical data was successfully prepared...")
+            app.logging.info("Historical data was successfully prepared...")
+            return
+        print("The live bars didn't reach the current period, the historical data will be requested to fill the gap...")
+        app.logging.info("The live bars didn't reach the current period, the historical data will be requested to fill the gap...")
+        
+    # If the live bars are used
+    if app.live_bars:
+        # Create the live bar feed the first time
+        if app.live_bar_feed is None:
+            app.live_bar_feed = ibf.live_bar_feed(app.data_frequency, app.market_open_time, app.train_span)
+        # Cancel the previous subscription if it was started
+        elif app.live_bar_feed.started and app.isConnected():
+            app.cancelHistoricalData(0)
+            app.cancelHistoricalData(1)
+        # Stop the feed until the new subscription's download is finished
+        app.live_bar_feed.reset()
+        # Use the saved bars up to the gap
+        if len(app.live_bar_feed.ring) > 0:
+            app.historical_data = app.live_bar_feed.to_dataframe()
     
     print("Requesting the historical data...")
     app.logging.info("Requesting the historical data...")
@@ -207,7 +268,7 @@ def update_hist_data(app):
     df = pd.concat([app.new_df['0'],app.new_df['1']], axis=1)
     
     # Get the mid prices based on the BID and ASK prices
-    df = tf.get_mid_series(df)
+    df = mid_df = tf.get_mid_series(df)
     
     # Set the hour string to resample the data
     hour_string = str(app.market_open_time.hour) if (app.market_open_time.hour)>=10 else '0'+str(app.market_open_time.hour)
@@ -223,36 +284,51 @@ def update_hist_data(app):
     # Drop duplicates
     app.historical_data = app.historical_data[~app.historical_data.index.duplicated(keep='last')]
     
+    # If the live bars are used
+    if app.live_bars:
+        # Keep the finished bars, the partial bar is created by the live bar feed
+        app.historical_data = app.historical_data[app.historical_data.index <= app.current_period]
+        # Start the feed with the finished bars and the minute mid prices of the partial bar
+        app.live_bar_feed.start(app.historical_data, mid_df[mid_df.index >= app.current_period])
+    
     print("Historical data was successfully prepared...")
     app.logging.info("Historical data was successfully prepared...")
 
-def update_asset_last_value(app):
-    ''' Request the update of the last value of the asset'''
+def update_asset_last_value(app, max_age=60, timeout=2):
+    ''' Request the update of the last value of the asset
+        - The midpoint ticks update the last value through a subscription that is kept while the app is connected
+        - The last value is used at once if it's not older than "max_age" seconds
+        - Otherwise, the app subscribes again and waits for a new tick for up to "timeout" seconds '''
     print("Updating the last value of the asset...")
     app.logging.info("Updating the last value of the asset...")
-    # Set the last value to zero
-    app.last_value = 0
     # Use the while loop in case the app has issues while requesting the last value
     while True:
-        # Reques the last value of the asset price
-        app.reqTickByTickData(0, app.contract, \
-                                'MidPoint', 0, True)
-        time.sleep(2)
-        # Cancel the request
-        app.cancelTickByTickData(0)
-        time.sleep(1)
+        # Check if the last value is recent enough
+        if app.midpoint_subscribed and (app.last_value_time is not None) and \
+            ((dt.datetime.now() - app.last_value_time).total_seconds() <= max_age):
+            print('Midpoint data obtained...')
+            app.logging.info('Midpoint data obtained...')
+            break
         # Check if the app tried more than 50 times
         if app.last_value_count >= 50:
             print("The app couldn't get the midpoint data, it will restart...")
             app.logging.info("The app couldn't get the midpoint data, it will restart...")
             break
-        # Check if the last value is different from zero
-        if app.last_value != 0:
-            print('Midpoint data obtained...')
-            app.logging.info('Midpoint data obtained...')
-            break
         # Check if the app is disconnected
         if not app.isConnected(): return
+        
+        # Cancel the previous subscription, IB sends the current midpoint once the new one starts
+        if app.midpoint_subscribed:
+            app.cancelTickByTickData(app.midpoint_id)
+        # Clear the threading event
+        app.midpoint_event.clear()
+        # Subscribe to the midpoint ticks of the asset
+        app.reqTickByTickData(app.midpoint_id, app.contract, \
+                                'MidPoint', 0, True)
+        app.midpoint_subscribed = True
+        # Wait until the first tick arrives
+        if app.midpoint_event.wait(timeout):
+            continue
                 
         print("Couldn't get Tick midpoint data, it will try again...")
         app.logging.info("Couldn't get Tick midpoint data, it will try again...")
@@ -309,8 +385,11 @@ def get_capital_as_per_forex_base_currency(app, capital_datetime):
             
     return capital      
 
-def update_capital(app):
-    ''' Function to update the capital value'''
+def update_capital(app, timeout=1, max_wait=30):
+    ''' Function to update the capital value
+        - The account download end is checked every "timeout" seconds while the app is connected, for up to "max_wait" seconds
+        - If the account values don't arrive, the app is disconnected so no orders are sent with a previous capital value
+        - It returns True if the capital value was updated'''
     print('Update the cash balance datetime and value...')
     app.logging.info('Update the cash balance datetime and value...')
     
@@ -320,15 +399,28 @@ def update_capital(app):
         app.account_update_event.clear()
         # Request the account update of app.account
         app.reqAccountUpdates(True,app.account)
+        # Set the wait's deadline
+        deadline = time.monotonic() + max_wait
         # Wait until the update is finished
-        app.account_update_event.wait()
+        while not app.account_update_event.wait(min(timeout, max(deadline - time.monotonic(), 0))):
+            # Stop waiting if the app is disconnected
+            if not app.isConnected(): return False
+            # Stop waiting if the deadline has passed
+            if time.monotonic() >= deadline:
+                print(f"The account values weren't received in {max_wait} seconds, the app is disconnected...")
+                app.logging.info(f"The account values weren't received in {max_wait} seconds, the app is disconnected...")
+                # Cancel the request and disconnect the app, it's connected again in the next period
+                app.reqAccountUpdates(False,app.account)
+                app.disconnect()
+                return False
         # Cancel the request
         app.reqAccountUpdates(False,app.account)
-        time.sleep(1)
+        # Save the account values received after the account download end
+        app.save_records('acc_update')
         print('Account values successfully updated ......')
         app.logging.info('Account values successfully requested...')
     else:
-        return
+        return False
     
     # Set the cash balance datetime
     capital_datetime = \
@@ -348,6 +440,8 @@ def update_capital(app):
     print('Capital value successfully updated ...')
     app.logging.info('Capital value successfully updated ...')
     
+    return True
+    
 def update_risk_management_orders(app):
     ''' Function to update the risk management orders IDs and their status'''
 
@@ -357,17 +451,17 @@ def update_risk_management_orders(app):
     # If the open orders dataframe is not empty
     if not app.open_orders.empty:
         # Set the last stop loss order
-        app.sl_order_id = int(app.open_orders[(app.open_orders["Symbol"]==app.contract.symbol) & (app.open_orders["OrderType"]=='STP')]["OrderId"].sort_values(ascending=True).values[-1])
+        app.sl_order_id = app.order_state.get_latest_order_id(app.contract.symbol, 'STP')
         # Set the last take profit order
-        app.tp_order_id = int(app.open_orders[(app.open_orders["Symbol"]==app.contract.symbol) & (app.open_orders["OrderType"]=='LMT')]["OrderId"].sort_values(ascending=True).values[-1])
+        app.tp_order_id = app.order_state.get_latest_order_id(app.contract.symbol, 'LMT')
         
         # Set a boolean to True if the previous stop loss is filled or canceled
-        app.sl_filled_or_canceled_bool = (app.open_orders[app.open_orders['OrderId'] == app.sl_order_id]['Status'].str.contains('canceled').sum()==1) or \
-                                           (app.open_orders[app.open_orders['OrderId'] == app.sl_order_id]['Status'].str.contains('Filled').sum()==1) 
+        sl_status = str(app.order_state.get(app.sl_order_id, 'open_status'))
+        app.sl_filled_or_canceled_bool = ('canceled' in sl_status) or ('Filled' in sl_status)
             
         # Set a boolean to True if the previous take profit is filled or canceled
-        app.tp_filled_or_canceled_bool = (app.open_orders[app.open_orders['OrderId'] == app.tp_order_id]['Status'].str.contains('canceled').sum()==1) or \
-                                           (app.open_orders[app.open_orders['OrderId'] == app.tp_order_id]['Status'].str.contains('Filled').sum()==1) 
+        tp_status = str(app.order_state.get(app.tp_order_id, 'open_status'))
+        app.tp_filled_or_canceled_bool = ('canceled' in tp_status) or ('Filled' in tp_status)
 
     else:
         # Set the last stop loss order to NaN
@@ -391,13 +485,13 @@ def update_remaining_position_based_on_risk_management(app, risk_management_thre
         # If the previous stop loss order is filled or canceled
         if app.sl_filled_or_canceled_bool == True:
             
-            # Set the remaining position value from the orders status dataframe
-            remaining = float(app.orders_status[app.orders_status['OrderId'] == app.sl_order_id]['Remaining'].values[-1])
+            # Set the remaining position value from the orders status index
+            remaining = float(app.order_state.get(app.sl_order_id, 'remaining'))
             # Set the position remaining datetime
-            remaining_datetime = app.orders_status[app.orders_status['OrderId'] == app.sl_order_id].index.values[-1]
+            remaining_datetime = app.order_state.get(app.sl_order_id, 'status_datetime')
             
             # Set the average traded price from the position
-            average_price = pd.to_numeric(app.exec_df[app.exec_df['OrderId'] == app.sl_order_id]['AvPrice'].values[-1])
+            average_price = pd.to_numeric(app.order_state.get(app.sl_order_id, 'av_price'))
             
             # Create a new row for the positions dataframe with the remaining datetime
             app.pos_df.loc[remaining_datetime,:] = app.pos_df[(app.pos_df['Symbol']==app.contract.symbol) & 
@@ -406,6 +500,8 @@ def update_remaining_position_based_on_risk_management(app, risk_management_thre
             app.pos_df.loc[remaining_datetime,'Position'] = remaining
             # Save the last average cost in the positions dataframe
             app.pos_df.loc[remaining_datetime,'Avg cost'] = average_price
+            # Save the last position value in the order state index
+            app.order_state.set_position(app.contract.symbol, app.contract.currency, remaining)
             
             # Update the leverage value in the cash balance dataframe
             app.cash_balance.loc[dt.datetime.now().replace(microsecond=0), 'leverage'] = app.leverage
@@ -419,13 +515,13 @@ def update_remaining_position_based_on_risk_management(app, risk_management_thre
         # If the previous take profit order is filled or canceled
         if app.tp_filled_or_canceled_bool == True:
             
-            # Set the remaining position value from the orders status dataframe
-            remaining = float(app.orders_status[app.orders_status['OrderId'] == app.tp_order_id]['Remaining'].values[-1])
+            # Set the remaining position value from the orders status index
+            remaining = float(app.order_state.get(app.tp_order_id, 'remaining'))
             # Set the position remaining datetime
-            remaining_datetime = app.orders_status[app.orders_status['OrderId'] == app.tp_order_id].index.values[-1]
+            remaining_datetime = app.order_state.get(app.tp_order_id, 'status_datetime')
             
             # Set the average traded price from the position
-            average_price = pd.to_numeric(app.exec_df[app.exec_df['OrderId'] == app.tp_order_id]['AvPrice'].values[-1])
+            average_price = pd.to_numeric(app.order_state.get(app.tp_order_id, 'av_price'))
             
             # Create a new row for the positions dataframe with the remaining datetime
             app.pos_df.loc[remaining_datetime,:] = app.pos_df[(app.pos_df['Symbol']==app.contract.symbol) & 
@@ -434,6 +530,8 @@ def update_remaining_position_based_on_risk_management(app, risk_management_thre
             app.pos_df.loc[remaining_datetime,'Position'] = remaining
             # Save the last average cost in the positions dataframe
             app.pos_df.loc[remaining_datetime,'Avg cost'] = average_price
+            # Save the last position value in the order state index
+            app.order_state.set_position(app.contract.symbol, app.contract.currency, remaining)
         
             # Update the leverage value in the cash balance dataframe
             app.cash_balance.loc[dt.datetime.now().replace(microsecond=0), 'leverage'] = app.leverage
@@ -552,8 +650,9 @@ def portfolio_allocation(app):
     
     # If the app is connected
     if app.isConnected():
-        # Update the capital value
-        update_capital(app)            
+        # Update the capital value, the app is disconnected if it couldn't be updated
+        if not update_capital(app):
+            return
         # Leveraged Equity
         app.capital *= app.leverage
     else:
@@ -562,8 +661,9 @@ def portfolio_allocation(app):
     print('Successfully Portfolio Allocation...')
     app.logging.info('Successfully Portfolio Allocation...')
                                                 
-def cancel_previous_stop_loss_order(app):
-    ''' Function to cancel the previous stop-loss order'''
+def cancel_previous_stop_loss_order(app, timeout=1):
+    ''' Function to cancel the previous stop-loss order
+        - It waits until the order is canceled or the cancellation fails, for up to "timeout" seconds'''
 
     # If there is a previous stop-loss order
     if isinstance(app.sl_order_id, int):
@@ -572,15 +672,18 @@ def cancel_previous_stop_loss_order(app):
             # If the app is connected
             if app.isConnected():
                 # Cancel the previous stop loss order
+                app.expect_order(app.sl_order_id, ('Cancelled', 'ApiCancelled'))
                 app.cancelOrder(app.sl_order_id, "")
-                time.sleep(1)
+                # Wait until the cancellation is acknowledged
+                app.wait_for_order(app.sl_order_id, timeout)
                 print('Canceled old stop-loss order to create a new one...')
                 app.logging.info('Canceled old stop-loss order to create a new one...')
             else:
                 return
 
-def cancel_previous_take_profit_order(app):
-    ''' Function to cancel the previous take profit order'''
+def cancel_previous_take_profit_order(app, timeout=1):
+    ''' Function to cancel the previous take profit order
+        - It waits until the order is canceled or the cancellation fails, for up to "timeout" seconds'''
 
     # If there is a previous take-profit order
     if isinstance(app.tp_order_id, int):
@@ -589,8 +692,10 @@ def cancel_previous_take_profit_order(app):
             # If the app is connected
             if app.isConnected():
                 # Cancel the previous take-profit order
+                app.expect_order(app.tp_order_id, ('Cancelled', 'ApiCancelled'))
                 app.cancelOrder(app.tp_order_id, "")
-                time.sleep(1)
+                # Wait until the cancellation is acknowledged
+                app.wait_for_order(app.tp_order_id, timeout)
                 print('Canceled old take-profit order to create a new one...')
                 app.logging.info('Canceled old take-profit order to create a new one...')
             else:
@@ -626,15 +731,16 @@ def cancel_risk_management_previous_orders(app):
     print('The previous risk management orders were canceled if needed...')
     app.logging.info('The previous risk management orders were canceled if needed...')
                
-def send_stop_loss_order(app, order_id, quantity): 
+def send_stop_loss_order(app, order_id, quantity, timeout=3): 
     ''' Function to send a stop loss order
         - The function has a while loop to incorporate the fact that sometimes
-          the order is not sent due to decimal errors'''
+          the order is not sent due to decimal errors
+        - Each order is checked once its status or error arrives, or after "timeout" seconds'''
     
     # If the previous position sign is different from the current signal
     if (app.previous_quantity!=0) and (np.sign(app.previous_quantity)==app.signal) and (app.open_orders.empty==False):
         # Set the previous stop-loss target price
-        order_price = app.open_orders[app.open_orders["OrderId"]==app.sl_order_id]["AuxPrice"].values[-1]
+        order_price = app.order_state.get(app.sl_order_id, 'aux_price')
         # Convert the quantity to an integer value
         quantity = int(abs(app.previous_quantity))
     # If they're equal
@@ -659,8 +765,10 @@ def send_stop_loss_order(app, order_id, quantity):
     # If the add value is less than or equal to 0.0001
     while add<=0.00010:
         # Send the stop-loss order
+        app.expect_order(order_id)
         app.placeOrder(order_id, app.contract, ibf.stopOrder(direction, quantity, order_price))
-        time.sleep(3)
+        # Wait until the order is acknowledged
+        app.wait_for_order(order_id, timeout)
         # Save the output errors in data as a boolean that corresponds to any error while sending the stop-loss order
         data = (321 in list(app.errors_dict.keys())) or \
                 (110 in list(app.errors_dict.keys())) or \
@@ -685,15 +793,16 @@ def send_stop_loss_order(app, order_id, quantity):
         if 504 in list(app.errors_dict.keys()):
             break
         
-def send_take_profit_order(app, order_id, quantity): 
+def send_take_profit_order(app, order_id, quantity, timeout=3): 
     ''' Function to send a take profit order
         - The function has a while loop to incorporate the fact that sometimes
-          the order is not sent due to decimal errors'''
+          the order is not sent due to decimal errors
+        - Each order is checked once its status or error arrives, or after "timeout" seconds'''
     
     # If the previous position sign is different from the current signal
     if (app.previous_quantity!=0) and (np.sign(app.previous_quantity)==app.signal) and (app.open_orders.empty==False):
         # Set the previous take-profit target price
-        order_price = app.open_orders[app.open_orders["OrderId"]==app.tp_order_id]["LmtPrice"].values[-1]
+        order_price = app.order_state.get(app.tp_order_id, 'lmt_price')
         # Convert the quantity to an integer value
         # quantity = int(abs(app.previous_quantity))
         quantity = int(abs(app.previous_quantity))
@@ -719,8 +828,10 @@ def send_take_profit_order(app, order_id, quantity):
     # If the add value is less than or equal to 0.0001
     while add<=0.00010:
         # Send the take-profit order
+        app.expect_order(order_id)
         app.placeOrder(order_id, app.contract, ibf.tpOrder(direction, quantity, order_price))
-        time.sleep(3)
+        # Wait until the order is acknowledged
+        app.wait_for_order(order_id, timeout)
         # Save the output errors in data as a boolean that corresponds to any error while sending the take-profit order
         data = (321 in list(app.errors_dict.keys())) or \
                 (110 in list(app.errors_dict.keys())) or \
@@ -745,8 +856,9 @@ def send_take_profit_order(app, order_id, quantity):
         if 504 in list(app.errors_dict.keys()):
             return
         
-def send_market_order(app, order_id, quantity):
-    ''' Function to send a market order '''
+def send_market_order(app, order_id, quantity, timeout=3):
+    ''' Function to send a market order
+        - It waits until the order status or error arrives, for up to "timeout" seconds'''
     
     print('Sending the market order...')
     app.logging.info('Sending the market order...')
@@ -764,8 +876,10 @@ def send_market_order(app, order_id, quantity):
         # If the app is connected
         if app.isConnected():
             # Place the market order
+            app.expect_order(order_id)
             app.placeOrder(order_id, app.contract, ibf.marketOrder(direction, int(abs(quantity))))                       
-            time.sleep(3)                                                
+            # Wait until the order is acknowledged
+            app.wait_for_order(order_id, timeout)
             print("Market order sent...")
             app.logging.info("Market order sent...")
         else:
@@ -783,8 +897,10 @@ def send_market_order(app, order_id, quantity):
         # If the app is connected
         if app.isConnected():
             # Send the market order to close the position
+            app.expect_order(order_id)
             app.placeOrder(order_id, app.contract, ibf.marketOrder(direction, int(abs(quantity))))
-            time.sleep(3)                                                
+            # Wait until the order is acknowledged
+            app.wait_for_order(order_id, timeout)
             print("Market order sent...")
             app.logging.info("Market order sent...")
         else:
@@ -796,8 +912,7 @@ def get_previous_quantity(app):
     # If the position dataframe is not empty
     if app.pos_df.empty==False:
         # Set the previous position quantity
-        app.previous_quantity = app.pos_df[(app.pos_df['Symbol']==app.contract.symbol) & \
-                                             (app.pos_df['Currency']==app.contract.currency)]["Position"].iloc[-1]
+        app.previous_quantity = app.order_state.get_position(app.contract.symbol, app.contract.currency)
     # If it's empty
     else:
         # Set the previous position quantity to zero
@@ -880,6 +995,21 @@ def update_cash_balance_values_for_signals(app):
     print('The cash balance signal and leverage were successfully updated...')
     app.logging.info('The cash balance signal and leverage were successfully updated...')
     
+def request_order_id(app, timeout=2):
+    ''' Function to request the next valid order ID
+        - It waits until the ID arrives, for up to "timeout" seconds, and returns it'''
+    
+    # Clear the threading event
+    app.order_id_event.clear()
+    # Request the next valid order ID
+    app.reqIds(-1)
+    # Wait until the ID arrives
+    if not app.order_id_event.wait(timeout):
+        print(f"The next valid order ID didn't arrive in {timeout} seconds, the last one will be used...")
+        app.logging.info(f"The next valid order ID didn't arrive in {timeout} seconds, the last one will be used...")
+        
+    return app.nextValidOrderId
+        
 def send_orders_as_bracket(app, order_id, quantity, mkt_order, sl_order, tp_order):
     ''' Function to send the orders as a bracket'''
     
@@ -913,11 +1043,8 @@ def send_orders(app):
     order_id = 0
     # If the app is connected
     if app.isConnected():
-        # Update the order id
-        app.reqIds(-1)
-        time.sleep(2)        
-        # Save the new order id in order_id
-        order_id = app.nextValidOrderId
+        # Update the order id and save it in order_id
+        order_id = request_order_id(app)
     else:
         return
     
@@ -1052,8 +1179,88 @@ def send_orders(app):
     # Update the trading information
     update_trading_info(app)  
                     
+def load_signal_inputs(app):
+    ''' Function to load the signal's model objects with the app's model cache
+        - The seconds of loading saved by the cache are logged '''
+    
+    # Save the cache counts before loading the model objects
+    hits, loads, saved_seconds = app.model_cache.hits, app.model_cache.loads, app.model_cache.saved_seconds
+    
+    # Load the model objects
+    signal_inputs = stra.prepare_signal(app.market_open_time, app.model_cache)
+    
+    print(f'Model objects: {app.model_cache.hits-hits} taken from the cache, {app.model_cache.loads-loads} loaded from their files, {app.model_cache.saved_seconds-saved_seconds:.3f} seconds of loading saved')
+    app.logging.info(f'Model objects: {app.model_cache.hits-hits} taken from the cache, {app.model_cache.loads-loads} loaded from their files, {app.model_cache.saved_seconds-saved_seconds:.3f} seconds of loading saved')
+    
+    return signal_inputs
+    
+def precompute_strategy_inputs(app, period):
+    ''' Function to prepare the strategy inputs of a period before its last bar closes
+        - The feature engine, the last base_df rows and the signal's model objects are loaded in memory
+        - Only the last bar's base_df rows and the signal prediction are left for the period itself
+        - If any input can't be prepared, the strategy loads all of them in the period as before'''
+    
+    print(f'Preparing the strategy inputs for the {period} period...')
+    app.logging.info(f'Preparing the strategy inputs for the {period} period...')
+    
+    # Drop the inputs of the previous periods
+    app.precomputed = {}
+    
+    # Set the base_df store
+    base_df_store = stf.columnar_store('data/'+os.path.splitext(app.base_df_address)[0])
+    
+    # If the base_df store or its feature engine doesn't exist, the strategy creates them in the period
+    if not (base_df_store.exists() and os.path.exists('data/models/feature_engine.pickle')):
+        return
+    
+    try:
+        # Load the feature engine saved in the previous period
+        with open('data/models/feature_engine.pickle', 'rb') as handle:
+            engine = pickle.load(handle)
+        # Import the last train_span rows of the base_df dataframe
+        base_df = base_df_store.read(last_rows=app.train_span)
+        # Load the signal's model objects
+        signal_inputs = load_signal_inputs(app)
+    except Exception as e:
+        print(f"The strategy inputs couldn't be prepared, they'll be loaded in the period: {e}")
+        app.logging.info(f"The strategy inputs couldn't be prepared, they'll be loaded in the period: {e}")
+        return
+    
+    # Save the inputs together with the period and the week they belong to
+    app.precomputed = {'period':period, 'market_open_time':app.market_open_time, 'feature_engine':engine, 
+                       'base_df':base_df, 'signal_inputs':signal_inputs}
+    
+    print('The strategy inputs were successfully prepared...')
+    app.logging.info('The strategy inputs were successfully prepared...')
+    
+def save_base_df_update(app):
+    ''' Function to save the base_df rows, the feature engine and the signal's updated objects of the period once the orders are sent'''
+    
+    # Save the objects updated by the signal for the next period, e.g. the HMM forward filter
+    for address, model in app.models_update.items():
+        with open(address, 'wb') as handle:
+            pickle.dump(model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    app.models_update = {}
+    
+    # Return if there's nothing else to save
+    if app.base_df_update is None:
+        return
+    
+    base_df_to_concat, engine = app.base_df_update
+    
+    # Append the new rows to the base_df store, the last bar of the previous period is updated with its final prediction feature
+    stf.columnar_store('data/'+os.path.splitext(app.base_df_address)[0]).append(base_df_to_concat)
+    
+    # Save the feature engine for the next period
+    with open('data/models/feature_engine.pickle', 'wb') as handle:
+        pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    app.base_df_update = None
+    
 def strategy(app): 
-    ''' Function to get the strategy run'''
+    ''' Function to get the strategy run
+        - If the strategy inputs were prepared for the current period, the base_df rows and the feature engine are saved once the orders are sent
+        - The objects updated by the signal are always saved once the orders are sent'''
     
     print('Running the strategy for the period...')
     app.logging.info('Running the strategy for the period...')            
@@ -1061,68 +1268,91 @@ def strategy(app):
     # Set a default dataframe
     base_df = pd.DataFrame()
     
-    # If the base_df file exists
-    if os.path.exists(app.base_df_address):
+    # Set the base_df store
+    base_df_store = stf.columnar_store('data/'+os.path.splitext(app.base_df_address)[0])
+    
+    # Get the strategy inputs prepared before the period started
+    precomputed = app.precomputed if (app.precomputed.get('period') == app.current_period) and (app.precomputed.get('market_open_time') == app.market_open_time) else {}
+    app.precomputed = {}
+    
+    # If the base_df store and its feature engine exist
+    if base_df_store.exists() and os.path.exists('data/models/feature_engine.pickle'):
+        
+        # Get the last index value of base_df
+        last_index = base_df_store.get_last_index()
+        
+        # Use the prepared base_df rows only if nothing was saved after they were read
+        if precomputed and (precomputed['base_df'].index[-1] != last_index):
+            precomputed = {}
         
-        # Import the base_df dataframe
-        base_df = pd.read_csv('data/'+app.base_df_address, index_col=0)
-        # Set the index to datetime type
-        base_df.index = pd.to_datetime(base_df.index)
-
         # If the last index value of base_df is the current period
-        if base_df.index[-1] < app.current_period:
+        if last_index < app.current_period:
             
             # Download historical data
             update_hist_data(app)
             
             # If the app is connected
             if app.isConnected():
-                # Get the train span for the new shorter base_df
-                if app.frequency_string == 'h':
-                    train_span = app.frequency_number*((app.current_period - base_df.index[-1]) + dt.timedelta(days=1)).days + 500
-                elif app.frequency_string == 'min':
-                    train_span = (60//app.frequency_number)*24*((app.current_period - base_df.index[-1]) + dt.timedelta(days=1)).days + 500
-
-                # Drop index duplicates from 
-                # Create the new shorter base_df
-                base_df_to_concat, _, _ = stra.prepare_base_df(app.historical_data, app.max_window, app.test_span, train_span, app.scalable_features)
-                
-                # Concat the shorter base_df with the whole one
-                base_df.loc[base_df_to_concat.index, base_df_to_concat.columns] = base_df_to_concat
-                # base_df = pd.concat([base_df.iloc[:-1],base_df_to_concat]) alpha
-                
-                # # Sort the base_df based on its index
-                # base_df.sort_index(inplace=True)
-                # # Drop duplicates
-                # base_df = base_df[~base_df.index.duplicated(keep='last')]
-                
-                # Save the base_df
-                base_df.iloc[-app.train_span:].to_csv('data/'+app.base_df_address)
-                # Save the base_df
-                base_df.to_csv('data/'+app.base_df_address)
+                # If the strategy inputs were prepared
+                if precomputed:
+                    # Create the base_df rows of the bars that arrived since the previous period
+                    base_df_to_concat = precomputed['feature_engine'].update(app.historical_data)
+                    # Update the prepared base_df rows in memory, the last bar of the previous period is updated with its final prediction feature
+                    base_df = precomputed['base_df']
+                    if not base_df_to_concat.empty:
+                        base_df = pd.concat([base_df[base_df.index < base_df_to_concat.index[0]], base_df_to_concat]).tail(app.train_span)
+                    # Save the new rows and the feature engine once the orders are sent
+                    app.base_df_update = (base_df_to_concat, precomputed['feature_engine'])
+                    
+                else:
+                    # Load the feature engine saved in the previous period
+                    with open('data/models/feature_engine.pickle', 'rb') as handle:
+                        engine = pickle.load(handle)
+                        
+                    # Create the base_df rows of the bars that arrived since the previous period
+                    base_df_to_concat = engine.update(app.historical_data)
+                    
+                    # Append the new rows to the base_df store, the last bar of the previous period is updated with its final prediction feature
+                    base_df_store.append(base_df_to_concat)
+                    
+                    # Save the feature engine for the next period
+                    with open('data/models/feature_engine.pickle', 'wb') as handle:
+                        pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
                 
             else:
                 return
+        
+        # Use the prepared base_df rows if they were updated in memory
+        if app.base_df_update is None:
+            # Import the last train_span rows of the base_df dataframe
+            base_df = base_df_store.read(last_rows=app.train_span)
                                             
     else:
         # Download historical data
         update_hist_data(app)
         
         if app.isConnected():
-            # Create the new base_df
-            base_df, _, _ = stra.prepare_base_df(app.historical_data, app.max_window, app.test_span, app.train_span)          
+            # Create the new base_df together with its feature engine, using the optimization features and transforms
+            base_df, _, _, engine = stra.create_feature_engine(app.historical_data, app.max_window, app.test_span, app.train_span, \
+                                                               app.scalable_features, app.transforms)
             # Sort the base_df based on its index
             base_df.index = pd.to_datetime(base_df.index)
             # Drop duplicates
             base_df = base_df[~base_df.index.duplicated(keep='last')]
             # Save the base_df
-            base_df.to_csv('data/'+app.base_df_address)
+            base_df_store.write(base_df)
+            # Save the feature engine for the next period
+            with open('data/models/feature_engine.pickle', 'wb') as handle:
+                pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
         else:
             return            
         
     # Get the signal value for the current period
     if app.isConnected():
-        app.signal = stra.get_signal(app.logging, app.market_open_time, base_df, app.final_input_features, app.purged_window_size, app.embargo_period)
+        # Load the signal's model objects if they weren't loaded before the period started
+        signal_inputs = precomputed['signal_inputs'] if precomputed else load_signal_inputs(app)
+        app.signal, app.models_update = stra.get_signal(app.logging, app.market_open_time, base_df, app.final_input_features, app.purged_window_size, app.embargo_period, 
+                                     signal_inputs)
     else:
         return
             
@@ -1179,12 +1409,15 @@ def save_data(app):
                  'app_time_spent':app.app_time_spent,\
                  'periods_traded':app.periods_traded}
          
-    # Save the dataframes in a single Excel workbook
-    tf.save_xlsx(dict_df = dictfiles, path = 'data/database.xlsx')
+    # Save the week's rows of the dataframes in the trading app database
+    app.journal.write(dictfiles, start = min(app.market_open_time, app.app_start_time))
 
     # Save the historical data
     app.historical_data.to_csv('data/'+app.historical_data_address)
     
+    # Save the base_df rows and the feature engine of the period if they were kept in memory
+    save_base_df_update(app)
+    
     print("All data saved...")
     app.logging.info("All data saved...")
 
@@ -1265,8 +1498,9 @@ def run_strategy_for_the_period(app):
     print("Let's wait for the next period to trade...")
     app.logging.info("Let's wait for the next period to trade...")
 
-def wait_for_next_period(app): 
-    """ Function to wait for the next period"""
+def wait_for_next_period(app, clock=None): 
+    """ Function to wait for the next period
+        - The clock sleeps until the next period, a new one is created if it's None"""
     
     print("Let's wait for the next period to trade...")
     app.logging.info("Let's wait for the next period to trade...")
@@ -1275,10 +1509,12 @@ def wait_for_next_period(app):
     stop(app)
                 
     # Wait until we arrive at the next trading period
-    time.sleep(0 if (app.next_period-dt.datetime.now()).total_seconds()<0 else (app.next_period-dt.datetime.now()).total_seconds())
+    clock = tf.setup_clock() if clock is None else clock
+    clock.sleep_until(app.next_period, 'next period')
 
-def update_and_close_positions(app):
-    """ Function to update and close the current position before the day closes"""
+def update_and_close_positions(app, clock=None):
+    """ Function to update and close the current position before the day closes
+        - The clock sleeps until the next period, a new one is created if it's None"""
 
     print('Update the trading info and closing the position...')
     app.logging.info('Update the trading info and closing the position...')
@@ -1298,9 +1534,7 @@ def update_and_close_positions(app):
     # If the app is connected
     if app.isConnected():
         # Update the order id
-        app.reqIds(-1)
-        time.sleep(2)        
-        order_id = app.nextValidOrderId
+        order_id = request_order_id(app)
     
     # If the app is connected
     if app.isConnected():
@@ -1340,7 +1574,8 @@ def update_and_close_positions(app):
     stop(app)
     
     # Wait until we arrive at the next trading period
-    time.sleep(0 if (app.next_period-dt.datetime.now()).total_seconds()<0 else (app.next_period-dt.datetime.now()).total_seconds())
+    clock = tf.setup_clock() if clock is None else clock
+    clock.sleep_until(app.next_period, 'next period')
 
 def send_email(app): 
     """ Function to send an email with relevant information of the trading current period"""
@@ -1349,18 +1584,18 @@ def send_email(app):
         
         try:
             # Get the market id 
-            mkt_order_id = int(app.open_orders[(app.open_orders["Symbol"]==app.contract.symbol) & (app.open_orders["OrderType"]=='MKT')]["OrderId"].sort_values(ascending=True).values[-1])
+            mkt_order_id = app.order_state.get_latest_order_id(app.contract.symbol, 'MKT')
             # Get the stop loss id 
-            sl_order_id = int(app.open_orders[(app.open_orders["Symbol"]==app.contract.symbol) & (app.open_orders["OrderType"]=='STP')]["OrderId"].sort_values(ascending=True).values[-1])
+            sl_order_id = app.order_state.get_latest_order_id(app.contract.symbol, 'STP')
             # Get the take profit id 
-            tp_order_id = int(app.open_orders[(app.open_orders["Symbol"]==app.contract.symbol) & (app.open_orders["OrderType"]=='LMT')]["OrderId"].sort_values(ascending=True).values[-1])
+            tp_order_id = app.order_state.get_latest_order_id(app.contract.symbol, 'LMT')
             
             # Get the market order price
-            market_order_price = float(app.orders_status[(app.orders_status['OrderId'] == mkt_order_id) & (app.orders_status['Status'] == 'Filled')]['AvgFillPrice'].sort_values(ascending=True).values[-1])
+            market_order_price = float(app.order_state.get(mkt_order_id, 'filled_price'))
             # Get the stop loss price
-            sl_order_price = float(app.open_orders[app.open_orders['OrderId'] == sl_order_id]['AuxPrice'].sort_values(ascending=True).values[-1])
+            sl_order_price = float(app.order_state.get(sl_order_id, 'aux_price'))
             # Get the take profit price
-            tp_order_price = float(app.open_orders[app.open_orders['OrderId'] == tp_order_id]['LmtPrice'].sort_values(ascending=True).values[-1])
+            tp_order_price = float(app.order_state.get(tp_order_id, 'lmt_price'))
                  
             # Import the email dataframe
             email_password = pd.read_excel('data/email_info.xlsx', index_col = 0)
@@ -1418,6 +1653,47 @@ def send_email(app):
      
 # Disconnect the app
 def stop(app):
+    # Keep the connection if the app is used for all the periods of the week
+    if app.persistent_connection:
+        print('Keeping the connection for the next period...')
+        app.logging.info('Keeping the connection for the next period...')
+        return
     print('Disconnecting...')
     app.disconnect()
 
+def connect_app(app, host, port, client_id, timeout=5):
+    ''' Function to connect the app to the IB server if it's not connected
+        - The app waits until the next valid order ID is received instead of a fixed time, with "timeout" seconds at most
+        - It returns True if the app had to be connected and False if the previous connection was kept '''
+    
+    # If the app is already connected, keep the connection
+    if app.isConnected():
+        return False
+    
+    # Close the previous connection if it was lost
+    app.disconnect()
+    # The live bars' subscription is lost together with the connection
+    if app.live_bar_feed is not None:
+        app.live_bar_feed.active = False
+    # The midpoint subscription is lost too
+    app.midpoint_subscribed = False
+    # Wait until the previous message loop finishes so it doesn't close the new connection
+    if app.run_thread is not None:
+        app.run_thread.join(timeout)
+    
+    # Connect the app to the IB server
+    print('Connecting the app to the IB server...')
+    app.logging.info('Connecting the app to the IB server...')
+    app.connection_event.clear()
+    app.connect(host=host, port=port, clientId=client_id)
+    
+    # Set the app thread as the main one
+    app.run_thread = Thread(target=app.run, daemon=True)
+    # Start the app
+    app.run_thread.start()
+    
+    # Wait until the app is successfully connected
+    app.connection_event.wait(timeout)
+    
+    return True
+
@@ -0,0 +1,530 @@
+# Import the necessary libraries
+import os
+import json
+import time
+import pickle
+import sqlite3
+import numpy as np
+import pandas as pd
+
+class columnar_store():
+    ''' Class to save a dataframe as append-only typed columns, one binary file per column
+        - The files are read with NumPy memmaps, so reading the last rows or some columns doesn't read the whole history
+        - The metadata file is written after the columns, so a period interrupted while appending leaves the previous rows untouched '''
+
+    def __init__(self, path):
+
+        # Set the store folder
+        self.path = path
+        # Set the metadata file address
+        self.metadata_address = os.path.join(path, 'metadata.json')
+        # Load the metadata if the store exists
+        self.metadata = self.load_metadata() if self.exists() else None
+
+    def exists(self):
+        ''' Function to check if the store exists '''
+        return os.path.exists(self.metadata_address)
+
+    def load_metadata(self):
+        ''' Function to load the columns, the data types and the number of rows of the store '''
+        with open(self.metadata_address, 'r') as handle:
+            return json.load(handle)
+
+    def save_metadata(self):
+        ''' Function to save the metadata replacing the previous file in one step '''
+        # Write a temporary file
+        with open(self.metadata_address+'.tmp', 'w') as handle:
+            json.dump(self.metadata, handle)
+        # Replace the metadata file
+        os.replace(self.metadata_address+'.tmp', self.metadata_address)
+
+    def get_file_address(self, position):
+        ''' Function to get the file address of a column position, the index position is -1 '''
+        return os.path.join(self.path, 'index.bin' if position==-1 else f'column_{position}.bin')
+
+    def get_columns_and_dtypes(self):
+        ''' Function to get the index and columns' positions together with their data types '''
+        return [(-1, np.dtype('int64'))] + [(position, np.dtype(dtype)) for position, dtype in enumerate(self.metadata['dtypes'])]
+
+    def get_arrays(self, df):
+        ''' Function to get the index and columns' arrays of a dataframe with the store data types '''
+        # Order the columns as the store columns
+        df = df.reindex(columns=self.metadata['columns'])
+        # Get the index as nanoseconds
+        arrays = [pd.DatetimeIndex(df.index).asi8]
+        # Get the columns with their data types
+        arrays += [df[column].to_numpy(dtype=dtype) for column, dtype in zip(self.metadata['columns'], self.metadata['dtypes'])]
+        return arrays
+
+    def write(self, df):
+        ''' Function to create the store with a dataframe, replacing the previous store '''
+
+        # Check the columns' data types
+        if (df.dtypes==object).any():
+            raise ValueError(f"The columns {df.columns[df.dtypes==object].tolist()} don't have a numeric or boolean data type")
+
+        # Create the store folder
+        os.makedirs(self.path, exist_ok=True)
+        # Set the metadata, the number of rows is saved after the columns are written
+        self.metadata = {'columns':df.columns.tolist(), 'dtypes':[str(dtype) for dtype in df.dtypes], 'length':0}
+
+        # Write each column
+        for (position, _), array in zip(self.get_columns_and_dtypes(), self.get_arrays(df)):
+            with open(self.get_file_address(position), 'wb') as handle:
+                handle.write(np.ascontiguousarray(array).tobytes())
+
+        # Save the number of rows
+        self.metadata['length'] = len(df)
+        self.save_metadata()
+
+    def get_memmap(self, position, dtype, start=0, stop=None, mode='r'):
+        ''' Function to map a row range of a column file '''
+        # Set the last row
+        stop = self.metadata['length'] if stop is None else stop
+        # Return an empty array if there are no rows
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.get_file_address(position), dtype=dtype, mode=mode, offset=start*dtype.itemsize, shape=(stop-start,))
+
+    def get_last_index(self):
+        ''' Function to get the last index value of the store '''
+        if self.metadata['length'] == 0:
+            return None
+        return pd.Timestamp(int(self.get_memmap(-1, np.dtype('int64'), self.metadata['length']-1)[0]))
+
+    def append(self, df):
+        ''' Function to append the rows of a dataframe
+            - Rows already in the store (e.g. the last bar with its final prediction feature) are overwritten in place
+            - It returns the number of new rows '''
+
+        # Return if there are no rows
+        if df.empty:
+            return 0
+
+        # Sort the rows and keep the last version of each one
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        # Get the rows' arrays
+        arrays = self.get_arrays(df)
+        # Get the number of rows in the store
+        length = self.metadata['length']
+
+        # Get the new rows
+        last_index = self.get_last_index()
+        is_new = np.ones(len(df), dtype=bool) if last_index is None else (arrays[0] > last_index.value)
+
+        # Overwrite the rows already in the store
+        if (~is_new).any():
+            # Find the rows' positions in the store index
+            stored_index = self.get_memmap(-1, np.dtype('int64'))
+            positions = np.searchsorted(stored_index, arrays[0][~is_new])
+            if (positions>=length).any() or (stored_index[np.minimum(positions, length-1)]!=arrays[0][~is_new]).any():
+                raise ValueError('Only the rows after the last stored row or the rows already stored can be appended')
+            # Overwrite the rows in place
+            for (position, dtype), array in zip(self.get_columns_and_dtypes()[1:], arrays[1:]):
+                column = self.get_memmap(position, dtype, positions.min(), positions.max()+1, mode='r+')
+                column[positions-positions.min()] = array[~is_new]
+                column.flush()
+                del column
+
+        # Append the new rows
+        if is_new.any():
+            for (position, dtype), array in zip(self.get_columns_and_dtypes(), arrays):
+                with open(self.get_file_address(position), 'r+b') as handle:
+                    # Drop any bytes written after the last saved row, in case an append was interrupted
+                    handle.truncate(length*dtype.itemsize)
+                    handle.seek(length*dtype.itemsize)
+                    handle.write(np.ascontiguousarray(array[is_new]).tobytes())
+
+            # Save the new number of rows
+            self.metadata['length'] = length + int(is_new.sum())
+            self.save_metadata()
+
+        return int(is_new.sum())
+
+    def read(self, last_rows=None, columns=None):
+        ''' Function to read the store as a dataframe, optionally only the last rows and some columns '''
+
+        # Set the first row to be read
+        length = self.metadata['length']
+        start = 0 if last_rows is None else max(0, length-last_rows)
+        # Set the columns to be read
+        columns = self.metadata['columns'] if columns is None else list(columns)
+        # Get the columns' positions
+        positions = {column:position for position, column in enumerate(self.metadata['columns'])}
+
+        # Read the index
+        index = pd.DatetimeIndex(np.array(self.get_memmap(-1, np.dtype('int64'), start)).view('datetime64[ns]'))
+        # Read the columns
+        data = {column:np.array(self.get_memmap(positions[column], np.dtype(self.metadata['dtypes'][positions[column]]), start)) for column in columns}
+
+        return pd.DataFrame(data, index=index, columns=columns)
+
+class minute_data_store():
+    ''' Class to save the historical minute data in weekly partitions, one file per download request
+        - Each partition is named after the Saturday datetime of its request, as in the saturdays_list output
+        - The covered ranges are saved in an index file, which is written after each partition
+        - Complete partitions are written once and never rewritten, the partition that ends after its download datetime can be replaced by a later update '''
+
+    def __init__(self, path):
+
+        # Set the store folder
+        self.path = path
+        # Set the index file address
+        self.index_address = os.path.join(path, 'partitions.json')
+        # Load the partitions' index if the store exists
+        self.partitions = self.load_index() if self.exists() else dict()
+
+    def exists(self):
+        ''' Function to check if the store exists '''
+        return os.path.exists(self.index_address)
+
+    def load_index(self):
+        ''' Function to load the partitions' index '''
+        with open(self.index_address, 'r') as handle:
+            return json.load(handle)
+
+    def save_index(self):
+        ''' Function to save the partitions' index replacing the previous file in one step '''
+        # Write a temporary file
+        with open(self.index_address+'.tmp', 'w') as handle:
+            json.dump(self.partitions, handle, indent=1)
+        # Replace the index file
+        os.replace(self.index_address+'.tmp', self.index_address)
+
+    def get_partition_address(self, name):
+        ''' Function to get the file address of a partition '''
+        return os.path.join(self.path, name.replace(':','').replace('-','_')+'.npz')
+
+    def get_ranges(self):
+        ''' Function to get the covered ranges of the partitions as a dataframe sorted by their start datetimes '''
+        # Create the ranges dataframe
+        ranges = pd.DataFrame.from_dict(self.partitions, orient='index', columns=['start','end','rows','complete'])
+        # Set the datetimes' data type
+        ranges['start'], ranges['end'] = pd.to_datetime(ranges['start']), pd.to_datetime(ranges['end'])
+        return ranges.sort_values('start')
+
+    def get_complete_names(self):
+        ''' Function to get the names of the complete partitions, which don't need to be downloaded again '''
+        return [name for name, partition in self.partitions.items() if partition['complete']]
+
+    def get_first_index(self):
+        ''' Function to get the first datetime of the store '''
+        return self.get_ranges()['start'].min() if len(self.partitions)>0 else None
+
+    def get_last_index(self):
+        ''' Function to get the last datetime of the store '''
+        return self.get_ranges()['end'].max() if len(self.partitions)>0 else None
+
+    def write_partition(self, name, df, complete=True):
+        ''' Function to write a partition once
+            - It returns False if a complete partition with the same name already exists '''
+
+        # Skip the complete partitions
+        if (name in self.partitions) and self.partitions[name]['complete']:
+            return False
+
+        # Create the store folder
+        os.makedirs(self.path, exist_ok=True)
+
+        # Save the empty complete partitions (e.g. weeks without data) only in the index, so they're not downloaded again
+        if df.empty:
+            if complete:
+                self.partitions[name] = {'start':None, 'end':None, 'rows':0, 'complete':True}
+                self.save_index()
+            return complete
+
+        # Sort the dataframe and drop the duplicated rows
+        df = df[~df.index.duplicated(keep='first')].sort_index()
+        # Save the partition index, values and columns
+        with open(self.get_partition_address(name), 'wb') as handle:
+            np.savez(handle, index=pd.DatetimeIndex(df.index).asi8, values=df.to_numpy(dtype=float), columns=np.array(df.columns.tolist()))
+
+        # Save the covered range of the partition
+        self.partitions[name] = {'start':str(df.index[0]), 'end':str(df.index[-1]), 'rows':len(df), 'complete':bool(complete)}
+        self.save_index()
+
+        return True
+
+    def import_dataframe(self, df, saturdays, now):
+        ''' Function to split a historical minute dataframe into the Saturday-based partitions, e.g. to import the CSV file of previous versions '''
+
+        # Sort the Saturday datetimes
+        saturday_datetimes = pd.to_datetime(sorted(saturdays), format='%Y%m%d-%H:%M:%S')
+        # Get the partition number of each row: the first Saturday datetime on or after each row
+        numbers = np.searchsorted(saturday_datetimes.values, pd.DatetimeIndex(df.index).values)
+
+        # Write each partition
+        for number in np.unique(numbers[numbers<len(saturday_datetimes)]):
+            name = saturday_datetimes[number].strftime('%Y%m%d-%H:%M:%S')
+            self.write_partition(name, df[numbers==number], complete=saturday_datetimes[number]<=now)
+
+    def read(self, start=None, end=None, columns=None):
+        ''' Function to read the rows between two datetimes, only the partitions overlapping the range are loaded '''
+
+        # Get the covered ranges of the non-empty partitions
+        ranges = self.get_ranges()
+        ranges = ranges[ranges['rows']>0]
+        # Keep the partitions overlapping the range
+        if start is not None:
+            ranges = ranges[ranges['end']>=pd.Timestamp(start)]
+        if end is not None:
+            ranges = ranges[ranges['start']<=pd.Timestamp(end)]
+
+        # Create a list to save the partitions' dataframes
+        dfs = list()
+        for name in ranges.index:
+            # Load the partition
+            with np.load(self.get_partition_address(name)) as partition:
+                df = pd.DataFrame(partition['values'], index=pd.DatetimeIndex(partition['index'].view('datetime64[ns]')), columns=partition['columns'].tolist())
+            # Select the columns
+            dfs.append(df if columns is None else df[columns])
+
+        # Return an empty dataframe if there are no partitions
+        if len(dfs)==0:
+            return pd.DataFrame(columns=columns)
+
+        # Concatenate the partitions, keeping the first row of each datetime
+        df = pd.concat(dfs).sort_index(kind='stable')
+        df = df[~df.index.duplicated(keep='first')]
+
+        # Subset the rows to the range
+        if start is not None:
+            df = df[df.index>=pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index<=pd.Timestamp(end)]
+
+        return df
+
+def get_minute_data_store(address):
+    ''' Function to get the historical minute data store of a CSV file address, the store folder is the address without its extension '''
+    return minute_data_store(os.path.splitext(address)[0])
+
+def read_minute_data(address, bars_number=None, data_frequency=None):
+    ''' Function to read the historical minute data from its store, or from the CSV file of previous versions
+        - If bars_number and data_frequency are provided, only the minute data of the last "bars_number" bars (with a margin for weekends and holidays) is read '''
+
+    # Get the minute data store
+    store = get_minute_data_store(address)
+
+    # If the store doesn't exist, import the CSV file
+    if not store.exists():
+        df = pd.read_csv(address, index_col=0)
+        df.index = pd.to_datetime(df.index)
+        return df
+
+    # Set the first datetime to be read
+    start = None
+    if (bars_number is not None) and (data_frequency is not None):
+        start = store.get_last_index() - 2*bars_number*pd.Timedelta(data_frequency) - pd.Timedelta(days=7)
+
+    return store.read(start=start)
+
+class trading_journal():
+    ''' Class to save the trading app dataframes in a SQLite database, one table per dataframe
+        - The index of each dataframe is saved in the "index" column
+        - The last key saved in each table is kept, so each period only replaces the rows of the last key and inserts the new ones
+        - The keys aren't unique (e.g. the orders sent in the same second), so the rows of the last key are replaced instead of each row
+        - The Excel workbook is only created on demand with export_xlsx '''
+
+    # Set the tables and the column used to select the rows of a period, the app_time_spent table is fully rewritten
+    tables = {'open_orders':'index', 'orders_status':'index', 'executions':'index', 'commissions':'index', \
+              'positions':'index', 'cash_balance':'index', 'app_time_spent':None, 'periods_traded':'trade_time'}
+    # Set the columns to be converted to datetime when they're read
+    datetime_columns = ['trade_time', 'market_open_time', 'market_close_time', 'Execution Time']
+
+    def __init__(self, path):
+
+        # Set the database file address
+        self.path = path
+        # Set the dictionary to save the last key saved in each table, it's read from the table the first time it's needed
+        self.last_keys = {}
+
+    def exists(self):
+        ''' Function to check if the database exists '''
+        return os.path.exists(self.path)
+
+    def connect(self):
+        ''' Function to open a connection to the database, each thread opens its own connection '''
+        return sqlite3.connect(self.path)
+
+    def get_table_columns(self, connection, name):
+        ''' Function to get the columns of a table '''
+        return [row[1] for row in connection.execute(f'PRAGMA table_info("{name}")')]
+
+    def create_table(self, connection, name, columns):
+        ''' Function to create a table, or add the new columns to it, together with the index of its period column
+            - The columns don't have a declared type so each value keeps its own type '''
+
+        # Create the table if it doesn't exist
+        connection.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ("index")')
+        # Get the current columns
+        table_columns = self.get_table_columns(connection, name)
+        # Add the new columns
+        for column in columns:
+            if column not in table_columns:
+                connection.execute(f'ALTER TABLE "{name}" ADD COLUMN "{column}"')
+        # Create the index of the period column
+        if self.tables[name] is not None:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}_{self.tables[name]}" ON "{name}" ("{self.tables[name]}")')
+
+    def to_sql_value(self, value):
+        ''' Function to convert a dataframe value into a SQLite value '''
+        # Save the missing values as NULL
+        if pd.api.types.is_scalar(value) and pd.isna(value):
+            return None
+        # Save the datetimes as sortable strings
+        if isinstance(value, (pd.Timestamp, np.datetime64)) or hasattr(value, 'isoformat'):
+            return pd.Timestamp(value).isoformat(sep=' ')
+        # Convert the NumPy values into Python values
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def get_last_key(self, connection, name):
+        ''' Function to get the last key saved in a table as a SQLite value, None if the table is empty '''
+        if name not in self.last_keys:
+            self.last_keys[name] = connection.execute(f'SELECT MAX("{self.tables[name]}") FROM "{name}"').fetchone()[0]
+        return self.last_keys[name]
+
+    def insert(self, connection, name, df):
+        ''' Function to insert the rows of a dataframe into its table '''
+
+        # Create the table or its new columns
+        self.create_table(connection, name, df.columns)
+        # Set the columns to be inserted
+        columns = ', '.join(f'"{column}"' for column in ['index']+list(df.columns))
+        # Convert the rows into SQLite values
+        rows = [[self.to_sql_value(value) for value in row] for row in df.reset_index().itertuples(index=False, name=None)]
+        # Insert the rows
+        connection.executemany(f'INSERT INTO "{name}" ({columns}) VALUES ({", ".join(["?"]*(len(df.columns)+1))})', rows)
+
+    def write(self, dict_df, start=None):
+        ''' Function to save a dictionary of dataframes in one transaction
+            - If start is provided, only the rows whose period column is equal or higher than the last key saved are replaced, or than start if the table is empty or its last key is older
+            - Otherwise, the tables are fully replaced '''
+
+        # Create a dictionary to save the new last keys once the transaction is done
+        last_keys = {}
+        connection = self.connect()
+        try:
+            with connection:
+                for name, df in dict_df.items():
+                    # Get the period column
+                    key = self.tables[name]
+                    # Create the table if it doesn't exist
+                    self.create_table(connection, name, df.columns)
+                    # Replace the whole table
+                    if (start is None) or (key is None):
+                        connection.execute(f'DELETE FROM "{name}"')
+                    # Replace only the rows from the last key saved
+                    else:
+                        last_key = self.get_last_key(connection, name)
+                        since = start if (last_key is None) or (pd.Timestamp(last_key) < start) else pd.Timestamp(last_key)
+                        connection.execute(f'DELETE FROM "{name}" WHERE "{key}" >= ?', (self.to_sql_value(since),))
+                        df = df[(df.index if key=='index' else df[key]) >= since]
+                    # Insert the rows
+                    self.insert(connection, name, df)
+                    # Save the new last key
+                    if key is not None:
+                        keys = df.index if key=='index' else df[key]
+                        last_keys[name] = self.to_sql_value(keys.max()) if len(keys)>0 else (None if start is None else self.last_keys.get(name))
+        finally:
+            connection.close()
+        # Keep the last keys saved
+        self.last_keys.update(last_keys)
+
+    def read(self, names=None):
+        ''' Function to read the tables as a dictionary of dataframes, in the order their rows were saved '''
+
+        dict_df = {}
+        connection = self.connect()
+        try:
+            for name in (list(self.tables) if names is None else names):
+                # Read the table
+                df = pd.read_sql_query(f'SELECT * FROM "{name}" ORDER BY rowid', connection)
+                # Convert the datetime columns
+                for column in df.columns.intersection(self.datetime_columns):
+                    df[column] = pd.to_datetime(df[column])
+                # Convert the columns with only missing values into NaN values
+                if len(df.index)>0:
+                    for column in df.columns[(df.dtypes==object) & df.isna().all()]:
+                        df[column] = df[column].astype(float)
+                # Set the index
+                df.set_index('index', inplace=True)
+                df.index.name = None
+                # Convert the datetime index
+                if self.tables[name]=='index':
+                    df.index = pd.to_datetime(df.index)
+                dict_df[name] = df.infer_objects()
+        finally:
+            connection.close()
+
+        return dict_df
+
+    def import_xlsx(self, path):
+        ''' Function to create the database with the sheets of the Excel workbook of previous versions '''
+        # Read the workbook sheets
+        dict_df = pd.read_excel(path, sheet_name=list(self.tables), index_col=0)
+        # Convert the datetime indexes
+        for name, key in self.tables.items():
+            if key=='index':
+                dict_df[name].index = pd.to_datetime(dict_df[name].index)
+        # Save the dataframes
+        self.write(dict_df)
+
+    def export_xlsx(self, path):
+        ''' Function to save the tables in an Excel workbook, with each table as a separate sheet '''
+        with pd.ExcelWriter(path) as writer:
+            for name, df in self.read().items():
+                df.to_excel(writer, sheet_name=name)
+
+class model_cache():
+    ''' Class to keep the pickled model objects in memory across the trading periods
+        - Each model is saved with its file modification time and size, so it's loaded again once a new file replaces it
+        - A "prepare" function can be applied once to each loaded model, its output is saved instead of the model
+        - The seconds used to load (and prepare) each model are saved, every cache hit saves those seconds
+        - Only the last "max_models" models loaded are kept '''
+
+    def __init__(self, max_models=4):
+
+        # Set the maximum number of models to keep
+        self.max_models = max_models
+        # Create the dictionary to save the models by file address
+        self.models = {}
+        # Set the number of cache hits, file loads and seconds of loading saved
+        self.hits = 0
+        self.loads = 0
+        self.saved_seconds = 0.0
+
+    def get_file_key(self, address):
+        ''' Function to get the modification time and size of a model file '''
+        stat = os.stat(address)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self, address, prepare=None):
+        ''' Function to get a model object, it's loaded from its file if it's not saved, if the file changed or if it was prepared with another function '''
+
+        # Get the file key
+        key = (self.get_file_key(address), prepare)
+
+        # Return the saved model if the file didn't change
+        if (address in self.models) and (self.models[address][0] == key):
+            self.hits += 1
+            self.saved_seconds += self.models[address][2]
+            return self.models[address][1]
+
+        # Load and prepare the model, and time it
+        start_time = time.perf_counter()
+        with open(address, 'rb') as handle:
+            model = pickle.load(handle)
+        if prepare is not None:
+            model = prepare(model)
+        self.loads += 1
+
+        # Save the model as the last one loaded, dropping the oldest ones
+        self.models.pop(address, None)
+        self.models[address] = (key, model, time.perf_counter() - start_time)
+        while len(self.models) > self.max_models:
+            self.models.pop(next(iter(self.models)))
+
+        return model
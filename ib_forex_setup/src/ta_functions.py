@@ -0,0 +1,888 @@
+# Import the necessary libraries
+import os
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Use numba to compile the PSAR and KAMA kernels if it's installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+###############################################################################
+# Array helpers
+###############################################################################
+def shift(values, periods, fill_value=np.nan):
+    """ Function to shift an array forward, filling the first observations with a value """
+
+    # Create the shifted array full of the fill value
+    shifted = np.full(len(values), fill_value, dtype=float)
+    # Shift the values
+    shifted[periods:] = values[:len(values)-periods]
+
+    return shifted
+
+def rolling_windows(values, window):
+    """ Function to get the rolling windows of an array, padding the first windows with NaN values """
+    return sliding_window_view(np.concatenate([np.full(window-1, np.nan), values]), window)
+
+def rolling_sum(values, window):
+    """ Function to compute the rolling sum of an array. Windows with NaN values return NaN """
+    return rolling_windows(values, window).sum(axis=1)
+
+def rolling_mean(values, window, min_periods=None):
+    """ Function to compute the rolling mean of an array
+        - If min_periods is given, the mean only uses the available observations of each window"""
+
+    # Get the rolling windows
+    windows = rolling_windows(values, window)
+
+    # If all the window observations are needed
+    if min_periods is None:
+        return windows.mean(axis=1)
+
+    # Count the available observations of each window
+    counts = (~np.isnan(windows)).sum(axis=1)
+
+    return np.where(counts >= max(min_periods,1), np.nansum(windows, axis=1)/np.maximum(counts,1), np.nan)
+
+def rolling_max(values, window, min_periods=None):
+    """ Function to compute the rolling maximum of an array
+        - If min_periods is given, the maximum only uses the available observations of each window"""
+
+    # If all the window observations are needed
+    if min_periods is None:
+        return rolling_windows(values, window).max(axis=1)
+
+    return np.fmax.reduce(rolling_windows(values, window), axis=1)
+
+def rolling_min(values, window, min_periods=None):
+    """ Function to compute the rolling minimum of an array
+        - If min_periods is given, the minimum only uses the available observations of each window"""
+
+    # If all the window observations are needed
+    if min_periods is None:
+        return rolling_windows(values, window).min(axis=1)
+
+    return np.fmin.reduce(rolling_windows(values, window), axis=1)
+
+def rolling_std(values, window, ddof=0):
+    """ Function to compute the rolling standard deviation of an array, the population one by default """
+
+    # Get the rolling windows
+    windows = rolling_windows(values, window)
+
+    # Set the standard deviation of constant windows to exactly zero
+    return np.where(windows.max(axis=1) == windows.min(axis=1), 0.0, windows.std(axis=1, ddof=ddof))
+
+###############################################################################
+# Recursions
+###############################################################################
+class indicator_states():
+    """ Class to save the states of the indicators' recursions, so they continue with the next bars instead of starting again
+        - Each recursion is saved by its key together with its last "keep" outputs, which are used by the rolling windows over the recursions
+        - The bars of each computation must start with bars already computed, at most "keep" of them, and end with the new bars """
+
+    def __init__(self, keep):
+
+        # Set the number of last outputs saved per recursion
+        self.keep = keep
+        # Create the dictionary to save each recursion's last outputs and state
+        self.states = {}
+        # Set the index of the last bars computed
+        self.index = None
+        # Set the number of bars of the current computation that were already computed
+        self.old_count = 0
+        # Set whether the current computation continues the saved recursions
+        self.resumed = False
+        # Create the set of the recursions run by the current computation
+        self.keys = set()
+
+    def start(self, index):
+        """ Function to set the bars of a new computation
+            - The recursions continue from their saved states if the first bars are the last bars computed, otherwise they start again """
+
+        # Count the bars already computed
+        old_count = 0 if self.index is None else int(index.searchsorted(self.index[-1], side='right'))
+        # Continue the recursions only if those bars are the last saved ones
+        self.resumed = (0 < old_count <= len(self.index)) and index[:old_count].equals(self.index[len(self.index)-old_count:])
+        self.old_count = old_count if self.resumed else 0
+        # Start the recursions again otherwise
+        if not self.resumed:
+            self.states = {}
+        self.keys = set()
+        # Save the index of the last bars
+        self.index = index[-self.keep:]
+
+    def run(self, key, kernel, values, *args):
+        """ Function to run a recursion through the new values, continuing it from its saved state
+            - kernel(values, state, *args) returns the outputs and the state after the last value, a None state starts the recursion
+            - It returns the outputs of all the values, the ones of the bars already computed are the saved outputs """
+
+        # Each recursion is run once per computation, a second run would continue the first one's state
+        if key in self.keys:
+            raise ValueError(f'The "{key}" recursion was already run with these bars')
+        self.keys.add(key)
+
+        # If the recursion continues from its saved state
+        if self.resumed and (key in self.states):
+            saved_outputs, state = self.states[key]
+            outputs = saved_outputs[len(saved_outputs)-self.old_count:]
+            # Run the recursion through the new values only
+            if self.old_count < len(values):
+                new_outputs, state = kernel(values[self.old_count:], state, *args)
+                outputs = np.concatenate([outputs, new_outputs])
+        # Run the recursion through all the values otherwise
+        else:
+            outputs, state = kernel(values, None, *args)
+
+        # Save the last outputs and the state
+        self.states[key] = (outputs[-self.keep:], state)
+
+        return outputs
+
+def run_recursion(states, key, kernel, values, *args):
+    """ Function to run a recursion kernel through an array, continuing it from its saved state if the indicator states are given """
+
+    # Start the recursion if there are no saved states
+    if states is None:
+        return kernel(values, None, *args)[0]
+
+    return states.run(key, kernel, values, *args)
+
+def ewm_mean_kernel(values, state, alpha, min_periods):
+    """ Function to run the exponentially-weighted mean recursion of pandas "adjust=False" through an array
+        - The state is the last mean, its weight and the number of observations. A None state starts the recursion
+        - The recursion is a linear filter once the first observation is found, so it's run with lfilter unless there are missing values after it """
+
+    # Set the weight of the previous mean
+    old_weight_factor = 1.0 - alpha
+    # Set the initial mean, weight and number of observations
+    weighted, old_weight, observations = (np.nan, 1.0, 0) if state is None else state
+
+    # Get the observations
+    is_observation = ~np.isnan(values)
+    # Get the first observation
+    first = int(np.argmax(is_observation)) if is_observation.any() else len(values)
+
+    # If there are no missing values after the first observation, nor before it once the recursion has started
+    if (old_weight == 1.0) and is_observation[first:].all() and ((first == 0) or (weighted != weighted)):
+        # Create the means array
+        means = np.full(len(values), np.nan)
+        if first < len(values):
+            # Set the first mean as the first observation and filter the rest of the observations
+            if weighted != weighted:
+                means[first] = values[first]
+                means[first+1:] = lfilter([alpha], [1.0, -old_weight_factor], values[first+1:], zi=[old_weight_factor*values[first]])[0]
+            # Filter the observations from the last mean
+            else:
+                means[first:] = lfilter([alpha], [1.0, -old_weight_factor], values[first:], zi=[old_weight_factor*weighted])[0]
+            weighted = means[-1]
+        # Set the means without enough observations as NaN values
+        means[:first+max(min_periods-observations,1)-1] = np.nan
+        return means, (weighted, 1.0, observations + len(values) - first)
+
+    # Create a list to save the means
+    means = list()
+
+    # Compute the mean recursively
+    for value in values.tolist():
+        # Check if the value is an observation
+        is_observation = value == value
+        observations += is_observation
+        # If there is a previous mean
+        if weighted == weighted:
+            # Decay the previous mean weight
+            old_weight *= old_weight_factor
+            # Update the mean with the new observation
+            if is_observation:
+                if weighted != value:
+                    weighted = (old_weight*weighted + alpha*value) / (old_weight + alpha)
+                old_weight = 1.0
+        # If this is the first observation
+        elif is_observation:
+            weighted = value
+        # Save the mean if there are enough observations
+        means.append(weighted if observations >= min_periods else np.nan)
+
+    return np.array(means, dtype=float), (weighted, old_weight, observations)
+
+def ewm_mean(values, com, min_periods, states=None, key=None):
+    """ Function to compute the exponentially-weighted mean of an array with the pandas "adjust=False" recursion
+        - If the indicator states are given, the recursion continues from the state saved with the key """
+    return run_recursion(states, key, ewm_mean_kernel, values, 1.0 / (1.0 + com), min_periods)
+
+def wilder_smoothing(values, first_value, window):
+    """ Function to continue Wilder's smoothing of an array from its first smoothed value
+        - Each smoothed value is (previous value * (window - 1) + value) / window, which is run with lfilter """
+    return lfilter([1.0 / window], [1.0, -(window - 1) / window], values, zi=[(window - 1) / window * first_value])[0]
+
+def ema(values, window, min_periods=None, states=None, key=None):
+    """ Function to compute the exponential moving average of an array """
+    return ewm_mean(values, (window - 1) / 2.0, window if min_periods is None else min_periods, states, key)
+
+def true_range(high, low, prev_close):
+    """ Function to compute the true range, skipping the missing previous close prices """
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+###############################################################################
+# Volatility indicators
+###############################################################################
+def average_true_range_kernel(tr, state, window):
+    """ Function to run Wilder's smoothing of the true range, the state is the last ATR value """
+
+    # Continue the smoothing from the last ATR value
+    if state is not None:
+        atr = wilder_smoothing(tr, state, window)
+        return atr, atr[-1]
+
+    # Create the ATR array
+    atr = np.zeros(len(tr))
+    # Set the first ATR value as the mean of the first true range values
+    atr[window-1] = np.mean(tr[:window])
+    # Smooth the true range
+    atr[window:] = wilder_smoothing(tr[window:], atr[window-1], window)
+
+    return atr, atr[-1]
+
+def average_true_range(high, low, close, window, states=None):
+    """ Function to compute the average true range with Wilder's smoothing """
+
+    # Get the true range
+    tr = true_range(high, low, shift(close, 1))
+
+    return run_recursion(states, f'volatility_atr_{window}', average_true_range_kernel, tr, window)
+
+def bollinger_bands(close, window, window_dev=2):
+    """ Function to compute the Bollinger bands """
+
+    # Compute the moving average and the bands
+    mavg = rolling_mean(close, window)
+    mstd = rolling_std(close, window)
+    hband = mavg + window_dev * mstd
+    lband = mavg - window_dev * mstd
+
+    return {'volatility_bbm': mavg,
+            'volatility_bbh': hband,
+            'volatility_bbl': lband,
+            'volatility_bbw': (hband - lband) / mavg * 100,
+            'volatility_bbp': (close - lband) / np.where(hband != lband, hband - lband, np.nan),
+            'volatility_bbhi': np.where(close > hband, 1.0, 0.0),
+            'volatility_bbli': np.where(close < lband, 1.0, 0.0)}
+
+def keltner_channel(high, low, close, window):
+    """ Function to compute the original Keltner channel """
+
+    # Compute the middle, high and low bands
+    mband = rolling_mean((high + low + close) / 3.0, window)
+    hband = rolling_mean((4 * high - 2 * low + close) / 3.0, window, min_periods=0)
+    lband = rolling_mean((-2 * high + 4 * low + close) / 3.0, window, min_periods=0)
+
+    return {'volatility_kcc': mband,
+            'volatility_kch': hband,
+            'volatility_kcl': lband,
+            'volatility_kcw': (hband - lband) / mband * 100,
+            'volatility_kcp': (close - lband) / (hband - lband),
+            'volatility_kchi': np.where(close > hband, 1.0, 0.0),
+            'volatility_kcli': np.where(close < lband, 1.0, 0.0)}
+
+def donchian_channel(high, low, close, window):
+    """ Function to compute the Donchian channel """
+
+    # Compute the high and low bands
+    hband = rolling_max(high, window)
+    lband = rolling_min(low, window)
+
+    return {'volatility_dcl': lband,
+            'volatility_dch': hband,
+            'volatility_dcm': (hband - lband) / 2.0 + lband,
+            'volatility_dcw': (hband - lband) / rolling_mean(close, window) * 100,
+            'volatility_dcp': (close - lband) / (hband - lband)}
+
+def ulcer_index(close, window):
+    """ Function to compute the ulcer index """
+
+    # Compute the percentage drawdowns from the rolling maximum
+    ui_max = rolling_max(close, window, min_periods=1)
+    drawdowns = 100 * (close - ui_max) / ui_max
+
+    return np.sqrt((rolling_windows(drawdowns, window) ** 2 / window).sum(axis=1))
+
+###############################################################################
+# Trend indicators
+###############################################################################
+def macd(close, window_slow=26, window_fast=12, window_sign=9, states=None):
+    """ Function to compute the MACD """
+
+    # Compute the MACD line and its signal
+    macd_line = ema(close, window_fast, states=states, key='trend_macd_fast') - ema(close, window_slow, states=states, key='trend_macd_slow')
+    macd_signal = ema(macd_line, window_sign, states=states, key='trend_macd_signal')
+
+    return {'trend_macd': macd_line,
+            'trend_macd_signal': macd_signal,
+            'trend_macd_diff': macd_line - macd_signal}
+
+def vortex_indicator(high, low, close, window):
+    """ Function to compute the vortex indicator """
+
+    # Compute the rolling true range
+    trn = rolling_sum(true_range(high, low, shift(close, 1, close.mean())), window)
+    # Compute the positive and negative vortex
+    vip = rolling_sum(np.abs(high - shift(low, 1)), window) / trn
+    vin = rolling_sum(np.abs(low - shift(high, 1)), window) / trn
+
+    return {'trend_vortex_ind_pos': vip,
+            'trend_vortex_ind_neg': vin,
+            'trend_vortex_ind_diff': vip - vin}
+
+def trix(close, window, states=None):
+    """ Function to compute the TRIX indicator """
+
+    # Compute the triple-smoothed EMA
+    ema1 = ema(close, window, states=states, key=f'trend_trix_1_{window}')
+    ema2 = ema(ema1, window, states=states, key=f'trend_trix_2_{window}')
+    ema3 = ema(ema2, window, states=states, key=f'trend_trix_3_{window}')
+    # Get its previous value
+    previous_ema3 = shift(ema3, 1, np.nanmean(ema3))
+
+    return (ema3 - previous_ema3) / previous_ema3 * 100
+
+def mass_index(high, low, window_fast=9, window_slow=25, states=None):
+    """ Function to compute the mass index """
+
+    # Compute the single and double EMA of the high-low amplitude
+    ema1 = ema(high - low, window_fast, states=states, key='trend_mass_index_1')
+    ema2 = ema(ema1, window_fast, states=states, key='trend_mass_index_2')
+
+    return rolling_sum(ema1 / ema2, window_slow)
+
+def dpo(close, window):
+    """ Function to compute the detrended price oscillator """
+    return shift(close, int(0.5 * window + 1), close.mean()) - rolling_mean(close, window)
+
+def kst(close, rocs=(10, 15, 20, 30), windows=(10, 10, 10, 15), nsig=9):
+    """ Function to compute the KST oscillator """
+
+    # Compute the smoothed rates of change
+    rocmas = list()
+    for roc, window in zip(rocs, windows):
+        previous_close = shift(close, roc, close.mean())
+        rocmas.append(rolling_mean((close - previous_close) / previous_close, window))
+
+    # Compute the KST line and its signal
+    kst_line = 100 * (rocmas[0] + 2 * rocmas[1] + 3 * rocmas[2] + 4 * rocmas[3])
+    kst_signal = rolling_mean(kst_line, nsig, min_periods=0)
+
+    return {'trend_kst': kst_line,
+            'trend_kst_sig': kst_signal,
+            'trend_kst_diff': kst_line - kst_signal}
+
+def ichimoku(high, low, window1=9, window2=26, window3=52):
+    """ Function to compute the Ichimoku lines, with and without the visual displacement """
+
+    # Compute the conversion and base lines
+    conversion = 0.5 * (rolling_max(high, window1) + rolling_min(low, window1))
+    base = 0.5 * (rolling_max(high, window2) + rolling_min(low, window2))
+    # Compute the leading spans
+    span_a = 0.5 * (conversion + base)
+    span_b = 0.5 * (rolling_max(high, window3, min_periods=0) + rolling_min(low, window3, min_periods=0))
+
+    return {'trend_ichimoku_conv': conversion,
+            'trend_ichimoku_base': base,
+            'trend_ichimoku_a': span_a,
+            'trend_ichimoku_b': span_b,
+            'trend_visual_ichimoku_a': shift(span_a, window2, np.nanmean(span_a)),
+            'trend_visual_ichimoku_b': shift(span_b, window2, np.nanmean(span_b))}
+
+def stc(close, window_slow=50, window_fast=23, cycle=10, smooth1=3, smooth2=3, states=None):
+    """ Function to compute the Schaff trend cycle """
+
+    # Compute the MACD line and its stochastic
+    macd_line = ema(close, window_fast, states=states, key='trend_stc_fast') - ema(close, window_slow, states=states, key='trend_stc_slow')
+    macd_min = rolling_min(macd_line, cycle)
+    stoch_k = 100 * (macd_line - macd_min) / (rolling_max(macd_line, cycle) - macd_min)
+    # Compute the stochastic of the smoothed stochastic
+    stoch_d = ema(stoch_k, smooth1, states=states, key='trend_stc_d')
+    stoch_d_min = rolling_min(stoch_d, cycle)
+    stoch_kd = 100 * (stoch_d - stoch_d_min) / (rolling_max(stoch_d, cycle) - stoch_d_min)
+
+    return ema(stoch_kd, smooth2, states=states, key='trend_stc')
+
+def adx_kernel(values, state, window):
+    """ Function to run the ADX smoothings through the ranges and the positive and negative directional movements
+        - It returns the ADX and the positive and negative directional indicators as columns
+        - The state is the last smoothed sums and the last ADX value """
+
+    # Set the smoothed sums' decay factor
+    decay = 1.0 - 1.0 / window
+
+    def directional_indicators(trs, dip, din):
+        """ Function to compute the directional indicators and the directional index from the smoothed sums """
+        dip_ratio = np.where(trs != 0, 100 * (dip / np.where(trs != 0, trs, 1.0)), 0.0)
+        din_ratio = np.where(trs != 0, 100 * (din / np.where(trs != 0, trs, 1.0)), 0.0)
+        dis_sum = dip_ratio + din_ratio
+        directional_index = np.where(dis_sum != 0, 100 * np.abs((dip_ratio - din_ratio) / np.where(dis_sum != 0, dis_sum, 1.0)), 0.0)
+        return dip_ratio, din_ratio, directional_index
+
+    # Continue the smoothings from their last values
+    if state is not None:
+        trs, dip, din = [lfilter([1.0], [1.0, -decay], values[:, i], zi=[decay * state[i]])[0] for i in range(3)]
+        dip_ratio, din_ratio, directional_index = directional_indicators(trs, dip, din)
+        adx_values = wilder_smoothing(directional_index, state[3], window)
+        return np.column_stack([adx_values, dip_ratio, din_ratio]), (trs[-1], dip[-1], din[-1], adx_values[-1])
+
+    # Set the number of observations
+    n = len(values)
+
+    def wilder_sum(values):
+        """ Function to smooth the directional movement sums, the last smoothed value is left as zero as the "ta" library does """
+        smoothed = np.zeros(n - (window - 1))
+        smoothed[0] = values[~np.isnan(values)][:window].sum()
+        smoothed[1:-1] = lfilter([1.0], [1.0, -decay], values[window+1:n], zi=[decay * smoothed[0]])[0]
+        return smoothed
+
+    # Smooth the ranges and the directional movements
+    trs, dip, din = wilder_sum(values[:, 0]), wilder_sum(values[:, 1]), wilder_sum(values[:, 2])
+
+    # Compute the directional indicators and the directional index
+    dip_ratio, din_ratio, directional_index = directional_indicators(trs, dip, din)
+
+    # Smooth the directional index
+    adx_values = np.zeros(len(trs))
+    adx_values[window] = np.mean(directional_index[:window])
+    adx_values[window+1:] = wilder_smoothing(directional_index[window:len(trs)-1], adx_values[window], window)
+    adx_values = np.concatenate([np.zeros(window - 1), adx_values])
+
+    # Place the directional indicators in the original positions
+    adx_pos, adx_neg = np.zeros(n), np.zeros(n)
+    positions = np.arange(1, len(trs) - 1)
+    adx_pos[positions + window] = dip_ratio[positions]
+    adx_neg[positions + window] = din_ratio[positions]
+
+    # Save the last smoothed sums, the last one of each array is the zero left by the "ta" library
+    return np.column_stack([adx_values, adx_pos, adx_neg]), (trs[-2], dip[-2], din[-2], adx_values[-1])
+
+def adx(high, low, close, window, states=None):
+    """ Function to compute the average directional movement index and the directional indicators """
+
+    # Get the previous close prices
+    close_shift = shift(close, 1)
+
+    # Compute the directional movement ranges
+    ranges = np.maximum(high, close_shift) - np.minimum(low, close_shift)
+    # Compute the positive and negative directional movements
+    diff_up = high - shift(high, 1)
+    diff_down = shift(low, 1) - low
+    pos = np.abs(((diff_up > diff_down) & (diff_up > 0)) * diff_up)
+    neg = np.abs(((diff_down > diff_up) & (diff_down > 0)) * diff_down)
+
+    # Smooth them
+    adx_values = run_recursion(states, f'trend_adx_{window}', adx_kernel, np.column_stack([ranges, pos, neg]), window)
+
+    return {'trend_adx': adx_values[:, 0],
+            'trend_adx_pos': adx_values[:, 1],
+            'trend_adx_neg': adx_values[:, 2]}
+
+def cci(high, low, close, window, constant=0.015):
+    """ Function to compute the commodity channel index """
+
+    # Get the typical price rolling windows
+    windows = rolling_windows((high + low + close) / 3.0, window)
+    # Compute the typical price moving average
+    mavg = windows.mean(axis=1)
+    # Compute the mean absolute deviation
+    mad = np.abs(windows - mavg[:, None]).mean(axis=1)
+
+    return (windows[:, -1] - mavg) / (constant * mad)
+
+def aroon(high, low, window):
+    """ Function to compute the Aroon indicator """
+
+    # Get the rolling windows, including the current observation
+    high_windows = rolling_windows(high, window + 1)
+    low_windows = rolling_windows(low, window + 1)
+    # Set the incomplete windows
+    incomplete = np.isnan(high_windows).any(axis=1) | np.isnan(low_windows).any(axis=1)
+
+    # Compute the Aroon up and down lines
+    aroon_up = np.where(incomplete, np.nan, np.argmax(np.nan_to_num(high_windows, nan=-np.inf), axis=1) / window * 100)
+    aroon_down = np.where(incomplete, np.nan, np.argmin(np.nan_to_num(low_windows, nan=np.inf), axis=1) / window * 100)
+
+    return {'trend_aroon_up': aroon_up,
+            'trend_aroon_down': aroon_down,
+            'trend_aroon_ind': aroon_up - aroon_down}
+
+def psar_kernel(highs, lows, psar_values, step, max_step, up_trend, acceleration_factor, up_trend_high, down_trend_low):
+    """ Function to run the parabolic stop and reverse recursion through the high and low prices, from the third price on
+        - psar_values has the initial PSAR values, the close prices, and its second value is used as the previous PSAR value
+        - It returns the PSAR values of the upward and downward trends, NaN values where the other trend is set, and the final state """
+
+    # Create the PSAR arrays
+    psar_values = np.copy(psar_values)
+    psar_up = np.full(len(psar_values), np.nan)
+    psar_down = np.full(len(psar_values), np.nan)
+
+    for i in range(2, len(psar_values)):
+        reversal = False
+        max_high = highs[i]
+        min_low = lows[i]
+        # If the trend is upward
+        if up_trend:
+            psar_values[i] = psar_values[i-1] + acceleration_factor * (up_trend_high - psar_values[i-1])
+            if min_low < psar_values[i]:
+                reversal = True
+                psar_values[i] = up_trend_high
+                down_trend_low = min_low
+                acceleration_factor = step
+            else:
+                if max_high > up_trend_high:
+                    up_trend_high = max_high
+                    acceleration_factor = min(acceleration_factor + step, max_step)
+                if lows[i-2] < psar_values[i]:
+                    psar_values[i] = lows[i-2]
+                elif lows[i-1] < psar_values[i]:
+                    psar_values[i] = lows[i-1]
+        # If the trend is downward
+        else:
+            psar_values[i] = psar_values[i-1] - acceleration_factor * (psar_values[i-1] - down_trend_low)
+            if max_high > psar_values[i]:
+                reversal = True
+                psar_values[i] = down_trend_low
+                up_trend_high = max_high
+                acceleration_factor = step
+            else:
+                if min_low < down_trend_low:
+                    down_trend_low = min_low
+                    acceleration_factor = min(acceleration_factor + step, max_step)
+                if highs[i-2] > psar_values[i]:
+                    psar_values[i] = highs[i-2]
+                elif highs[i-1] > psar_values[i]:
+                    psar_values[i] = highs[i-1]
+
+        # Update the trend
+        up_trend = up_trend != reversal
+        if up_trend:
+            psar_up[i] = psar_values[i]
+        else:
+            psar_down[i] = psar_values[i]
+
+    return psar_up, psar_down, up_trend, acceleration_factor, up_trend_high, down_trend_low, psar_values[-1]
+
+def kama_kernel(closes, smoothing_constants, previous_kama, first_value):
+    """ Function to run Kaufman's adaptive moving average recursion through the close prices
+        - The average starts at the first close price with a smoothing constant if first_value is True, otherwise it continues from previous_kama """
+
+    # Create the KAMA array
+    kama_values = np.full(len(closes), np.nan)
+
+    for i in range(len(closes)):
+        # If there's no smoothing constant yet
+        if smoothing_constants[i] != smoothing_constants[i]:
+            previous_kama = np.nan
+            continue
+        elif first_value:
+            kama_values[i] = closes[i]
+            first_value = False
+        else:
+            kama_values[i] = previous_kama + smoothing_constants[i] * (closes[i] - previous_kama)
+        previous_kama = kama_values[i]
+
+    return kama_values, previous_kama, first_value
+
+# Compile the PSAR and KAMA kernels if numba is installed, releasing the GIL so the window sizes' threads run them in parallel
+if njit is not None:
+    psar_kernel_numba = njit(cache=True, nogil=True)(psar_kernel)
+    kama_kernel_numba = njit(cache=True, nogil=True)(kama_kernel)
+else:
+    psar_kernel_numba = kama_kernel_numba = None
+
+def psar_recursion(values, state, step, max_step, use_numba):
+    """ Function to run the PSAR kernel through the high, low and close price columns
+        - The state is the final trend state, the last PSAR value and the last two high and low prices. A None state starts the recursion """
+
+    # Start the trend upward from the first prices
+    if state is None:
+        highs, lows, psar_values = [np.ascontiguousarray(values[:, i]) for i in range(3)]
+        trend_state = (True, step, highs[0], lows[0])
+    # Continue the trend, with the last two prices before the new ones
+    else:
+        trend_state, last_psar, last_highs, last_lows = state[:4], state[4], state[5], state[6]
+        highs = np.concatenate([last_highs, values[:, 0]])
+        lows = np.concatenate([last_lows, values[:, 1]])
+        psar_values = np.concatenate([[np.nan, last_psar], values[:, 2]])
+
+    # Run the compiled kernel
+    if use_numba and (psar_kernel_numba is not None):
+        psar_up, psar_down, *trend_state, last_psar = psar_kernel_numba(highs, lows, psar_values, float(step), float(max_step), bool(trend_state[0]), *[float(x) for x in trend_state[1:]])
+    # Run the pure-Python kernel on lists, which are faster to index than arrays
+    else:
+        psar_up, psar_down, *trend_state, last_psar = psar_kernel(highs.tolist(), lows.tolist(), psar_values.tolist(), step, max_step, *trend_state)
+
+    # Drop the previous prices' outputs
+    outputs = np.column_stack([psar_up, psar_down])
+    if state is not None:
+        outputs = outputs[2:]
+
+    return outputs, (*trend_state, last_psar, highs[-2:], lows[-2:])
+
+def psar(high, low, close, step=0.02, max_step=0.20, use_numba=True, states=None):
+    """ Function to compute the parabolic stop and reverse indicator
+        - The kernel is compiled with numba if it's installed and use_numba is True, otherwise it runs on plain lists """
+
+    # Run the PSAR recursion
+    psar_values = run_recursion(states, 'trend_psar', psar_recursion, np.column_stack([high, low, close]), step, max_step, use_numba)
+    psar_up, psar_down = psar_values[:, 0], psar_values[:, 1]
+
+    # Signal the first observation of each trend
+    psar_up_indicator = ~np.isnan(psar_up) & np.isnan(shift(psar_up, 1)) & (psar_up != 0)
+    psar_down_indicator = ~np.isnan(psar_down) & np.isnan(shift(psar_down, 1))
+
+    return {'trend_psar_up': psar_up,
+            'trend_psar_down': psar_down,
+            'trend_psar_up_indicator': psar_up_indicator.astype(float),
+            'trend_psar_down_indicator': psar_down_indicator.astype(float)}
+
+###############################################################################
+# Momentum indicators
+###############################################################################
+def rsi(close, window, states=None, key='momentum_rsi'):
+    """ Function to compute the relative strength index """
+
+    # Compute the upward and downward price changes
+    diff = close - shift(close, 1)
+    up_direction = np.where(diff > 0, diff, 0.0)
+    down_direction = -np.where(diff < 0, diff, 0.0)
+
+    # Smooth the price changes
+    alpha = 1 / window
+    emaup = ewm_mean(up_direction, (1 - alpha) / alpha, window, states, f'{key}_up_{window}')
+    emadn = ewm_mean(down_direction, (1 - alpha) / alpha, window, states, f'{key}_down_{window}')
+
+    return np.where(emadn == 0, 100, 100 - 100 / (1 + emaup / emadn))
+
+def stoch_rsi(close, window, smooth1=3, smooth2=3, states=None):
+    """ Function to compute the stochastic RSI """
+
+    # Compute the RSI and its stochastic
+    rsi_values = rsi(close, window, states, 'momentum_stoch_rsi')
+    lowest_low_rsi = rolling_min(rsi_values, window)
+    stochrsi = (rsi_values - lowest_low_rsi) / (rolling_max(rsi_values, window) - lowest_low_rsi)
+    # Smooth the stochastic RSI
+    stochrsi_k = rolling_mean(stochrsi, smooth1)
+
+    return {'momentum_stoch_rsi': stochrsi,
+            'momentum_stoch_rsi_k': stochrsi_k,
+            'momentum_stoch_rsi_d': rolling_mean(stochrsi_k, smooth2)}
+
+def tsi(close, window_slow=25, window_fast=13, states=None):
+    """ Function to compute the true strength index """
+
+    # Compute the price changes
+    diff_close = close - shift(close, 1)
+    # Double-smooth the price changes and their absolute values
+    smoothed = ema(ema(diff_close, window_slow, states=states, key='momentum_tsi_slow'), window_fast, states=states, key='momentum_tsi_fast')
+    smoothed_abs = ema(ema(np.abs(diff_close), window_slow, states=states, key='momentum_tsi_abs_slow'), window_fast, states=states, key='momentum_tsi_abs_fast')
+
+    return smoothed / smoothed_abs * 100
+
+def ultimate_oscillator(high, low, close, windows=(7, 14, 28), weights=(4.0, 2.0, 1.0)):
+    """ Function to compute the ultimate oscillator """
+
+    # Compute the buying pressure and the true range
+    close_shift = shift(close, 1)
+    tr = true_range(high, low, close_shift)
+    buying_pressure = close - np.minimum(low, close_shift)
+
+    # Compute the buying pressure averages
+    averages = [rolling_sum(buying_pressure, window) / rolling_sum(tr, window) for window in windows]
+
+    return 100.0 * (weights[0] * averages[0] + weights[1] * averages[1] + weights[2] * averages[2]) / sum(weights)
+
+def stochastic_oscillator(high, low, close, window, smooth_window=3):
+    """ Function to compute the stochastic oscillator """
+
+    # Compute the stochastic oscillator
+    smin = rolling_min(low, window)
+    stoch_k = 100 * (close - smin) / (rolling_max(high, window) - smin)
+
+    return {'momentum_stoch': stoch_k,
+            'momentum_stoch_signal': rolling_mean(stoch_k, smooth_window)}
+
+def williams_r(high, low, close, lbp):
+    """ Function to compute the Williams %R """
+
+    # Compute the highest high and the lowest low
+    highest_high = rolling_max(high, lbp)
+    lowest_low = rolling_min(low, lbp)
+
+    return -100 * (highest_high - close) / (highest_high - lowest_low)
+
+def awesome_oscillator(high, low, window1=5, window2=34):
+    """ Function to compute the awesome oscillator """
+
+    # Compute the median price
+    median_price = 0.5 * (high + low)
+
+    return rolling_mean(median_price, window1) - rolling_mean(median_price, window2)
+
+def roc(close, window):
+    """ Function to compute the rate of change """
+
+    # Get the previous close prices
+    previous_close = shift(close, window)
+
+    return (close - previous_close) / previous_close * 100
+
+def kama_recursion(values, state, use_numba):
+    """ Function to run the KAMA kernel through the close price and smoothing constant columns
+        - The state is the last KAMA value and whether the first value is still to be set. A None state starts the recursion """
+
+    # Set the initial state
+    previous_kama, first_value = (np.nan, True) if state is None else state
+
+    # Run the compiled kernel
+    if use_numba and (kama_kernel_numba is not None):
+        kama_values, previous_kama, first_value = kama_kernel_numba(np.ascontiguousarray(values[:, 0]), np.ascontiguousarray(values[:, 1]), float(previous_kama), bool(first_value))
+    # Run the pure-Python kernel on lists
+    else:
+        kama_values, previous_kama, first_value = kama_kernel(values[:, 0].tolist(), values[:, 1].tolist(), previous_kama, first_value)
+
+    return kama_values, (previous_kama, first_value)
+
+def kama(close, window, pow1=2, pow2=30, use_numba=True, states=None):
+    """ Function to compute Kaufman's adaptive moving average
+        - The kernel is compiled with numba if it's installed and use_numba is True, otherwise it runs on plain lists """
+
+    # Compute the efficiency ratio
+    er_num = np.abs(close - np.roll(close, window))
+    er_den = rolling_sum(np.abs(close - np.roll(close, 1)), window)
+    efficiency_ratio = np.divide(er_num, er_den, out=np.zeros_like(er_num), where=er_den != 0)
+    # Compute the smoothing constant
+    smoothing_constant = (efficiency_ratio * (2.0 / (pow1 + 1) - 2.0 / (pow2 + 1.0)) + 2 / (pow2 + 1.0)) ** 2.0
+
+    return run_recursion(states, f'momentum_kama_{window}', kama_recursion, np.column_stack([close, smoothing_constant]), use_numba)
+
+def ppo(close, window_slow=26, window_fast=12, window_sign=9, states=None):
+    """ Function to compute the percentage price oscillator """
+
+    # Compute the PPO line and its signal
+    ema_slow = ema(close, window_slow, states=states, key='momentum_ppo_slow')
+    ppo_line = (ema(close, window_fast, states=states, key='momentum_ppo_fast') - ema_slow) / ema_slow * 100
+    ppo_signal = ema(ppo_line, window_sign, states=states, key='momentum_ppo_signal')
+
+    return {'momentum_ppo': ppo_line,
+            'momentum_ppo_signal': ppo_signal,
+            'momentum_ppo_hist': ppo_line - ppo_signal}
+
+###############################################################################
+# Indicator layer
+###############################################################################
+def get_indicators_lookback(windows):
+    """ Function to get the number of previous bars the rolling windows of the technical indicators use
+        - The visual Ichimoku span B uses the longest fixed lookback: a 52-bar window displaced 26 bars
+        - The ulcer index and the stochastic RSI use the longest window-based lookbacks: two chained windows """
+    return max([52 + 26] + [2 * window + 6 for window in windows])
+
+def get_window_indicators(high, low, close, window, states=None):
+    """ Function to compute the technical indicators whose lookback is the window size
+        - If the indicator states are given, the recursions continue from their saved states """
+
+    # Create a dictionary to save the technical indicators
+    indicators = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Volatility indicators
+        indicators.update(bollinger_bands(close, window))
+        indicators.update(keltner_channel(high, low, close, window))
+        indicators.update(donchian_channel(high, low, close, window))
+        indicators['volatility_atr'] = average_true_range(high, low, close, window, states)
+        indicators['volatility_ui'] = ulcer_index(close, window)
+
+        # Trend indicators
+        indicators['trend_sma'] = rolling_mean(close, window)
+        indicators['trend_ema'] = ema(close, window, states=states, key=f'trend_ema_{window}')
+        indicators.update(vortex_indicator(high, low, close, window))
+        indicators['trend_trix'] = trix(close, window, states)
+        indicators['trend_dpo'] = dpo(close, window)
+        indicators.update(adx(high, low, close, window, states))
+        indicators['trend_cci'] = cci(high, low, close, window)
+        indicators.update(aroon(high, low, window))
+
+        # Momentum indicators
+        indicators['momentum_rsi'] = rsi(close, window, states)
+        indicators.update(stoch_rsi(close, window, states=states))
+        indicators.update(stochastic_oscillator(high, low, close, window))
+        indicators['momentum_wr'] = williams_r(high, low, close, window)
+        indicators['momentum_roc'] = roc(close, window)
+        indicators['momentum_kama'] = kama(close, window, states=states)
+
+    # Modify the indicators names to distinguish them from other features with different window sizes
+    return {f'{name}_{window}': values for name, values in indicators.items()}
+
+def get_fixed_indicators(high, low, close, cumulative_return_base=None, states=None):
+    """ Function to compute the technical indicators which don't depend on the window size
+        - The cumulative return is computed from cumulative_return_base, or from the first close price if it's None
+        - If the indicator states are given, the recursions continue from their saved states """
+
+    # Set the close price the cumulative return starts from
+    if cumulative_return_base is None:
+        cumulative_return_base = close[0]
+
+    # Create a dictionary to save the technical indicators
+    indicators = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Trend indicators
+        indicators.update(macd(close, states=states))
+        indicators['trend_mass_index'] = mass_index(high, low, states=states)
+        indicators.update(kst(close))
+        indicators.update(ichimoku(high, low))
+        indicators['trend_stc'] = stc(close, states=states)
+        indicators.update(psar(high, low, close, states=states))
+
+        # Momentum indicators
+        indicators['momentum_tsi'] = tsi(close, states=states)
+        indicators['momentum_uo'] = ultimate_oscillator(high, low, close)
+        indicators['momentum_ao'] = awesome_oscillator(high, low)
+        indicators.update(ppo(close, states=states))
+
+        # Daily return, daily log return and cumulative return
+        indicators['others_dr'] = (close / shift(close, 1) - 1) * 100
+        indicators['others_dlr'] = np.diff(np.log(close), prepend=np.nan) * 100
+        indicators['others_cr'] = (close / cumulative_return_base - 1) * 100
+
+    return indicators
+
+def get_technical_indicators(df, windows, workers=None, cumulative_return_base=None, states=None):
+    """ Function to compute each technical indicator once per distinct window size
+        - The window sizes are computed in parallel threads, one per CPU core if workers is None. The kernels release the GIL: they're NumPy operations, linear filters and numba kernels
+        - The cumulative return is computed from cumulative_return_base, or from the first close price if it's None
+        - If the indicator states are given, the recursions continue from their saved states through the bars after the last bars computed, and the states are updated.
+          The bars before them are only used by the rolling windows, "get_indicators_lookback" bars are enough """
+
+    # Set the OHLC data as contiguous float arrays to be shared by the threads
+    high, low, close = [np.ascontiguousarray(df[column].to_numpy(dtype=float)) for column in ['High','Low','Close']]
+
+    # Set one thread per CPU core, a single thread only adds its overhead
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Set the bars of the recursions
+    if states is not None:
+        states.start(df.index)
+
+    # Compute the fixed indicators and each window size's indicators in parallel
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fixed_future = executor.submit(get_fixed_indicators, high, low, close, cumulative_return_base, states)
+        window_futures = [executor.submit(get_window_indicators, high, low, close, window, states) for window in windows]
+        indicators = fixed_future.result()
+        for future in window_futures:
+            indicators.update(future.result())
+
+    # Create the technical indicators dataframe and forward-fill it
+    technical_features_df = pd.DataFrame(indicators, index=df.index).ffill()
+
+    return technical_features_df
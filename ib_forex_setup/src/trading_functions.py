@@ -1,11 +1,21 @@
 # Import the necessary libraries
+import time
 import pytz
 import numpy as np
 import pandas as pd
 import datetime as dt
 from datetime import datetime
+from collections import deque
 from lightgbm import LGBMClassifier
 from shaphypetune import BoostBoruta
+from statsmodels.tsa.stattools import adfuller
+from statsmodels.tsa.adfvalues import mackinnonp
+
+# Use numba to compile the DC events' kernel if it's installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 def dropLabels(events,minPct=.05):
     ''' Function to drop the lowest-percentage prediction feature class'''
@@ -40,126 +50,411 @@ def get_mid_series(dfraw):
     return df
 
 def resample_df(dfraw,frequency,start='00h00min'):
-    ''' Function to resample the data'''
-    # Copy the dataframe
-    df = dfraw.copy()   
+    ''' Function to resample the data
+        - The bars are computed in one vectorised pass with reduceat over the bars' first positions'''
     # Get the start hour
     hour=int(start[0:2])
     # Get the start minute time    
     minutes=int(start[3:5])
     
+    # Sort the dataframe by index just in case
+    df = dfraw if dfraw.index.is_monotonic_increasing else dfraw.sort_index()
     # Set the first day of the new dataframe
-    origin = df[(df.index.hour==hour) & (df.index.minute==minutes)].index[0]
+    origin = df.index[(df.index.hour==hour) & (df.index.minute==minutes)][0]
     # Subset the dataframe from the origin onwards
     df = df[df.index>=origin]
-    # Create a datetime column based on the index
-    df['datetime'] = df.index
-    # Create a new dataframe
-    df2 = (df.groupby(pd.Grouper(freq=frequency, origin=df.index[0]))
-           # Resample the Open price
-            .agg(Open=('Open','first'),
+    # Set the bar length
+    bar_length = pd.Timedelta(frequency)
+    
+    # Get the bar number of each observation, counting from the origin
+    bar_numbers = (df.index.values - df.index.values[0]) // bar_length.to_timedelta64()
+    # Get the first position of each non-empty bar
+    starts = np.flatnonzero(np.concatenate([[True], bar_numbers[1:]!=bar_numbers[:-1]]))
+    # Get the last position of each non-empty bar
+    ends = np.concatenate([starts[1:], [len(df)]]) - 1
+    # Get the number of observations of each non-empty bar
+    counts = ends - starts + 1
+    
+    # Get the high and low prices
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
+    # Set the observations' positions
+    positions = np.arange(len(df))
+    
+    # Resample the High and Low prices
+    bar_high = np.maximum.reduceat(high, starts)
+    bar_low = np.minimum.reduceat(low, starts)
+    # Get the first position of the High and Low prices within each bar
+    high_positions = np.minimum.reduceat(np.where(high==np.repeat(bar_high, counts), positions, len(df)), starts)
+    low_positions = np.minimum.reduceat(np.where(low==np.repeat(bar_low, counts), positions, len(df)), starts)
+    
+    # Create the new dataframe, each bar is indexed by its closing time as the shifted groupby output was
+    final_df = pd.DataFrame({
+                 # Resample the Open price
+                 'Open':df['Open'].to_numpy()[starts],
                  # Resample the Close price
-                 Close=('Close','last'),
+                 'Close':df['Close'].to_numpy()[ends],
                  # Resample the High price
-                 High=('High','max'),
+                 'High':bar_high,
                  # Resample the Low price
-                 Low=('Low','min'),
+                 'Low':bar_low,
                  # Get the High-price index
-                 High_time=('High', lambda x : np.nan if x.count() == 0 else x.idxmax()),
+                 'High_time':df.index[high_positions],
                  # Get the Low-price index
-                 Low_time=('Low', lambda x : np.nan if x.count() == 0 else x.idxmin()),
+                 'Low_time':df.index[low_positions],
                  # Get the Open-price index
-                 Open_time=('datetime','first'),
+                 'Open_time':df.index[starts],
                  # Get the Close-price index
-                 Close_time=('datetime','last'))
-            # Create a column and set each row to True in case the high price index is sooner than the low price index
-            .assign(high_first = lambda x: x["High_time"] < x["Low_time"])
-            )
+                 'Close_time':df.index[ends],
+                 # Set each row to True in case the high price index is sooner than the low price index
+                 'high_first':high_positions < low_positions},
+                 index=df.index[0] + (bar_numbers[starts]+1)*bar_length)
+        
+    return final_df
+
+class bar_aggregator():
+    ''' Class to build the data-frequency bars incrementally from the minute (or 5-second) mid prices
+        - The bars are set from the market open time and have the same columns and index as the resample_df output
+        - Set complete_observations to False if the last observation can be revised (e.g. keepUpToDate bars), so each bar is emitted with flush or with the next bar's first observation '''
     
-    final_df = df2.shift(1)
+    def __init__(self, data_frequency, market_open_time, observation_length='1min', complete_observations=True):
         
-    if 'h' in frequency:
-        final_df.loc[df2.index[-1]+dt.timedelta(hours=int(frequency[:frequency.find("h")])),:] = df2.loc[df2.index[-1],:]
-    else:
-        final_df.loc[df2.index[-1]+dt.timedelta(minutes=int(frequency[:frequency.find("min")])),:] = df2.loc[df2.index[-1],:]
+        # Set the bar length
+        self.bar_length = pd.Timedelta(data_frequency)
+        # Set the observation length
+        self.observation_length = pd.Timedelta(observation_length)
+        # Set the origin of the bars
+        self.origin = pd.Timestamp(market_open_time)
+        # Set whether the observations are complete when they arrive
+        self.complete_observations = complete_observations
+        # Set the partial bar state: bar number, open, high, low, close, open time, high time, low time and close time
+        self.state = None
+        # Set the partial bar state before the last observation, in case the last observation is revised
+        self.previous_state = None
+        # Set the bar number and close time of the last finished bar, the later updates of its observations are skipped
+        self.last_bar_number = self.last_close_time = None
+        # Set the list to save the finished bars
+        self.bars = list()
+        
+    def get_bar_number(self, time):
+        ''' Function to get the number of the bar an observation belongs to, counting from the origin '''
+        return (pd.Timestamp(time) - self.origin) // self.bar_length
+    
+    def get_bar_end(self, bar_number):
+        ''' Function to get the closing time of a bar, which is its index '''
+        return self.origin + (bar_number+1)*self.bar_length
+    
+    def emit(self):
+        ''' Function to save the partial bar as a finished bar and return it '''
+        # Get the partial bar state
+        bar_number, open_price, high_price, low_price, close_price, open_time, high_time, low_time, close_time = self.state
+        # Create the finished bar
+        bar = (self.get_bar_end(bar_number), open_price, close_price, high_price, low_price, high_time, low_time, open_time, close_time, high_time < low_time)
+        # Save the finished bar and reset the partial bar
+        self.bars.append(bar)
+        self.last_bar_number, self.last_close_time = bar_number, close_time
+        self.state = self.previous_state = None
+        return [bar]
+    
+    def update(self, time, open_price, high_price=None, low_price=None, close_price=None):
+        ''' Function to add a new observation to the partial bar and return the bars finished with it
+            - A single mid price can be passed as the open price
+            - The finished bars are returned as a list of tuples, use to_dataframe to convert them '''
         
-    final_df.dropna(inplace=True)
+        # Set the time as a timestamp
+        time = pd.Timestamp(time)
+        # Use the open price as the rest of the prices if they're not provided
+        high_price = open_price if high_price is None else high_price
+        low_price = open_price if low_price is None else low_price
+        close_price = open_price if close_price is None else close_price
         
-    return final_df
+        # Create a list to save the finished bars
+        finished_bars = list()
+        
+        # Get the bar number of the observation
+        bar_number = self.get_bar_number(time)
+        
+        # Skip the observations of the finished bars, e.g. a late revision of a flushed bar's last minute, even if there's no partial bar
+        if (self.last_bar_number is not None) and ((bar_number <= self.last_bar_number) or (time <= self.last_close_time)):
+            return finished_bars
+        
+        # If the observation revises the last one, restore the partial bar state without it
+        if (self.state is not None) and (time == self.state[8]):
+            self.state = self.previous_state
+        # Skip the observations older than the partial bar ones
+        elif (self.state is not None) and (time < self.state[8]):
+            return finished_bars
+        
+        # If the observation belongs to a new bar, finish the partial bar
+        if (self.state is not None) and (bar_number != self.state[0]):
+            finished_bars += self.emit()
+        
+        # Save the partial bar state before the observation
+        self.previous_state = self.state
+        
+        # Start a new bar with the observation
+        if self.state is None:
+            self.state = (bar_number, open_price, high_price, low_price, close_price, time, time, time, time)
+        # Update the partial bar with the observation, keeping the first times of the high and low prices
+        else:
+            _, bar_open, bar_high, bar_low, _, open_time, high_time, low_time, _ = self.state
+            self.state = (bar_number, bar_open, 
+                          high_price if high_price > bar_high else bar_high, 
+                          low_price if low_price < bar_low else bar_low, 
+                          close_price, open_time, 
+                          time if high_price > bar_high else high_time, 
+                          time if low_price < bar_low else low_time, 
+                          time)
+        
+        # Finish the bar if the observation is its last one
+        if self.complete_observations and (time + self.observation_length >= self.get_bar_end(bar_number)):
+            finished_bars += self.emit()
+        
+        return finished_bars
+    
+    def flush(self, now):
+        ''' Function to finish the partial bar if its closing time has passed and return it in a list '''
+        if (self.state is not None) and (pd.Timestamp(now) >= self.get_bar_end(self.state[0])):
+            return self.emit()
+        return list()
+    
+    def to_dataframe(self, bars=None):
+        ''' Function to create a dataframe with the finished bars, as the resample_df output '''
+        # Use all the finished bars if no bars are provided
+        bars = self.bars if bars is None else bars
+        # Create the dataframe
+        df = pd.DataFrame([bar[1:] for bar in bars], index=pd.DatetimeIndex([bar[0] for bar in bars]),
+                          columns=['Open','Close','High','Low','High_time','Low_time','Open_time','Close_time','high_first'])
+        # Set the high-first column as boolean
+        df['high_first'] = df['high_first'].astype(bool)
+        return df
+
+class bar_ring_buffer():
+    ''' Class to keep the last data-frequency bars in fixed-size arrays used as a ring
+        - Once the buffer is full each new bar overwrites the oldest one, so the memory used doesn't grow from period to period
+        - The bars are saved as the bar_aggregator tuples and read as a dataframe with the resample_df columns '''
+    
+    def __init__(self, capacity):
+        
+        # Set the maximum number of bars
+        self.capacity = capacity
+        # Create the arrays to save the bars' index, Open, Close, High and Low prices, their times and high-first values
+        self.index = np.empty(capacity, dtype='datetime64[ns]')
+        self.prices = np.empty((capacity, 4), dtype=float)
+        self.times = np.empty((capacity, 4), dtype='datetime64[ns]')
+        self.high_first = np.empty(capacity, dtype=bool)
+        # Set the position of the next bar and the number of bars saved
+        self.position = 0
+        self.length = 0
+        
+    def __len__(self):
+        return self.length
+        
+    def get_last_index(self):
+        ''' Function to get the index of the last bar, None if there are no bars '''
+        return pd.Timestamp(self.index[self.position-1]) if self.length > 0 else None
+    
+    def append(self, bar):
+        ''' Function to save a bar tuple
+            - A bar with the last bar's index replaces it and older bars are skipped '''
+        
+        # Get the bar index
+        index = np.datetime64(pd.Timestamp(bar[0]), 'ns')
+        # If the bar is not later than the last bar
+        if (self.length > 0) and (index <= self.index[self.position-1]):
+            # Skip it if it's older
+            if index < self.index[self.position-1]:
+                return
+            # Replace the last bar otherwise
+            self.position, self.length = (self.position-1) % self.capacity, self.length-1
+            
+        # Save the bar
+        self.index[self.position] = index
+        self.prices[self.position] = bar[1:5]
+        self.times[self.position] = [np.datetime64(pd.Timestamp(time), 'ns') for time in bar[5:9]]
+        self.high_first[self.position] = bar[9]
+        # Move the position forward, going back to the start once the arrays' end is reached
+        self.position = (self.position+1) % self.capacity
+        self.length = min(self.length+1, self.capacity)
+        
+    def extend(self, df):
+        ''' Function to save the bars of a dataframe with the resample_df columns '''
+        
+        # Set the time columns as datetimes, they're strings if the bars were read from a csv file
+        times = [pd.to_datetime(df[column]) for column in ['High_time','Low_time','Open_time','Close_time']]
+        # Save the bars
+        for bar in zip(df.index, df['Open'], df['Close'], df['High'], df['Low'], *times, df['high_first'].astype(bool)):
+            self.append(bar)
+    
+    def to_dataframe(self, last_rows=None):
+        ''' Function to create a dataframe with the last bars, all of them if last_rows is None '''
+        
+        # Set the number of bars to read
+        length = self.length if last_rows is None else min(last_rows, self.length)
+        # Get the bars' positions from the oldest to the newest one
+        positions = (self.position - length + np.arange(length)) % self.capacity
+        # Create the dataframe
+        df = pd.DataFrame(self.prices[positions], index=pd.DatetimeIndex(self.index[positions]), columns=['Open','Close','High','Low'])
+        for i, column in enumerate(['High_time','Low_time','Open_time','Close_time']):
+            df[column] = self.times[positions, i]
+        df['high_first'] = self.high_first[positions]
+        return df
+
+def dc_events_kernel(closes, theta, upward, ph, pl):
+    """ Function to run the DC events' state machine through the close prices
+        - It returns the events (-1 for a new high in an upward trend, 1 for a new low in a downward trend, 0 otherwise) and the final state"""
+    # Create the events array
+    events = np.zeros(len(closes))
+    # Create loop to run through each close price
+    for t in range(len(closes)):
+        close = closes[t]
+        # Check if we're on an upward trend
+        if upward:
+            # Check if the close price is less than the high price by the theta threshold
+            if close <= ph * (1 - theta):
+                # Set the trend to downward and the low price as the current close price
+                upward = False
+                pl = close
+            # Check if the close price is higher than the high price
+            elif close > ph:
+                # Set the high price as the current close price and save the event
+                ph = close
+                events[t] = -1.0
+        # If we're on a downward trend
+        else:
+            # Check if the close price is higher than the low price by the theta threshold
+            if close >= pl * (1 + theta):
+                # Set the trend to upward and the high price as the current close price
+                upward = True
+                ph = close
+            # Check if the close price is less than the low price
+            elif close < pl:
+                # Set the low price as the current close price and save the event
+                pl = close
+                events[t] = 1.0
+    return events, upward, ph, pl
 
-def directional_change_events(data, theta=0.004, columns=None):
+# Compile the DC events' kernel if numba is installed
+if njit is not None:
+    dc_events_kernel_numba = njit(cache=True)(dc_events_kernel)
+else:
+    dc_events_kernel_numba = None
+
+def get_dc_events(closes, theta, upward=True, ph=None, pl=None, use_numba=True):
+    """ Function to get the DC events of a close price array together with the final DC state
+        - The kernel is compiled with numba if it's installed and use_numba is True, otherwise it runs on a plain list"""
+    # Set the initial high and low prices as the first close price
+    ph = closes[0] if ph is None else ph
+    pl = closes[0] if pl is None else pl
+    # Run the compiled kernel
+    if use_numba and (dc_events_kernel_numba is not None):
+        return dc_events_kernel_numba(np.ascontiguousarray(closes, dtype=np.float64), float(theta), bool(upward), float(ph), float(pl))
+    # Run the pure-Python kernel on a list, which is faster to index than an array
+    return dc_events_kernel(np.asarray(closes, dtype=float).tolist(), theta, upward, ph, pl)
+
+def forward_fill_events(values, events):
+    """ Function to forward-fill the non-event values with the previous event value. Values before the first event are set to zero """
+    # Get the index of the last event for each observation
+    last_event = np.maximum.accumulate(np.where(events, np.arange(len(values)), -1))
+    return np.where(last_event>=0, values[np.maximum(last_event,0)], 0.0)
+
+class directional_change_state():
+    ''' Class to update the DC R indicator incrementally, one close price per period
+        - It's picklable, so it can be saved and restored across periods and app reconnections '''
+    
+    def __init__(self, theta=0.004):
+        
+        # Set the DC threshold
+        self.theta = theta
+        # Set the trend direction, the high and low prices
+        self.upward = True
+        self.ph = None
+        self.pl = None
+        # Set the last peak or trough price
+        self.peak_trough_price = 0.0
+        # Set the number of periods since the count restarted
+        self.count = 0
+        # Set whether the previous close price was an event
+        self.previous_event = False
+        # Set the last non-zero R value
+        self.r = 0.0
+        # Set the number of close prices seen
+        self.length = 0
+        
+    def update(self, close):
+        ''' Function to update the DC state with a new close price and return its R value '''
+        
+        # Set the initial high and low prices as the first close price
+        if self.length == 0:
+            self.ph = self.pl = close
+        
+        # Run the DC events' state machine for the new close price
+        events, self.upward, self.ph, self.pl = dc_events_kernel([close], self.theta, self.upward, self.ph, self.pl)
+        event = events[0]!=0
+        
+        # Update the count, it restarts at 1 after each non-event period
+        self.count = self.count + 1 if self.previous_event else min(self.length, 1)
+        
+        # If it's an event
+        if event:
+            # Compute the TMV, T and R indicators
+            with np.errstate(divide='ignore', invalid='ignore'):
+                previous_price = np.float64(self.peak_trough_price) if self.length>0 else np.nan
+                tmv = np.abs(close-previous_price)/(previous_price*self.theta)
+                r = np.log(tmv/np.float64(self.count)*self.theta)
+            # Save the R value if it's non-zero
+            if r != 0:
+                self.r = float(r)
+            # Save the new peak or trough price
+            self.peak_trough_price = close
+        
+        # Save the event and the number of close prices seen
+        self.previous_event = event
+        self.length += 1
+        
+        # Return NaN for infinite R values
+        return self.r if np.isfinite(self.r) else np.nan
+    
+    def update_many(self, closes):
+        ''' Function to update the DC state with several close prices and return their R values '''
+        return np.array([self.update(float(close)) for close in closes], dtype=float)
+
+def directional_change_events(data, theta=0.004, columns=None, use_numba=True):
     """ Function to create the DC indicators provided by Chen and Tsang (2021) """
 
     # Copy the dataframe
     data = data.copy()
+    
+    # Get the close prices
+    closes = data['Close'].to_numpy(dtype=float)
+    # Set the observations' positions
+    positions = np.arange(len(closes))
 
-    # Create the necessary columns and variables
-    data["Event"] = 0.0
+    # Get the DC events
+    data["Event"] = get_dc_events(closes, theta, use_numba=use_numba)[0]
+    # Set the event observations
+    is_event = data["Event"].values!=0
 
-    # Set the initial event variable value
-    event = "upward" # initial event
+    # Set the peak and trough prices and forward-fill them
+    data['peak_trough_prices'] = forward_fill_events(closes, is_event)
 
-    # Set the initial value for low and high prices
-    ph = data['Close'].iloc[0] # highest price
-    pl = data['Close'].iloc[0] # lowest price
-
-    # Create loop to run through each date
-    for t in range(0, len(data.index)):
-        # Check if we're on a downward trend
-        if event == "downward":
-            # Check if the close price is higher than the low price by the theta threshold
-            if data["Close"].iloc[t] >= pl * (1 + theta):
-                # Set the event variable to upward
-                event = "upward"
-                # Set the high price as the current close price                
-                ph = data["Close"].iloc[t]
-            # If the close price is lower than the low price by the theta threshold
-            else:
-                # Check if the close price is less than the low price
-                if data["Close"].iloc[t] < pl:
-                    # Set the low price as the current close price
-                    pl = data["Close"].iloc[t]
-                    # Set the Event to upward for the current period
-                    data["Event"].iloc[t] = 1
-        # Check if we're on an upward trend
-        elif event == "upward":
-            # Check if the close price is less than the high price by the theta threshold
-            if data["Close"].iloc[t] <= ph * (1 - theta):  
-                # Set the event variable to downward
-                event = "downward"
-                # Set the low price as the current close price
-                pl = data["Close"].iloc[t]
-            # If the close price is higher than the high price by the theta threshold
-            else:
-                # Check if the close price is higher than the high price
-                if data["Close"].iloc[t] > ph:
-                    # Set the high price as the current close price
-                    ph = data["Close"].iloc[t]
-                    # Set the Event to downward for the current period
-                    data["Event"].iloc[t] = -1
-
-    # Set the peak and trough prices and forward-fill the column
-    data['peak_trough_prices'] = np.where(data['Event']!=0, data['Close'],0)
-    data['peak_trough_prices'].replace(to_replace=0, method='ffill', inplace=True)
-
-    # Count the number of periods between a peak and a trough
-    data['count'] = 0
-    for i in range(1,len(data.index)):
-        if data['Event'].iloc[(i-1)]!=0:
-            data['count'].iloc[i] = 1+data['count'].iloc[(i-1)]
-        else:
-            data['count'].iloc[i] = 1
+    # Count the number of periods between a peak and a trough: it restarts at 1 after each non-event period
+    previous_is_event = np.concatenate([[False], is_event[:-1]])
+    last_restart = np.maximum.accumulate(np.where(previous_is_event, 0, positions))
+    data['count'] = np.where(last_restart==0, 0, 1) + positions - last_restart
 
     # Compute the TMV indicator
-    data['TMV'] = np.where(data['Event']!=0, abs(data['peak_trough_prices']-data['peak_trough_prices'].shift())/\
-                          (data['peak_trough_prices'].shift()*theta),0)
+    previous_prices = data['peak_trough_prices'].shift().values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data['TMV'] = np.where(is_event, np.abs(data['peak_trough_prices'].values-previous_prices)/(previous_prices*theta),0)
 
     # Compute the time-completion-for-a-trend indicator
-    data['T'] = np.where(data['Event']!=0, data['count'],0)
+    data['T'] = np.where(is_event, data['count'],0)
 
     # Compute the time-adjusted-return indicator and forward-fill it
-    data['R'] = np.where(data['Event']!=0, np.log(data['TMV']/data['T']*theta),0)
-    data['R'] = data['R'].replace(to_replace=0, method='ffill')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_values = np.where(is_event, np.log(data['TMV'].values/data['T'].values*theta),0)
+    data['R'] = forward_fill_events(r_values, r_values!=0)
 
     # Drop NaN or infinite values
     data.replace([np.inf, -np.inf], np.nan, inplace=True)
@@ -169,6 +464,75 @@ def directional_change_events(data, theta=0.004, columns=None):
     else:
         return data[columns]
 
+class hmm_forward_filter():
+    ''' Class to update the forward probabilities of a fitted HMM model incrementally, one observation per period
+        - It's used with the diagonal-covariance GaussianHMM models of the strategy and it's picklable '''
+    
+    def __init__(self, hmm_model, model_address=None):
+        
+        # Save the HMM model parameters
+        self.startprob = np.asarray(hmm_model.startprob_, dtype=float).copy()
+        self.transmat = np.asarray(hmm_model.transmat_, dtype=float).copy()
+        self.means = np.asarray(hmm_model.means_, dtype=float).copy()
+        self.variances = np.diagonal(np.asarray(hmm_model.covars_, dtype=float), axis1=1, axis2=2).copy()
+        # Save the HMM model random state to sample the next state
+        self.random_state = hmm_model.random_state
+        # Save the HMM model address to know which model the filter belongs to
+        self.model_address = model_address
+        # Set the forward (filtered) state probabilities
+        self.probabilities = None
+        # Set the log-likelihood of the observations seen
+        self.log_likelihood = 0.0
+        # Set the index of the last observation seen
+        self.last_index = None
+        
+    def emission_log_likelihood(self, values):
+        ''' Function to compute the Gaussian log-likelihood of each observation for each state '''
+        # Reshape the observations as a 2D array
+        values = np.asarray(values, dtype=float).reshape(-1, self.means.shape[1])
+        # Compute the diagonal-covariance Gaussian log-likelihood
+        squared_errors = (values[:,None,:] - self.means[None,:,:])**2 / self.variances[None,:,:]
+        return -0.5*(np.log(2*np.pi*self.variances).sum(axis=1)[None,:] + squared_errors.sum(axis=2))
+        
+    def update_many(self, values, index=None):
+        ''' Function to update the forward probabilities with several observations and return the current state '''
+        
+        # Compute the emission log-likelihoods
+        log_emissions = self.emission_log_likelihood(values)
+        # Get the probabilities of the previous observation
+        probabilities = self.probabilities
+        
+        for log_emission in log_emissions:
+            # Predict the state probabilities with the transition matrix, or use the start probabilities for the first observation
+            prior = self.startprob if probabilities is None else probabilities @ self.transmat
+            # Scale the emission likelihoods to avoid underflows
+            max_log_emission = log_emission.max()
+            probabilities = prior * np.exp(log_emission - max_log_emission)
+            # Normalize the forward probabilities and update the log-likelihood
+            scale = probabilities.sum()
+            probabilities = probabilities / scale
+            self.log_likelihood += np.log(scale) + max_log_emission
+        
+        # Save the forward probabilities
+        self.probabilities = probabilities
+        # Save the index of the last observation
+        if (index is not None) and (len(index) > 0):
+            self.last_index = index[-1]
+            
+        return self.get_current_state()
+    
+    def update(self, value, index=None):
+        ''' Function to update the forward probabilities with a new observation and return the current state '''
+        return self.update_many([value], None if index is None else [index])
+    
+    def get_current_state(self):
+        ''' Function to get the most likely current state given the observations seen '''
+        return int(np.argmax(self.probabilities)) if self.probabilities is not None else None
+    
+    def get_next_state_probabilities(self):
+        ''' Function to get the next state distribution with the transition matrix '''
+        return self.startprob.copy() if self.probabilities is None else self.probabilities @ self.transmat
+
 def library_boruta_shap(X, y, seed, max_iter, date_loc):
     """ Function to compute the Boruta-Shap algorithm and get the best features"""    
     X_train, X_test = X.loc[:date_loc,:], X.loc[date_loc:,:]
@@ -200,6 +564,226 @@ def library_boruta_shap(X, y, seed, max_iter, date_loc):
         best_features = X.columns.tolist()
         return best_features
 
+def set_model_jobs(model, n_jobs=1):
+    """ Function to set the number of parallel jobs of a fitted model together with its fitted sub-models
+        - A single-row prediction is faster without the parallel jobs' overhead and gives the same output """
+    # Set the model's number of jobs
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = n_jobs
+    # Set the calibrated models' and the ensembles' sub-models number of jobs
+    for sub_model in getattr(model, 'calibrated_classifiers_', []) + list(getattr(model, 'estimators_', [])):
+        set_model_jobs(sub_model, n_jobs)
+    # Set the calibrated model's classifier number of jobs
+    if hasattr(model, 'estimator') and hasattr(model, 'calibrators'):
+        set_model_jobs(model.estimator, n_jobs)
+    return model
+
+def export_tree_ensemble(model):
+    """ Function to export an isotonic-calibrated bagging classifier of random forests (or decision trees) into contiguous NumPy arrays
+        - The nodes of all the trees are saved in single arrays, their features are the model input columns and their values are the bagging classes' probabilities
+        - The trees are grouped per forest (tree_roots and forest_starts) and the forests per calibrated classifier (classifier_starts)
+        - The isotonic calibrators' thresholds are saved in single arrays too, grouped per calibrated classifier (calibrator_starts)
+        - It raises a ValueError if the model has another structure """
+    
+    # Check the model is an isotonic-calibrated classifier
+    if not hasattr(model, 'calibrated_classifiers_') or any(getattr(calibrated_classifier, 'method', None) != 'isotonic' for calibrated_classifier in model.calibrated_classifiers_):
+        raise ValueError('Only the isotonic-calibrated classifiers can be exported')
+    
+    # Create the lists to save the tree nodes' arrays and the groups' starts
+    nodes = {'feature':[], 'threshold':[], 'left':[], 'right':[], 'missing_left':[], 'value':[]}
+    tree_roots, forest_starts, classifier_starts = [], [0], [0]
+    # Create the lists to save the calibrators' arrays
+    calibrators = {'column':[], 'class':[], 'x_min':[], 'x_max':[], 'x_thresholds':[], 'y_thresholds':[]}
+    threshold_starts, calibrator_starts = [0], [0]
+    # Set the number of nodes saved
+    nodes_number = 0
+    
+    for calibrated_classifier in model.calibrated_classifiers_:
+        # Check the classifier is a bagging classifier
+        bagging = calibrated_classifier.estimator
+        if not hasattr(bagging, 'estimators_features_'):
+            raise ValueError('Only the calibrated bagging classifiers can be exported')
+        
+        for estimator, features in zip(bagging.estimators_, bagging.estimators_features_):
+            # Get the estimator trees, a single decision tree is a forest of one tree
+            trees = estimator.estimators_ if hasattr(estimator, 'estimators_') else [estimator]
+            if not all(hasattr(tree, 'tree_') and (tree.tree_.n_outputs == 1) for tree in trees):
+                raise ValueError('Only the bagging classifiers of single-output random forests or decision trees can be exported')
+            
+            for tree in trees:
+                tree_ = tree.tree_
+                is_leaf = tree_.children_left == -1
+                # Save the split features as the model input columns, the leaves' feature isn't used
+                nodes['feature'].append(np.where(is_leaf, 0, np.asarray(features)[np.maximum(tree_.feature, 0)]))
+                nodes['threshold'].append(tree_.threshold)
+                # Save the children as positions in the single arrays
+                nodes['left'].append(np.where(is_leaf, -1, tree_.children_left + nodes_number))
+                nodes['right'].append(np.where(is_leaf, -1, tree_.children_right + nodes_number))
+                nodes['missing_left'].append(tree_.missing_go_to_left)
+                # Save the nodes' probabilities as the bagging classes' probabilities, the estimator classes are the bagging encoded classes
+                value = np.zeros((tree_.node_count, bagging.n_classes_))
+                value[:, estimator.classes_] = tree_.value[:, 0, :len(estimator.classes_)]
+                nodes['value'].append(value)
+                tree_roots.append(nodes_number)
+                nodes_number += tree_.node_count
+            forest_starts.append(len(tree_roots))
+        classifier_starts.append(len(forest_starts)-1)
+        
+        # Get the calibrated classes of the bagging classes, the binary calibrator uses the last class probabilities
+        n_classes = len(calibrated_classifier.classes)
+        class_indices = np.searchsorted(calibrated_classifier.classes, bagging.classes_)
+        for column, (class_index, calibrator) in enumerate(zip(class_indices, calibrated_classifier.calibrators)):
+            calibrators['column'].append(bagging.n_classes_-1 if n_classes == 2 else column)
+            calibrators['class'].append(class_index+1 if n_classes == 2 else class_index)
+            calibrators['x_min'].append(calibrator.X_min_)
+            calibrators['x_max'].append(calibrator.X_max_)
+            calibrators['x_thresholds'].append(np.asarray(calibrator.X_thresholds_, dtype=np.float64))
+            calibrators['y_thresholds'].append(np.asarray(calibrator.y_thresholds_, dtype=np.float64))
+            threshold_starts.append(threshold_starts[-1] + len(calibrator.X_thresholds_))
+        calibrator_starts.append(len(calibrators['column']))
+    
+    # Concatenate the arrays
+    arrays = {'feature':np.concatenate(nodes['feature']).astype(np.int64), 'threshold':np.concatenate(nodes['threshold']).astype(np.float64), 
+              'left':np.concatenate(nodes['left']).astype(np.int64), 'right':np.concatenate(nodes['right']).astype(np.int64), 
+              'missing_left':np.concatenate(nodes['missing_left']).astype(np.uint8), 'value':np.ascontiguousarray(np.concatenate(nodes['value'])), 
+              'tree_roots':np.array(tree_roots, dtype=np.int64), 'forest_starts':np.array(forest_starts, dtype=np.int64), 
+              'classifier_starts':np.array(classifier_starts, dtype=np.int64), 
+              'calibrator_columns':np.array(calibrators['column'], dtype=np.int64), 'calibrator_classes':np.array(calibrators['class'], dtype=np.int64), 
+              'x_min':np.array(calibrators['x_min'], dtype=np.float64), 'x_max':np.array(calibrators['x_max'], dtype=np.float64), 
+              'x_thresholds':np.concatenate(calibrators['x_thresholds']), 'y_thresholds':np.concatenate(calibrators['y_thresholds']), 
+              'threshold_starts':np.array(threshold_starts, dtype=np.int64), 'calibrator_starts':np.array(calibrator_starts, dtype=np.int64)}
+    
+    return arrays
+
+def tree_ensemble_kernel(X, feature, threshold, left, right, missing_left, value, tree_roots, forest_starts, classifier_starts):
+    """ Function to get each bagging classifier's probabilities of a few rows with the exported tree arrays
+        - The probabilities are added tree by tree and forest by forest as scikit-learn does with a single job, so they're the same """
+    n_samples, n_classes = X.shape[0], value.shape[1]
+    n_classifiers = len(classifier_starts) - 1
+    # Create the bagging classifiers' and the forest probabilities arrays
+    bagging_proba = np.zeros((n_classifiers, n_samples, n_classes))
+    forest_proba = np.zeros(n_classes)
+    for c in range(n_classifiers):
+        for i in range(n_samples):
+            for f in range(classifier_starts[c], classifier_starts[c+1]):
+                forest_proba[:] = 0.0
+                for t in range(forest_starts[f], forest_starts[f+1]):
+                    # Go down the tree up to its leaf, the missing values follow the tree's missing-value direction
+                    node = tree_roots[t]
+                    while left[node] != -1:
+                        x = X[i, feature[node]]
+                        if np.isnan(x):
+                            node = left[node] if missing_left[node] else right[node]
+                        elif x <= threshold[node]:
+                            node = left[node]
+                        else:
+                            node = right[node]
+                    # Add the leaf probabilities
+                    for k in range(n_classes):
+                        forest_proba[k] += value[node, k]
+                # Add the forest's mean probabilities
+                for k in range(n_classes):
+                    bagging_proba[c, i, k] += forest_proba[k] / (forest_starts[f+1] - forest_starts[f])
+            # Get the bagging classifier's mean probabilities
+            for k in range(n_classes):
+                bagging_proba[c, i, k] /= (classifier_starts[c+1] - classifier_starts[c])
+    return bagging_proba
+
+# Compile the tree ensemble kernel if numba is installed
+if njit is not None:
+    tree_ensemble_kernel_numba = njit(cache=True)(tree_ensemble_kernel)
+else:
+    tree_ensemble_kernel_numba = None
+
+def tree_ensemble_numpy(X, feature, threshold, left, right, missing_left, value, tree_roots, forest_starts, classifier_starts):
+    """ Function to get each bagging classifier's probabilities with NumPy, going down all the trees one level per step
+        - np.add.at adds the probabilities in the same order as the kernel """
+    n_samples = X.shape[0]
+    rows = np.arange(n_samples)[:, None]
+    # Go down all the trees up to their leaves
+    nodes = np.repeat(tree_roots[None, :], n_samples, axis=0)
+    is_split = left[nodes] != -1
+    while is_split.any():
+        x = X[rows, feature[nodes]]
+        go_left = np.where(np.isnan(x), missing_left[nodes] == 1, x <= threshold[nodes])
+        nodes = np.where(is_split, np.where(go_left, left[nodes], right[nodes]), nodes)
+        is_split = left[nodes] != -1
+    # Get the forests' mean probabilities
+    trees_number, forests_number = np.diff(forest_starts), np.diff(classifier_starts)
+    forest_proba = np.zeros((n_samples, len(trees_number), value.shape[1]))
+    np.add.at(forest_proba, (slice(None), np.repeat(np.arange(len(trees_number)), trees_number)), value[nodes])
+    forest_proba /= trees_number[None, :, None]
+    # Get the bagging classifiers' mean probabilities
+    bagging_proba = np.zeros((n_samples, len(forests_number), value.shape[1]))
+    np.add.at(bagging_proba, (slice(None), np.repeat(np.arange(len(forests_number)), forests_number)), forest_proba)
+    bagging_proba /= forests_number[None, :, None]
+    return bagging_proba.transpose(1, 0, 2)
+
+class tree_ensemble_predictor():
+    ''' Class to predict with an isotonic-calibrated bagging classifier of random forests using its exported NumPy arrays
+        - All the trees are evaluated in a single kernel (compiled with numba if it's installed and use_numba is True), without joblib
+        - The isotonic calibration is the scikit-learn one, so the probabilities and classes are the same as the model's ones with a single job '''
+    
+    def __init__(self, model, use_numba=True):
+        
+        # Export the model arrays
+        self.arrays = export_tree_ensemble(model)
+        # Save the model classes and input features
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.feature_names_in_ = getattr(model, 'feature_names_in_', None)
+        # Set the kernel to be used
+        self.kernel = tree_ensemble_kernel_numba if (use_numba and (tree_ensemble_kernel_numba is not None)) else tree_ensemble_numpy
+        
+    def get_bagging_proba(self, X):
+        ''' Function to get each bagging classifier's probabilities, the input features are used as float32 as the scikit-learn trees do '''
+        # Order the input features as the model ones
+        if hasattr(X, 'columns') and (self.feature_names_in_ is not None):
+            X = X[self.feature_names_in_.tolist()]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if (X.ndim != 2) or (X.shape[1] != self.n_features_in_):
+            raise ValueError(f'X has {X.shape[-1]} features, but the model has {self.n_features_in_} features')
+        a = self.arrays
+        return self.kernel(X, a['feature'], a['threshold'], a['left'], a['right'], a['missing_left'], a['value'], 
+                           a['tree_roots'], a['forest_starts'], a['classifier_starts'])
+    
+    def predict_proba(self, X):
+        ''' Function to get the calibrated probabilities, the mean of the calibrated classifiers' probabilities '''
+        a = self.arrays
+        bagging_proba = self.get_bagging_proba(X)
+        n_classes = len(self.classes_)
+        mean_proba = np.zeros((bagging_proba.shape[1], n_classes))
+        for c in range(len(a['calibrator_starts'])-1):
+            proba = np.zeros((bagging_proba.shape[1], n_classes))
+            for j in range(a['calibrator_starts'][c], a['calibrator_starts'][c+1]):
+                # Clip the probabilities to the calibrator's range and interpolate them
+                thresholds = slice(a['threshold_starts'][j], a['threshold_starts'][j+1])
+                values = np.clip(bagging_proba[c][:, a['calibrator_columns'][j]], a['x_min'][j], a['x_max'][j])
+                proba[:, a['calibrator_classes'][j]] = np.interp(values, a['x_thresholds'][thresholds], a['y_thresholds'][thresholds]) \
+                    if (thresholds.stop - thresholds.start) > 1 else a['y_thresholds'][thresholds.start]
+            # Normalize the probabilities, using the uniform distribution if all of them are zero
+            if n_classes == 2:
+                proba[:, 0] = 1.0 - proba[:, 1]
+            else:
+                denominator = np.sum(proba, axis=1)[:, np.newaxis]
+                proba = np.divide(proba, denominator, out=np.full_like(proba, 1 / n_classes), where=denominator != 0)
+            # Set the probabilities that minimally exceed 1 to 1
+            proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+            mean_proba += proba
+        mean_proba /= (len(a['calibrator_starts'])-1)
+        return mean_proba
+    
+    def predict(self, X):
+        ''' Function to get the classes with the highest calibrated probabilities '''
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+    
+def get_fast_predictor(model):
+    """ Function to get the array-based predictor of a model, or the model itself with a single job if it can't be exported """
+    try:
+        return tree_ensemble_predictor(model)
+    except ValueError:
+        return set_model_jobs(model, 1)
+
 def create_Xy(indf, feature_cols, y_target_col): 
     """ Function to create the input and prediction features dataframes """
     # Create the input features and prediction features dataframes
@@ -207,15 +791,30 @@ def create_Xy(indf, feature_cols, y_target_col):
     return X, y
 
 def roll_zscore(x, window):
-    """ Function to create the rolling zscore versions of an array """
-    # Create the rolling object
-    r = x.rolling(window=window)
-    # Set the rolling mean
-    m = r.mean().shift(1)
-    # Set the rolling standard deviation
-    s = r.std().shift(1)
-    # Compute the zscore values
-    z = (x - m) / s
+    """ Function to create the rolling zscore versions of a dataframe's columns
+        - Each window's mean and standard deviation are summed over its own values in a fixed order, so a row's zscore doesn't depend on the rows before its window
+        - As with pandas' rolling windows, the windows with NaN or infinite values give NaN values and the constant windows have a zero standard deviation """
+    # Set the values as a float array, leaving the infinite values out of the windows
+    values = x.to_numpy(dtype=float)
+    values = np.where(np.isfinite(values), values, np.nan)
+    # Set the number of complete windows
+    n = len(values) - window + 1
+    # Create the rolling mean and standard deviation arrays
+    m = np.full(values.shape, np.nan)
+    s = np.full(values.shape, np.nan)
+    if n > 0:
+        # Compute the rolling mean
+        m[window-1:] = sum(values[i:n+i] for i in range(window)) / window
+        # Compute the rolling sample standard deviation
+        s[window-1:] = np.sqrt(sum((values[i:n+i] - m[window-1:])**2 for i in range(window)) / (window - 1))
+        # Set the standard deviation of the constant windows to exactly zero
+        maximum, minimum = values[:n].copy(), values[:n].copy()
+        for i in range(1, window):
+            np.maximum(maximum, values[i:n+i], out=maximum)
+            np.minimum(minimum, values[i:n+i], out=minimum)
+        s[window-1:][maximum == minimum] = 0.0
+    # Compute the zscore values with the previous rows' rolling mean and standard deviation
+    z = (x - pd.DataFrame(m, index=x.index, columns=x.columns).shift(1)) / pd.DataFrame(s, index=x.index, columns=x.columns).shift(1)
     return z
 
 def rolling_zscore_function(data, scalable_features, window):
@@ -251,6 +850,123 @@ def rolling_zscore_function(data, scalable_features, window):
     
     return X_scaled_final, scaled_features
 
+def adfuller_design(values, lag):
+    """ Function to create the ADF regression data of stacked series with the same length
+        - The input features are a constant, the lagged level and the lagged differences"""
+    # Compute the first differences of the series
+    diffs = np.diff(values, axis=1)
+    # Set the number of observations of the regression
+    nobs = diffs.shape[1] - lag
+    # Set the input features
+    X = np.stack([np.ones((values.shape[0], nobs)), values[:, lag:lag+nobs]] + \
+                 [diffs[:, lag-j:lag-j+nobs] for j in range(1, lag+1)], axis=2)
+    # Set the current differences as the prediction feature
+    y = diffs[:, lag:]
+    return X, y
+
+def batched_adfuller(values):
+    """ Function to compute the ADF p-values of stacked series with the same length in matrix form
+        - It follows statsmodels' adfuller with regression='c' and autolag='AIC'
+        - It also returns which series have ill-conditioned regressions"""
+    # Set the number of observations
+    n = values.shape[1]
+    # Set the maximum lag as statsmodels does
+    maxlag = min(n // 2 - 2, int(np.ceil(12.0 * np.power(n / 100.0, 1 / 4.0))))
+    # Standardize each series. The t-statistics and the AIC ranking don't change
+    values = (values - values.mean(axis=1, keepdims=True)) / values.std(axis=1, keepdims=True)
+    
+    # Create the regression data with the maximum lag, which sets the common sample of the lag selection
+    X, y = adfuller_design(values, maxlag)
+    nobs = y.shape[1]
+    # Compute the cross products once, each lag's regression uses their leading block
+    XX = np.einsum('snk,snl->skl', X, X)
+    Xy = np.einsum('snk,sn->sk', X, y)
+    yy = np.einsum('sn,sn->s', y, y)
+    
+    # Flag the ill-conditioned regressions
+    ill_conditioned = ~(np.linalg.cond(XX) < 1e10)
+    # Set the well-conditioned regressions
+    valid = ~ill_conditioned
+    
+    # Create an array to save the AIC of each series and lag
+    aics = np.full((values.shape[0], maxlag+1), np.inf)
+    for lag in range(maxlag+1):
+        # Set the number of input features
+        k = lag + 2
+        # Estimate the coefficients and the sum of squared residuals
+        beta = np.linalg.solve(XX[valid, :k, :k], Xy[valid, :k, None])[:, :, 0]
+        ssr = yy[valid] - (Xy[valid, :k] * beta).sum(axis=1)
+        # Compute the AIC
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aics[valid, lag] = nobs * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1) + 2 * k
+    # Choose the lag with the lowest AIC
+    best_lags = np.argmin(aics, axis=1)
+    
+    # Create an array to save the ADF statistics
+    adf_stats = np.full(values.shape[0], np.nan)
+    # Estimate the final regressions with the whole sample, grouping the series by their best lag
+    for lag in np.unique(best_lags[valid]):
+        # Get the series with this best lag
+        group = valid & (best_lags == lag)
+        # Create the regression data
+        X, y = adfuller_design(values[group], lag)
+        # Estimate the coefficients and the residuals
+        XX_inv = np.linalg.inv(np.einsum('snk,snl->skl', X, X))
+        beta = np.einsum('skl,sl->sk', XX_inv, np.einsum('snk,sn->sk', X, y))
+        residuals = y - np.einsum('snk,sk->sn', X, beta)
+        # Compute the t-statistic of the lagged level
+        sigma2 = (residuals**2).sum(axis=1) / (y.shape[1] - X.shape[2])
+        adf_stats[group] = beta[:, 1] / np.sqrt(sigma2 * XX_inv[:, 1, 1])
+        
+    # Get the p-values with the MacKinnon approximation
+    pvalues = np.array([mackinnonp(adf_stat, regression='c', N=1) if not np.isnan(adf_stat) else np.nan for adf_stat in adf_stats])
+    
+    return pvalues, ill_conditioned
+
+def adfuller_pvalues(data, batched=True, chunk_size=64):
+    """ Function to compute the ADF p-values of each column with its non-NaN values
+        - If batched is True, the columns with the same number of observations are tested at once in matrix form
+        - Otherwise, and for the columns the batched test can't handle, statsmodels' adfuller is used column by column
+        - The columns whose test fails get a NaN p-value"""
+    # Create a series to save the p-values
+    pvalues = pd.Series(np.nan, index=data.columns)
+    # Create a list to save the columns to be tested one by one
+    single_columns = list()
+    
+    if batched:
+        # Create a dictionary to group the columns by their number of observations
+        groups = dict()
+        for column in data.columns:
+            values = data[column].dropna().values.astype(float)
+            # The constant, infinite-valued or short series are tested one by one
+            if (len(values) < 10) or (not np.isfinite(values).all()) or (values.max() == values.min()):
+                single_columns.append(column)
+            else:
+                groups.setdefault(len(values), []).append(column)
+                
+        for columns in groups.values():
+            # Test the columns in chunks to bound the memory used by the stacked regressions
+            for i in range(0, len(columns), chunk_size):
+                chunk = columns[i:i+chunk_size]
+                # Stack the series
+                values = np.array([data[column].dropna().values for column in chunk], dtype=float)
+                # Compute their p-values
+                chunk_pvalues, ill_conditioned = batched_adfuller(values)
+                pvalues[chunk] = chunk_pvalues
+                # Save the ill-conditioned columns to be tested one by one
+                single_columns.extend([column for column, flag in zip(chunk, ill_conditioned) if flag])
+    else:
+        single_columns = data.columns.tolist()
+        
+    for column in single_columns:
+        try:
+            # Get the p-value of the adfuller applied to the column
+            pvalues[column] = adfuller(data[column].dropna(), regression='c', autolag='AIC')[1]
+        except:
+            continue
+            
+    return pvalues
+
 def train_test_split(X, y, split, purged_window_size, embargo_period):
     """ Function to split the data into train and test data """
     # If the split variable is an integer
@@ -272,11 +988,11 @@ def train_test_split(X, y, split, purged_window_size, embargo_period):
     
     return X_train, X_test, y_train, y_test
 
-def define_trading_week(local_timezone, trading_start_hour, day_end_minute):
+def define_trading_week(local_timezone, trading_start_hour, day_end_minute, now_datetime=None):
     """ Function to get the current trading week start and end datetimes """
         
     # Set the now datetime
-    today = dt.datetime.now().astimezone(pytz.timezone(local_timezone))
+    today = (dt.datetime.now() if now_datetime is None else now_datetime).astimezone(pytz.timezone(local_timezone))
     
     # Set the easter timezone string
     bog = 'America/Bogota'
@@ -322,6 +1038,42 @@ def define_trading_week(local_timezone, trading_start_hour, day_end_minute):
     
     return week_start, week_end 
 
+class setup_clock():
+    ''' Class to read the now datetime and sleep until the next event of the trading setup
+        - The setup sleeps until the market open, the trading day start, the auto-restart end and each period instead of busy-waiting
+        - It sleeps in chunks of max_sleep seconds and reads the clock again, so clock adjustments and system suspensions don't make it oversleep
+        - The last wake-ups are saved as (event, wake-up datetime, now datetime) tuples to check the transitions '''
+    
+    def __init__(self, max_sleep=60, max_wake_ups=1000):
+        
+        # Set the maximum number of seconds to sleep before reading the clock again
+        self.max_sleep = max_sleep
+        # Set the queue to save the last wake-ups
+        self.wake_ups = deque(maxlen=max_wake_ups)
+        
+    def now(self):
+        ''' Function to get the now datetime '''
+        return dt.datetime.now()
+    
+    def sleep(self, seconds):
+        ''' Function to sleep a number of seconds '''
+        time.sleep(seconds)
+        
+    def sleep_until(self, wake_up_datetime, event=''):
+        ''' Function to sleep until the wake-up datetime of an event
+            - It returns at once if the wake-up datetime has already passed '''
+        
+        while True:
+            # Get the seconds left until the wake-up datetime
+            seconds = (wake_up_datetime - self.now()).total_seconds()
+            # Stop sleeping if the wake-up datetime has arrived
+            if seconds <= 0: break
+            # Sleep until the wake-up datetime or the next clock read
+            self.sleep(min(seconds, self.max_sleep))
+            
+        # Save the wake-up
+        self.wake_ups.append((event, wake_up_datetime, self.now()))
+
 def save_xlsx(dict_df, path):
     """
     Function to save a dictionary of dataframes to an Excel file, with each dataframe as a separate sheet
@@ -0,0 +1,51 @@
+# Import the necessary libraries
+import time
+import pytest
+import pandas as pd
+from datetime import timedelta
+import trading_functions as tf
+from synthetic_data import virtual_clock, run_virtual_trading_week
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_event_scheduler_benchmark(data_folder, benchmark_report, timezone='America/Lima', data_frequency='10min', local_restart_hour=23, spin_seconds=1, wait_seconds=0.2):
+    """ Time the trading setup loop sleeping until each event against busy-waiting as the previous versions
+        - Both loops run a whole week with a virtual clock starting on a Saturday at noon, the busy-waiting clock moves forward spin_seconds per clock read
+        - The CPU seconds used to wait wait_seconds with the real clock are also measured for both """
+
+    # Import the engine once the data folder exists, importing it creates the log file
+    import engine
+
+    # Set the start datetime on a Saturday
+    start_datetime = pd.Timestamp('2024-01-06 12:00').to_pydatetime()
+
+    # Time the week sleeping until each event and busy-waiting
+    sleeping_clock = virtual_clock(start_datetime)
+    start_time = time.perf_counter()
+    sleeping_calls = run_virtual_trading_week(engine, sleeping_clock, timezone, data_frequency, local_restart_hour)
+    sleeping_seconds = time.perf_counter() - start_time
+    spinning_clock = virtual_clock(start_datetime, spin_seconds)
+    start_time = time.perf_counter()
+    spinning_calls = run_virtual_trading_week(engine, spinning_clock, timezone, data_frequency, local_restart_hour)
+    spinning_seconds = time.perf_counter() - start_time
+
+    # Check both loops trade the same periods
+    same_transitions = [period for _, period in sleeping_calls if period is not None] == [period for _, period in spinning_calls if period is not None]
+
+    # Measure the CPU seconds used to wait with the real clock
+    wake_up_datetime = tf.setup_clock().now() + timedelta(seconds=wait_seconds)
+    cpu_start_time = time.process_time()
+    while tf.setup_clock().now() <= wake_up_datetime: continue
+    spinning_cpu_seconds = time.process_time() - cpu_start_time
+    cpu_start_time = time.process_time()
+    tf.setup_clock().sleep_until(tf.setup_clock().now() + timedelta(seconds=wait_seconds))
+    sleeping_cpu_seconds = time.process_time() - cpu_start_time
+
+    results_df = pd.DataFrame([['busy-wait', len(spinning_calls), spinning_clock.reads, spinning_clock.sleeps, spinning_seconds, spinning_cpu_seconds/wait_seconds],
+                               ['scheduler', len(sleeping_calls), sleeping_clock.reads, sleeping_clock.sleeps, sleeping_seconds, sleeping_cpu_seconds/wait_seconds]],
+                              columns=['wait','run_app_calls','clock_reads','sleeps','virtual_week_seconds','cpu_seconds_per_waited_second'])
+    benchmark_report(results_df)
+    assert same_transitions
+    assert sleeping_clock.reads < spinning_clock.reads
+    assert sleeping_cpu_seconds < spinning_cpu_seconds
@@ -0,0 +1,200 @@
+# Import the necessary libraries
+import io
+import time
+import logging
+import contextlib
+import pytest
+import numpy as np
+import pandas as pd
+import trading_functions as tf
+import ib_functions as ibf
+from threading import Event
+from ibapi.common import BarData
+from setup import trading_app
+from setup_for_download_data import app_for_download_data
+from synthetic_data import create_synthetic_bars, create_synthetic_callbacks, create_synthetic_trading_database
+from reference_functions import historical_data_loc, risk_management_lookups_masks, risk_management_lookups_index
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_bar_buffer_benchmark(benchmark_report, bars_number=14400, reference_max_bars=3000):
+    """ Time the historicalData callbacks of both apps with the bar buffer against the original .loc assignments
+        - The apps are created without connecting to IB and receive synthetic bars for request ID 0
+        - The .loc assignments are timed only with the first "reference_max_bars" bars since they take quadratic time """
+
+    # Create the synthetic bars
+    bars = create_synthetic_bars(bars_number)
+
+    # Create the trading app and the download app without connecting them
+    trading = trading_app.__new__(trading_app)
+    trading.new_df, trading.bar_buffer, trading.hist_data_events = {'0':pd.DataFrame()}, ibf.bar_buffer(), {'0':Event()}
+    trading.logging = logging.getLogger('test_bar_buffer_benchmark')
+    download = app_for_download_data.__new__(app_for_download_data)
+    download.dfs, download.bar_buffer, download.events = {'0':pd.DataFrame()}, ibf.bar_buffer(), {'0':Event()}
+
+    # Time the original .loc assignments
+    dfs = {'0':pd.DataFrame()}
+    start_time = time.perf_counter()
+    for bar in bars[:reference_max_bars]:
+        historical_data_loc(dfs, 0, bar)
+    loc_seconds = time.perf_counter() - start_time
+
+    # Create a list to save the benchmark results
+    results = list()
+
+    for name, app, callback_df in [('trading_app', trading, lambda: trading.new_df['0']), ('app_for_download_data', download, lambda: download.dfs['0'])]:
+        # Time the bar buffer callbacks, including the dataframe creation
+        start_time = time.perf_counter()
+        for bar in bars:
+            app.historicalData(0, bar)
+        app.historicalDataEnd(0, '', '')
+        buffer_seconds = time.perf_counter() - start_time
+
+        # Check the bar buffer dataframe against the .loc assignments one
+        same_output = dfs['0'].equals(callback_df().iloc[:reference_max_bars])
+
+        results.append([name, bars_number, buffer_seconds, bars_number/buffer_seconds, reference_max_bars, loc_seconds, reference_max_bars/loc_seconds, same_output])
+
+    results_df = pd.DataFrame(results, columns=['app','bars','buffer_seconds','buffer_bars_per_second','loc_bars','loc_seconds','loc_bars_per_second','same_output'])
+    benchmark_report(results_df)
+    assert results_df['same_output'].all()
+    assert (results_df['buffer_bars_per_second'] > results_df['loc_bars_per_second']).all()
+
+@pytest.mark.parametrize('callback, end_callback, end_args, name', [('openOrder', 'openOrderEnd', (), 'temp_open_orders'), ('orderStatus', 'openOrderEnd', (), 'temp_orders_status'),
+                                                                  ('execDetails', 'execDetailsEnd', (0,), 'temp_exec_df'), ('commissionReport', 'execDetailsEnd', (0,), 'temp_comm_df'),
+                                                                  ('position', 'positionEnd', (), 'temp_pos_df'), ('updateAccountValue', 'accountDownloadEnd', ('DU000000',), 'acc_update')])
+def test_callback_records_benchmark(benchmark_report, callback, end_callback, end_args, name, events_number=2000):
+    """ Time the trading app callbacks with the record lists against the original one-row dataframe concatenations
+        - The app is created without connecting to IB and receives synthetic callbacks followed by their end callback
+        - The concatenations are applied to the same records, so both dataframes are compared without the datetime column """
+
+    # Create the trading app without connecting it
+    app = trading_app.__new__(trading_app)
+    app.logging = logging.getLogger('test_callback_records_benchmark')
+    for table in ['temp_open_orders','temp_orders_status','temp_exec_df','temp_comm_df','temp_pos_df','acc_update']:
+        setattr(app, table, pd.DataFrame())
+    app.records = {table:[] for table in ['temp_open_orders','temp_orders_status','temp_exec_df','temp_comm_df','temp_pos_df','acc_update']}
+    app.order_state = ibf.order_state_index()
+    app.orders_request_event, app.executions_request_event = Event(), Event()
+    app.positions_request_event, app.account_update_event = Event(), Event()
+    app.order_events = {}
+
+    # Time the record callbacks, including the dataframe creation at the end callback
+    callbacks = create_synthetic_callbacks(events_number)[callback]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        for args in callbacks:
+            getattr(app, callback)(*args)
+        getattr(app, end_callback)(*end_args)
+        records_seconds = time.perf_counter() - start_time
+    records_df = getattr(app, name)
+
+    # Time the original one-row dataframe concatenations of the same records
+    dictionaries = records_df.to_dict('records')
+    concat_df = pd.DataFrame()
+    start_time = time.perf_counter()
+    for dictionary in dictionaries:
+        concat_df = pd.concat([concat_df, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+    concat_seconds = time.perf_counter() - start_time
+
+    # Check both dataframes
+    same_output = concat_df.drop('datetime', axis=1).equals(records_df.drop('datetime', axis=1))
+
+    benchmark_report(pd.DataFrame([[callback, events_number, records_seconds, concat_seconds, concat_seconds/records_seconds, same_output]],
+                                  columns=['callback','events','records_seconds','concat_seconds','speed_up','same_output']))
+    assert same_output
+    assert records_seconds < concat_seconds
+
+@pytest.mark.parametrize('weeks', [1, 4, 12])
+def test_order_state_index_benchmark(benchmark_report, weeks, periods_per_week=120, lookups_number=20):
+    """ Time the risk management orders lookups with the order state index against the original dataframe masks
+        - The index is created once with the synthetic trading dataframes, as the trading app does when it starts
+        - The lookups are repeated "lookups_number" times, as they're done several times per period """
+
+    # Create the trading dataframes
+    dict_df, _ = create_synthetic_trading_database(weeks, periods_per_week)
+    open_orders, orders_status, exec_df, pos_df = dict_df['open_orders'], dict_df['orders_status'], dict_df['executions'], dict_df['positions']
+
+    # Time the original masks lookups
+    start_time = time.perf_counter()
+    for _ in range(lookups_number):
+        masks_output = risk_management_lookups_masks(open_orders, orders_status, exec_df, pos_df, 'EUR', 'USD')
+    masks_seconds = time.perf_counter() - start_time
+
+    # Time the index creation and its lookups
+    start_time = time.perf_counter()
+    order_state = ibf.order_state_index()
+    order_state.add_dataframes(open_orders, orders_status, exec_df, pos_df)
+    index_creation_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(lookups_number):
+        index_output = risk_management_lookups_index(order_state, 'EUR', 'USD')
+    index_seconds = time.perf_counter() - start_time
+
+    benchmark_report(pd.DataFrame([[weeks, len(open_orders), masks_seconds/lookups_number, index_seconds/lookups_number, masks_seconds/index_seconds, index_creation_seconds]],
+                                  columns=['weeks','open_orders_rows','masks_seconds','index_seconds','speed_up','index_creation_seconds']))
+    assert masks_output == index_output
+    assert index_seconds < masks_seconds
+
+def test_live_bar_feed_benchmark(minute_df, market_open_time, benchmark_report, data_frequency='10min', train_span=3000, periods=100, revisions=3):
+    """ Time the live bar feed updates and reads against preparing the historical data downloaded every period
+        - The feed is started with the bars up to the first period and then receives every minute bar as "revisions" keepUpToDate updates per side, the last one with the final prices
+        - The feed's last train_span bars are compared with the resample_df bars at each of the next periods """
+
+    # Get the minute mid prices and the bars of the whole data
+    mid_df = tf.get_mid_series(minute_df)
+    start = f'{market_open_time.hour:02d}h{market_open_time.minute:02d}min'
+    resampled_df = tf.resample_df(mid_df, data_frequency, start)
+
+    # Set the first period after the first train_span bars and the next periods
+    current_periods = resampled_df.index[train_span:train_span+periods+1]
+
+    # Start the feed as update_hist_data does, with the finished bars and the minutes of the partial bar
+    feed = ibf.live_bar_feed(data_frequency, market_open_time, train_span)
+    downloaded_df = tf.resample_df(mid_df[mid_df.index <= current_periods[0]], data_frequency, start)
+    feed.start(downloaded_df[downloaded_df.index <= current_periods[0]], mid_df[mid_df.index == current_periods[0]])
+
+    # Create the BID and ASK updates of the minutes after the first period
+    minutes = minute_df[(minute_df.index > current_periods[0]) & (minute_df.index <= current_periods[-1])]
+    updates = list()
+    for time_, row in zip(minutes.index, minutes.itertuples(index=False)):
+        date = time_.strftime('%Y%m%d %H:%M:%S') + ' US/Eastern'
+        for k in range(1, revisions+1):
+            for reqId, side in [(0, 'bid'), (1, 'ask')]:
+                open_price, high_price, low_price, close_price = getattr(row, f'{side}_open'), getattr(row, f'{side}_high'), getattr(row, f'{side}_low'), getattr(row, f'{side}_close')
+                # Set the revised prices, the last revision has the final ones
+                if k < revisions:
+                    close_price = open_price + (close_price-open_price)*k/revisions
+                    high_price, low_price = max(open_price, close_price), min(open_price, close_price)
+                bar = BarData()
+                bar.date, bar.open, bar.high, bar.low, bar.close = date, open_price, high_price, low_price, close_price
+                updates.append((time_, reqId, bar))
+
+    # Time the updates and the reads once the first update of each next period arrives
+    same_output = True
+    update_seconds, read_seconds = 0, list()
+    next_check = 1
+    for time_, reqId, bar in updates:
+        start_time = time.perf_counter()
+        feed.update(reqId, bar)
+        update_seconds += time.perf_counter() - start_time
+        if (next_check < len(current_periods)) and (time_ >= current_periods[next_check]) and (feed.get_last_index() >= current_periods[next_check]):
+            start_time = time.perf_counter()
+            streaming_df = feed.to_dataframe(train_span)
+            read_seconds.append(time.perf_counter() - start_time)
+            same_output = same_output and streaming_df.equals(resampled_df.loc[:current_periods[next_check]].tail(train_span))
+            next_check += 1
+
+    # Time the download path's data preparation for a day of minutes: mid prices, bars and concatenation
+    day_df = minute_df[minute_df.index <= current_periods[0]].tail(1440)
+    start_time = time.perf_counter()
+    df = tf.resample_df(tf.get_mid_series(day_df), data_frequency, start)
+    historical_data = pd.concat([downloaded_df.tail(train_span), df]).sort_index()
+    historical_data = historical_data[~historical_data.index.duplicated(keep='last')]
+    download_prepare_seconds = time.perf_counter() - start_time
+
+    benchmark_report(pd.DataFrame([[data_frequency, train_span, periods, len(updates), update_seconds/len(updates), np.mean(read_seconds), download_prepare_seconds]],
+                                  columns=['data_frequency','train_span','periods','updates','update_seconds','feed_read_seconds','download_prepare_seconds']))
+    assert same_output and (next_check == len(current_periods))
+    assert np.mean(read_seconds) < download_prepare_seconds
@@ -0,0 +1,66 @@
+# Import the necessary libraries
+import io
+import time
+import logging
+import contextlib
+import pytest
+import pandas as pd
+import store_functions as stf
+import setup_functions as sf
+from setup import trading_app
+from synthetic_data import create_synthetic_trading_database, get_synthetic_periods, simulated_ib_server
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_persistent_session_benchmark(bars_df, data_folder, benchmark_report, weeks=4, periods_per_week=120, train_span=3500, repetitions=5):
+    """ Time the set up of a period with a persistent session app against constructing and connecting a new app, as run_app does
+        - A new app loads the historical data, the trading database and the optimal features from the data folder and connects to a simulated IB server
+        - A session app only resets its period-scoped state and keeps its connection """
+
+    # Save the historical data, the trading database and the optimal features
+    bars_df.tail(train_span).to_csv('data/historical_data.csv')
+    dict_df, market_open_time = create_synthetic_trading_database(weeks, periods_per_week)
+    stf.trading_journal('data/database.db').write(dict_df)
+    pd.DataFrame({'scalable_features':['Close'], 'final_features':['Close']}).to_excel('data/optimal_features_df.xlsx')
+
+    # Set the period datetimes and the function to create a new app
+    periods = get_synthetic_periods(market_open_time.to_pydatetime(), (market_open_time + pd.Timedelta(days=4)).to_pydatetime())
+    new_app = lambda: trading_app(logging.getLogger('test_persistent_session_benchmark'), 'DU000000', 'USD', 'EURUSD', 'US/Eastern', '10min', 'historical_data.csv', 'app_base_df.csv', 1,
+                                  0.003, 1, 2, 1, 1, *periods, train_span, 1, 6)
+
+    server = simulated_ib_server()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Time the new apps, each one is constructed and connected
+            new_app_seconds = 0
+            for _ in range(repetitions):
+                start_time = time.perf_counter()
+                app = new_app()
+                reconnected = sf.connect_app(app, '127.0.0.1', server.port, 1)
+                new_app_seconds += (time.perf_counter() - start_time)/repetitions
+                assert reconnected and app.isConnected()
+                app.disconnect()
+                app.run_thread.join(5)
+
+            # Time the session app resets, the app keeps its connection
+            app = new_app()
+            sf.connect_app(app, '127.0.0.1', server.port, 1)
+            start_time = time.perf_counter()
+            for _ in range(repetitions):
+                app.reset_period(periods[5], periods[6], periods[7], periods[0], periods[1], periods[2], periods[3], periods[4])
+                reconnected = sf.connect_app(app, '127.0.0.1', server.port, 1)
+            reset_seconds = (time.perf_counter() - start_time)/repetitions
+            assert not reconnected
+
+            # Check the session app keeps the same state as a new app
+            same_output = app.historical_data.equals(new_app().historical_data) and app.open_orders.equals(new_app().open_orders)
+            app.disconnect()
+    finally:
+        server.close()
+
+    benchmark_report(pd.DataFrame([[weeks, new_app_seconds, reset_seconds, new_app_seconds-reset_seconds, server.connections, same_output]],
+                                  columns=['weeks','new_app_seconds','session_reset_seconds','seconds_saved_per_period','connections','same_output']))
+    assert same_output
+    assert server.connections == repetitions+1
+    assert reset_seconds < new_app_seconds
@@ -0,0 +1,216 @@
+# Import the necessary libraries
+import io
+import os
+import time
+import pickle
+import shutil
+import contextlib
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from threading import Event, Thread, Timer
+from concurrent.futures import ThreadPoolExecutor
+from hmmlearn import hmm
+import strategy as stra
+import trading_functions as tf
+import store_functions as stf
+import ib_functions as ibf
+import setup_functions as sf
+from synthetic_data import create_synthetic_trading_app
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+@pytest.mark.parametrize('latency_seconds', [0.01, 0.05, 0.2])
+def test_order_acknowledgements_benchmark(benchmark_report, latency_seconds, rejections=1, next_order_id=100):
+    """ Time the orders of a new position sent once IB acknowledges each request against the previous fixed sleeps
+        - A simulated IB server answers each request after latency_seconds: nextValidId for reqIds, orderStatus for placeOrder and an error and orderStatus for cancelOrder
+        - The first "rejections" stop-loss orders are rejected with the 110 error, so the price retries are also sent
+        - The previous fixed sleeps were 2 seconds for the order ID, 3 seconds per order sent and 1 second per order canceled in parallel """
+
+    # Create the trading app with the state to open a new long position and cancel the previous risk management orders
+    app = create_synthetic_trading_app('test_order_acknowledgements_benchmark')
+    app.previous_quantity, app.signal, app.current_quantity, app.last_value = 0, 1, 10000, 1.1
+    app.sl_order_id, app.tp_order_id = next_order_id-2, next_order_id-1
+    app.sl_filled_or_canceled_bool = app.tp_filled_or_canceled_bool = False
+
+    # Create the lists to save the orders sent and canceled
+    placed_orders, canceled_orders = list(), list()
+    rejections_left = [rejections]
+
+    # Answer each request after the latency as the IB server does
+    def reply(function, *args):
+        Timer(latency_seconds, function, args).start()
+    def place_order(order_id, contract, order):
+        placed_orders.append((order_id, order.orderType))
+        if (order.orderType=='STP') and (rejections_left[0] > 0):
+            rejections_left[0] -= 1
+            reply(app.error, order_id, 110, 'The price does not conform to the minimum price variation for this contract.')
+        else:
+            reply(app.orderStatus, order_id, 'Filled' if order.orderType=='MKT' else 'PreSubmitted', 0, order.totalQuantity, 0, 0, 0, 0, 0, '', 0)
+    def cancel_order(order_id, manual_cancel_order_time=''):
+        canceled_orders.append(order_id)
+        reply(app.error, order_id, 202, 'Order Canceled - reason:')
+        reply(app.orderStatus, order_id, 'Cancelled', 0, 0, 0, 0, 0, 0, 0, '', 0)
+    app.isConnected = lambda: True
+    app.reqIds = lambda num_ids: reply(app.nextValidId, next_order_id)
+    app.placeOrder = place_order
+    app.cancelOrder = cancel_order
+
+    # Time the orders sent as send_orders does with a new position
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        order_id = sf.request_order_id(app)
+        with ThreadPoolExecutor(2) as executor:
+            executors_list = [executor.submit(sf.cancel_risk_management_previous_orders, app),
+                              executor.submit(sf.send_orders_as_bracket, app, order_id, app.current_quantity, True, True, True)]
+        for x in executors_list:
+            x.result()
+    acknowledged_seconds = time.perf_counter() - start_time
+
+    # Set the previous fixed sleeps' seconds
+    sleep_seconds = 2 + max(1, 3*len(placed_orders))
+
+    benchmark_report(pd.DataFrame([[latency_seconds, len(placed_orders), len(canceled_orders), sleep_seconds, acknowledged_seconds, sleep_seconds/acknowledged_seconds]],
+                                  columns=['latency_seconds','orders_sent','orders_canceled','sleep_seconds','acknowledged_seconds','speed_up']))
+    assert placed_orders == [(next_order_id, 'MKT')] + [(next_order_id+1, 'STP')]*(rejections+1) + [(next_order_id+2, 'LMT')]
+    assert sorted(canceled_orders) == [next_order_id-2, next_order_id-1]
+    assert acknowledged_seconds < sleep_seconds
+
+def test_midpoint_subscription_benchmark(benchmark_report, latency_seconds=0.05, tick_seconds=0.1, periods=20, max_age=60):
+    """ Time the last value updates with the kept midpoint subscription against the previous request, sleep and cancel loop
+        - A simulated IB server sends the current midpoint latency_seconds after each subscription and then one every tick_seconds until it's canceled
+        - The last value is read once per period, only the first period subscribes, and then it's set as stale so the app subscribes again
+        - The previous loop slept 3 seconds per request, with at least one request per period """
+
+    # Create the trading app
+    app = create_synthetic_trading_app('test_midpoint_subscription_benchmark')
+
+    # Count the subscriptions and cancellations
+    requests, cancellations = [0], [0]
+    # Set the threading event to stop the current subscription's ticks
+    subscription = {'stop':Event()}
+
+    # Send the midpoint ticks as the IB server does
+    def send_ticks(stop):
+        price = 1.1
+        stop.wait(latency_seconds)
+        while not stop.is_set():
+            app.tickByTickMidPoint(app.midpoint_id, int(time.time()), price)
+            price = round(price + 0.00001, 5)
+            stop.wait(tick_seconds)
+    def request_ticks(reqId, contract, tickType, numberOfTicks, ignoreSize):
+        requests[0] += 1
+        subscription['stop'] = Event()
+        Thread(target=send_ticks, args=(subscription['stop'],), daemon=True).start()
+    def cancel_ticks(reqId):
+        cancellations[0] += 1
+        subscription['stop'].set()
+    app.isConnected = lambda: True
+    app.reqTickByTickData = request_ticks
+    app.cancelTickByTickData = cancel_ticks
+
+    try:
+        # Time the last value read once per period
+        seconds = list()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(periods):
+                start_time = time.perf_counter()
+                sf.update_asset_last_value(app, max_age)
+                seconds.append(time.perf_counter() - start_time)
+
+            # Set the last value as stale and time its read
+            app.last_value_time -= timedelta(seconds=max_age+1)
+            start_time = time.perf_counter()
+            sf.update_asset_last_value(app, max_age)
+            stale_seconds = time.perf_counter() - start_time
+    finally:
+        subscription['stop'].set()
+
+    benchmark_report(pd.DataFrame([[latency_seconds, periods, 3, seconds[0], np.mean(seconds[1:]), stale_seconds, requests[0]]],
+                                  columns=['latency_seconds','periods','sleep_seconds','first_period_seconds','next_periods_seconds','stale_seconds','subscriptions']))
+    assert (requests[0] == 2) and (cancellations[0] == 1)
+    assert max(seconds + [stale_seconds]) < 3
+
+def test_precomputed_strategy_inputs_benchmark(bars_df, market_open_time, data_folder, benchmark_report, periods=5, max_window=6, test_span=144, train_span=3500, seed=0):
+    """ Time the strategy of each period with its inputs prepared before the period starts against loading them in the period
+        - The feature engine is created without the last "periods" bars, which are then read from a live bar feed
+        - Both runs use a copy of the same data folder, their signals and final base_df stores are compared
+        - The prepared run saves the base_df rows and the feature engine once the orders are sent, that time is reported as after_orders_seconds """
+
+    # Create the base_df store and the feature engine without the last bars
+    os.makedirs(os.path.join('loaded', 'data', 'models'))
+    os.chdir('loaded')
+    base_df, final_input_features, _, engine = stra.create_feature_engine(bars_df.iloc[:-periods].copy(), max_window, test_span, train_span)
+    base_df.index = pd.to_datetime(base_df.index)
+    stf.columnar_store('data/app_base_df').write(base_df)
+    with open('data/models/feature_engine.pickle', 'wb') as handle:
+        pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Set the month and day strings of the model objects
+    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
+    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+
+    # Fit and save the HMM model and the classifier model with the first input features
+    hmm_model = hmm.GaussianHMM(n_components = 2, covariance_type = "diag", n_iter = 100, random_state = seed).fit(base_df['R'].dropna().values.reshape(-1,1))
+    X, y = tf.create_Xy(base_df, final_input_features, 'y')
+    model_object = stra.create_classifier_model(seed).fit(X[final_input_features[:20]].astype("float32"), y.astype("int32").values.ravel())
+    with open(f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(hmm_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(model_object, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Copy the data folder for the prepared run
+    shutil.copytree(os.path.join(data_folder, 'loaded', 'data'), os.path.join(data_folder, 'precomputed', 'data'))
+
+    # Create the trading apps, they read the bars from a live bar feed
+    apps = {}
+    for name in ['loaded', 'precomputed']:
+        app = create_synthetic_trading_app('test_precomputed_strategy_inputs_benchmark')
+        app.isConnected = lambda: True
+        app.live_bars = True
+        app.market_open_time = market_open_time
+        app.train_span = train_span
+        app.final_input_features = final_input_features
+        apps[name] = app
+
+    # Run the strategy for each of the last periods
+    seconds = {'loaded':[], 'precompute':[], 'precomputed':[], 'after_orders':[]}
+    signals = {'loaded':[], 'precomputed':[]}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for current_period in bars_df.index[-periods:]:
+            for name, app in apps.items():
+                os.chdir(os.path.join(data_folder, name))
+                # Set the period and the live bars up to its last bar
+                app.current_period = current_period
+                app.live_bar_feed = ibf.live_bar_feed(app.data_frequency, market_open_time, train_span)
+                app.live_bar_feed.start(bars_df[bars_df.index <= current_period].tail(train_span), pd.DataFrame(columns=['Open','High','Low','Close']))
+
+                # Prepare the strategy inputs before the period starts
+                if name == 'precomputed':
+                    start_time = time.perf_counter()
+                    sf.precompute_strategy_inputs(app, current_period)
+                    seconds['precompute'].append(time.perf_counter() - start_time)
+
+                # Time the strategy up to the signal
+                start_time = time.perf_counter()
+                sf.strategy(app)
+                seconds[name].append(time.perf_counter() - start_time)
+                signals[name].append(app.signal)
+
+                # Time the base_df rows, the feature engine and the HMM forward filter saved as save_data does
+                start_time = time.perf_counter()
+                sf.save_base_df_update(app)
+                if name == 'precomputed':
+                    seconds['after_orders'].append(time.perf_counter() - start_time)
+
+    # Check the signals and the base_df stores are the same, and the stores have the new rows
+    stores = [stf.columnar_store(os.path.join(data_folder, name, 'data', 'app_base_df')).read() for name in ['loaded', 'precomputed']]
+    same_output = (signals['loaded'] == signals['precomputed']) and stores[0].equals(stores[1]) and (stores[0].index[-1] > base_df.index[-1])
+
+    benchmark_report(pd.DataFrame([[periods, len(final_input_features), np.mean(seconds['loaded']), np.mean(seconds['precompute']), np.mean(seconds['precomputed']),
+                                    np.mean(seconds['after_orders']), same_output]],
+                                  columns=['periods','input_features','loaded_seconds','precompute_seconds','precomputed_seconds','after_orders_seconds','same_output']))
+    assert same_output
+    assert np.mean(seconds['precomputed']) < np.mean(seconds['loaded'])
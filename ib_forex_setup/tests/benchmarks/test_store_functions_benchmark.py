@@ -0,0 +1,155 @@
+# Import the necessary libraries
+import time
+import pytest
+import numpy as np
+import pandas as pd
+import strategy as stra
+import trading_functions as tf
+import store_functions as stf
+from synthetic_data import create_minute_data, create_synthetic_trading_database
+from reference_functions import read_trading_workbook
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_columnar_store_benchmark(bars_df, benchmark_report, tmp_path, history_lengths=(5000, 20000, 100000), max_window=6, test_span=144, train_span=3500, new_rows_number=1):
+    """ Time the per-period base_df input/output with the CSV file and with the columnar store
+        - The base_df rows are repeated with later index values to create the longer histories
+        - Each period appends "new_rows_number" rows and reads the last "train_span" rows """
+
+    # Create the base_df dataframe and set its bar length
+    base_df, _, _, _ = stra.create_feature_engine(bars_df.copy(), max_window, test_span, train_span)
+    base_df.index = pd.to_datetime(base_df.index)
+    bar_length = base_df.index[-1] - base_df.index[-2]
+
+    # Create a list to save the benchmark results
+    results = list()
+
+    for history_length in history_lengths:
+        # Repeat the base_df rows up to the history length, together with the new rows
+        repeats = int(np.ceil((history_length+new_rows_number)/len(base_df)))
+        history_df = pd.concat([base_df]*repeats).iloc[:(history_length+new_rows_number)]
+        history_df.index = pd.date_range(base_df.index[0], periods=len(history_df), freq=bar_length)
+        # Set the new rows
+        new_rows = history_df.iloc[-new_rows_number:]
+        history_df = history_df.iloc[:-new_rows_number]
+
+        # Save the CSV file
+        csv_address = str(tmp_path / f'base_df_{history_length}.csv')
+        history_df.to_csv(csv_address)
+        # Time the CSV file period of the previous versions: read the whole file, concatenate the new rows and write it
+        start_time = time.perf_counter()
+        csv_df = pd.read_csv(csv_address, index_col=0)
+        csv_df.index = pd.to_datetime(csv_df.index)
+        csv_df = pd.concat([csv_df, new_rows])
+        csv_df = csv_df[~csv_df.index.duplicated(keep='last')]
+        csv_df.to_csv(csv_address)
+        csv_seconds = time.perf_counter() - start_time
+
+        # Save the columnar store
+        store_address = str(tmp_path / f'base_df_{history_length}')
+        stf.columnar_store(store_address).write(history_df)
+        # Time the columnar store period: append the new rows and read the last train_span rows
+        start_time = time.perf_counter()
+        store = stf.columnar_store(store_address)
+        store.append(new_rows)
+        store_df = store.read(last_rows=train_span)
+        store_seconds = time.perf_counter() - start_time
+
+        # Check the store rows against the CSV file rows
+        same_output = store_df.index.equals(csv_df.index[-train_span:]) and \
+                      np.allclose(store_df.astype(float).values, csv_df.iloc[-train_span:].astype(float).values, equal_nan=True)
+
+        results.append([history_length, csv_seconds, store_seconds, csv_seconds/store_seconds, same_output])
+
+    results_df = pd.DataFrame(results, columns=['history_length','csv_seconds','store_seconds','speed_up','same_output'])
+    benchmark_report(results_df)
+    assert results_df['same_output'].all()
+    assert (results_df['store_seconds'] < results_df['csv_seconds']).all()
+
+def test_minute_data_store_benchmark(benchmark_report, tmp_path, weeks=26, train_span=3500, data_frequency='10min'):
+    """ Time the historical minute data saved after each downloaded week with the CSV file and with the weekly partitions
+        - The minute data is split into the Saturday-based chunks of the download app, which are saved one at a time
+        - The range read of the last "train_span" bars is timed against reading the whole CSV file """
+
+    # Create the minute data and set the now datetime after it
+    minute_df = create_minute_data(weeks*7*24*60)
+    now = (minute_df.index[-1] + pd.Timedelta(days=10)).to_pydatetime()
+    csv_address = str(tmp_path / 'minute_df.csv')
+
+    # Split the data into the Saturday-based chunks of the download app, downloaded from the most recent to the oldest one
+    saturday_datetimes = pd.to_datetime(sorted(tf.saturdays_list(now.date())), format='%Y%m%d-%H:%M:%S')
+    numbers = np.searchsorted(saturday_datetimes.values, minute_df.index.values)
+    chunks = [(saturday_datetimes[number].strftime('%Y%m%d-%H:%M:%S'), minute_df[numbers==number]) for number in np.unique(numbers)[::-1]]
+
+    # Time the CSV file of the previous versions: concatenate, sort, drop duplicates and rewrite the whole file after each chunk
+    start_time = time.perf_counter()
+    end_df = pd.DataFrame()
+    for _, chunk in chunks:
+        end_df = pd.concat([end_df, chunk]).sort_index()
+        end_df = end_df[~end_df.index.duplicated(keep='first')]
+        end_df.to_csv(csv_address, encoding='utf-8', index=True)
+    csv_seconds = time.perf_counter() - start_time
+
+    # Time the weekly partitions, each chunk is written once
+    store = stf.get_minute_data_store(csv_address)
+    start_time = time.perf_counter()
+    for name, chunk in chunks:
+        store.write_partition(name, chunk, complete=pd.Timestamp(name.replace('-',' '))<=now)
+    store_seconds = time.perf_counter() - start_time
+
+    # Time the whole CSV file read and the range read of the last "train_span" bars
+    start_time = time.perf_counter()
+    csv_df = pd.read_csv(csv_address, index_col=0)
+    csv_df.index = pd.to_datetime(csv_df.index)
+    csv_read_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    store_df = stf.read_minute_data(csv_address, train_span, data_frequency)
+    store_read_seconds = time.perf_counter() - start_time
+
+    # Check the store rows against the CSV file rows
+    same_output = store_df.index.equals(csv_df.index[-len(store_df):]) and np.allclose(store_df.values, csv_df.loc[store_df.index, store_df.columns].values)
+
+    benchmark_report(pd.DataFrame([[len(chunks), len(minute_df), csv_seconds, store_seconds, csv_read_seconds, store_read_seconds, len(store_df), same_output]],
+                                  columns=['chunks','rows','csv_write_seconds','store_write_seconds','csv_read_seconds','store_read_seconds','rows_read','same_output']))
+    assert same_output
+    assert (store_seconds < csv_seconds) and (store_read_seconds < csv_read_seconds)
+
+@pytest.mark.parametrize('weeks', [1, 4, 12])
+def test_trading_journal_benchmark(benchmark_report, tmp_path, weeks, periods_per_week=120):
+    """ Time the trading app database save and load of a period with the SQLite journal against the Excel workbook
+        - The database has "weeks" weeks of hourly periods and only the last week's rows are saved in the journal
+        - The journal dataframes are compared with the saved ones, the workbook can't be compared since Excel turns empty strings into NaN values """
+
+    # Create the database dataframes
+    dict_df, market_open_time = create_synthetic_trading_database(weeks, periods_per_week)
+
+    # Save the previous weeks in the journal
+    journal = stf.trading_journal(str(tmp_path / 'database.db'))
+    previous_weeks_df = {name:df[df.index<market_open_time] for name, df in dict_df.items() if name not in ['app_time_spent','periods_traded']}
+    previous_weeks_df['app_time_spent'] = dict_df['app_time_spent']
+    previous_weeks_df['periods_traded'] = dict_df['periods_traded'][dict_df['periods_traded']['trade_time']<market_open_time]
+    journal.write(previous_weeks_df)
+
+    # Time the workbook save and load of a period of the previous versions
+    start_time = time.perf_counter()
+    tf.save_xlsx(dict_df = dict_df, path = str(tmp_path / 'database.xlsx'))
+    read_trading_workbook(str(tmp_path / 'database.xlsx'))
+    workbook_seconds = time.perf_counter() - start_time
+
+    # Time the journal save and load of a period
+    start_time = time.perf_counter()
+    journal.write(dict_df, start=market_open_time)
+    journal_df = journal.read()
+    journal_seconds = time.perf_counter() - start_time
+
+    # Time the on-demand export of the journal to an Excel workbook
+    start_time = time.perf_counter()
+    journal.export_xlsx(str(tmp_path / 'export.xlsx'))
+    export_seconds = time.perf_counter() - start_time
+
+    benchmark_report(pd.DataFrame([[weeks, len(dict_df['orders_status']), workbook_seconds, journal_seconds, workbook_seconds/journal_seconds, export_seconds]],
+                                  columns=['weeks','orders_status_rows','workbook_seconds','journal_seconds','speed_up','export_seconds']))
+    for name in dict_df:
+        pd.testing.assert_frame_equal(journal_df[name], dict_df[name])
+    assert journal_seconds < workbook_seconds
@@ -0,0 +1,94 @@
+# Import the necessary libraries
+import os
+import time
+import pickle
+import pytest
+import numpy as np
+import pandas as pd
+from hmmlearn import hmm
+import strategy as stra
+import store_functions as stf
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_feature_engine_benchmark(bars_df, benchmark_report, max_window=6, test_span=144, train_span=3500, new_bars_number=30):
+    """ Time the incremental feature engine updates against the batch prepare_base_df of every period
+        - The engine is created without the last "new_bars_number" bars and then updated bar by bar """
+
+    # Create the feature engine without the last bars
+    df = bars_df.iloc[-(train_span+max_window*100+new_bars_number):]
+    _, _, scalable_features, engine = stra.create_feature_engine(df.iloc[:-new_bars_number].copy(), max_window, test_span, train_span)
+
+    # Time the incremental updates bar by bar, keeping the latest version of each row
+    start_time = time.perf_counter()
+    new_rows = [engine.update(df.iloc[:(len(df)-i+1)]) for i in range(new_bars_number, 0, -1)]
+    update_seconds = (time.perf_counter() - start_time)/new_bars_number
+    incremental_df = pd.concat(new_rows)
+    incremental_df = incremental_df[~incremental_df.index.duplicated(keep='last')]
+
+    # Time the batch computation with the same scalable features and transforms
+    start_time = time.perf_counter()
+    batch_df, _, _ = stra.prepare_base_df(df.copy(), max_window, test_span, train_span+new_bars_number, scalable_features, engine.transforms)
+    batch_seconds = time.perf_counter() - start_time
+
+    # Get the maximum absolute difference of the rows both dataframes have
+    common_index = incremental_df.index.intersection(batch_df.index)
+    max_difference = (incremental_df.loc[common_index, batch_df.columns].astype(float) - batch_df.loc[common_index].astype(float)).abs().max().max()
+
+    benchmark_report(pd.DataFrame([[train_span, new_bars_number, update_seconds, batch_seconds, batch_seconds/update_seconds, max_difference]],
+                                  columns=['train_span','bars_updated','update_seconds_per_bar','batch_seconds','speed_up','max_difference']))
+    assert max_difference == 0
+    assert update_seconds < batch_seconds
+
+def test_model_cache_benchmark(market_open_time, data_folder, benchmark_report, periods=10, rows_number=500, features_number=20, seed=0):
+    """ Time the signal's model objects taken from the model cache against loading their files every period
+        - The HMM model and the classifier model are fitted with synthetic data and saved in the data folder
+        - The classifier model file is then replaced by a model with another seed, so the cache has to load it again """
+
+    # Create the synthetic input and prediction features
+    random_state = np.random.default_rng(seed)
+    X = pd.DataFrame(random_state.normal(size=(rows_number, features_number)).astype("float32"), columns=[f'feature_{i}' for i in range(features_number)])
+    y = np.where(X.sum(axis=1) + random_state.normal(size=rows_number) > 0, 1, -1)
+
+    # Set the month and day strings of the model objects
+    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
+    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+    model_address = f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle'
+
+    # Fit and save the HMM model and the classifier model
+    hmm_model = hmm.GaussianHMM(n_components = 2, covariance_type = "diag", n_iter = 100, random_state = seed).fit(X[['feature_0']].values)
+    with open(f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(hmm_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(model_address, 'wb') as handle:
+        pickle.dump(stra.create_classifier_model(seed).fit(X, y), handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Time the model objects loaded from their files every period
+    start_time = time.perf_counter()
+    for _ in range(periods):
+        signal_inputs = stra.prepare_signal(market_open_time)
+    load_seconds = (time.perf_counter() - start_time)/periods
+
+    # Time the model objects taken from the cache, the first period loads them
+    cache = stf.model_cache()
+    start_time = time.perf_counter()
+    for _ in range(periods):
+        cached_inputs = stra.prepare_signal(market_open_time, cache)
+    cached_seconds = (time.perf_counter() - start_time)/periods
+    saved_seconds = cache.saved_seconds/periods
+    same_output = (cache.loads == 2) and (cache.hits == 2*(periods-1)) and \
+                  np.array_equal(cached_inputs['model_object'].predict(X.iloc[:100]), signal_inputs['model_object'].predict(X.iloc[:100]))
+
+    # Replace the classifier model file and check the cache loads it again
+    time.sleep(0.01)
+    with open(model_address, 'wb') as handle:
+        pickle.dump(stra.create_classifier_model(seed+1).fit(X, y), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    cached_inputs = stra.prepare_signal(market_open_time, cache)
+    signal_inputs = stra.prepare_signal(market_open_time)
+    same_output = same_output and (cache.loads == 3) and \
+                  np.array_equal(cached_inputs['model_object'].predict_proba(X.iloc[:100]), signal_inputs['model_object'].predict_proba(X.iloc[:100]))
+
+    benchmark_report(pd.DataFrame([[periods, os.path.getsize(model_address)/1e6, load_seconds, cached_seconds, saved_seconds, cache.loads, same_output]],
+                                  columns=['periods','model_megabytes','load_seconds','cached_seconds','saved_seconds_per_period','file_loads','same_output']))
+    assert same_output
+    assert cached_seconds < load_seconds
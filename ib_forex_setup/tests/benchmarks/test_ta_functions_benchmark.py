@@ -0,0 +1,73 @@
+# Import the necessary libraries
+import os
+import time
+import pytest
+import numpy as np
+import pandas as pd
+import ta_functions as taf
+from reference_functions import get_ta_fixed_indicators, get_ta_window_indicators
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+def test_technical_indicators_benchmark(bars_df, benchmark_report, windows=range(3, 15)):
+    """ Time the NumPy technical indicators against the "ta" library ones, with and without numba
+        - The PSAR and KAMA kernels are also timed alone, they're the only indicators without a vectorised or linear-filter form """
+
+    # Set the OHLC dataframe and arrays
+    ohlc_df = bars_df[['Open','High','Low','Close']].astype(float)
+    high, low, close = [ohlc_df[column].to_numpy() for column in ['High','Low','Close']]
+
+    # Compile the kernels before timing them
+    taf.get_technical_indicators(ohlc_df.iloc[:100], [3])
+
+    # Time the NumPy and the "ta" computations
+    start_time = time.perf_counter()
+    numpy_df = taf.get_technical_indicators(ohlc_df, windows)
+    numpy_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    ta_df = pd.concat([get_ta_fixed_indicators(ohlc_df)] + [get_ta_window_indicators(ohlc_df, window) for window in windows], axis=1).ffill()
+    ta_seconds = time.perf_counter() - start_time
+
+    # Time the PSAR and KAMA kernels with and without numba
+    kernel_seconds = {}
+    for use_numba in [True, False]:
+        start_time = time.perf_counter()
+        taf.psar(high, low, close, use_numba=use_numba)
+        for window in windows:
+            taf.kama(close, window, use_numba=use_numba)
+        kernel_seconds[use_numba] = time.perf_counter() - start_time
+
+    # Get the maximum relative difference of the finite values
+    numpy_values, ta_values = numpy_df[ta_df.columns].to_numpy(dtype=float), ta_df.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        relative_differences = np.where(np.isfinite(numpy_values) & np.isfinite(ta_values) & (ta_values != 0), np.abs(numpy_values/ta_values - 1), 0.0)
+
+    benchmark_report(pd.DataFrame([[len(ohlc_df), len(windows), numpy_seconds, ta_seconds, ta_seconds/numpy_seconds, kernel_seconds[True], kernel_seconds[False], relative_differences.max()]],
+                                  columns=['bars','windows','numpy_seconds','ta_seconds','speed_up','psar_kama_numba_seconds','psar_kama_python_seconds','max_relative_difference']))
+    assert numpy_seconds < ta_seconds
+    assert kernel_seconds[True] < kernel_seconds[False]
+
+def test_technical_indicators_threads_benchmark(bars_df, benchmark_report, windows=range(3, 15), workers=4):
+    """ Time the window sizes computed in parallel threads against computing them one after the other
+        - The gain depends on the number of CPU cores, it's reported together with the timings """
+
+    # Set the OHLC dataframe
+    ohlc_df = bars_df[['Open','High','Low','Close']].astype(float)
+
+    # Compile the kernels before timing them
+    taf.get_technical_indicators(ohlc_df.iloc[:100], [3])
+
+    # Time the sequential and the threaded computations, keeping the best of 3 runs
+    seconds, outputs = {}, {}
+    for threads in [1, workers]:
+        timings = list()
+        for _ in range(3):
+            start_time = time.perf_counter()
+            outputs[threads] = taf.get_technical_indicators(ohlc_df, windows, workers=threads)
+            timings.append(time.perf_counter() - start_time)
+        seconds[threads] = min(timings)
+
+    benchmark_report(pd.DataFrame([[os.cpu_count(), len(ohlc_df), len(windows), workers, seconds[1], seconds[workers], seconds[1]/seconds[workers]]],
+                                  columns=['cpu_cores','bars','windows','threads','sequential_seconds','threads_seconds','speed_up']))
+    pd.testing.assert_frame_equal(outputs[1], outputs[workers])
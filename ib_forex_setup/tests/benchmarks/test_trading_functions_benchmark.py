@@ -0,0 +1,218 @@
+# Import the necessary libraries
+import time
+import pickle
+import pytest
+import numpy as np
+import pandas as pd
+import trading_functions as tf
+import ta_functions as taf
+import strategy as stra
+from reference_functions import directional_change_events_loop, resample_df_groupby
+from synthetic_data import create_minute_data
+
+# Set all the tests of this file as benchmarks
+pytestmark = pytest.mark.benchmark
+
+@pytest.mark.parametrize('max_window', [6, 15])
+def test_batched_adfuller_benchmark(bars_df, benchmark_report, max_window, test_span=144, train_span=3500):
+    """ Time the batched adfuller p-values against the column-by-column statsmodels ones, as get_stationarity_transforms uses them
+        - The technical indicators are the strategy ones of the last "train_span" bars """
+
+    # Set the technical indicators used to test the stationarity
+    data = taf.get_technical_indicators(bars_df.iloc[-train_span:], stra.get_window_sizes(max_window)).iloc[:-test_span]
+
+    # Time the batched and the column-by-column tests
+    start_time = time.perf_counter()
+    batched_pvalues = tf.adfuller_pvalues(data, batched=True)
+    batched_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    single_pvalues = tf.adfuller_pvalues(data, batched=False)
+    single_seconds = time.perf_counter() - start_time
+
+    # Count the technical indicators whose transform decision differs
+    decision_mismatches = ((batched_pvalues > 0.05) != (single_pvalues > 0.05)).sum() + (batched_pvalues.isna() != single_pvalues.isna()).sum()
+
+    benchmark_report(pd.DataFrame([[data.shape[1], len(data), batched_seconds, single_seconds, single_seconds/batched_seconds,
+                                    (batched_pvalues - single_pvalues).abs().max(), decision_mismatches]],
+                                  columns=['indicators','rows','batched_seconds','single_seconds','speed_up','max_pvalue_difference','transform_mismatches']))
+    assert decision_mismatches == 0
+    assert batched_seconds < single_seconds
+
+def test_directional_change_events_benchmark(benchmark_report, thetas=(0.00002, 0.0005, 0.004), lengths=(3500, 10000, 30000, 100000), reference_max_length=10000):
+    """ Time the DC events' kernels for several theta values and series lengths
+        - The numba and pure-NumPy outputs are checked against the original loop up to "reference_max_length" bars, the loop takes minutes with longer series """
+
+    # Set the close prices of the longest series
+    data = tf.get_mid_series(create_minute_data(max(lengths)))[['Close']]
+
+    # Compile the numba kernel before timing it
+    tf.directional_change_events(data.iloc[:10], thetas[0])
+
+    # Create a list to save the benchmark results
+    results = list()
+
+    for length in lengths:
+        # Set the close prices
+        closes = data.iloc[-length:]
+
+        for theta in thetas:
+            # Time the numba kernel, if numba is installed, and the pure-NumPy fallback
+            start_time = time.perf_counter()
+            numba_df = tf.directional_change_events(closes, theta, use_numba=True)
+            numba_seconds = time.perf_counter() - start_time if tf.njit is not None else np.nan
+            start_time = time.perf_counter()
+            numpy_df = tf.directional_change_events(closes, theta, use_numba=False)
+            numpy_seconds = time.perf_counter() - start_time
+
+            # Time the original loop and check the output of both kernels, the longer series only check the kernels against each other
+            loop_seconds = np.nan
+            if length <= reference_max_length:
+                start_time = time.perf_counter()
+                loop_df = directional_change_events_loop(closes, theta)
+                loop_seconds = time.perf_counter() - start_time
+                same_output = loop_df.equals(numba_df) and loop_df.equals(numpy_df)
+            else:
+                same_output = numba_df.equals(numpy_df)
+
+            results.append([theta, length, numba_seconds, numpy_seconds, loop_seconds, loop_seconds/numpy_seconds, same_output])
+
+    results_df = pd.DataFrame(results, columns=['theta','length','numba_seconds','numpy_seconds','loop_seconds','numpy_speed_up','same_output'])
+    benchmark_report(results_df)
+    assert results_df['same_output'].all()
+    assert (results_df['numpy_seconds'] < results_df['loop_seconds']).where(results_df['length'] <= reference_max_length, True).all()
+
+def test_directional_change_state_benchmark(mid_df, benchmark_report, theta=0.00002, warmup_length=3500, origin_shift=100):
+    """ Time the streaming DC state updates against the batch R indicator created per period
+        - The state is warmed up with the first "warmup_length" bars, pickled as if saved in a previous period, and then updated bar by bar
+        - The bars until the R indicator started "origin_shift" bars later converges are also counted, as get_signal did with the X_train data """
+
+    # Set the close prices
+    closes = mid_df['Close'].to_numpy(dtype=float)
+
+    # Warm up the DC state, restore it from its pickled bytes and time its updates bar by bar
+    dc_state = tf.directional_change_state(theta)
+    warmup_values = dc_state.update_many(closes[:warmup_length])
+    dc_state = pickle.loads(pickle.dumps(dc_state, protocol=pickle.HIGHEST_PROTOCOL))
+    start_time = time.perf_counter()
+    new_values = [dc_state.update(close) for close in closes[warmup_length:]]
+    update_seconds = (time.perf_counter() - start_time)/(len(closes)-warmup_length)
+    streaming_values = np.concatenate([warmup_values, new_values])
+
+    # Compile the numba kernel before timing the batch R indicator for the last bar, as it was created per period
+    tf.directional_change_events(mid_df[['Close']].iloc[:10], theta)
+    start_time = time.perf_counter()
+    batch_values = tf.directional_change_events(mid_df[['Close']], theta, columns='R').values
+    batch_seconds = time.perf_counter() - start_time
+
+    # Get the positions in which the R indicator started some bars later differs from the streaming one
+    shifted_values = tf.directional_change_events(mid_df[['Close']].iloc[origin_shift:], theta, columns='R').values
+    different = np.flatnonzero(~np.isclose(streaming_values[origin_shift:], shifted_values, equal_nan=True))
+
+    benchmark_report(pd.DataFrame([[len(closes), update_seconds, batch_seconds, batch_seconds/update_seconds, different[-1]+1 if len(different) else 0]],
+                                  columns=['bars','update_seconds_per_bar','batch_seconds','speed_up','shifted_origin_bars_to_converge']))
+    np.testing.assert_array_equal(streaming_values, batch_values)
+    assert update_seconds < batch_seconds
+
+@pytest.fixture(scope='module')
+def years_mid_df(years=5):
+    """ Synthetic minute mid prices of "years" years without the weekends, as the downloaded historical data """
+    # Create the minute prices, one row per minute
+    df = tf.get_mid_series(create_minute_data(years*365*24*60, start='2019-01-06 17:00'))
+    # Drop the minutes from Friday 17:00 to Sunday 17:00
+    weekday, hour = df.index.weekday, df.index.hour
+    return df[~((weekday==5) | ((weekday==4) & (hour>=17)) | ((weekday==6) & (hour<17)))]
+
+@pytest.mark.parametrize('frequency', ['5min', '10min', '15min', '30min', '1h', '4h'])
+def test_resample_df_benchmark(years_mid_df, benchmark_report, frequency, start='17h00min'):
+    """ Time the vectorised resample_df against the original groupby version with five years of minute data """
+
+    # Time the vectorised and the groupby versions
+    start_time = time.perf_counter()
+    vectorised_df = tf.resample_df(years_mid_df, frequency, start)
+    vectorised_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    groupby_df = resample_df_groupby(years_mid_df, frequency, start)
+    groupby_seconds = time.perf_counter() - start_time
+
+    # Compare both outputs, the groupby high_first column is of object type
+    same_output = groupby_df.astype({'high_first':bool}).equals(vectorised_df)
+
+    benchmark_report(pd.DataFrame([[frequency, len(years_mid_df), len(vectorised_df), vectorised_seconds, groupby_seconds, groupby_seconds/vectorised_seconds, same_output]],
+                                  columns=['frequency','observations','bars','vectorised_seconds','groupby_seconds','speed_up','same_output']))
+    assert same_output
+    assert vectorised_seconds < groupby_seconds
+
+def test_bar_aggregator_benchmark(mid_df, market_open_time, benchmark_report, frequency='10min'):
+    """ Time the streaming bar aggregator updates against resampling all the minute data each period
+        - The minute mid prices are passed one at a time and the last partial bar is finished with flush """
+
+    # Time the resample_df bars from the market opening time, as they were created per period
+    start = f'{market_open_time.hour:02d}h{market_open_time.minute:02d}min'
+    start_time = time.perf_counter()
+    resampled_df = tf.resample_df(mid_df, frequency, start)
+    resample_seconds = time.perf_counter() - start_time
+    df = mid_df[mid_df.index>=resampled_df['Open_time'].iloc[0]]
+
+    # Time the observations passed one at a time
+    aggregator = tf.bar_aggregator(frequency, market_open_time)
+    observations = list(df[['Open','High','Low','Close']].itertuples())
+    start_time = time.perf_counter()
+    for observation in observations:
+        aggregator.update(*observation)
+    update_seconds = (time.perf_counter() - start_time)/len(observations)
+
+    # Finish the last partial bar, as resample_df returns it
+    aggregator.flush(df.index[-1] + pd.Timedelta(frequency))
+    same_output = aggregator.to_dataframe().equals(resampled_df)
+
+    benchmark_report(pd.DataFrame([[frequency, len(df), update_seconds, resample_seconds, resample_seconds/update_seconds, same_output]],
+                                  columns=['frequency','observations','update_seconds_per_observation','resample_seconds','speed_up','same_output']))
+    assert same_output
+    assert update_seconds < resample_seconds
+
+@pytest.mark.parametrize('use_numba', [True, False])
+def test_tree_ensemble_predictor_benchmark(benchmark_report, use_numba, rows_number=500, features_number=20, single_rows_number=50, seed=0):
+    """ Time the single-row predictions of the signal's classifier model with its array-based predictor against the model's own predictions
+        - The strategy classifier model is fitted with synthetic data, and a missing value checks the trees' missing values direction
+        - The numba kernel is compiled before it's timed and is skipped if numba isn't installed """
+
+    # Skip the numba kernel if numba isn't installed
+    if use_numba and (tf.njit is None):
+        pytest.skip('numba is not installed')
+
+    # Create the synthetic input and prediction features and fit the strategy classifier model
+    random_state = np.random.default_rng(seed)
+    X = pd.DataFrame(random_state.normal(size=(rows_number, features_number)).astype("float32"), columns=[f'feature_{i}' for i in range(features_number)])
+    y = np.where(X.sum(axis=1) + random_state.normal(size=rows_number) > 0, 1, -1)
+    model_object = stra.create_classifier_model(seed).fit(X, y)
+
+    # Set a missing value and get the model predictions
+    X.iloc[0, 0] = np.nan
+    model_proba, model_predictions = model_object.predict_proba(X), model_object.predict(X)
+
+    # Time the model single-row predictions
+    start_time = time.perf_counter()
+    for i in range(single_rows_number):
+        model_object.predict(X.iloc[[i]])
+    model_microseconds = (time.perf_counter() - start_time)/single_rows_number*1e6
+
+    # Time the model export to its array-based predictor
+    start_time = time.perf_counter()
+    predictor = tf.tree_ensemble_predictor(model_object, use_numba)
+    export_seconds = time.perf_counter() - start_time
+
+    # Compare the predictor predictions with the model ones, which also compiles the kernel
+    predictor_proba = predictor.predict_proba(X)
+    same_output = np.array_equal(predictor_proba, model_proba) and np.array_equal(predictor.predict(X), model_predictions)
+
+    # Time the predictor single-row predictions
+    start_time = time.perf_counter()
+    for i in range(single_rows_number):
+        predictor.predict(X.iloc[[i]])
+    predictor_microseconds = (time.perf_counter() - start_time)/single_rows_number*1e6
+
+    benchmark_report(pd.DataFrame([['numba' if use_numba else 'numpy', len(predictor.arrays['feature']), export_seconds, model_microseconds, predictor_microseconds,
+                                    model_microseconds/predictor_microseconds, np.abs(predictor_proba-model_proba).max(), same_output]],
+                                  columns=['kernel','nodes_number','export_seconds','model_microseconds','predictor_microseconds','speed_up','max_proba_difference','same_output']))
+    assert same_output
+    assert predictor_microseconds < model_microseconds
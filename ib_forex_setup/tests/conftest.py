@@ -0,0 +1,66 @@
+# Import the necessary libraries
+import os
+import sys
+import pytest
+import pandas as pd
+
+# Add the setup modules and the strategy file to the import path, as the trading setup imports them
+folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(folder, 'src'), os.path.join(folder, 'samples')]
+
+import trading_functions as tf
+from synthetic_data import create_minute_data
+
+# Create a list to save the benchmark results, they're shown at the end of the test session
+benchmark_results = list()
+
+def pytest_configure(config):
+    """ Register the benchmark marker """
+    config.addinivalue_line('markers', 'benchmark: timing benchmarks of the setup computations, run them with "-m benchmark"')
+
+def pytest_collection_modifyitems(config, items):
+    """ Skip the benchmarks unless they're selected with the marker expression, they take minutes """
+    if 'benchmark' in (config.getoption('markexpr') or ''):
+        return
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(pytest.mark.skip(reason='benchmark, run it with "-m benchmark"'))
+
+def pytest_terminal_summary(terminalreporter):
+    """ Show the benchmark results """
+    for name, results_df in benchmark_results:
+        terminalreporter.write_sep('=', name)
+        terminalreporter.write_line(results_df.to_string())
+
+@pytest.fixture
+def benchmark_report(request):
+    """ Function to save a benchmark results dataframe, shown at the end of the test session """
+    return lambda results_df: benchmark_results.append((request.node.name, results_df))
+
+@pytest.fixture(scope='session')
+def market_open_time():
+    """ The synthetic data's first market open datetime """
+    return pd.Timestamp('2024-01-07 17:00').to_pydatetime()
+
+@pytest.fixture(scope='session')
+def minute_df():
+    """ Synthetic BID and ASK minute prices, about four weeks of minutes """
+    return create_minute_data(40000)
+
+@pytest.fixture(scope='session')
+def mid_df(minute_df):
+    """ The synthetic minute mid prices """
+    return tf.get_mid_series(minute_df)
+
+@pytest.fixture(scope='session')
+def bars_df(mid_df):
+    """ The synthetic 10-minute bars as resample_df creates them """
+    return tf.resample_df(mid_df, '10min', '17h00min')
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    """ A temporary working folder with the trading setup data folders """
+    os.makedirs(tmp_path / 'data' / 'models')
+    os.makedirs(tmp_path / 'data' / 'log')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
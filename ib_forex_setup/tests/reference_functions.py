@@ -0,0 +1,373 @@
+# Import the necessary libraries
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from ta.volatility import AverageTrueRange, BollingerBands, DonchianChannel, KeltnerChannel, UlcerIndex
+from ta.trend import ADXIndicator, AroonIndicator, CCIIndicator, DPOIndicator, EMAIndicator, IchimokuIndicator, \
+    KSTIndicator, MACD, MassIndex, PSARIndicator, SMAIndicator, STCIndicator, TRIXIndicator, VortexIndicator
+from ta.momentum import AwesomeOscillatorIndicator, KAMAIndicator, PercentagePriceOscillator, ROCIndicator, \
+    RSIIndicator, StochasticOscillator, StochRSIIndicator, TSIIndicator, UltimateOscillator, WilliamsRIndicator
+from ta.others import CumulativeReturnIndicator, DailyLogReturnIndicator, DailyReturnIndicator
+
+def get_ta_window_indicators(df, window):
+    """ Function to compute the window-size-based technical indicators with the "ta" library """
+
+    # Set the OHLC series
+    high, low, close = df['High'], df['Low'], df['Close']
+
+    # Create a dictionary to save the technical indicators
+    indicators = {}
+
+    # Bollinger Bands
+    indicator_bb = BollingerBands(close=close, window=window, window_dev=2)
+    indicators['volatility_bbm'] = indicator_bb.bollinger_mavg()
+    indicators['volatility_bbh'] = indicator_bb.bollinger_hband()
+    indicators['volatility_bbl'] = indicator_bb.bollinger_lband()
+    indicators['volatility_bbw'] = indicator_bb.bollinger_wband()
+    indicators['volatility_bbp'] = indicator_bb.bollinger_pband()
+    indicators['volatility_bbhi'] = indicator_bb.bollinger_hband_indicator()
+    indicators['volatility_bbli'] = indicator_bb.bollinger_lband_indicator()
+
+    # Keltner Channel
+    indicator_kc = KeltnerChannel(close=close, high=high, low=low, window=window)
+    indicators['volatility_kcc'] = indicator_kc.keltner_channel_mband()
+    indicators['volatility_kch'] = indicator_kc.keltner_channel_hband()
+    indicators['volatility_kcl'] = indicator_kc.keltner_channel_lband()
+    indicators['volatility_kcw'] = indicator_kc.keltner_channel_wband()
+    indicators['volatility_kcp'] = indicator_kc.keltner_channel_pband()
+    indicators['volatility_kchi'] = indicator_kc.keltner_channel_hband_indicator()
+    indicators['volatility_kcli'] = indicator_kc.keltner_channel_lband_indicator()
+
+    # Donchian Channel
+    indicator_dc = DonchianChannel(high=high, low=low, close=close, window=window, offset=0)
+    indicators['volatility_dcl'] = indicator_dc.donchian_channel_lband()
+    indicators['volatility_dch'] = indicator_dc.donchian_channel_hband()
+    indicators['volatility_dcm'] = indicator_dc.donchian_channel_mband()
+    indicators['volatility_dcw'] = indicator_dc.donchian_channel_wband()
+    indicators['volatility_dcp'] = indicator_dc.donchian_channel_pband()
+
+    # Average True Range
+    indicators['volatility_atr'] = AverageTrueRange(close=close, high=high, low=low, window=window).average_true_range()
+
+    # Ulcer Index
+    indicators['volatility_ui'] = UlcerIndex(close=close, window=window).ulcer_index()
+
+    # SMA and EMA
+    indicators['trend_sma'] = SMAIndicator(close=close, window=window).sma_indicator()
+    indicators['trend_ema'] = EMAIndicator(close=close, window=window).ema_indicator()
+
+    # Vortex Indicator
+    indicator_vortex = VortexIndicator(high=high, low=low, close=close, window=window)
+    indicators['trend_vortex_ind_pos'] = indicator_vortex.vortex_indicator_pos()
+    indicators['trend_vortex_ind_neg'] = indicator_vortex.vortex_indicator_neg()
+    indicators['trend_vortex_ind_diff'] = indicator_vortex.vortex_indicator_diff()
+
+    # TRIX Indicator
+    indicators['trend_trix'] = TRIXIndicator(close=close, window=window).trix()
+
+    # DPO Indicator
+    indicators['trend_dpo'] = DPOIndicator(close=close, window=window).dpo()
+
+    # Average Directional Movement Index (ADX)
+    indicator_adx = ADXIndicator(high=high, low=low, close=close, window=window)
+    indicators['trend_adx'] = indicator_adx.adx()
+    indicators['trend_adx_pos'] = indicator_adx.adx_pos()
+    indicators['trend_adx_neg'] = indicator_adx.adx_neg()
+
+    # CCI Indicator
+    indicators['trend_cci'] = CCIIndicator(high=high, low=low, close=close, window=window, constant=0.015).cci()
+
+    # Aroon Indicator
+    indicator_aroon = AroonIndicator(high=high, low=low, window=window)
+    indicators['trend_aroon_up'] = indicator_aroon.aroon_up()
+    indicators['trend_aroon_down'] = indicator_aroon.aroon_down()
+    indicators['trend_aroon_ind'] = indicator_aroon.aroon_indicator()
+
+    # Relative Strength Index (RSI)
+    indicators['momentum_rsi'] = RSIIndicator(close=close, window=window).rsi()
+
+    # Stoch RSI (StochRSI)
+    indicator_srsi = StochRSIIndicator(close=close, window=window, smooth1=3, smooth2=3)
+    indicators['momentum_stoch_rsi'] = indicator_srsi.stochrsi()
+    indicators['momentum_stoch_rsi_k'] = indicator_srsi.stochrsi_k()
+    indicators['momentum_stoch_rsi_d'] = indicator_srsi.stochrsi_d()
+
+    # Stoch Indicator
+    indicator_so = StochasticOscillator(high=high, low=low, close=close, window=window, smooth_window=3)
+    indicators['momentum_stoch'] = indicator_so.stoch()
+    indicators['momentum_stoch_signal'] = indicator_so.stoch_signal()
+
+    # Williams R Indicator
+    indicators['momentum_wr'] = WilliamsRIndicator(high=high, low=low, close=close, lbp=window).williams_r()
+
+    # Rate Of Change
+    indicators['momentum_roc'] = ROCIndicator(close=close, window=window).roc()
+
+    # KAMA
+    indicators['momentum_kama'] = KAMAIndicator(close=close, window=window, pow1=2, pow2=30).kama()
+
+    # Create the technical indicators dataframe
+    technical_features = pd.DataFrame(indicators, index=df.index)
+    # Modify the dataframe columns to distinguish them from other features with different window sizes
+    technical_features.columns = [f'{column}_{window}' for column in technical_features.columns.tolist()]
+
+    return technical_features
+
+def get_ta_fixed_indicators(df):
+    """ Function to compute the fixed technical indicators with the "ta" library """
+
+    # Set the OHLC series
+    high, low, close = df['High'], df['Low'], df['Close']
+
+    # Create a dictionary to save the technical indicators
+    indicators = {}
+
+    # MACD
+    indicator_macd = MACD(close=close, window_slow=26, window_fast=12, window_sign=9)
+    indicators['trend_macd'] = indicator_macd.macd()
+    indicators['trend_macd_signal'] = indicator_macd.macd_signal()
+    indicators['trend_macd_diff'] = indicator_macd.macd_diff()
+
+    # Mass Index
+    indicators['trend_mass_index'] = MassIndex(high=high, low=low, window_fast=9, window_slow=25).mass_index()
+
+    # KST Indicator
+    indicator_kst = KSTIndicator(close=close, roc1=10, roc2=15, roc3=20, roc4=30, \
+                                 window1=10, window2=10, window3=10, window4=15, nsig=9)
+    indicators['trend_kst'] = indicator_kst.kst()
+    indicators['trend_kst_sig'] = indicator_kst.kst_sig()
+    indicators['trend_kst_diff'] = indicator_kst.kst_diff()
+
+    # Ichimoku Indicator
+    indicator_ichi = IchimokuIndicator(high=high, low=low, window1=9, window2=26, window3=52, visual=False)
+    indicators['trend_ichimoku_conv'] = indicator_ichi.ichimoku_conversion_line()
+    indicators['trend_ichimoku_base'] = indicator_ichi.ichimoku_base_line()
+    indicators['trend_ichimoku_a'] = indicator_ichi.ichimoku_a()
+    indicators['trend_ichimoku_b'] = indicator_ichi.ichimoku_b()
+
+    # Ichimoku Visual Indicator
+    indicator_ichi_visual = IchimokuIndicator(high=high, low=low, window1=9, window2=26, window3=52, visual=True)
+    indicators['trend_visual_ichimoku_a'] = indicator_ichi_visual.ichimoku_a()
+    indicators['trend_visual_ichimoku_b'] = indicator_ichi_visual.ichimoku_b()
+
+    # Schaff Trend Cycle (STC)
+    indicators['trend_stc'] = STCIndicator(close=close, window_slow=50, window_fast=23, cycle=10, smooth1=3, smooth2=3).stc()
+
+    # PSAR Indicator
+    indicator_psar = PSARIndicator(high=high, low=low, close=close, step=0.02, max_step=0.20)
+    indicators['trend_psar_up'] = indicator_psar.psar_up()
+    indicators['trend_psar_down'] = indicator_psar.psar_down()
+    indicators['trend_psar_up_indicator'] = indicator_psar.psar_up_indicator()
+    indicators['trend_psar_down_indicator'] = indicator_psar.psar_down_indicator()
+
+    # TSI Indicator
+    indicators['momentum_tsi'] = TSIIndicator(close=close, window_slow=25, window_fast=13).tsi()
+
+    # Ultimate Oscillator
+    indicators['momentum_uo'] = UltimateOscillator(high=high, low=low, close=close, window1=7, window2=14, window3=28, \
+                                                   weight1=4.0, weight2=2.0, weight3=1.0).ultimate_oscillator()
+
+    # Awesome Oscillator
+    indicators['momentum_ao'] = AwesomeOscillatorIndicator(high=high, low=low, window1=5, window2=34).awesome_oscillator()
+
+    # Percentage Price Oscillator
+    indicator_ppo = PercentagePriceOscillator(close=close, window_slow=26, window_fast=12, window_sign=9)
+    indicators['momentum_ppo'] = indicator_ppo.ppo()
+    indicators['momentum_ppo_signal'] = indicator_ppo.ppo_signal()
+    indicators['momentum_ppo_hist'] = indicator_ppo.ppo_hist()
+
+    # Daily Return, Daily Log Return and Cumulative Return
+    indicators['others_dr'] = DailyReturnIndicator(close=close).daily_return()
+    indicators['others_dlr'] = DailyLogReturnIndicator(close=close).daily_log_return()
+    indicators['others_cr'] = CumulativeReturnIndicator(close=close).cumulative_return()
+
+    # Create the technical indicators dataframe
+    technical_features = pd.DataFrame(indicators, index=df.index)
+
+    return technical_features
+
+def directional_change_events_loop(data, theta=0.004, columns=None):
+    """ Function to create the DC indicators with the original row-by-row loop, used as the tests reference """
+
+    # Copy the dataframe
+    data = data.copy()
+
+    # Create the necessary columns and variables
+    data["Event"] = 0.0
+
+    # Set the initial event variable value
+    event = "upward" # initial event
+
+    # Set the initial value for low and high prices
+    ph = data['Close'].iloc[0] # highest price
+    pl = data['Close'].iloc[0] # lowest price
+
+    # Create loop to run through each date
+    for t in range(0, len(data.index)):
+        # Check if we're on a downward trend
+        if event == "downward":
+            # Check if the close price is higher than the low price by the theta threshold
+            if data["Close"].iloc[t] >= pl * (1 + theta):
+                # Set the event variable to upward
+                event = "upward"
+                # Set the high price as the current close price                
+                ph = data["Close"].iloc[t]
+            # If the close price is lower than the low price by the theta threshold
+            else:
+                # Check if the close price is less than the low price
+                if data["Close"].iloc[t] < pl:
+                    # Set the low price as the current close price
+                    pl = data["Close"].iloc[t]
+                    # Set the Event to upward for the current period
+                    data["Event"].iloc[t] = 1
+        # Check if we're on an upward trend
+        elif event == "upward":
+            # Check if the close price is less than the high price by the theta threshold
+            if data["Close"].iloc[t] <= ph * (1 - theta):  
+                # Set the event variable to downward
+                event = "downward"
+                # Set the low price as the current close price
+                pl = data["Close"].iloc[t]
+            # If the close price is higher than the high price by the theta threshold
+            else:
+                # Check if the close price is higher than the high price
+                if data["Close"].iloc[t] > ph:
+                    # Set the high price as the current close price
+                    ph = data["Close"].iloc[t]
+                    # Set the Event to downward for the current period
+                    data["Event"].iloc[t] = -1
+
+    # Set the peak and trough prices and forward-fill the column
+    data['peak_trough_prices'] = np.where(data['Event']!=0, data['Close'],0)
+    data['peak_trough_prices'].replace(to_replace=0, method='ffill', inplace=True)
+
+    # Count the number of periods between a peak and a trough
+    data['count'] = 0
+    for i in range(1,len(data.index)):
+        if data['Event'].iloc[(i-1)]!=0:
+            data['count'].iloc[i] = 1+data['count'].iloc[(i-1)]
+        else:
+            data['count'].iloc[i] = 1
+
+    # Compute the TMV indicator
+    data['TMV'] = np.where(data['Event']!=0, abs(data['peak_trough_prices']-data['peak_trough_prices'].shift())/\
+                          (data['peak_trough_prices'].shift()*theta),0)
+
+    # Compute the time-completion-for-a-trend indicator
+    data['T'] = np.where(data['Event']!=0, data['count'],0)
+
+    # Compute the time-adjusted-return indicator and forward-fill it
+    data['R'] = np.where(data['Event']!=0, np.log(data['TMV']/data['T']*theta),0)
+    data['R'] = data['R'].replace(to_replace=0, method='ffill')
+
+    # Drop NaN or infinite values
+    data.replace([np.inf, -np.inf], np.nan, inplace=True)
+    
+    if columns is None:
+        return data
+    else:
+        return data[columns]
+
+def resample_df_groupby(dfraw,frequency,start='00h00min'):
+    ''' Function to resample the data with the original groupby and idxmax/idxmin lambdas, kept as a reference'''
+    # Copy the dataframe
+    df = dfraw.copy()   
+    # Get the start hour
+    hour=int(start[0:2])
+    # Get the start minute time    
+    minutes=int(start[3:5])
+    
+    # Set the first day of the new dataframe
+    origin = df[(df.index.hour==hour) & (df.index.minute==minutes)].index[0]
+    # Subset the dataframe from the origin onwards
+    df = df[df.index>=origin]
+    # Create a datetime column based on the index
+    df['datetime'] = df.index
+    # Create a new dataframe
+    df2 = (df.groupby(pd.Grouper(freq=frequency, origin=df.index[0]))
+           # Resample the Open price
+            .agg(Open=('Open','first'),
+                 # Resample the Close price
+                 Close=('Close','last'),
+                 # Resample the High price
+                 High=('High','max'),
+                 # Resample the Low price
+                 Low=('Low','min'),
+                 # Get the High-price index
+                 High_time=('High', lambda x : np.nan if x.count() == 0 else x.idxmax()),
+                 # Get the Low-price index
+                 Low_time=('Low', lambda x : np.nan if x.count() == 0 else x.idxmin()),
+                 # Get the Open-price index
+                 Open_time=('datetime','first'),
+                 # Get the Close-price index
+                 Close_time=('datetime','last'))
+            # Create a column and set each row to True in case the high price index is sooner than the low price index
+            .assign(high_first = lambda x: x["High_time"] < x["Low_time"])
+            )
+    
+    final_df = df2.shift(1)
+        
+    if 'h' in frequency:
+        final_df.loc[df2.index[-1]+timedelta(hours=int(frequency[:frequency.find("h")])),:] = df2.loc[df2.index[-1],:]
+    else:
+        final_df.loc[df2.index[-1]+timedelta(minutes=int(frequency[:frequency.find("min")])),:] = df2.loc[df2.index[-1],:]
+        
+    final_df.dropna(inplace=True)
+        
+    return final_df
+
+def historical_data_loc(dfs, reqId, bar):
+    """ Function to save a bar with the original .loc assignments of the historicalData callbacks, kept as a reference """
+    dfs[f'{reqId}'].loc[bar.date,'close'] = bar.close
+    dfs[f'{reqId}'].loc[bar.date,'open'] = bar.open
+    dfs[f'{reqId}'].loc[bar.date,'high'] = bar.high
+    dfs[f'{reqId}'].loc[bar.date,'low'] = bar.low
+
+def read_trading_workbook(path):
+    """ Function to read the trading app dataframes from the Excel workbook as the trading app did, kept as a reference """
+    # Call the workbook
+    database = pd.ExcelFile(path)
+    dict_df = {}
+    for name in ['open_orders','orders_status','executions','commissions','positions','cash_balance','app_time_spent','periods_traded']:
+        # Load the sheet
+        dict_df[name] = database.parse(name, index_col=0)
+        # Convert the datetime index
+        if name not in ['app_time_spent','periods_traded']:
+            dict_df[name].index = pd.to_datetime(dict_df[name].index)
+    return dict_df
+
+def risk_management_lookups_masks(open_orders, orders_status, exec_df, pos_df, symbol, currency):
+    """ Function to get the risk management orders information with the original dataframe masks, kept as a reference """
+    # Get the last stop-loss, take-profit and market orders IDs
+    sl_order_id = int(open_orders[(open_orders["Symbol"]==symbol) & (open_orders["OrderType"]=='STP')]["OrderId"].sort_values(ascending=True).values[-1])
+    tp_order_id = int(open_orders[(open_orders["Symbol"]==symbol) & (open_orders["OrderType"]=='LMT')]["OrderId"].sort_values(ascending=True).values[-1])
+    mkt_order_id = int(open_orders[(open_orders["Symbol"]==symbol) & (open_orders["OrderType"]=='MKT')]["OrderId"].sort_values(ascending=True).values[-1])
+    return {'sl_order_id':sl_order_id, 'tp_order_id':tp_order_id, 'mkt_order_id':mkt_order_id,
+            'sl_filled_or_canceled_bool':(open_orders[open_orders['OrderId'] == sl_order_id]['Status'].str.contains('canceled').sum()==1) or \
+                                         (open_orders[open_orders['OrderId'] == sl_order_id]['Status'].str.contains('Filled').sum()==1),
+            'tp_filled_or_canceled_bool':(open_orders[open_orders['OrderId'] == tp_order_id]['Status'].str.contains('canceled').sum()==1) or \
+                                         (open_orders[open_orders['OrderId'] == tp_order_id]['Status'].str.contains('Filled').sum()==1),
+            'sl_remaining':float(orders_status[orders_status['OrderId'] == sl_order_id]['Remaining'].values[-1]),
+            'sl_remaining_datetime':pd.Timestamp(orders_status[orders_status['OrderId'] == sl_order_id].index.values[-1]),
+            'sl_average_price':pd.to_numeric(exec_df[exec_df['OrderId'] == sl_order_id]['AvPrice'].values[-1]),
+            'sl_order_price':float(open_orders[open_orders['OrderId'] == sl_order_id]['AuxPrice'].sort_values(ascending=True).values[-1]),
+            'tp_order_price':float(open_orders[open_orders['OrderId'] == tp_order_id]['LmtPrice'].sort_values(ascending=True).values[-1]),
+            'market_order_price':float(orders_status[(orders_status['OrderId'] == mkt_order_id) & (orders_status['Status'] == 'Filled')]['AvgFillPrice'].sort_values(ascending=True).values[-1]),
+            'previous_quantity':pos_df[(pos_df['Symbol']==symbol) & (pos_df['Currency']==currency)]["Position"].iloc[-1]}
+
+def risk_management_lookups_index(order_state, symbol, currency):
+    """ Function to get the risk management orders information with the order state index """
+    # Get the last stop-loss, take-profit and market orders IDs
+    sl_order_id = order_state.get_latest_order_id(symbol, 'STP')
+    tp_order_id = order_state.get_latest_order_id(symbol, 'LMT')
+    mkt_order_id = order_state.get_latest_order_id(symbol, 'MKT')
+    return {'sl_order_id':sl_order_id, 'tp_order_id':tp_order_id, 'mkt_order_id':mkt_order_id,
+            'sl_filled_or_canceled_bool':('canceled' in str(order_state.get(sl_order_id, 'open_status'))) or ('Filled' in str(order_state.get(sl_order_id, 'open_status'))),
+            'tp_filled_or_canceled_bool':('canceled' in str(order_state.get(tp_order_id, 'open_status'))) or ('Filled' in str(order_state.get(tp_order_id, 'open_status'))),
+            'sl_remaining':float(order_state.get(sl_order_id, 'remaining')),
+            'sl_remaining_datetime':pd.Timestamp(order_state.get(sl_order_id, 'status_datetime')),
+            'sl_average_price':pd.to_numeric(order_state.get(sl_order_id, 'av_price')),
+            'sl_order_price':float(order_state.get(sl_order_id, 'aux_price')),
+            'tp_order_price':float(order_state.get(tp_order_id, 'lmt_price')),
+            'market_order_price':float(order_state.get(mkt_order_id, 'filled_price')),
+            'previous_quantity':order_state.get_position(symbol, currency)}
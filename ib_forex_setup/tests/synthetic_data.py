@@ -0,0 +1,293 @@
+# Import the necessary libraries
+import io
+import os
+import shutil
+import socket
+import inspect
+import logging
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+from threading import Thread
+from datetime import datetime, timedelta
+import trading_functions as tf
+import store_functions as stf
+import ib_functions as ibf
+from ibapi import comm
+from ibapi.common import BarData
+from ibapi.order_state import OrderState
+from ibapi.execution import Execution
+from ibapi.commission_report import CommissionReport
+from setup import trading_app
+
+def create_minute_data(minutes_number, start='2024-01-07 17:00', spread=5e-5, seed=0):
+    """ Function to create synthetic BID and ASK minute prices as the downloaded historical data """
+    # Set the random generator
+    rng = np.random.default_rng(seed)
+    # Create the minute datetimes and the mid prices
+    index = pd.date_range(start, periods=minutes_number, freq='1min')
+    mid = 1.1*np.exp(np.cumsum(rng.normal(0, 2e-4, minutes_number)))
+    # Create the OHLC mid prices
+    open_prices, close_prices = mid*(1+rng.normal(0, 5e-5, minutes_number)), mid*(1+rng.normal(0, 5e-5, minutes_number))
+    high_prices = np.maximum(open_prices, close_prices)*(1+np.abs(rng.normal(0, 5e-5, minutes_number)))
+    low_prices = np.minimum(open_prices, close_prices)*(1-np.abs(rng.normal(0, 5e-5, minutes_number)))
+    # Create the BID and ASK prices around the mid prices
+    return pd.DataFrame({'bid_open':open_prices-spread, 'bid_high':high_prices-spread, 'bid_low':low_prices-spread, 'bid_close':close_prices-spread,
+                         'ask_open':open_prices+spread, 'ask_high':high_prices+spread, 'ask_low':low_prices+spread, 'ask_close':close_prices+spread}, index=index)
+
+def create_synthetic_bars(bars_number, seed=0):
+    """ Function to create synthetic minute bars as the IB API sends them """
+    # Create the close prices
+    closes = 1.1*np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 2e-4, bars_number)))
+    # Create the bar dates
+    dates = pd.date_range('2024-01-08 00:00', periods=bars_number, freq='1min').strftime('%Y%m%d %H:%M:%S US/Eastern')
+    # Create the bars
+    bars = list()
+    for date, close in zip(dates, closes):
+        bar = BarData()
+        bar.date, bar.open, bar.high, bar.low, bar.close = date, close, close*1.0001, close*0.9999, close
+        bars.append(bar)
+    return bars
+
+def create_synthetic_callbacks(events_number):
+    """ Function to create the synthetic arguments of the trading app callbacks as the IB API sends them """
+    # Create the forex contract
+    contract = ibf.ForexContract('EURUSD')
+    # Create a dictionary to save the arguments of each callback
+    callbacks = {'openOrder':[], 'orderStatus':[], 'execDetails':[], 'commissionReport':[], 'position':[], 'updateAccountValue':[]}
+    for i in range(events_number):
+        # Create the order and its state
+        order, order_state = ibf.stopOrder('BUY', 10000, 1.1+i*1e-5), OrderState()
+        order.permId, order.clientId, order.account, order_state.status = 1000+i, 1, 'DU000000', 'PreSubmitted'
+        callbacks['openOrder'].append((i, contract, order, order_state))
+        callbacks['orderStatus'].append((i, 'PreSubmitted', 0.0, 10000.0, 0.0, 1000+i, 0, 0.0, 1, '', 0.0))
+        # Create the execution and its commission report
+        execution, commission_report = Execution(), CommissionReport()
+        execution.orderId, execution.permId, execution.execId, execution.side = i, 1000+i, f'0000e0d5.{i}.01.01', 'BOT'
+        execution.price, execution.avgPrice, execution.cumQty, execution.shares = 1.1, 1.1, 10000.0, 10000.0
+        execution.time, execution.orderRef = '20240108 10:00:00 US/Eastern', ''
+        commission_report.execId, commission_report.commission, commission_report.currency, commission_report.realizedPNL = execution.execId, 2.0, 'USD', 1.0
+        callbacks['execDetails'].append((0, contract, execution))
+        callbacks['commissionReport'].append((commission_report,))
+        callbacks['position'].append(('DU000000', contract, 10000.0*i, 1.1))
+        callbacks['updateAccountValue'].append((f'key_{i}', str(i), 'BASE', 'DU000000'))
+    return callbacks
+
+def create_synthetic_trading_database(weeks, periods_per_week=120, seed=0):
+    """ Function to create the trading app dataframes of several weeks of hourly periods as the trading app saves them """
+
+    # Set the random generator
+    rng = np.random.default_rng(seed)
+    # Set the first week's market open datetime
+    first_open = pd.Timestamp('2024-01-07 17:00:00')
+    # Create the lists to save the rows of each dataframe
+    rows = {name:[] for name in ['open_orders','orders_status','executions','commissions','positions','cash_balance','periods_traded']}
+    for week in range(weeks):
+        # Set the week's market open and close datetimes
+        market_open_time = first_open + pd.Timedelta(weeks=week)
+        market_close_time = market_open_time + pd.Timedelta(days=5)
+        for period in range(periods_per_week):
+            # Set the period datetime and the order IDs
+            period_time = market_open_time + pd.Timedelta(hours=period)
+            order_id = 3*(week*periods_per_week+period)
+            price = 1.1 + rng.normal(0, 0.01)
+            # The market order is filled and the stop-loss order is filled every two periods
+            filled = [True, period%2==1, False]
+            for i, (order_type, lmt_price, aux_price) in enumerate([('MKT', 0.0, 0.0), ('STP', 0.0, price-0.005), ('LMT', price+0.005, 0.0)]):
+                rows['open_orders'].append([period_time, 1000+order_id+i, 1, order_id+i, 'DU000000', 'EUR', 'CASH', 'IDEALPRO', 'BUY' if i==0 else 'SELL', order_type, \
+                                            10000.0, np.nan, lmt_price, aux_price, 'Filled' if filled[i] else 'PreSubmitted', market_open_time, market_close_time])
+                rows['orders_status'].append([period_time, order_id+i, 'Filled' if filled[i] else 'PreSubmitted', 10000.0 if filled[i] else 0.0, 1000+order_id+i, 1, \
+                                              0.0 if filled[i] else 10000.0, price if filled[i] else 0.0, price if filled[i] else 0.0, market_open_time, market_close_time])
+                # Save the execution and commission of the filled orders
+                if filled[i]:
+                    rows['executions'].append([period_time, order_id+i, 1000+order_id+i, f'0000e0d5.{order_id+i}.01.01', 'EUR', 'BOT' if i==0 else 'SLD', price, price, 10000.0, 'USD', 'CASH', \
+                                               10000.0, period_time, 1, '', market_open_time, market_close_time])
+                    rows['commissions'].append([period_time, f'0000e0d5.{order_id+i}.01.01', 2.0, 'USD', np.nan if i==0 else rng.normal(0, 10), market_open_time, market_close_time])
+            rows['positions'].append([period_time, 'DU000000', 'EUR', 'CASH', 'USD', 10000.0, price, market_open_time, market_close_time])
+            rows['cash_balance'].append([period_time, 10000+rng.normal(0, 100), 1.0, float(rng.choice([-1, 0, 1])), market_open_time, market_close_time])
+            rows['periods_traded'].append([period_time, 1, market_open_time, market_close_time])
+
+    # Set the dataframes columns
+    columns = {'open_orders':['PermId', 'ClientId', 'OrderId', 'Account', 'Symbol', 'SecType', 'Exchange', 'Action', 'OrderType', 'TotalQty', \
+                              'CashQty', 'LmtPrice', 'AuxPrice', 'Status', 'market_open_time', 'market_close_time'],
+               'orders_status':["OrderId", "Status", "Filled", "PermId", "ClientId","Remaining", "AvgFillPrice", "LastFillPrice", 'market_open_time', 'market_close_time'],
+               'executions':["OrderId", "PermId", "ExecutionId", "Symbol", "Side", "Price", "AvPrice", "cumQty", "Currency", "SecType", "Position", "Execution Time", \
+                             "Last Liquidity", "OrderRef", 'market_open_time', 'market_close_time'],
+               'commissions':['ExecutionId', 'Commission', 'Currency', 'Realized PnL', 'market_open_time', 'market_close_time'],
+               'positions':['Account', 'Symbol', 'SecType', 'Currency', 'Position', 'Avg cost', 'market_open_time', 'market_close_time'],
+               'cash_balance':['value', 'leverage', 'signal', 'market_open_time', 'market_close_time']}
+
+    # Create the dataframes with the datetime index
+    dict_df = {name:pd.DataFrame([row[1:] for row in rows[name]], index=pd.DatetimeIndex([row[0] for row in rows[name]]), columns=columns[name]) for name in columns}
+    # Create the app time spent and the periods traded dataframes
+    dict_df['app_time_spent'] = pd.DataFrame({'seconds':[12.5]}, index=[0])
+    dict_df['periods_traded'] = pd.DataFrame(rows['periods_traded'], columns=['trade_time', 'trade_done', 'market_open_time', 'market_close_time'])
+
+    return dict_df, market_open_time
+
+def create_synthetic_trading_app(name, weeks=1, historical_data=None, train_span=1):
+    """ Function to create a trading app with a synthetic trading database, loaded from a temporary data folder
+        - The current period is two days after the last week's market open time
+        - The historical data has a single bar if it's None"""
+
+    # Create a temporary folder with the data files
+    folder = tempfile.mkdtemp()
+    current_folder = os.getcwd()
+    try:
+        os.makedirs(os.path.join(folder, 'data'))
+        # Save the trading database
+        dict_df, market_open_time = create_synthetic_trading_database(weeks)
+        stf.trading_journal(os.path.join(folder, 'data', 'database.db')).write(dict_df)
+        # Save the historical data and the optimal features
+        if historical_data is None:
+            historical_data = pd.DataFrame({'Close':[1.1]}, index=[market_open_time])
+        historical_data.tail(train_span).to_csv(os.path.join(folder, 'data', 'historical_data.csv'))
+        pd.DataFrame({'scalable_features':['Close'], 'final_features':['Close']}).to_excel(os.path.join(folder, 'data', 'optimal_features_df.xlsx'))
+        os.chdir(folder)
+
+        # Set the period datetimes
+        current_period = (market_open_time + pd.Timedelta(days=2)).to_pydatetime()
+        periods = get_synthetic_periods(market_open_time.to_pydatetime(), current_period)
+        app = trading_app(logging.getLogger(name), 'DU000000', 'USD', 'EURUSD', 'US/Eastern', '10min', 'historical_data.csv', 'app_base_df.csv', 1,
+                          0.003, 1, 2, 1, 1, *periods, train_span, 1, 6)
+    finally:
+        os.chdir(current_folder)
+        shutil.rmtree(folder)
+
+    return app
+
+def get_synthetic_periods(market_open_time, current_period):
+    """ Function to get the trading app period datetimes of a current period, in the trading app inputs order """
+    return [market_open_time, market_open_time+timedelta(days=5), current_period-timedelta(hours=12), current_period+timedelta(hours=12),
+            current_period+timedelta(hours=13), current_period, current_period-timedelta(minutes=10), current_period+timedelta(minutes=10)]
+
+class virtual_clock(tf.setup_clock):
+    ''' Class to simulate the setup clock, each sleep moves the now datetime forward at once
+        - Each sleep oversleeps latency_seconds as the OS timers do, so a sleep until a datetime ends after it
+        - Set spin_seconds to busy-wait instead of sleeping, each clock read then moves the now datetime forward spin_seconds
+        - The clock reads and the sleeps are counted '''
+
+    def __init__(self, start_datetime, spin_seconds=None, max_sleep=60, latency_seconds=0.001):
+
+        super().__init__(max_sleep, max_wake_ups=None)
+        # Set the virtual now datetime
+        self.current = start_datetime
+        # Set the seconds each sleep oversleeps
+        self.latency_seconds = latency_seconds
+        # Set the seconds each clock read takes if we busy-wait
+        self.spin_seconds = spin_seconds
+        # Set the clock reads and sleeps counts
+        self.reads = self.sleeps = 0
+
+    def now(self):
+        ''' Function to get the virtual now datetime '''
+        self.reads += 1
+        # Move the now datetime forward if we busy-wait
+        if self.spin_seconds is not None:
+            self.current += timedelta(seconds=self.spin_seconds)
+        return self.current
+
+    def sleep(self, seconds):
+        ''' Function to move the virtual now datetime forward a number of seconds '''
+        self.sleeps += 1
+        self.current += timedelta(seconds=seconds+self.latency_seconds)
+
+    def sleep_until(self, wake_up_datetime, event=''):
+        ''' Function to sleep, or busy-wait as the previous versions, until the wake-up datetime of an event '''
+        # Busy-wait as the previous versions
+        if self.spin_seconds is not None:
+            while self.now() <= wake_up_datetime: continue
+            self.wake_ups.append((event, wake_up_datetime, self.current))
+        else:
+            super().sleep_until(wake_up_datetime, event)
+
+def run_virtual_trading_week(engine, clock, timezone, data_frequency, local_restart_hour, app_seconds=30):
+    ''' Function to run the engine's trading setup loop for a week with a virtual clock
+        - The IB app isn't created, each run_app call only spends app_seconds and sleeps until the next period as the run_app function does
+        - It returns the list of run_app calls as (call datetime, current period) tuples '''
+
+    # Create a list to save the run_app calls
+    calls = list()
+
+    def run_app_virtual(*args, **kwargs):
+        # Get the run_app arguments by name
+        arguments = inspect.signature(engine_run_app).bind(*args, **kwargs).arguments
+        # Stop if the market has closed
+        if clock.now() >= arguments['market_close_time']:
+            calls.append((clock.current, None))
+            clock.sleep(app_seconds)
+            return
+        # Get the current and next periods
+        _, current_period, next_period = tf.get_the_closest_periods(clock.now(), data_frequency, arguments['trading_day_end_datetime'], arguments['previous_day_start_datetime'],
+                                                                     arguments['day_start_datetime'], arguments['market_close_time'])
+        calls.append((clock.current, current_period))
+        # Spend the app set-up and strategy time
+        clock.sleep(app_seconds)
+        # Sleep until the next period or the next trading day start as run_app does
+        if clock.now() < arguments['trading_day_end_datetime']:
+            clock.sleep_until(next_period, 'next period')
+        else:
+            clock.sleep_until(arguments['day_start_datetime'], 'day start')
+
+    # Replace the engine's run_app function while the loop runs
+    engine_run_app = engine.run_app
+    engine.run_app = run_app_virtual
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.run_trading_setup_loop('127.0.0.1', 7497, 'DU000000', 1, data_frequency, 23, local_restart_hour, timezone, clock.now(), 'USD', 'EURUSD', 1, 0.003, 1, 2,
+                                          'historical_data.csv', 'app_base_df.csv', 1, 1, 3500, 1, 6, True, clock)
+    finally:
+        engine.run_app = engine_run_app
+
+    return calls
+
+class simulated_ib_server():
+    ''' Class to simulate the IB server connection handshake on a local socket
+        - Each client receives the server version and the connection time, and then its next valid order ID once it starts the API
+        - The connections are kept open until the clients close them '''
+
+    def __init__(self, server_version=151, next_order_id=1):
+
+        # Set the server version and the next valid order ID sent to the clients
+        self.server_version = server_version
+        self.next_order_id = next_order_id
+        # Listen on a free local port
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen()
+        self.port = self.socket.getsockname()[1]
+        # Set the connections count
+        self.connections = 0
+        # Accept the connections in a separate thread
+        Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        ''' Function to accept the clients until the server is closed '''
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            Thread(target=self.serve, args=(connection,), daemon=True).start()
+
+    def serve(self, connection):
+        ''' Function to answer a client as the IB server does while connecting '''
+        with connection:
+            # Read the API prefix and the client versions, and send the server version and the connection time
+            connection.recv(1024)
+            connection.sendall(comm.make_msg(f"{self.server_version}\0{datetime.now().strftime('%Y%m%d %H:%M:%S')} EST\0"))
+            # Read the start API request and send the next valid order ID
+            connection.recv(1024)
+            connection.sendall(comm.make_msg(f'9\0{1}\0{self.next_order_id}\0'))
+            # Keep the connection open until the client closes it
+            try:
+                while connection.recv(1024):
+                    continue
+            except OSError:
+                return
+
+    def close(self):
+        ''' Function to stop accepting clients '''
+        self.socket.close()
@@ -0,0 +1,27 @@
+# Import the necessary libraries
+import pandas as pd
+from synthetic_data import virtual_clock, run_virtual_trading_week
+
+def test_event_scheduler_matches_busy_wait(data_folder, timezone='America/Lima', data_frequency='10min', local_restart_hour=23, spin_seconds=5):
+    """ The trading setup loop sleeping until each event trades the same periods as busy-waiting as the previous versions
+        - Both loops run a whole week with a virtual clock starting on a Saturday at noon
+        - The busy-waiting clock moves forward spin_seconds per clock read """
+
+    # Import the engine once the data folder exists, importing it creates the log file
+    import engine
+
+    # Set the start datetime on a Saturday
+    start_datetime = pd.Timestamp('2024-01-06 12:00').to_pydatetime()
+
+    # Run the week sleeping until each event and busy-waiting
+    sleeping_clock = virtual_clock(start_datetime)
+    sleeping_calls = run_virtual_trading_week(engine, sleeping_clock, timezone, data_frequency, local_restart_hour)
+    spinning_clock = virtual_clock(start_datetime, spin_seconds)
+    spinning_calls = run_virtual_trading_week(engine, spinning_clock, timezone, data_frequency, local_restart_hour)
+
+    # Check both loops trade the same periods, a whole week of them, and the scheduler reads the clock less
+    sleeping_periods = [period for _, period in sleeping_calls if period is not None]
+    assert sleeping_periods == [period for _, period in spinning_calls if period is not None]
+    assert len(sleeping_periods) > 500
+    assert sleeping_clock.reads < spinning_clock.reads
+    assert all(wake_up_datetime <= woken_datetime for _, wake_up_datetime, woken_datetime in sleeping_clock.wake_ups)
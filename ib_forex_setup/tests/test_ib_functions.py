@@ -0,0 +1,151 @@
+# Import the necessary libraries
+import io
+import logging
+import contextlib
+import pytest
+import pandas as pd
+import trading_functions as tf
+import ib_functions as ibf
+from threading import Event
+from ibapi.common import BarData
+from setup import trading_app
+from setup_for_download_data import app_for_download_data
+from synthetic_data import create_synthetic_bars, create_synthetic_callbacks, create_synthetic_trading_database
+from reference_functions import historical_data_loc, risk_management_lookups_masks, risk_management_lookups_index
+
+def test_bar_buffer_matches_loc_assignments():
+    """ The historicalData callbacks of both apps give the same dataframe as the original .loc assignments """
+
+    # Create the synthetic bars and the .loc assignments dataframe
+    bars = create_synthetic_bars(500)
+    dfs = {'0':pd.DataFrame()}
+    for bar in bars:
+        historical_data_loc(dfs, 0, bar)
+
+    # Create the trading app and the download app without connecting them
+    trading = trading_app.__new__(trading_app)
+    trading.new_df, trading.bar_buffer, trading.hist_data_events = {'0':pd.DataFrame()}, ibf.bar_buffer(), {'0':Event()}
+    trading.logging = logging.getLogger('test_bar_buffer')
+    download = app_for_download_data.__new__(app_for_download_data)
+    download.dfs, download.bar_buffer, download.events = {'0':pd.DataFrame()}, ibf.bar_buffer(), {'0':Event()}
+
+    for app, callback_df in [(trading, lambda: trading.new_df['0']), (download, lambda: download.dfs['0'])]:
+        # Pass the bars and end the request
+        for bar in bars:
+            app.historicalData(0, bar)
+        app.historicalDataEnd(0, '', '')
+        pd.testing.assert_frame_equal(callback_df(), dfs['0'])
+
+@pytest.mark.parametrize('callback, end_callback, end_args, name', [('openOrder', 'openOrderEnd', (), 'temp_open_orders'), ('orderStatus', 'openOrderEnd', (), 'temp_orders_status'),
+                                                                  ('execDetails', 'execDetailsEnd', (0,), 'temp_exec_df'), ('commissionReport', 'execDetailsEnd', (0,), 'temp_comm_df'),
+                                                                  ('position', 'positionEnd', (), 'temp_pos_df'), ('updateAccountValue', 'accountDownloadEnd', ('DU000000',), 'acc_update')])
+def test_callback_records_match_concatenations(callback, end_callback, end_args, name):
+    """ The callback records give the same dataframe as the original one-row dataframe concatenations """
+
+    # Create the trading app without connecting it
+    app = trading_app.__new__(trading_app)
+    app.logging = logging.getLogger('test_callback_records')
+    for table in ['temp_open_orders','temp_orders_status','temp_exec_df','temp_comm_df','temp_pos_df','acc_update']:
+        setattr(app, table, pd.DataFrame())
+    app.records = {table:[] for table in ['temp_open_orders','temp_orders_status','temp_exec_df','temp_comm_df','temp_pos_df','acc_update']}
+    app.order_state = ibf.order_state_index()
+    app.orders_request_event, app.executions_request_event = Event(), Event()
+    app.positions_request_event, app.account_update_event = Event(), Event()
+    app.order_events = {}
+
+    # Pass the callbacks and end the request
+    with contextlib.redirect_stdout(io.StringIO()):
+        for args in create_synthetic_callbacks(50)[callback]:
+            getattr(app, callback)(*args)
+        getattr(app, end_callback)(*end_args)
+    records_df = getattr(app, name)
+
+    # Concatenate the same records one row at a time
+    concat_df = pd.DataFrame()
+    for dictionary in records_df.to_dict('records'):
+        concat_df = pd.concat([concat_df, pd.DataFrame(dictionary, index=[0])], ignore_index=True)
+
+    assert len(records_df) == 50
+    pd.testing.assert_frame_equal(records_df.drop('datetime', axis=1), concat_df.drop('datetime', axis=1))
+
+def test_order_state_index_matches_masks():
+    """ The order state index gives the same risk management orders information as the original dataframe masks """
+
+    # Create the trading dataframes
+    dict_df, _ = create_synthetic_trading_database(2, periods_per_week=40)
+    open_orders, orders_status, exec_df, pos_df = dict_df['open_orders'], dict_df['orders_status'], dict_df['executions'], dict_df['positions']
+
+    # Create the index with the trading dataframes
+    order_state = ibf.order_state_index()
+    order_state.add_dataframes(open_orders, orders_status, exec_df, pos_df)
+
+    assert risk_management_lookups_index(order_state, 'EUR', 'USD') == risk_management_lookups_masks(open_orders, orders_status, exec_df, pos_df, 'EUR', 'USD')
+
+@pytest.mark.parametrize('data_frequency, open_time', [('10min', '2024-01-07 17:00'), ('1h', '2024-01-07 17:00'), ('15min', '2024-01-07 17:05')])
+def test_live_bar_feed_matches_resample_df(minute_df, data_frequency, open_time, train_span=200, periods=30, revisions=3):
+    """ The live bar feed gives the resample_df bars of the historical data downloaded every period
+        - The feed is started with the bars up to the first period and then receives every minute bar as "revisions" keepUpToDate updates per side, the last one with the final prices """
+
+    # Get the minute mid prices and the bars of the whole data
+    market_open_time = pd.Timestamp(open_time).to_pydatetime()
+    mid_df = tf.get_mid_series(minute_df)
+    start = f'{market_open_time.hour:02d}h{market_open_time.minute:02d}min'
+    resampled_df = tf.resample_df(mid_df, data_frequency, start)
+
+    # Set the first period after the first train_span bars and the next periods
+    current_periods = resampled_df.index[train_span:train_span+periods+1]
+
+    # Start the feed as update_hist_data does, with the finished bars and the minutes of the partial bar
+    feed = ibf.live_bar_feed(data_frequency, market_open_time, train_span)
+    downloaded_df = tf.resample_df(mid_df[mid_df.index <= current_periods[0]], data_frequency, start)
+    feed.start(downloaded_df[downloaded_df.index <= current_periods[0]], mid_df[mid_df.index == current_periods[0]])
+
+    # Create the BID and ASK updates of the minutes after the first period
+    minutes = minute_df[(minute_df.index > current_periods[0]) & (minute_df.index <= current_periods[-1])]
+    updates = list()
+    for time_, row in zip(minutes.index, minutes.itertuples(index=False)):
+        date = time_.strftime('%Y%m%d %H:%M:%S') + ' US/Eastern'
+        for k in range(1, revisions+1):
+            for reqId, side in [(0, 'bid'), (1, 'ask')]:
+                open_price, high_price, low_price, close_price = getattr(row, f'{side}_open'), getattr(row, f'{side}_high'), getattr(row, f'{side}_low'), getattr(row, f'{side}_close')
+                # Set the revised prices, the last revision has the final ones
+                if k < revisions:
+                    close_price = open_price + (close_price-open_price)*k/revisions
+                    high_price, low_price = max(open_price, close_price), min(open_price, close_price)
+                bar = BarData()
+                bar.date, bar.open, bar.high, bar.low, bar.close = date, open_price, high_price, low_price, close_price
+                updates.append((time_, reqId, bar))
+
+    # Pass the updates and check the bars once the first update of each next period arrives
+    next_check = 1
+    for time_, reqId, bar in updates:
+        feed.update(reqId, bar)
+        if (next_check < len(current_periods)) and (time_ >= current_periods[next_check]) and (feed.get_last_index() >= current_periods[next_check]):
+            pd.testing.assert_frame_equal(feed.to_dataframe(train_span), resampled_df.loc[:current_periods[next_check]].tail(train_span))
+            next_check += 1
+
+    # Check all the periods were finished
+    assert next_check == len(current_periods)
+
+def test_live_bar_feed_skips_late_revisions(minute_df, data_frequency='10min', train_span=50):
+    """ A late keepUpToDate revision of a flushed bar's last minute doesn't replace the flushed bar in the ring buffer """
+
+    # Start the feed with the finished bars and flush the next bar once its minutes have arrived
+    market_open_time = minute_df.index[0].to_pydatetime()
+    mid_df = tf.get_mid_series(minute_df)
+    resampled_df = tf.resample_df(mid_df.iloc[:(train_span+1)*10], data_frequency, '17h00min')
+    feed = ibf.live_bar_feed(data_frequency, market_open_time, train_span)
+    feed.start(resampled_df.iloc[:-1], mid_df.iloc[train_span*10:(train_span+1)*10])
+    feed.flush(resampled_df.index[-1])
+    pd.testing.assert_frame_equal(feed.to_dataframe(), resampled_df.tail(train_span))
+
+    # Send a late revision of the flushed bar's last minute and of the last downloaded bar's last minute
+    for time_ in [mid_df.index[(train_span+1)*10-1], mid_df.index[train_span*10-1]]:
+        for reqId in [0, 1]:
+            bar = BarData()
+            bar.date, bar.open, bar.high, bar.low, bar.close = time_.strftime('%Y%m%d %H:%M:%S') + ' US/Eastern', 2.0, 2.0, 2.0, 2.0
+            feed.update(reqId, bar)
+
+    # Flush the feed again in the next period and check the bars weren't replaced
+    feed.flush(resampled_df.index[-1] + pd.Timedelta(data_frequency))
+    pd.testing.assert_frame_equal(feed.to_dataframe(), resampled_df.tail(train_span))
@@ -0,0 +1,40 @@
+# Import the necessary libraries
+import pandas as pd
+from datetime import timedelta
+from synthetic_data import create_synthetic_trading_app, get_synthetic_periods
+
+def get_reset_periods(app, current_period):
+    """ Function to get the reset_period inputs of a current period of the app's week """
+    periods = get_synthetic_periods(app.market_open_time, current_period)
+    return periods[5], periods[6], periods[7], periods[0], periods[1], periods[2], periods[3], periods[4]
+
+def test_reset_period_keeps_the_app_state(bars_df):
+    """ A session app reset for a new period keeps the same state as a new app """
+
+    # Create the session app and reset it for the next periods
+    app = create_synthetic_trading_app('test_reset_period', weeks=2, historical_data=bars_df, train_span=500)
+    current_period = app.current_period
+    for i in range(1, 4):
+        app.reset_period(*get_reset_periods(app, current_period+timedelta(minutes=10*i)))
+
+    # Create a new app for the last period
+    new_app = create_synthetic_trading_app('test_reset_period', weeks=2, historical_data=bars_df, train_span=500)
+
+    # Check the session app state
+    assert app.historical_data.equals(new_app.historical_data) and app.open_orders.equals(new_app.open_orders)
+    assert app.current_period == current_period+timedelta(minutes=30) and (app.next_period == app.current_period+timedelta(minutes=10))
+    assert (app.order_events == {}) and (app.base_df_update is None) and (app.models_update == {}) and not app.strategy_end
+    assert pd.Timestamp(app.periods_traded['trade_time'].iloc[-1]) == app.current_period
+
+def test_reset_period_retries_add_one_period_row():
+    """ Resetting the session app several times for the same period adds a single periods_traded row """
+
+    # Create the session app and reset it three times for the next period
+    app = create_synthetic_trading_app('test_reset_period_retries')
+    periods_number, next_period = len(app.periods_traded), app.current_period+timedelta(minutes=10)
+    for _ in range(3):
+        app.reset_period(*get_reset_periods(app, next_period))
+
+    # Check the next period was added once
+    assert len(app.periods_traded) == periods_number+1
+    assert (pd.to_datetime(app.periods_traded['trade_time']) == app.current_period).sum() == 1
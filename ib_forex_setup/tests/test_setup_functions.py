@@ -0,0 +1,305 @@
+# Import the necessary libraries
+import io
+import os
+import time
+import pickle
+import shutil
+import contextlib
+import pandas as pd
+from datetime import timedelta
+from threading import Event, Thread, Timer
+from concurrent.futures import ThreadPoolExecutor
+from hmmlearn import hmm
+import strategy as stra
+import trading_functions as tf
+import store_functions as stf
+import ib_functions as ibf
+import setup_functions as sf
+from synthetic_data import create_synthetic_trading_app, virtual_clock
+
+def test_orders_sent_once_acknowledged(latency_seconds=0.05, rejections=1, next_order_id=100):
+    """ The orders of a new position are sent once IB acknowledges each request
+        - A simulated IB server answers each request after latency_seconds: nextValidId for reqIds, orderStatus for placeOrder and an error and orderStatus for cancelOrder
+        - The first "rejections" stop-loss orders are rejected with the 110 error, so the price retries are also checked """
+
+    # Create the trading app with the state to open a new long position and cancel the previous risk management orders
+    app = create_synthetic_trading_app('test_orders_sent_once_acknowledged')
+    app.previous_quantity, app.signal, app.current_quantity, app.last_value = 0, 1, 10000, 1.1
+    app.sl_order_id, app.tp_order_id = next_order_id-2, next_order_id-1
+    app.sl_filled_or_canceled_bool = app.tp_filled_or_canceled_bool = False
+
+    # Create the lists to save the orders sent and canceled
+    placed_orders, canceled_orders = list(), list()
+    rejections_left = [rejections]
+
+    # Answer each request after the latency as the IB server does
+    def reply(function, *args):
+        Timer(latency_seconds, function, args).start()
+    def place_order(order_id, contract, order):
+        placed_orders.append((order_id, order.orderType, order.auxPrice if order.orderType=='STP' else order.lmtPrice))
+        if (order.orderType=='STP') and (rejections_left[0] > 0):
+            rejections_left[0] -= 1
+            reply(app.error, order_id, 110, 'The price does not conform to the minimum price variation for this contract.')
+        else:
+            reply(app.orderStatus, order_id, 'Filled' if order.orderType=='MKT' else 'PreSubmitted', 0, order.totalQuantity, 0, 0, 0, 0, 0, '', 0)
+    def cancel_order(order_id, manual_cancel_order_time=''):
+        canceled_orders.append(order_id)
+        reply(app.error, order_id, 202, 'Order Canceled - reason:')
+        reply(app.orderStatus, order_id, 'Cancelled', 0, 0, 0, 0, 0, 0, 0, '', 0)
+    app.isConnected = lambda: True
+    app.reqIds = lambda num_ids: reply(app.nextValidId, next_order_id)
+    app.placeOrder = place_order
+    app.cancelOrder = cancel_order
+
+    # Send the orders as send_orders does with a new position
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        order_id = sf.request_order_id(app)
+        with ThreadPoolExecutor(2) as executor:
+            executors_list = [executor.submit(sf.cancel_risk_management_previous_orders, app),
+                              executor.submit(sf.send_orders_as_bracket, app, order_id, app.current_quantity, True, True, True)]
+        for x in executors_list:
+            x.result()
+    acknowledged_seconds = time.perf_counter() - start_time
+
+    # Check the orders: the market order, the rejected and retried stop-loss orders and the take-profit order
+    stop_loss_prices = [price for _, order_type, price in placed_orders if order_type=='STP']
+    assert order_id == next_order_id
+    assert sorted(canceled_orders) == [next_order_id-2, next_order_id-1]
+    assert [order[:2] for order in placed_orders] == [(next_order_id, 'MKT')] + [(next_order_id+1, 'STP')]*(rejections+1) + [(next_order_id+2, 'LMT')]
+    assert all(round(stop_loss_prices[i]+0.00001*(i+1), 5) == stop_loss_prices[i+1] for i in range(rejections))
+    assert len(app.order_events) == 0
+    # Check the orders weren't sent with the previous fixed sleeps: 2 seconds for the order ID and 3 seconds per order sent
+    assert acknowledged_seconds < 2 + 3*len(placed_orders)
+
+def test_update_capital_stops_at_the_deadline(timeout=0.05, max_wait=0.3):
+    """ The account update wait stops at its deadline if the account download end never arrives, and the app is disconnected so no orders are sent """
+
+    # Create the trading app, it stays connected until it's disconnected
+    app = create_synthetic_trading_app('test_update_capital_stops_at_the_deadline')
+    connected = [True]
+    requests = list()
+    app.isConnected = lambda: connected[0]
+    app.disconnect = lambda: connected.__setitem__(0, False)
+    app.reqAccountUpdates = lambda subscribe, account: requests.append(subscribe)
+
+    # Update the capital without the account values
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        updated = sf.update_capital(app, timeout, max_wait)
+    waited_seconds = time.perf_counter() - start_time
+
+    # Check the wait stopped at the deadline, the request was canceled and the app was disconnected
+    assert not updated and not app.isConnected()
+    assert requests == [True, False]
+    assert max_wait <= waited_seconds < max_wait + 1
+
+def test_midpoint_subscription_is_kept(latency_seconds=0.05, tick_seconds=0.1, periods=5, max_age=60):
+    """ The last value is read from the kept midpoint subscription, which is requested again once the last value is stale
+        - A simulated IB server sends the current midpoint latency_seconds after each subscription and then one every tick_seconds until it's canceled """
+
+    # Create the trading app
+    app = create_synthetic_trading_app('test_midpoint_subscription_is_kept')
+
+    # Count the subscriptions and cancellations
+    requests, cancellations = [0], [0]
+    # Set the threading event to stop the current subscription's ticks
+    subscription = {'stop':Event()}
+
+    # Send the midpoint ticks as the IB server does
+    def send_ticks(stop):
+        price = 1.1
+        stop.wait(latency_seconds)
+        while not stop.is_set():
+            app.tickByTickMidPoint(app.midpoint_id, int(time.time()), price)
+            price = round(price + 0.00001, 5)
+            stop.wait(tick_seconds)
+    def request_ticks(reqId, contract, tickType, numberOfTicks, ignoreSize):
+        requests[0] += 1
+        subscription['stop'] = Event()
+        Thread(target=send_ticks, args=(subscription['stop'],), daemon=True).start()
+    def cancel_ticks(reqId):
+        cancellations[0] += 1
+        subscription['stop'].set()
+    app.isConnected = lambda: True
+    app.reqTickByTickData = request_ticks
+    app.cancelTickByTickData = cancel_ticks
+
+    try:
+        # Read the last value once per period, only the first period subscribes
+        values = list()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(periods):
+                sf.update_asset_last_value(app, max_age)
+                values.append(app.last_value)
+            assert (requests[0] == 1) and (cancellations[0] == 0) and all(value > 0 for value in values)
+
+            # Set the last value as stale and read it again
+            app.last_value_time -= timedelta(seconds=max_age+1)
+            stale_value_time = app.last_value_time
+            sf.update_asset_last_value(app, max_age)
+    finally:
+        subscription['stop'].set()
+
+    # Check the app subscribed again and the stale value was replaced
+    assert (requests[0] == 2) and (cancellations[0] == 1)
+    assert (app.last_value_time > stale_value_time) and (app.last_value_count == 0)
+
+def test_precomputed_strategy_inputs(bars_df, market_open_time, data_folder, periods=3, max_window=6, test_span=50, train_span=1000, seed=0):
+    """ The strategy with its inputs prepared before the period starts gives the same signals and base_df rows as loading them in the period
+        - The feature engine is created without the last "periods" bars, which are then read from a live bar feed
+        - Both runs use a copy of the same data folder """
+
+    # Create the base_df store and the feature engine without the last bars
+    df = bars_df.iloc[-(train_span+500):]
+    os.makedirs(os.path.join('loaded', 'data', 'models'))
+    os.chdir('loaded')
+    base_df, final_input_features, _, engine = stra.create_feature_engine(df.iloc[:-periods].copy(), max_window, test_span, train_span)
+    base_df.index = pd.to_datetime(base_df.index)
+    stf.columnar_store('data/app_base_df').write(base_df)
+    with open('data/models/feature_engine.pickle', 'wb') as handle:
+        pickle.dump(engine, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Set the month and day strings of the model objects
+    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
+    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+
+    # Fit and save the HMM model and the classifier model with the first input features
+    hmm_model = hmm.GaussianHMM(n_components = 2, covariance_type = "diag", n_iter = 100, random_state = seed).fit(base_df['R'].dropna().values.reshape(-1,1))
+    X, y = tf.create_Xy(base_df, final_input_features, 'y')
+    model_object = stra.create_classifier_model(seed).fit(X[final_input_features[:20]].astype("float32"), y.astype("int32").values.ravel())
+    with open(f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(hmm_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(model_object, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Copy the data folder for the prepared run
+    shutil.copytree(os.path.join(data_folder, 'loaded', 'data'), os.path.join(data_folder, 'precomputed', 'data'))
+
+    # Create the trading apps, they read the bars from a live bar feed
+    apps = {}
+    for name in ['loaded', 'precomputed']:
+        app = create_synthetic_trading_app('test_precomputed_strategy_inputs')
+        app.isConnected = lambda: True
+        app.live_bars = True
+        app.market_open_time = market_open_time
+        app.train_span = train_span
+        app.final_input_features = final_input_features
+        apps[name] = app
+
+    # Run the strategy for each of the last periods
+    signals = {'loaded':[], 'precomputed':[]}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for current_period in df.index[-periods:]:
+            for name, app in apps.items():
+                os.chdir(os.path.join(data_folder, name))
+                # Set the period and the live bars up to its last bar
+                app.current_period = current_period
+                app.live_bar_feed = ibf.live_bar_feed(app.data_frequency, market_open_time, train_span)
+                app.live_bar_feed.start(df[df.index <= current_period].tail(train_span), pd.DataFrame(columns=['Open','High','Low','Close']))
+                # Prepare the strategy inputs before the period starts
+                if name == 'precomputed':
+                    sf.precompute_strategy_inputs(app, current_period)
+                    assert app.precomputed['period'] == current_period
+                # Run the strategy up to the signal, the HMM forward filter isn't saved before the orders are sent
+                hmm_filter_time = os.stat('data/models/hmm_filter.pickle').st_mtime_ns if os.path.exists('data/models/hmm_filter.pickle') else None
+                sf.strategy(app)
+                signals[name].append(app.signal)
+                assert hmm_filter_time == (os.stat('data/models/hmm_filter.pickle').st_mtime_ns if os.path.exists('data/models/hmm_filter.pickle') else None)
+                # Save the base_df rows, the feature engine and the HMM forward filter as save_data does
+                hmm_filter = app.models_update['data/models/hmm_filter.pickle']
+                sf.save_base_df_update(app)
+                with open('data/models/hmm_filter.pickle', 'rb') as handle:
+                    assert pickle.load(handle).last_index == hmm_filter.last_index
+                assert app.models_update == {}
+
+    # Check the signals and the base_df stores are the same, and the stores have the new rows
+    stores = [stf.columnar_store(os.path.join(data_folder, name, 'data', 'app_base_df')).read() for name in ['loaded', 'precomputed']]
+    assert signals['loaded'] == signals['precomputed']
+    pd.testing.assert_frame_equal(stores[0], stores[1])
+    assert stores[0].index[-1] > base_df.index[-1]
+
+def test_strategy_after_a_new_optimization(minute_df, market_open_time, data_folder, monkeypatch, periods=2, max_window=6, test_span=50, train_span=1000, seed=0):
+    """ The strategy runs with the features of a new optimization whose technical indicators' transforms are different from the previous one's
+        - The first optimization keeps the even technical indicators and the second one the odd ones, so the second one's features aren't in the previous base_df
+        - The Boruta-Shap selection is replaced by the first selected indicators, it takes minutes """
+
+    # Keep only the technical indicators of the optimization's parity
+    get_stationarity_transforms = stra.get_stationarity_transforms
+    parity = [0]
+    def get_parity_transforms(technical_features_df, test_span, batched=True):
+        transforms = get_stationarity_transforms(technical_features_df, test_span, batched)
+        return {indicator:transform for i, (indicator, transform) in enumerate(transforms.items()) if i%2 == parity[0]}
+    monkeypatch.setattr(stra, 'get_stationarity_transforms', get_parity_transforms)
+    monkeypatch.setattr(tf, 'library_boruta_shap', lambda X_train, y_train, seed, n_trials, date_loc_split: [feature for feature in X_train.columns if feature != 'states'][:10])
+
+    # Save the minute data up to the first trading period
+    bars_df = tf.resample_df(tf.get_mid_series(minute_df), '10min', '17h00min')
+    minute_df[minute_df.index < bars_df.index[-2*periods]].to_csv('data/minute_data.csv')
+
+    # Create the trading app, it reads the bars from a live bar feed
+    app = create_synthetic_trading_app('test_strategy_after_a_new_optimization')
+    app.isConnected = lambda: True
+    app.live_bars = True
+    app.market_open_time = market_open_time
+    app.max_window, app.test_span, app.train_span = max_window, test_span, train_span
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for parity[0], current_periods in [(0, bars_df.index[-2*periods:-periods]), (1, bars_df.index[-periods:])]:
+            # Optimize the strategy and load its features as the trading app does
+            stra.strategy_parameter_optimization(market_open_time, seed, [seed], '10min', max_window, 'data/minute_data.csv', app.base_df_address, 1, 1, train_span, test_span)
+            features_df = pd.read_excel('data/optimal_features_df.xlsx', index_col=0)
+            app.scalable_features = features_df['scalable_features'].dropna().tolist()
+            app.final_input_features = features_df['final_features'].dropna().tolist()
+            app.transforms = dict(zip(features_df['indicators'].dropna(), features_df['transforms'].dropna()))
+
+            # Run the strategy for the periods, each one after the other
+            for current_period in current_periods:
+                app.current_period = current_period
+                app.live_bar_feed = ibf.live_bar_feed(app.data_frequency, market_open_time, train_span)
+                app.live_bar_feed.start(bars_df[bars_df.index <= current_period].tail(train_span), pd.DataFrame(columns=['Open','High','Low','Close']))
+                app.signal = None
+                sf.strategy(app)
+                assert app.signal in [-1, 0, 1]
+
+    # Check the base_df store has the second optimization's features and the rows up to the last period, whose bar isn't complete
+    store_df = stf.columnar_store('data/app_base_df').read()
+    assert set(app.final_input_features).issubset(store_df.columns)
+    assert store_df.index[-1] == bars_df.index[-2]
+    assert store_df[app.final_input_features].iloc[-periods:].notna().all().all()
+
+def test_wait_for_next_period_uses_the_clock():
+    """ The app waits for the next period with the setup clock instead of sleeping on the system clock """
+
+    # Create the trading app and a virtual clock at its current period
+    app = create_synthetic_trading_app('test_wait_for_next_period_uses_the_clock')
+    app.disconnect = lambda: None
+    clock = virtual_clock(app.current_period)
+
+    # Wait for the next period
+    with contextlib.redirect_stdout(io.StringIO()):
+        sf.wait_for_next_period(app, clock)
+
+    # Check the clock slept until the next period
+    assert clock.current >= app.next_period
+    assert clock.wake_ups[-1][:2] == ('next period', app.next_period)
+
+def test_data_errors_dont_acknowledge_orders():
+    """ Only the errors of the pending orders acknowledge them, not the errors of the data requests with the same IDs or of other IDs """
+
+    # Create the trading app waiting for the acknowledgement of the orders with the data requests' IDs
+    app = create_synthetic_trading_app('test_data_errors_dont_acknowledge_orders')
+    for order_id in [1, app.midpoint_id]:
+        app.expect_order(order_id)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Send the errors of the historical data and midpoint requests and of an order that isn't pending
+        app.error(1, 162, 'Historical Market Data Service error message:API historical data query cancelled: 1')
+        app.error(app.midpoint_id, 10182, 'Failed to request live updates (disconnected).')
+        app.error(5, 202, 'Order Canceled - reason:')
+        assert not any(app.order_events[order_id][0].is_set() for order_id in [1, app.midpoint_id])
+        assert 5 not in app.order_events
+
+        # Send an order error of a pending order
+        app.error(1, 110, 'The price does not conform to the minimum price variation for this contract.')
+    assert app.wait_for_order(1, 0)
@@ -0,0 +1,145 @@
+# Import the necessary libraries
+import time
+import pickle
+import pytest
+import numpy as np
+import pandas as pd
+import trading_functions as tf
+import store_functions as stf
+from synthetic_data import create_synthetic_trading_database
+
+def test_columnar_store_matches_csv_file(bars_df, tmp_path):
+    """ The columnar store gives the same last rows as the base_df CSV file after appending the new rows """
+
+    # Set the base_df history and the new rows, the last one replaces an existing row
+    history_df, new_rows = bars_df[['Open','High','Low','Close','high_first']].iloc[:-3], bars_df[['Open','High','Low','Close','high_first']].iloc[-4:]
+
+    # Save the CSV file and append the new rows as the previous versions did
+    history_df.to_csv(tmp_path / 'base_df.csv')
+    csv_df = pd.read_csv(tmp_path / 'base_df.csv', index_col=0)
+    csv_df.index = pd.to_datetime(csv_df.index)
+    csv_df = pd.concat([csv_df, new_rows])
+    csv_df = csv_df[~csv_df.index.duplicated(keep='last')]
+
+    # Save the columnar store and append the new rows
+    stf.columnar_store(str(tmp_path / 'base_df')).write(history_df)
+    store = stf.columnar_store(str(tmp_path / 'base_df'))
+    store.append(new_rows)
+
+    # Compare the last rows and the whole store
+    store_df = store.read(last_rows=500)
+    np.testing.assert_allclose(store_df.astype(float).values, csv_df.iloc[-500:].astype(float).values)
+    assert store_df.index.equals(csv_df.index[-500:])
+    assert stf.columnar_store(str(tmp_path / 'base_df')).read().equals(pd.concat([history_df, new_rows.iloc[1:]]))
+    assert store.get_last_index() == bars_df.index[-1]
+
+def test_minute_data_store_matches_csv_file(minute_df, tmp_path):
+    """ The weekly partitions, written once per downloaded chunk, give the same rows as the rewritten CSV file """
+
+    # Set the now datetime after the minute data and the CSV file address
+    now = (minute_df.index[-1] + pd.Timedelta(days=10)).to_pydatetime()
+    csv_address = str(tmp_path / 'minute_df.csv')
+
+    # Split the data into the Saturday-based chunks of the download app, downloaded from the most recent to the oldest one
+    saturday_datetimes = pd.to_datetime(sorted(tf.saturdays_list(now.date())), format='%Y%m%d-%H:%M:%S')
+    numbers = np.searchsorted(saturday_datetimes.values, minute_df.index.values)
+    chunks = [(saturday_datetimes[number].strftime('%Y%m%d-%H:%M:%S'), minute_df[numbers==number]) for number in np.unique(numbers)[::-1]]
+
+    # Save the CSV file rewriting it after each chunk, and the partitions writing each chunk once
+    end_df = pd.DataFrame()
+    store = stf.get_minute_data_store(csv_address)
+    for name, chunk in chunks:
+        end_df = pd.concat([end_df, chunk]).sort_index()
+        end_df = end_df[~end_df.index.duplicated(keep='first')]
+        store.write_partition(name, chunk, complete=pd.Timestamp(name.replace('-',' '))<=now)
+    end_df.to_csv(csv_address, encoding='utf-8', index=True)
+    csv_df = pd.read_csv(csv_address, index_col=0)
+    csv_df.index = pd.to_datetime(csv_df.index)
+
+    # Compare the range read of the last bars and the whole store
+    store_df = stf.read_minute_data(csv_address, 500, '10min')
+    assert store_df.index.equals(csv_df.index[-len(store_df):])
+    np.testing.assert_allclose(store_df.values, csv_df.loc[store_df.index, store_df.columns].values)
+    assert len(store_df) < len(csv_df)
+    np.testing.assert_allclose(stf.read_minute_data(csv_address).values, minute_df[store_df.columns].values)
+
+def test_trading_journal_write_and_read(tmp_path):
+    """ The trading journal gives the saved dataframes after saving the previous weeks and then the last week """
+
+    # Create the database dataframes
+    dict_df, market_open_time = create_synthetic_trading_database(3, periods_per_week=40)
+
+    # Save the previous weeks in the journal
+    journal = stf.trading_journal(str(tmp_path / 'database.db'))
+    previous_weeks_df = {name:df[df.index<market_open_time] for name, df in dict_df.items() if name not in ['app_time_spent','periods_traded']}
+    previous_weeks_df['app_time_spent'] = dict_df['app_time_spent']
+    previous_weeks_df['periods_traded'] = dict_df['periods_traded'][dict_df['periods_traded']['trade_time']<market_open_time]
+    journal.write(previous_weeks_df)
+
+    # Save the last week and compare the dataframes
+    journal.write(dict_df, start=market_open_time)
+    journal_df = journal.read()
+    for name in dict_df:
+        pd.testing.assert_frame_equal(journal_df[name], dict_df[name])
+
+    # Export the journal to an Excel workbook
+    journal.export_xlsx(str(tmp_path / 'database.xlsx'))
+    assert pd.ExcelFile(tmp_path / 'database.xlsx').sheet_names == list(stf.trading_journal.tables)
+
+@pytest.mark.parametrize('keep_journal', [True, False])
+def test_trading_journal_writes_only_the_new_rows(tmp_path, monkeypatch, keep_journal, periods=5):
+    """ Each period only inserts the rows of the last key saved and the new ones, with the journal kept in memory or a new one per period
+        - The last period's row of periods_traded is updated before it's saved again, as a retried period does """
+
+    # Create the database dataframes and save the rows before the last periods
+    dict_df, market_open_time = create_synthetic_trading_database(2, periods_per_week=40)
+    period_times = dict_df['cash_balance'].index[-periods:]
+    get_rows = lambda end: {name:(df if name=='app_time_spent' else df[(df.index if stf.trading_journal.tables[name]=='index' else df['trade_time']) <= end]) \
+                            for name, df in dict_df.items()}
+    journal = stf.trading_journal(str(tmp_path / 'database.db'))
+    journal.write(get_rows(period_times[0]))
+
+    # Count the rows inserted in the tables
+    inserted_rows = {name:0 for name in stf.trading_journal.tables}
+    insert = stf.trading_journal.insert
+    def count_insert(self, connection, name, df):
+        inserted_rows[name] += len(df)
+        insert(self, connection, name, df)
+    monkeypatch.setattr(stf.trading_journal, 'insert', count_insert)
+
+    # Save the next periods, the last one twice with its trade done
+    for period_time in list(period_times[1:]) + [period_times[-1]]:
+        if period_time == period_times[-1]:
+            dict_df['periods_traded'].loc[dict_df['periods_traded'].index[-1], 'trade_done'] = 1 - dict_df['periods_traded']['trade_done'].iloc[-1]
+        journal = journal if keep_journal else stf.trading_journal(str(tmp_path / 'database.db'))
+        journal.write(get_rows(period_time), start=market_open_time)
+
+    # Check the journal has the saved dataframes and only the rows of the last keys and the new ones were inserted
+    journal_df = journal.read()
+    for name in dict_df:
+        pd.testing.assert_frame_equal(journal_df[name], dict_df[name])
+    assert inserted_rows['open_orders'] == 3*(2*periods-1)
+    assert inserted_rows['periods_traded'] == 2*periods-1
+    assert inserted_rows['app_time_spent'] == periods
+
+def test_model_cache_loads_each_file_once(tmp_path):
+    """ The model cache loads each model file once, and again when the file changes """
+
+    # Save a model file
+    address = str(tmp_path / 'model.pickle')
+    with open(address, 'wb') as handle:
+        pickle.dump({'seed':0}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Load the model several times, with and without a prepare function
+    cache = stf.model_cache()
+    prepare = lambda model: {**model, 'prepared':True}
+    models = [cache.load(address) for _ in range(3)]
+    prepared_model = cache.load(address, prepare)
+    assert all(model is models[0] for model in models) and (cache.loads == 2) and (cache.hits == 2)
+    assert (cache.load(address, prepare) is prepared_model) and prepared_model['prepared']
+
+    # Replace the model file and check it's loaded again
+    time.sleep(0.01)
+    with open(address, 'wb') as handle:
+        pickle.dump({'seed':1}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    assert cache.load(address)['seed'] == 1 and (cache.loads == 3)
@@ -0,0 +1,67 @@
+# Import the necessary libraries
+import time
+import pickle
+import numpy as np
+import pandas as pd
+from hmmlearn import hmm
+import strategy as stra
+import store_functions as stf
+
+def test_feature_engine_matches_prepare_base_df(bars_df, max_window=6, test_span=50, train_span=1000, new_bars_number=10):
+    """ The incremental feature engine gives the same features as the batch prepare_base_df
+        - The engine is created without the last "new_bars_number" bars and then updated bar by bar
+        - The batch output is created with the same first bar as the engine's base_df, so the cumulative return and the technical indicators' recursions start from the same bar """
+
+    # Create the feature engine without the last bars
+    df = bars_df.iloc[-(train_span+500):]
+    _, _, scalable_features, engine = stra.create_feature_engine(df.iloc[:-new_bars_number].copy(), max_window, test_span, train_span)
+
+    # Update the feature engine bar by bar, keeping the latest version of each row
+    incremental_df = pd.concat([engine.update(df.iloc[:(len(df)-i+1)]) for i in range(new_bars_number, 0, -1)])
+    incremental_df = incremental_df[~incremental_df.index.duplicated(keep='last')]
+
+    # Create the base_df dataframe with the same scalable features and transforms
+    batch_df, _, _ = stra.prepare_base_df(df.copy(), max_window, test_span, train_span+new_bars_number, scalable_features, engine.transforms)
+
+    # Compare the rows both dataframes have
+    common_index = incremental_df.index.intersection(batch_df.index)
+    assert len(common_index) >= new_bars_number
+    assert engine.states.resumed
+    pd.testing.assert_frame_equal(incremental_df.loc[common_index, batch_df.columns].astype(float), batch_df.loc[common_index].astype(float), check_exact=True)
+
+def test_prepare_signal_with_model_cache(market_open_time, data_folder, rows_number=200, features_number=10, seed=0):
+    """ The signal's model objects taken from the model cache predict as the ones loaded from their files, and are loaded again when a file changes """
+
+    # Create the synthetic input and prediction features
+    random_state = np.random.default_rng(seed)
+    X = pd.DataFrame(random_state.normal(size=(rows_number, features_number)).astype("float32"), columns=[f'feature_{i}' for i in range(features_number)])
+    y = np.where(X.sum(axis=1) + random_state.normal(size=rows_number) > 0, 1, -1)
+
+    # Set the month and day strings of the model objects
+    month_string = str(market_open_time.month) if market_open_time.month>=10 else '0'+str(market_open_time.month)
+    day_string = str(market_open_time.day-1) if (market_open_time.day-1)>=10 else '0'+str(market_open_time.day-1)
+    model_address = f'data/models/model_object_{market_open_time.year}_{month_string}_{day_string}.pickle'
+
+    # Fit and save the HMM model and the classifier model
+    hmm_model = hmm.GaussianHMM(n_components = 2, covariance_type = "diag", n_iter = 100, random_state = seed).fit(X[['feature_0']].values)
+    with open(f'data/models/hmm_model_{market_open_time.year}_{month_string}_{day_string}.pickle', 'wb') as handle:
+        pickle.dump(hmm_model, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(model_address, 'wb') as handle:
+        pickle.dump(stra.create_classifier_model(seed).fit(X, y), handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Take the model objects from the cache for several periods, the first period loads them
+    cache = stf.model_cache()
+    for _ in range(3):
+        cached_inputs = stra.prepare_signal(market_open_time, cache)
+    signal_inputs = stra.prepare_signal(market_open_time)
+    assert (cache.loads == 2) and (cache.hits == 4)
+    np.testing.assert_array_equal(cached_inputs['model_object'].predict(X.iloc[:100]), signal_inputs['model_object'].predict(X.iloc[:100]))
+
+    # Replace the classifier model file and check the cache loads it again
+    time.sleep(0.01)
+    with open(model_address, 'wb') as handle:
+        pickle.dump(stra.create_classifier_model(seed+1).fit(X, y), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    cached_inputs = stra.prepare_signal(market_open_time, cache)
+    signal_inputs = stra.prepare_signal(market_open_time)
+    assert cache.loads == 3
+    np.testing.assert_array_equal(cached_inputs['model_object'].predict_proba(X.iloc[:100]), signal_inputs['model_object'].predict_proba(X.iloc[:100]))
@@ -0,0 +1,67 @@
+# Import the necessary libraries
+import numpy as np
+import pandas as pd
+import ta_functions as taf
+from reference_functions import get_ta_fixed_indicators, get_ta_window_indicators
+
+def test_technical_indicators_match_ta(bars_df):
+    """ The NumPy technical indicators are the same as the "ta" library ones """
+
+    # Set the OHLC dataframe and the window sizes
+    ohlc_df = bars_df[['Open','High','Low','Close']].astype(float).iloc[-3000:]
+    windows = [3, 4, 5, 10, 15]
+
+    # Compute the technical indicators with the NumPy kernels and with the "ta" library
+    numpy_df = taf.get_technical_indicators(ohlc_df, windows)
+    ta_df = pd.concat([get_ta_fixed_indicators(ohlc_df)] + [get_ta_window_indicators(ohlc_df, window) for window in windows], axis=1).ffill()
+
+    # Compare the values, including the NaN and infinite values. The Bollinger width and %B values of near-zero deviations differ by about 1e-5 relative
+    assert set(numpy_df.columns) == set(ta_df.columns)
+    numpy_values, ta_values = numpy_df[ta_df.columns].to_numpy(dtype=float), ta_df.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        equal = np.isclose(numpy_values, ta_values, rtol=1e-4, atol=1e-9, equal_nan=True) | (numpy_values == ta_values)
+    assert equal.all(), ta_df.columns[~equal.all(axis=0)].tolist()
+
+def test_cumulative_return_base(bars_df):
+    """ The cumulative return starts from the given close price """
+
+    # Compute the technical indicators with and without the cumulative return base
+    ohlc_df = bars_df[['Open','High','Low','Close']].iloc[-500:]
+    base = bars_df['Close'].iloc[-600]
+    technical_features_df = taf.get_technical_indicators(ohlc_df, [3], cumulative_return_base=base)
+
+    # Check the cumulative return and the first close price default
+    np.testing.assert_allclose(technical_features_df['others_cr'], (ohlc_df['Close']/base - 1)*100)
+    assert taf.get_technical_indicators(ohlc_df, [3])['others_cr'].iloc[0] == 0
+
+def test_kernels_without_numba(bars_df):
+    """ The PSAR and KAMA kernels give the same values compiled with numba and run on plain lists """
+
+    # Set the OHLC arrays
+    high, low, close = [bars_df[column].to_numpy(dtype=float)[-2000:] for column in ['High','Low','Close']]
+
+    # Compare the compiled and the pure-Python kernels
+    for name, values in taf.psar(high, low, close).items():
+        np.testing.assert_array_equal(values, taf.psar(high, low, close, use_numba=False)[name])
+    np.testing.assert_array_equal(taf.kama(close, 10), taf.kama(close, 10, use_numba=False))
+
+def test_indicator_states_continue_the_recursions(bars_df, windows=[3, 10], start_bars=1000, new_bars_number=20):
+    """ The technical indicators computed with the last bars and the saved recursion states are the ones computed with all the bars
+        - The bars that don't continue the last bars computed start the recursions again """
+
+    # Compute the technical indicators of the first bars saving the recursion states
+    ohlc_df = bars_df[['Open','High','Low','Close']].iloc[-(start_bars+new_bars_number):]
+    lookback = taf.get_indicators_lookback(windows)
+    states = taf.indicator_states(keep=lookback)
+    taf.get_technical_indicators(ohlc_df.iloc[:start_bars], windows, cumulative_return_base=ohlc_df['Close'].iloc[0], states=states)
+
+    # Compute each new bar's indicators with the lookback bars only
+    new_rows = list()
+    for i in range(start_bars, start_bars+new_bars_number):
+        new_rows.append(taf.get_technical_indicators(ohlc_df.iloc[i-lookback:i+1], windows, cumulative_return_base=ohlc_df['Close'].iloc[0], states=states).iloc[-1:])
+        assert states.resumed and (states.old_count == lookback)
+    pd.testing.assert_frame_equal(pd.concat(new_rows), taf.get_technical_indicators(ohlc_df, windows).iloc[start_bars:], check_exact=True)
+
+    # Check the recursions start again with bars that don't continue the last ones
+    taf.get_technical_indicators(ohlc_df.iloc[:start_bars], windows, states=states)
+    assert not states.resumed
@@ -0,0 +1,158 @@
+# Import the necessary libraries
+import pickle
+import pytest
+import numpy as np
+import pandas as pd
+import trading_functions as tf
+import ta_functions as taf
+import strategy as stra
+from hmmlearn import hmm
+from reference_functions import directional_change_events_loop, resample_df_groupby
+
+# Set the kernels to be tested, the compiled one only if numba is installed
+use_numba_values = [True, False] if tf.njit is not None else [False]
+
+def test_batched_adfuller_matches_statsmodels(bars_df):
+    """ The batched adfuller p-values are the same as the column-by-column statsmodels ones """
+
+    # Set the technical indicators used to test the stationarity
+    data = taf.get_technical_indicators(bars_df.iloc[-1500:], [3, 4]).iloc[:-100]
+
+    # Compute the batched and column-by-column p-values
+    batched_pvalues = tf.adfuller_pvalues(data, batched=True)
+    single_pvalues = tf.adfuller_pvalues(data, batched=False)
+
+    # Check the p-values and the transform decisions
+    assert batched_pvalues.isna().equals(single_pvalues.isna())
+    assert (batched_pvalues - single_pvalues).abs().max() < 1e-6
+    assert ((batched_pvalues > 0.05) == (single_pvalues > 0.05)).all()
+
+@pytest.mark.parametrize('use_numba', use_numba_values)
+@pytest.mark.parametrize('theta', [0.00002, 0.0005, 0.004])
+def test_directional_change_events_match_loop(bars_df, theta, use_numba):
+    """ The DC events' kernels give the same indicators as the original row-by-row loop """
+
+    # Set the close prices
+    closes = bars_df[['Close']].iloc[-2000:]
+
+    # Compare the kernel output with the loop output
+    pd.testing.assert_frame_equal(tf.directional_change_events(closes, theta, use_numba=use_numba), directional_change_events_loop(closes, theta))
+
+def test_directional_change_state_matches_batch(mid_df):
+    """ The streaming DC state, restored from its pickled bytes, gives the same R values as the batch R indicator """
+
+    # Set the close prices and the warm-up length
+    closes, warmup_length = mid_df['Close'].to_numpy(dtype=float)[:10000], 3500
+
+    # Warm up the DC state, restore it from its pickled bytes and update it bar by bar
+    dc_state = tf.directional_change_state(0.00002)
+    warmup_values = dc_state.update_many(closes[:warmup_length])
+    dc_state = pickle.loads(pickle.dumps(dc_state, protocol=pickle.HIGHEST_PROTOCOL))
+    streaming_values = np.concatenate([warmup_values, [dc_state.update(close) for close in closes[warmup_length:]]])
+
+    # Compare the R values with the batch R indicator
+    batch_values = tf.directional_change_events(pd.DataFrame({'Close':closes}), 0.00002, columns='R').values
+    np.testing.assert_array_equal(streaming_values, batch_values)
+
+def test_hmm_forward_filter_matches_hmmlearn(bars_df):
+    """ The HMM forward filter gives the hmmlearn last-observation posteriors and log-likelihood """
+
+    # Get the R values and fit the HMM model
+    r_values = tf.directional_change_events(bars_df[['Close']], theta=0.00002, columns='R').dropna().values.reshape(-1,1)
+    warmup_length = len(r_values) - 200
+    hmm_model = hmm.GaussianHMM(n_components = 2, covariance_type = "diag", n_iter = 100, random_state = 0).fit(r_values[:warmup_length])
+
+    # Warm up the forward filter and restore it from its pickled bytes
+    hmm_filter = tf.hmm_forward_filter(hmm_model)
+    hmm_filter.update_many(r_values[:warmup_length])
+    hmm_filter = pickle.loads(pickle.dumps(hmm_filter, protocol=pickle.HIGHEST_PROTOCOL))
+
+    for i in range(warmup_length, len(r_values)):
+        # Update the filter with the new R value
+        state = hmm_filter.update(r_values[i])
+        # Compare the filter with the hmmlearn last posterior
+        if i % 50 == 0:
+            posteriors = hmm_model.predict_proba(r_values[:i+1])[-1]
+            np.testing.assert_allclose(hmm_filter.probabilities, posteriors, atol=1e-8)
+            assert state == np.argmax(posteriors)
+
+    # Compare the log-likelihood of all the R values
+    assert hmm_filter.log_likelihood == pytest.approx(hmm_model.score(r_values), abs=1e-6)
+
+@pytest.mark.parametrize('frequency', ['5min', '10min', '15min', '30min', '1h', '4h'])
+def test_resample_df_matches_groupby(mid_df, frequency):
+    """ The vectorised resample_df gives the same bars as the original groupby version """
+
+    # Set minute data with a gap, as the weekends
+    df = mid_df.iloc[:20000].drop(mid_df.index[5000:7000])
+
+    # Compare both outputs, the groupby high_first column is of object type
+    pd.testing.assert_frame_equal(tf.resample_df(df, frequency, '00h00min'), resample_df_groupby(df, frequency, '00h00min').astype({'high_first':bool}))
+
+@pytest.mark.parametrize('frequency, open_time', [('5min', '2024-01-07 17:00'), ('10min', '2024-01-07 17:00'), ('1h', '2024-01-07 17:00'), ('15min', '2024-01-07 17:05')])
+def test_bar_aggregator_matches_resample_df(mid_df, frequency, open_time):
+    """ The streaming bar aggregator gives the resample_df bars with the observations passed one at a time """
+
+    # Resample the data from the market opening time
+    market_open_time = pd.Timestamp(open_time).to_pydatetime()
+    df = mid_df.iloc[:10000]
+    resampled_df = tf.resample_df(df, frequency, f'{market_open_time.hour:02d}h{market_open_time.minute:02d}min')
+    df = df[df.index>=resampled_df['Open_time'].iloc[0]]
+
+    # Pass the observations one at a time and finish the last partial bar, as resample_df returns it
+    aggregator = tf.bar_aggregator(frequency, market_open_time)
+    for observation in df[['Open','High','Low','Close']].itertuples():
+        aggregator.update(*observation)
+    aggregator.flush(df.index[-1] + pd.Timedelta(frequency))
+
+    pd.testing.assert_frame_equal(aggregator.to_dataframe(), resampled_df)
+
+@pytest.mark.parametrize('use_numba', use_numba_values)
+def test_tree_ensemble_predictor_matches_model(use_numba):
+    """ The array-based predictor gives the same predictions and probabilities as the strategy classifier model """
+
+    # Create the synthetic input and prediction features, with a missing value
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 10)).astype("float32"), columns=[f'feature_{i}' for i in range(10)])
+    y = np.where(X.sum(axis=1) + rng.normal(size=300) > 0, 1, -1)
+    model_object = stra.create_classifier_model(0).fit(X, y)
+    X.iloc[0, 0] = np.nan
+
+    # Export the model to its array-based predictor
+    predictor = tf.tree_ensemble_predictor(model_object, use_numba)
+
+    # Compare all the rows and a single row with the model
+    np.testing.assert_array_equal(predictor.predict_proba(X), model_object.predict_proba(X))
+    np.testing.assert_array_equal(predictor.predict(X), model_object.predict(X))
+    np.testing.assert_array_equal(predictor.predict(X.iloc[[5]]), model_object.predict(X.iloc[[5]]))
+
+def test_fast_predictor_falls_back_to_the_model():
+    """ A model that can't be exported is returned with a single job """
+
+    # Fit a model which isn't a calibrated bagging of random forests
+    from sklearn.ensemble import RandomForestClassifier
+    model_object = RandomForestClassifier(n_estimators=5, n_jobs=-1, random_state=0).fit(np.random.default_rng(0).normal(size=(50, 3)), np.arange(50) % 2)
+
+    assert tf.get_fast_predictor(model_object) is model_object
+    assert model_object.n_jobs == 1
+
+def test_bar_aggregator_skips_late_revisions(mid_df, frequency='10min'):
+    """ A late revision of a flushed bar's last minute is skipped instead of starting a new partial bar with the flushed bar number """
+
+    # Pass the revisable minutes of the first bar and flush it once its closing time has passed
+    market_open_time = mid_df.index[0].to_pydatetime()
+    aggregator = tf.bar_aggregator(frequency, market_open_time, complete_observations=False)
+    for observation in mid_df[['Open','High','Low','Close']].iloc[:10].itertuples():
+        aggregator.update(*observation)
+    flushed_bars = aggregator.flush(mid_df.index[10])
+
+    # Pass a late revision of the flushed bar's last minute and an update of an earlier minute
+    assert aggregator.update(mid_df.index[9], 2.0, 2.0, 2.0, 2.0) == []
+    assert aggregator.update(mid_df.index[5], 2.0) == []
+    assert (aggregator.state is None) and (aggregator.bars == flushed_bars)
+
+    # Pass the next bar's minutes and check both bars are the resample_df ones
+    for observation in mid_df[['Open','High','Low','Close']].iloc[10:20].itertuples():
+        aggregator.update(*observation)
+    aggregator.flush(mid_df.index[20])
+    pd.testing.assert_frame_equal(aggregator.to_dataframe(), tf.resample_df(mid_df.iloc[:20], frequency, '17h00min'))